@@ -4,7 +4,29 @@ abloom - A high-performance Bloom filter for Python
 
 from importlib.metadata import version
 
-from abloom._abloom import BloomFilter
+from abloom._abloom import (
+    SIMD_KERNEL,
+    BloomFilter,
+    CountingBloomFilter,
+    CuckooFilter,
+    FrozenFilter,
+    ScalableBloomFilter,
+    get_prefetch_distance,
+    get_storage_backend,
+    set_prefetch_distance,
+    set_storage_backend,
+)
 
 __version__ = version("abloom")
-__all__ = ['BloomFilter']
+__all__ = [
+    'BloomFilter',
+    'CountingBloomFilter',
+    'CuckooFilter',
+    'FrozenFilter',
+    'ScalableBloomFilter',
+    'SIMD_KERNEL',
+    'get_prefetch_distance',
+    'set_prefetch_distance',
+    'get_storage_backend',
+    'set_storage_backend',
+]
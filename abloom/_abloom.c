@@ -1,8 +1,16 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <float.h>
 #include <math.h>
 #include <string.h>
 
+#if !defined(_WIN32)
+#include <sys/mman.h>
+#define ABLOOM_HAS_MMAP 1
+#else
+#define ABLOOM_HAS_MMAP 0
+#endif
+
 // Atomics support detection and portable macros
 #if defined(_MSC_VER)
 #include <intrin.h>
@@ -11,6 +19,35 @@
   _InterlockedOr64((volatile long long *)(ptr), (val))
 #define ATOMIC_LOAD64(ptr)                                                     \
   ((uint64_t)_InterlockedOr64((volatile long long *)(ptr), 0))
+#define ATOMIC_EXCHANGE32(ptr, val)                                            \
+  ((uint32_t)_InterlockedExchange((volatile long *)(ptr), (long)(val)))
+#define ATOMIC_STORE32(ptr, val)                                               \
+  ((void)_InterlockedExchange((volatile long *)(ptr), (long)(val)))
+#define ATOMIC_LOAD32(ptr)                                                     \
+  ((uint32_t)_InterlockedOr((volatile long *)(ptr), 0))
+#define ATOMIC_OR64_RELEASE(ptr, val)                                          \
+  ((void)_InterlockedOr64((volatile long long *)(ptr), (val)))
+#define ATOMIC_EXCHANGE64(ptr, val)                                            \
+  ((uint64_t)_InterlockedExchange64((volatile long long *)(ptr), (val)))
+// Stores `desired` if *ptr equals *expected, else loads *ptr into *expected
+static __forceinline int abloom_cas64(volatile uint64_t *ptr,
+                                      uint64_t *expected, uint64_t desired) {
+  uint64_t old = (uint64_t)_InterlockedCompareExchange64(
+      (volatile long long *)ptr, (long long)desired, (long long)*expected);
+  if (old == *expected)
+    return 1;
+  *expected = old;
+  return 0;
+}
+#define ATOMIC_CAS64(ptr, expected, desired)                                   \
+  abloom_cas64((volatile uint64_t *)(ptr), (expected), (desired))
+#define ATOMIC_ADD64(ptr, val)                                                 \
+  ((uint64_t)_InterlockedExchangeAdd64((volatile long long *)(ptr), (val)))
+#define ATOMIC_LOAD32_ACQUIRE(ptr)                                             \
+  ((uint32_t)_InterlockedOr((volatile long *)(ptr), 0))
+// Interlocked operations are full barriers
+static volatile long abloom_fence_word;
+#define ATOMIC_FENCE() ((void)_InterlockedOr(&abloom_fence_word, 0))
 #elif defined(__STDC_VERSION__) && __STDC_VERSION__ >= 201112L &&              \
     !defined(__STDC_NO_ATOMICS__)
 #include <stdatomic.h>
@@ -20,6 +57,29 @@
                            memory_order_relaxed)
 #define ATOMIC_LOAD64(ptr)                                                     \
   atomic_load_explicit((_Atomic uint64_t *)(ptr), memory_order_relaxed)
+#define ATOMIC_EXCHANGE32(ptr, val)                                            \
+  atomic_exchange_explicit((_Atomic uint32_t *)(ptr), (val),                   \
+                           memory_order_acquire)
+#define ATOMIC_STORE32(ptr, val)                                               \
+  atomic_store_explicit((_Atomic uint32_t *)(ptr), (val), memory_order_release)
+#define ATOMIC_LOAD32(ptr)                                                     \
+  atomic_load_explicit((_Atomic uint32_t *)(ptr), memory_order_relaxed)
+#define ATOMIC_OR64_RELEASE(ptr, val)                                          \
+  ((void)atomic_fetch_or_explicit((_Atomic uint64_t *)(ptr), (val),            \
+                                  memory_order_release))
+#define ATOMIC_EXCHANGE64(ptr, val)                                            \
+  atomic_exchange_explicit((_Atomic uint64_t *)(ptr), (val),                   \
+                           memory_order_acquire)
+#define ATOMIC_CAS64(ptr, expected, desired)                                   \
+  atomic_compare_exchange_weak_explicit((_Atomic uint64_t *)(ptr), (expected), \
+                                        (desired), memory_order_relaxed,       \
+                                        memory_order_relaxed)
+#define ATOMIC_ADD64(ptr, val)                                                 \
+  atomic_fetch_add_explicit((_Atomic uint64_t *)(ptr), (val),                  \
+                            memory_order_relaxed)
+#define ATOMIC_LOAD32_ACQUIRE(ptr)                                             \
+  atomic_load_explicit((_Atomic uint32_t *)(ptr), memory_order_acquire)
+#define ATOMIC_FENCE() atomic_thread_fence(memory_order_seq_cst)
 #else
 #define ABLOOM_HAS_ATOMICS 0
 #endif
@@ -33,10 +93,57 @@
 #define BLOCK_WORDS 8
 #define BITS_PER_WORD 64
 
+// Parquet split block Bloom filters: 256-bit blocks of 8 x 32-bit words, one
+// salted bit per word. Bitsets are a power of two bytes in [32 B, 128 MiB].
+#define PARQUET_BLOCK_BYTES 32
+#define PARQUET_BLOCK_WORDS 4
+#define PARQUET_MIN_BYTES 32
+#define PARQUET_MAX_BYTES (128 * 1024 * 1024)
+
+// Register-blocked filters: each item sets k salted bits of a single 64-bit
+// word. k is capped by the 8 SALT constants, and below REGISTER_MIN_FP_RATE
+// the layout needs more than 2.5x the memory of SBBF-512.
+#define REGISTER_MAX_K 8
+#define REGISTER_MIN_FP_RATE 1e-5
+
 #define ABLOOM_MAGIC "ABLM"
 #define ABLOOM_MAGIC_SIZE 4
-#define ABLOOM_VERSION 2
-#define ABLOOM_HEADER_SIZE                                                     \
+
+// Format v3, written by to_bytes() and mapped by BloomFilter.open(): a
+// 64-byte header of little-endian fields, then the blocks as little-endian
+// words. On little-endian hosts saving and loading are a single memcpy, and
+// the block array of a mapped file is used in place.
+//   0 magic "ABLM"  4 version  5 flags  6 layout  7 hash
+//   8 capacity  16 fp_rate  24 block_count  32 compact payload size, or
+//   the number of blocks of a delta  40 bits per item of the register
+//   layout  41-63 reserved (zero)
+#define ABLOOM_VERSION 3
+#define ABLOOM_HEADER_SIZE 64
+#define ABLOOM_FLAG_FREE_THREADING 0x01
+// The blocks are stored in the compact encoding (see encode_compact())
+#define ABLOOM_FLAG_COMPACT 0x02
+// A delta from to_delta(), which only apply_delta() accepts
+#define ABLOOM_FLAG_DELTA 0x04
+// A ScalableBloomFilter: its parameters, then one filter image per stage
+#define ABLOOM_FLAG_SCALABLE 0x08
+// 512-bit blocks, one salted bit per 64-bit word
+#define ABLOOM_LAYOUT_SBBF512 0
+// Parquet's 256-bit blocks, one salted bit per 32-bit word
+#define ABLOOM_LAYOUT_PARQUET 1
+// FrozenFilter binary fuse arrays of 8- and 16-bit fingerprints
+#define ABLOOM_LAYOUT_FUSE8 2
+#define ABLOOM_LAYOUT_FUSE16 3
+// One 64-bit word per item holding k salted bits, k in 1..REGISTER_MAX_K
+#define ABLOOM_LAYOUT_REGISTER 4
+// Serializable-mode hashing: XXH64 (seed 0) for bytes/str, mix64 of the
+// Python hash for int/float
+#define ABLOOM_HASH_SERIALIZABLE 0
+// Parquet hashing: XXH64 (seed 0) of the value's PLAIN encoding
+#define ABLOOM_HASH_PARQUET 1
+
+// Format v2, still read by from_bytes(): every field and word big-endian
+#define ABLOOM_V2_VERSION 2
+#define ABLOOM_V2_HEADER_SIZE                                                  \
   30 // 4 magic + 1 version + 8 capacity + 8 fp_rate + 8 block_count + 1
      // free_threading
 
@@ -58,33 +165,330 @@ static inline uint64_t read_be64(const unsigned char *buf) {
          ((uint64_t)buf[6] << 8) | (uint64_t)buf[7];
 }
 
+static inline void write_le64(unsigned char *buf, uint64_t val) {
+  for (int i = 0; i < 8; i++)
+    buf[i] = (val >> (8 * i)) & 0xFF;
+}
+
+static inline uint64_t read_le64(const unsigned char *buf) {
+  uint64_t val = 0;
+  for (int i = 0; i < 8; i++)
+    val |= (uint64_t)buf[i] << (8 * i);
+  return val;
+}
+
 // Salt constants from Parquet spec
 static const uint32_t SALT[8] = {0x47b6137bU, 0x44974d91U, 0x8824ad5bU,
                                  0xa2b7289dU, 0x705495c7U, 0x2df1424bU,
                                  0x9efc4947U, 0x5c6bfb31U};
 
+// Block storage backends. Every backend hands out 64-byte aligned memory, so
+// each 512-bit block is exactly one cache line.
+// STORAGE_FILE and STORAGE_SHARED are only used by BloomFilter.open() and
+// create_shared()/attach() and can't be selected as the process-wide backend.
+typedef enum {
+  STORAGE_ALIGNED,
+  STORAGE_MMAP,
+  STORAGE_HUGETLB,
+  STORAGE_FILE,
+  STORAGE_SHARED
+} StorageKind;
+static const char *const storage_names[] = {"aligned", "mmap", "hugetlb",
+                                            "file", "shared"};
+// Indexed by ABLOOM_LAYOUT_*; 2 and 3 are FrozenFilter's
+static const char *const layout_names[] = {"sbbf", "parquet", NULL, NULL,
+                                           "register"};
+
 typedef struct {
   PyObject_HEAD uint64_t *blocks;
+  // Allocation that owns `blocks`: a PyMem block for STORAGE_ALIGNED, a
+  // mapping of storage_bytes for the mmap backends, or the buffer exported
+  // by an mmap.mmap object (file_view) for STORAGE_FILE, or by the
+  // SharedMemory object `shm` for STORAGE_SHARED
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  Py_buffer file_view;
+  PyObject *shm;
+  // Set for files opened with mode="r", whose mapping is not writable
+  int readonly;
+  // Number of buffer exports (memoryviews) of `blocks`; the block array can't
+  // be replaced while any are held
+  Py_ssize_t exports;
+  // Operations between bloom_begin_read()/bloom_begin_write() and their end,
+  // which may run without the GIL; __init__ refuses while any are active
+  Py_ssize_t active_ops;
   uint64_t block_count;
   uint64_t capacity;
   double fp_rate;
   int serializable;
   int free_threading;
+  // ABLOOM_LAYOUT_*; parquet filters are always serializable
+  int layout;
+  // Salted bits set per item: one per word for the blocked layouts, or the
+  // k picked by register_bits_for_fpr() for the register layout
+  int k;
+  // Default-mode bulk writers that have released the GIL hold bulk_lock
+  // (allocated on first use); bulk_writers is only touched with the GIL held
+  PyThread_type_lock bulk_lock;
+  int bulk_writers;
+  // One bit per block changed since the last checkpoint(), or NULL until
+  // checkpoint() turns change tracking on
+  uint64_t *dirty;
 } BloomFilter;
 
-static double sbbf_fpr(double bits_per_element) {
-  double a = 512.0 / bits_per_element;
+// Filters of at least ABLOOM_MMAP_MIN_BYTES are mapped straight from the OS
+// instead of the Python heap. The mapping starts on a 2 MiB boundary and, on
+// Linux, is advised to use transparent huge pages, so random probes into a
+// large filter take far fewer TLB misses. The "hugetlb" backend asks for
+// pages from the explicit huge page pool instead and falls back to "mmap"
+// when the pool is empty. Smaller filters always use the aligned heap.
+#define ABLOOM_HUGE_PAGE ((size_t)2 << 20)
+#define ABLOOM_MMAP_MIN_BYTES ABLOOM_HUGE_PAGE
+
+static StorageKind storage_backend =
+    ABLOOM_HAS_MMAP ? STORAGE_MMAP : STORAGE_ALIGNED;
+
+static int storage_supported(StorageKind kind) {
+  switch (kind) {
+  case STORAGE_ALIGNED:
+    return 1;
+  case STORAGE_MMAP:
+    return ABLOOM_HAS_MMAP;
+  case STORAGE_HUGETLB:
+#ifdef MAP_HUGETLB
+    return 1;
+#else
+    return 0;
+#endif
+  case STORAGE_FILE:
+  case STORAGE_SHARED:
+    return 0;
+  }
+  return 0;
+}
+
+#if ABLOOM_HAS_MMAP
+// Maps `len` zeroed bytes (a multiple of ABLOOM_HUGE_PAGE) starting on a huge
+// page boundary, or returns NULL.
+static void *storage_map(size_t len, int hugetlb) {
+  int flags = MAP_PRIVATE | MAP_ANONYMOUS;
+  if (hugetlb) {
+#ifdef MAP_HUGETLB
+    void *p = mmap(NULL, len, PROT_READ | PROT_WRITE, flags | MAP_HUGETLB, -1,
+                   0);
+    return p == MAP_FAILED ? NULL : p;
+#else
+    return NULL;
+#endif
+  }
+
+  // Over-map by one huge page and trim both ends, since mmap only promises
+  // base page alignment and THP can only back aligned 2 MiB ranges
+  size_t padded = len + ABLOOM_HUGE_PAGE;
+  char *raw = mmap(NULL, padded, PROT_READ | PROT_WRITE, flags, -1, 0);
+  if (raw == MAP_FAILED)
+    return NULL;
+  uintptr_t start = ((uintptr_t)raw + ABLOOM_HUGE_PAGE - 1) &
+                    ~(uintptr_t)(ABLOOM_HUGE_PAGE - 1);
+  size_t head = start - (uintptr_t)raw;
+  if (head)
+    munmap(raw, head);
+  if (padded - head - len)
+    munmap((char *)start + len, padded - head - len);
+#ifdef MADV_HUGEPAGE
+  madvise((void *)start, len, MADV_HUGEPAGE);
+#endif
+  return (void *)start;
+}
+#endif
+
+// Allocates `num_bytes` of 64-byte aligned storage from the current backend
+// and returns the aligned pointer. The allocation to free is stored in
+// `*base`, `*len` and `*kind`. Memory is zeroed when `zero` is set (mappings
+// always are). Sets MemoryError and returns NULL on failure.
+static void *storage_alloc(size_t num_bytes, int zero, void **base,
+                           size_t *len, StorageKind *kind) {
+  if (num_bytes > SIZE_MAX - ABLOOM_HUGE_PAGE) {
+    PyErr_NoMemory();
+    return NULL;
+  }
+
+#if ABLOOM_HAS_MMAP
+  if (storage_backend != STORAGE_ALIGNED &&
+      num_bytes >= ABLOOM_MMAP_MIN_BYTES) {
+    size_t map_len =
+        (num_bytes + ABLOOM_HUGE_PAGE - 1) & ~(ABLOOM_HUGE_PAGE - 1);
+    StorageKind map_kind = STORAGE_HUGETLB;
+    void *p = NULL;
+    if (storage_backend == STORAGE_HUGETLB)
+      p = storage_map(map_len, 1);
+    if (p == NULL) {
+      map_kind = STORAGE_MMAP;
+      p = storage_map(map_len, 0);
+    }
+    if (p != NULL) {
+      *base = p;
+      *len = map_len;
+      *kind = map_kind;
+      return p;
+    }
+  }
+#endif
+
+  // PyMem only promises 16-byte alignment, so over-allocate by a block and
+  // round up
+  size_t padded = num_bytes + BLOCK_BYTES;
+  void *raw = zero ? PyMem_Calloc(padded, 1) : PyMem_Malloc(padded);
+  if (raw == NULL) {
+    PyErr_NoMemory();
+    return NULL;
+  }
+  *base = raw;
+  *len = padded;
+  *kind = STORAGE_ALIGNED;
+  return (void *)(((uintptr_t)raw + BLOCK_BYTES - 1) &
+                  ~(uintptr_t)(BLOCK_BYTES - 1));
+}
+
+// Frees an allocation of storage_alloc()
+static void storage_free(void *base, size_t len, StorageKind kind) {
+  if (kind == STORAGE_ALIGNED) {
+    PyMem_Free(base);
+  } else {
+#if ABLOOM_HAS_MMAP
+    munmap(base, len);
+#endif
+  }
+}
+
+// Allocates `num_bytes` of block storage for `bf` from the current backend.
+// Sets MemoryError and returns -1 on failure.
+static int bloom_alloc_blocks(BloomFilter *bf, size_t num_bytes, int zero) {
+  bf->blocks = storage_alloc(num_bytes, zero, &bf->storage_base,
+                             &bf->storage_bytes, &bf->storage);
+  return bf->blocks == NULL ? -1 : 0;
+}
+
+static void bloom_free_blocks(BloomFilter *bf) {
+  if (bf->storage_base == NULL)
+    return;
+  switch (bf->storage) {
+  case STORAGE_ALIGNED:
+  case STORAGE_MMAP:
+  case STORAGE_HUGETLB:
+    storage_free(bf->storage_base, bf->storage_bytes, bf->storage);
+    break;
+  case STORAGE_FILE:
+    PyBuffer_Release(&bf->file_view);
+    break;
+  case STORAGE_SHARED: {
+    // Only closes this process's mapping; the segment stays until unlink()
+    PyBuffer_Release(&bf->file_view);
+    PyObject *exc_type, *exc_value, *exc_tb;
+    PyErr_Fetch(&exc_type, &exc_value, &exc_tb);
+    PyObject *res = PyObject_CallMethod(bf->shm, "close", NULL);
+    if (res == NULL)
+      PyErr_WriteUnraisable(bf->shm);
+    Py_XDECREF(res);
+    PyErr_Restore(exc_type, exc_value, exc_tb);
+    Py_CLEAR(bf->shm);
+    break;
+  }
+  }
+  bf->storage_base = NULL;
+  bf->blocks = NULL;
+  bf->readonly = 0;
+  PyMem_Free(bf->dirty);
+  bf->dirty = NULL;
+}
+
+// Called first by every method that sets bits: writing through the
+// read-only mapping of a file opened with mode="r" would crash.
+static inline int bloom_check_writable(BloomFilter *bf) {
+  if (bf->readonly) {
+    PyErr_SetString(PyExc_TypeError,
+                    "Cannot modify a BloomFilter opened with mode='r'");
+    return -1;
+  }
+  return 0;
+}
+
+// Returns the ABLOOM_LAYOUT_* value for a layout name, or -1 with ValueError
+static int parse_layout(const char *name) {
+  for (int i = ABLOOM_LAYOUT_SBBF512; i <= ABLOOM_LAYOUT_REGISTER; i++) {
+    if (layout_names[i] != NULL && strcmp(name, layout_names[i]) == 0)
+      return i;
+  }
+  PyErr_Format(PyExc_ValueError,
+               "Unknown layout '%s' (expected 'sbbf', 'parquet' or "
+               "'register')",
+               name);
+  return -1;
+}
+
+// False positive rate of a blocked filter at `bits_per_element`, using the
+// Poisson model of Apple 2021: a block of `block_bits` holds Poisson(a) items
+// with a = block_bits / bits_per_element, and each item sets `word_k` bits
+// (uniform draws, with replacement) in each of the block's words of
+// `word_bits` bits. A lookup hits a word when its `word_k` draws all land on
+// bits set by the i * word_k draws of the block's i items. With one bit per
+// word that is 1 - (1 - 1/word_bits)^i; with more it is the inclusion-
+// exclusion sum over the distinct bits of the lookup. SBBF-512 is
+// (512, 64, 1) and the register layout (64, 64, k).
+static double blocked_fpr(double bits_per_element, double block_bits,
+                          double word_bits, int word_k) {
+  double a = block_bits / bits_per_element;
   double exp_neg_a = exp(-a);
   double poisson_pmf = exp_neg_a;
-  double p_miss = 63.0 / 64.0;
+  double p_miss = 1.0 - 1.0 / word_bits;
+  double k = block_bits / word_bits;
   double fpr = 0.0;
 
+  // coeff[t] multiplies (1 - t/word_bits)^(i * word_k) in the word hit
+  // probability: the chance of j distinct lookup bits (Stirling numbers of
+  // the second kind) times (-1)^t C(j, t) for the j-bit covering sum
+  double coeff[REGISTER_MAX_K + 1] = {0};
+  // miss[t] = (1 - t/word_bits)^(i * word_k), advanced by miss_step[t]
+  double miss[REGISTER_MAX_K + 1], miss_step[REGISTER_MAX_K + 1];
+  if (word_k > 1) {
+    for (int t = 0; t <= word_k; t++) {
+      miss[t] = 1.0;
+      miss_step[t] = pow(1.0 - t / word_bits, word_k);
+    }
+    double stirling[REGISTER_MAX_K + 1] = {1};
+    for (int n = 1; n <= word_k; n++) {
+      for (int j = n; j >= 1; j--)
+        stirling[j] = j * stirling[j] + stirling[j - 1];
+      stirling[0] = 0;
+    }
+    for (int j = 1; j <= word_k; j++) {
+      double p_distinct = stirling[j] / pow(word_bits, word_k);
+      for (int m = 0; m < j; m++)
+        p_distinct *= word_bits - m;
+      double binom = 1.0;
+      for (int t = 0; t <= j; t++) {
+        coeff[t] += (t % 2 ? -binom : binom) * p_distinct;
+        binom = binom * (j - t) / (t + 1);
+      }
+    }
+  }
+
   for (int i = 0; i < 500; i++) {
     if (i > 0)
       poisson_pmf *= a / i;
 
-    double p_bit_set = 1.0 - pow(p_miss, i);
-    double f_inner = pow(p_bit_set, 8);
+    double p_word_hit;
+    if (word_k == 1) {
+      p_word_hit = 1.0 - pow(p_miss, i);
+    } else {
+      p_word_hit = 0.0;
+      for (int t = 0; t <= word_k; t++) {
+        p_word_hit += coeff[t] * miss[t];
+        miss[t] *= miss_step[t];
+      }
+    }
+    double f_inner = pow(p_word_hit, k);
     fpr += poisson_pmf * f_inner;
 
     if (poisson_pmf < 1e-15 && i > a)
@@ -94,12 +498,13 @@ static double sbbf_fpr(double bits_per_element) {
   return fpr;
 }
 
-static double sbbf_bits_for_fpr(double target_fpr) {
+static double blocked_bits_for_fpr(double target_fpr, double block_bits,
+                                   double word_bits, int word_k) {
   double lo = 0.5, hi = 300.0;
 
   while (hi - lo > 1e-6) {
     double mid = (lo + hi) / 2.0;
-    if (sbbf_fpr(mid) > target_fpr)
+    if (blocked_fpr(mid, block_bits, word_bits, word_k) > target_fpr)
       lo = mid;
     else
       hi = mid;
@@ -108,6 +513,31 @@ static double sbbf_bits_for_fpr(double target_fpr) {
   return (lo + hi) / 2.0;
 }
 
+static double sbbf_bits_for_fpr(double target_fpr) {
+  return blocked_bits_for_fpr(target_fpr, BLOCK_BITS, BITS_PER_WORD, 1);
+}
+
+// Bits per item of the register layout: the k in 1..REGISTER_MAX_K that
+// needs the fewest, which is also stored to `k_out` when it isn't NULL. The
+// bits needed rise on both sides of the best k, so the search walks down
+// from REGISTER_MAX_K and stops at the first k that needs more than the one
+// above it (small k at low rates would need more than the model's range).
+static double register_bits_for_fpr(double target_fpr, int *k_out) {
+  double best = 0.0;
+  int best_k = 0;
+  for (int k = REGISTER_MAX_K; k >= 1; k--) {
+    double bits =
+        blocked_bits_for_fpr(target_fpr, BITS_PER_WORD, BITS_PER_WORD, k);
+    if (best_k != 0 && bits > best)
+      break;
+    best = bits;
+    best_k = k;
+  }
+  if (k_out != NULL)
+    *k_out = best_k;
+  return best;
+}
+
 static inline uint64_t mix64(uint64_t x) {
   x ^= x >> 33;
   x *= 0xff51afd7ed558ccdULL;
@@ -129,11 +559,188 @@ static int64_t calculate_block_count(uint64_t capacity, double fp_rate) {
   return (int64_t)min_blocks;
 }
 
-static inline void bloom_insert(BloomFilter *bf, uint64_t hash) {
-  uint64_t block_idx = (hash >> 32) % bf->block_count;
-  uint32_t h_low = (uint32_t)hash;
-  uint64_t *block = &bf->blocks[block_idx * BLOCK_WORDS];
+// Parquet writers size the bitset for `capacity` distinct values as
+// -8 * ndv / ln(1 - fpp^(1/8)) bits, rounded up to a power of two bytes and
+// clamped to [PARQUET_MIN_BYTES, PARQUET_MAX_BYTES]. Matching them makes a
+// filter built here byte-compatible with one written for the same ndv/fpp.
+static int64_t parquet_block_count(uint64_t capacity, double fp_rate) {
+  double m = -8.0 * (double)capacity / log(1.0 - pow(fp_rate, 1.0 / 8));
+  uint64_t bits = m >= (double)PARQUET_MAX_BYTES * 8 ? (uint64_t)PARQUET_MAX_BYTES * 8
+                                                     : (uint64_t)m;
+  uint64_t bytes = PARQUET_MIN_BYTES;
+  while (bytes * 8 < bits)
+    bytes <<= 1;
+  return (int64_t)(bytes / PARQUET_BLOCK_BYTES);
+}
+
+// One block per 64-bit word
+static int64_t register_block_count(uint64_t capacity, double fp_rate) {
+  double bits_per_item = register_bits_for_fpr(fp_rate, NULL);
+  if (capacity > (double)UINT64_MAX / bits_per_item) {
+    return -1;
+  }
+
+  uint64_t total_bits = (uint64_t)ceil(capacity * bits_per_item);
+  uint64_t words = (total_bits + BITS_PER_WORD - 1) / BITS_PER_WORD;
+  // Words are picked by a 32 x 32-bit multiply-shift (see bloom_block())
+  return words > UINT32_MAX ? -1 : (int64_t)words;
+}
+
+static int64_t layout_block_count(int layout, uint64_t capacity,
+                                  double fp_rate) {
+  switch (layout) {
+  case ABLOOM_LAYOUT_PARQUET:
+    return parquet_block_count(capacity, fp_rate);
+  case ABLOOM_LAYOUT_REGISTER:
+    return register_block_count(capacity, fp_rate);
+  default:
+    return calculate_block_count(capacity, fp_rate);
+  }
+}
+
+static inline size_t layout_block_bytes(int layout) {
+  switch (layout) {
+  case ABLOOM_LAYOUT_PARQUET:
+    return PARQUET_BLOCK_BYTES;
+  case ABLOOM_LAYOUT_REGISTER:
+    return 8;
+  default:
+    return BLOCK_BYTES;
+  }
+}
+
+// Salted bits per item of a filter with `layout` at `fp_rate`
+static int layout_k(int layout, double fp_rate) {
+  int k = BLOCK_WORDS;
+  if (layout == ABLOOM_LAYOUT_REGISTER)
+    register_bits_for_fpr(fp_rate, &k);
+  return k;
+}
+
+// Size of the block array in bytes
+static inline size_t bloom_nbytes(const BloomFilter *bf) {
+  return (size_t)bf->block_count * layout_block_bytes(bf->layout);
+}
+
+// Parquet picks the block with a multiply-shift instead of a modulo, which
+// is why its bitsets are a power of two. The register layout does the same
+// because a 64-bit division costs more than the rest of its lookup; its
+// word count stays below 2^32, so the product can't overflow.
+static inline uint64_t bloom_block_index(const BloomFilter *bf, uint64_t hash) {
+  if (bf->layout != ABLOOM_LAYOUT_SBBF512)
+    return ((hash >> 32) * bf->block_count) >> 32;
+  return (hash >> 32) % bf->block_count;
+}
+
+static inline uint64_t *bloom_block(BloomFilter *bf, uint64_t hash) {
+  if (bf->layout == ABLOOM_LAYOUT_PARQUET)
+    return &bf->blocks[(((hash >> 32) * bf->block_count) >> 32) *
+                       PARQUET_BLOCK_WORDS];
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER)
+    return &bf->blocks[((hash >> 32) * bf->block_count) >> 32];
+  return &bf->blocks[(hash >> 32) % bf->block_count * BLOCK_WORDS];
+}
+
+// Parquet's 32-bit words 2j and 2j + 1 are the low and high halves of 64-bit
+// word j, so the blocks serialize to Parquet's little-endian bytes on every
+// host and the filter-wide code can keep working on 64-bit words. Returns
+// the bits of `h_low` in word j.
+static inline uint64_t parquet_mask(uint32_t h_low, int j) {
+  return (1ULL << ((h_low * SALT[2 * j]) >> 27)) |
+         (1ULL << (32 + ((h_low * SALT[2 * j + 1]) >> 27)));
+}
+
+static inline void parquet_set_bits(BloomFilter *bf, uint64_t *block,
+                                    uint32_t h_low) {
+#if ABLOOM_HAS_ATOMICS
+  if (bf->free_threading) {
+    for (int j = 0; j < PARQUET_BLOCK_WORDS; j++)
+      ATOMIC_OR64(&block[j], parquet_mask(h_low, j));
+    return;
+  }
+#endif
+  for (int j = 0; j < PARQUET_BLOCK_WORDS; j++)
+    block[j] |= parquet_mask(h_low, j);
+}
+
+static inline int parquet_test_bits(BloomFilter *bf, const uint64_t *block,
+                                    uint32_t h_low) {
+  for (int j = 0; j < PARQUET_BLOCK_WORDS; j++) {
+    uint64_t mask = parquet_mask(h_low, j);
+#if ABLOOM_HAS_ATOMICS
+    uint64_t word = bf->free_threading ? ATOMIC_LOAD64(&block[j]) : block[j];
+#else
+    uint64_t word = block[j];
+#endif
+    if ((word & mask) != mask)
+      return 0;
+  }
+  return 1;
+}
+
+// The register layout sets the first k salted bits of SBBF-512 in a single
+// word, so an insert is one OR and a lookup one load, AND and compare.
+// The switch falls through from bit k, so each k runs straight-line code.
+#define REGISTER_BIT(h_low, i) (1ULL << (((h_low) * SALT[i]) >> 26))
+static inline uint64_t register_mask_k(int k, uint32_t h_low) {
+  uint64_t mask = 0;
+  switch (k) {
+  case 8:
+    mask |= REGISTER_BIT(h_low, 7); // fall through
+  case 7:
+    mask |= REGISTER_BIT(h_low, 6); // fall through
+  case 6:
+    mask |= REGISTER_BIT(h_low, 5); // fall through
+  case 5:
+    mask |= REGISTER_BIT(h_low, 4); // fall through
+  case 4:
+    mask |= REGISTER_BIT(h_low, 3); // fall through
+  case 3:
+    mask |= REGISTER_BIT(h_low, 2); // fall through
+  case 2:
+    mask |= REGISTER_BIT(h_low, 1); // fall through
+  default:
+    mask |= REGISTER_BIT(h_low, 0);
+  }
+  return mask;
+}
+
+static inline uint64_t register_mask(const BloomFilter *bf, uint32_t h_low) {
+  return register_mask_k(bf->k, h_low);
+}
+
+static inline void register_set_bits(BloomFilter *bf, uint64_t *word,
+                                     uint32_t h_low) {
+#if ABLOOM_HAS_ATOMICS
+  if (bf->free_threading) {
+    ATOMIC_OR64(word, register_mask(bf, h_low));
+    return;
+  }
+#endif
+  *word |= register_mask(bf, h_low);
+}
+
+static inline int register_test_bits(BloomFilter *bf, const uint64_t *word,
+                                     uint32_t h_low) {
+  uint64_t mask = register_mask(bf, h_low);
+#if ABLOOM_HAS_ATOMICS
+  uint64_t bits = bf->free_threading ? ATOMIC_LOAD64(word) : *word;
+#else
+  uint64_t bits = *word;
+#endif
+  return (bits & mask) == mask;
+}
 
+static inline void bloom_set_bits(BloomFilter *bf, uint64_t *block,
+                                  uint32_t h_low) {
+  if (bf->layout == ABLOOM_LAYOUT_PARQUET) {
+    parquet_set_bits(bf, block, h_low);
+    return;
+  }
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER) {
+    register_set_bits(bf, block, h_low);
+    return;
+  }
 #if ABLOOM_HAS_ATOMICS
   if (bf->free_threading) {
     for (int i = 0; i < BLOCK_WORDS; i++) {
@@ -148,11 +755,12 @@ static inline void bloom_insert(BloomFilter *bf, uint64_t hash) {
   }
 }
 
-static inline int bloom_check(BloomFilter *bf, uint64_t hash) {
-  uint64_t block_idx = (hash >> 32) % bf->block_count;
-  uint32_t h_low = (uint32_t)hash;
-  uint64_t *block = &bf->blocks[block_idx * BLOCK_WORDS];
-
+static inline int bloom_test_bits(BloomFilter *bf, const uint64_t *block,
+                                  uint32_t h_low) {
+  if (bf->layout == ABLOOM_LAYOUT_PARQUET)
+    return parquet_test_bits(bf, block, h_low);
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER)
+    return register_test_bits(bf, block, h_low);
 #if ABLOOM_HAS_ATOMICS
   if (bf->free_threading) {
     for (int i = 0; i < BLOCK_WORDS; i++) {
@@ -170,591 +778,8178 @@ static inline int bloom_check(BloomFilter *bf, uint64_t hash) {
   return 1;
 }
 
-// Fast path: uses Python's hash (not deterministic across processes)
-static inline int get_hash_fast(PyObject *item, uint64_t *out_hash) {
-  Py_hash_t py_hash = PyObject_Hash(item);
-  if (py_hash == -1 && PyErr_Occurred())
-    return -1;
-  *out_hash = mix64((uint64_t)py_hash);
-  return 0;
+// Sets the bits of `h_low` in `block` and returns 1 if they were all already
+// set. In free_threading mode the old word values come from the atomic ORs,
+// but the 8 words are still updated one at a time: two threads inserting the
+// same new item could each flip some of its bits and both report it as new.
+// Test-and-set calls therefore also take a spinlock from a small striped
+// table keyed by block address, which makes them linearizable with respect
+// to each other. Plain inserts don't take it and stay lock-free. The register
+// layout needs no lock: its single atomic OR already is the test-and-set.
+#if ABLOOM_HAS_ATOMICS
+#define ABLOOM_CLAIM_STRIPES 1024
+static uint32_t claim_locks[ABLOOM_CLAIM_STRIPES];
+
+static inline uint32_t *claim_lock(const uint64_t *block) {
+  uint32_t *lock =
+      &claim_locks[((uintptr_t)block / BLOCK_BYTES) % ABLOOM_CLAIM_STRIPES];
+  while (ATOMIC_EXCHANGE32(lock, 1) != 0) {
+    while (ATOMIC_LOAD32(lock) != 0) {
+    }
+  }
+  return lock;
 }
+#endif
 
-// Deterministic hashing for serialization support
-static inline int get_hash_serializable(PyObject *item, uint64_t *out_hash) {
-  if (PyBytes_Check(item)) {
-    *out_hash = XXH64(PyBytes_AS_STRING(item), PyBytes_GET_SIZE(item), 0);
-  } else if (PyUnicode_Check(item)) {
-    Py_ssize_t size;
-    const char *utf8 = PyUnicode_AsUTF8AndSize(item, &size);
-    if (!utf8)
-      return -1;
-    *out_hash = XXH64(utf8, size, 0);
-  } else if (PyLong_Check(item) || PyFloat_Check(item)) {
-    Py_hash_t py_hash = PyObject_Hash(item);
-    if (py_hash == -1 && PyErr_Occurred())
-      return -1;
-    *out_hash = mix64((uint64_t)py_hash);
-  } else {
-    PyErr_SetString(
-        PyExc_TypeError,
-        "Only bytes, str, int, and float are supported in serializable mode");
-    return -1;
+static inline int bloom_test_and_set_bits(BloomFilter *bf, uint64_t *block,
+                                          uint32_t h_low) {
+  int present = 1;
+  if (bf->layout == ABLOOM_LAYOUT_PARQUET) {
+#if ABLOOM_HAS_ATOMICS
+    if (bf->free_threading) {
+      uint32_t *lock = claim_lock(block);
+      for (int j = 0; j < PARQUET_BLOCK_WORDS; j++) {
+        uint64_t mask = parquet_mask(h_low, j);
+        present &= (ATOMIC_OR64(&block[j], mask) & mask) == mask;
+      }
+      ATOMIC_STORE32(lock, 0);
+      return present;
+    }
+#endif
+    for (int j = 0; j < PARQUET_BLOCK_WORDS; j++) {
+      uint64_t mask = parquet_mask(h_low, j);
+      present &= (block[j] & mask) == mask;
+      block[j] |= mask;
+    }
+    return present;
   }
-  return 0;
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER) {
+    uint64_t mask = register_mask(bf, h_low);
+#if ABLOOM_HAS_ATOMICS
+    if (bf->free_threading)
+      return (ATOMIC_OR64(block, mask) & mask) == mask;
+#endif
+    present = (*block & mask) == mask;
+    *block |= mask;
+    return present;
+  }
+#if ABLOOM_HAS_ATOMICS
+  if (bf->free_threading) {
+    uint32_t *lock = claim_lock(block);
+    for (int i = 0; i < BLOCK_WORDS; i++) {
+      uint64_t mask = 1ULL << ((h_low * SALT[i]) >> 26);
+      present &= (ATOMIC_OR64(&block[i], mask) & mask) != 0;
+    }
+    ATOMIC_STORE32(lock, 0);
+    return present;
+  }
+#endif
+
+  for (int i = 0; i < BLOCK_WORDS; i++) {
+    uint64_t mask = 1ULL << ((h_low * SALT[i]) >> 26);
+    present &= (block[i] & mask) != 0;
+    block[i] |= mask;
+  }
+  return present;
 }
 
-static int BloomFilter_compatible(BloomFilter *self, BloomFilter *other) {
-  return self->capacity == other->capacity && self->fp_rate == other->fp_rate &&
-         self->serializable == other->serializable &&
-         self->free_threading == other->free_threading;
+// Change tracking for to_delta(). Writers mark a block after setting its
+// bits, and to_delta(checkpoint=True) clears the marks before copying the
+// blocks, so a racing insert is either in the copy or marked for the next
+// delta. Marks are atomic whenever available, because threads of one
+// threaded insert can share a bitmap word. Only called when bf->dirty is set,
+// so untracked filters pay a single predictable branch.
+static inline void bloom_mark_dirty(BloomFilter *bf, const uint64_t *block) {
+  size_t b = (size_t)(block - bf->blocks) / BLOCK_WORDS;
+  uint64_t *word = &bf->dirty[b / 64];
+  uint64_t bit = 1ULL << (b % 64);
+#if ABLOOM_HAS_ATOMICS
+  if (!(ATOMIC_LOAD64(word) & bit))
+    ATOMIC_OR64_RELEASE(word, bit);
+#else
+  *word |= bit;
+#endif
 }
 
-static PyObject *BloomFilter_richcompare(BloomFilter *self, PyObject *other,
-                                         int op) {
-  if (op != Py_EQ && op != Py_NE) {
-    Py_RETURN_NOTIMPLEMENTED;
+static inline void bloom_insert(BloomFilter *bf, uint64_t hash) {
+  uint64_t *block = bloom_block(bf, hash);
+  bloom_set_bits(bf, block, (uint32_t)hash);
+  if (bf->dirty != NULL)
+    bloom_mark_dirty(bf, block);
+}
+
+static inline int bloom_check(BloomFilter *bf, uint64_t hash) {
+  return bloom_test_bits(bf, bloom_block(bf, hash), (uint32_t)hash);
+}
+
+// Block kernels: set or test the 8 salted bits of a window of blocks. The
+// vector kernels compute all 8 bit positions at once (broadcast h_low, multiply
+// by SALT, shift by 26, then a variable 64-bit shift of 1). The best kernel the
+// CPU supports is selected once at module init; free-threading filters keep
+// the scalar atomic path in bloom_set_bits/bloom_test_bits.
+typedef struct {
+  const char *name;
+  void (*set_bits)(uint64_t *const *blocks, const uint64_t *hashes, size_t n);
+  size_t (*test_bits)(const uint64_t *const *blocks, const uint64_t *hashes,
+                      size_t n, unsigned char *out);
+} BlockKernel;
+
+static void scalar_set_bits(uint64_t *const *blocks, const uint64_t *hashes,
+                            size_t n) {
+  for (size_t j = 0; j < n; j++) {
+    uint32_t h_low = (uint32_t)hashes[j];
+    for (int i = 0; i < BLOCK_WORDS; i++) {
+      blocks[j][i] |= 1ULL << ((h_low * SALT[i]) >> 26);
+    }
   }
+}
 
-  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
-    Py_RETURN_NOTIMPLEMENTED;
+static size_t scalar_test_bits(const uint64_t *const *blocks,
+                               const uint64_t *hashes, size_t n,
+                               unsigned char *out) {
+  size_t found = 0;
+  for (size_t j = 0; j < n; j++) {
+    uint32_t h_low = (uint32_t)hashes[j];
+    uint64_t missing = 0;
+    for (int i = 0; i < BLOCK_WORDS; i++) {
+      uint64_t bit = 1ULL << ((h_low * SALT[i]) >> 26);
+      missing |= ~blocks[j][i] & bit;
+    }
+    out[j] = missing == 0;
+    found += out[j];
   }
+  return found;
+}
 
-  BloomFilter *other_bf = (BloomFilter *)other;
+static const BlockKernel scalar_kernel = {"scalar", scalar_set_bits,
+                                          scalar_test_bits};
 
-  int equal = BloomFilter_compatible(self, other_bf);
+#if defined(__x86_64__) || defined(_M_X64)
+#define ABLOOM_X86_KERNELS 1
+#include <immintrin.h>
+#if defined(__GNUC__) || defined(__clang__)
+#include <cpuid.h>
+#define ABLOOM_TARGET(features) __attribute__((target(features)))
+#else
+#define ABLOOM_TARGET(features)
+#endif
 
-  if (equal) {
-    size_t num_bytes = self->block_count * BLOCK_BYTES;
-    equal = (memcmp(self->blocks, other_bf->blocks, num_bytes) == 0);
-  }
+ABLOOM_TARGET("avx2")
+static inline void avx2_masks(uint32_t h_low, __m256i *lo, __m256i *hi) {
+  const __m256i salt = _mm256_loadu_si256((const __m256i *)SALT);
+  __m256i idx =
+      _mm256_srli_epi32(_mm256_mullo_epi32(_mm256_set1_epi32((int)h_low), salt),
+                        26);
+  const __m256i one = _mm256_set1_epi64x(1);
+  *lo = _mm256_sllv_epi64(one, _mm256_cvtepu32_epi64(_mm256_castsi256_si128(idx)));
+  *hi = _mm256_sllv_epi64(one,
+                          _mm256_cvtepu32_epi64(_mm256_extracti128_si256(idx, 1)));
+}
 
-  if (op == Py_EQ) {
-    return PyBool_FromLong(equal);
-  } else {
-    return PyBool_FromLong(!equal);
+ABLOOM_TARGET("avx2")
+static void avx2_set_bits(uint64_t *const *blocks, const uint64_t *hashes,
+                          size_t n) {
+  for (size_t j = 0; j < n; j++) {
+    __m256i lo, hi;
+    avx2_masks((uint32_t)hashes[j], &lo, &hi);
+    __m256i *block = (__m256i *)blocks[j];
+    _mm256_storeu_si256(block, _mm256_or_si256(_mm256_loadu_si256(block), lo));
+    _mm256_storeu_si256(block + 1,
+                        _mm256_or_si256(_mm256_loadu_si256(block + 1), hi));
   }
 }
 
-static PyObject *BloomFilter_or(BloomFilter *self, PyObject *other) {
-  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
-    Py_RETURN_NOTIMPLEMENTED;
+ABLOOM_TARGET("avx2")
+static size_t avx2_test_bits(const uint64_t *const *blocks,
+                             const uint64_t *hashes, size_t n,
+                             unsigned char *out) {
+  size_t found = 0;
+  for (size_t j = 0; j < n; j++) {
+    __m256i lo, hi;
+    avx2_masks((uint32_t)hashes[j], &lo, &hi);
+    const __m256i *block = (const __m256i *)blocks[j];
+    // testc: 1 when every mask bit is also set in the block
+    out[j] = (unsigned char)(_mm256_testc_si256(_mm256_loadu_si256(block), lo) &
+                             _mm256_testc_si256(_mm256_loadu_si256(block + 1), hi));
+    found += out[j];
   }
+  return found;
+}
 
-  BloomFilter *other_bf = (BloomFilter *)other;
+static const BlockKernel avx2_kernel = {"avx2", avx2_set_bits, avx2_test_bits};
 
-  if (!BloomFilter_compatible(self, other_bf)) {
-    PyErr_SetString(PyExc_ValueError,
-                    "BloomFilters must have the same capacity, fp_rate, "
-                    "serializable, and free_threading");
-    return NULL;
+ABLOOM_TARGET("avx2,avx512f")
+static inline __m512i avx512_mask(uint32_t h_low) {
+  const __m256i salt = _mm256_loadu_si256((const __m256i *)SALT);
+  __m256i idx =
+      _mm256_srli_epi32(_mm256_mullo_epi32(_mm256_set1_epi32((int)h_low), salt),
+                        26);
+  return _mm512_sllv_epi64(_mm512_set1_epi64(1), _mm512_cvtepu32_epi64(idx));
+}
+
+ABLOOM_TARGET("avx2,avx512f")
+static void avx512_set_bits(uint64_t *const *blocks, const uint64_t *hashes,
+                            size_t n) {
+  for (size_t j = 0; j < n; j++) {
+    __m512i mask = avx512_mask((uint32_t)hashes[j]);
+    void *block = blocks[j];
+    _mm512_storeu_si512(block, _mm512_or_si512(_mm512_loadu_si512(block), mask));
   }
+}
 
-  BloomFilter *result =
-      (BloomFilter *)Py_TYPE(self)->tp_alloc(Py_TYPE(self), 0);
-  if (result == NULL) {
-    return NULL;
+ABLOOM_TARGET("avx2,avx512f")
+static size_t avx512_test_bits(const uint64_t *const *blocks,
+                               const uint64_t *hashes, size_t n,
+                               unsigned char *out) {
+  size_t found = 0;
+  for (size_t j = 0; j < n; j++) {
+    __m512i mask = avx512_mask((uint32_t)hashes[j]);
+    __m512i block = _mm512_loadu_si512(blocks[j]);
+    out[j] = _mm512_cmpneq_epi64_mask(_mm512_and_si512(block, mask), mask) == 0;
+    found += out[j];
   }
+  return found;
+}
 
-  result->block_count = self->block_count;
-  result->capacity = self->capacity;
-  result->fp_rate = self->fp_rate;
-  result->serializable = self->serializable;
-  result->free_threading = self->free_threading;
+static const BlockKernel avx512_kernel = {"avx512", avx512_set_bits,
+                                          avx512_test_bits};
 
-  size_t num_bytes = self->block_count * BLOCK_BYTES;
-  result->blocks = PyMem_Malloc(num_bytes);
-  if (result->blocks == NULL) {
-    Py_DECREF(result);
-    return PyErr_NoMemory();
+// CPUID leaf 7 feature bits plus OS support for the wider register state
+static void x86_features(int *has_avx2, int *has_avx512) {
+  unsigned int regs[4] = {0, 0, 0, 0};
+  uint64_t xcr0 = 0;
+  *has_avx2 = *has_avx512 = 0;
+
+#if defined(_MSC_VER) && !defined(__clang__)
+  int info[4];
+  __cpuid(info, 0);
+  if (info[0] < 7)
+    return;
+  __cpuid(info, 1);
+  if (!(info[2] & (1 << 27))) // OSXSAVE
+    return;
+  xcr0 = _xgetbv(0);
+  __cpuidex(info, 7, 0);
+  regs[1] = (unsigned int)info[1];
+#else
+  unsigned int eax, ebx, ecx, edx;
+  if (__get_cpuid_max(0, NULL) < 7)
+    return;
+  __cpuid(1, eax, ebx, ecx, edx);
+  if (!(ecx & (1u << 27))) // OSXSAVE
+    return;
+  __asm__("xgetbv" : "=a"(eax), "=d"(edx) : "c"(0));
+  xcr0 = ((uint64_t)edx << 32) | eax;
+  __cpuid_count(7, 0, regs[0], regs[1], regs[2], regs[3]);
+#endif
+
+  int ymm_state = (xcr0 & 0x6) == 0x6;    // SSE + AVX state
+  int zmm_state = (xcr0 & 0xE6) == 0xE6;  // plus opmask and ZMM state
+  *has_avx2 = ymm_state && (regs[1] & (1u << 5));
+  *has_avx512 = *has_avx2 && zmm_state && (regs[1] & (1u << 16));
+}
+#endif
+
+#if defined(__aarch64__) || defined(_M_ARM64)
+#define ABLOOM_NEON_KERNELS 1
+#include <arm_neon.h>
+
+static inline void neon_masks(uint32_t h_low, uint64x2_t masks[4]) {
+  const uint32x4_t h = vdupq_n_u32(h_low);
+  const uint64x2_t one = vdupq_n_u64(1);
+  uint32x4_t idx_lo = vshrq_n_u32(vmulq_u32(h, vld1q_u32(SALT)), 26);
+  uint32x4_t idx_hi = vshrq_n_u32(vmulq_u32(h, vld1q_u32(SALT + 4)), 26);
+  masks[0] = vshlq_u64(one, vreinterpretq_s64_u64(vmovl_u32(vget_low_u32(idx_lo))));
+  masks[1] = vshlq_u64(one, vreinterpretq_s64_u64(vmovl_u32(vget_high_u32(idx_lo))));
+  masks[2] = vshlq_u64(one, vreinterpretq_s64_u64(vmovl_u32(vget_low_u32(idx_hi))));
+  masks[3] = vshlq_u64(one, vreinterpretq_s64_u64(vmovl_u32(vget_high_u32(idx_hi))));
+}
+
+static void neon_set_bits(uint64_t *const *blocks, const uint64_t *hashes,
+                          size_t n) {
+  for (size_t j = 0; j < n; j++) {
+    uint64x2_t masks[4];
+    neon_masks((uint32_t)hashes[j], masks);
+    for (int i = 0; i < 4; i++) {
+      uint64_t *words = blocks[j] + 2 * i;
+      vst1q_u64(words, vorrq_u64(vld1q_u64(words), masks[i]));
+    }
+  }
+}
+
+static size_t neon_test_bits(const uint64_t *const *blocks,
+                             const uint64_t *hashes, size_t n,
+                             unsigned char *out) {
+  size_t found = 0;
+  for (size_t j = 0; j < n; j++) {
+    uint64x2_t masks[4];
+    neon_masks((uint32_t)hashes[j], masks);
+    uint64x2_t missing = vdupq_n_u64(0);
+    for (int i = 0; i < 4; i++) {
+      uint64x2_t words = vld1q_u64(blocks[j] + 2 * i);
+      missing = vorrq_u64(missing, vbicq_u64(masks[i], words));
+    }
+    out[j] = (vgetq_lane_u64(missing, 0) | vgetq_lane_u64(missing, 1)) == 0;
+    found += out[j];
+  }
+  return found;
+}
+
+static const BlockKernel neon_kernel = {"neon", neon_set_bits, neon_test_bits};
+#endif
+
+static const BlockKernel *block_kernel = &scalar_kernel;
+
+// Picks the widest supported kernel. ABLOOM_SIMD=<name> selects a specific
+// kernel instead when the CPU supports it (e.g. "scalar" to rule out SIMD).
+static void select_block_kernel(void) {
+  const BlockKernel *candidates[4];
+  int count = 0;
+
+#ifdef ABLOOM_X86_KERNELS
+  int has_avx2, has_avx512;
+  x86_features(&has_avx2, &has_avx512);
+  if (has_avx512)
+    candidates[count++] = &avx512_kernel;
+  if (has_avx2)
+    candidates[count++] = &avx2_kernel;
+#endif
+#ifdef ABLOOM_NEON_KERNELS
+  candidates[count++] = &neon_kernel;
+#endif
+  candidates[count++] = &scalar_kernel;
+
+  block_kernel = candidates[0];
+  const char *requested = getenv("ABLOOM_SIMD");
+  if (requested && *requested) {
+    for (int i = 0; i < count; i++) {
+      if (strcmp(requested, candidates[i]->name) == 0)
+        block_kernel = candidates[i];
+    }
+  }
+}
+
+// Batch pipeline: hashes are gathered into windows of `prefetch_distance`
+// items. Each window first resolves and prefetches every target block, then
+// sets or tests the bits, so the DRAM misses of a window overlap instead of
+// being paid one after another. Filters that fit comfortably in cache skip
+// the prefetch, but still go through the block kernel a window at a time.
+#if defined(__GNUC__) || defined(__clang__)
+#define ABLOOM_PREFETCH(addr) __builtin_prefetch((addr), 1, 3)
+#elif defined(_MSC_VER) && (defined(_M_X64) || defined(_M_IX86))
+#include <xmmintrin.h>
+#define ABLOOM_PREFETCH(addr) _mm_prefetch((const char *)(addr), _MM_HINT_T0)
+#else
+#define ABLOOM_PREFETCH(addr) ((void)(addr))
+#endif
+
+#define ABLOOM_DEFAULT_PREFETCH_DISTANCE 16
+#define ABLOOM_MAX_PREFETCH_DISTANCE 256
+#define ABLOOM_PREFETCH_MIN_BYTES (256 * 1024)
+
+static int prefetch_distance = ABLOOM_DEFAULT_PREFETCH_DISTANCE;
+
+// Number of hashes to gather per window
+static inline size_t bloom_window(void) {
+  return prefetch_distance > 0 ? (size_t)prefetch_distance
+                               : ABLOOM_DEFAULT_PREFETCH_DISTANCE;
+}
+
+static inline int bloom_should_prefetch(BloomFilter *bf) {
+  return prefetch_distance > 0 &&
+         bloom_nbytes(bf) >= ABLOOM_PREFETCH_MIN_BYTES;
+}
+
+// `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static inline void bloom_insert_many(BloomFilter *bf, const uint64_t *hashes,
+                                     size_t n) {
+  uint64_t *blocks[ABLOOM_MAX_PREFETCH_DISTANCE];
+  int prefetch = bloom_should_prefetch(bf);
+
+  // A register insert is a single OR, and checkpoint() refuses the layout,
+  // so there are no dirty marks to set
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER && !bf->free_threading) {
+    int k = bf->k;
+    for (size_t i = 0; i < n; i++) {
+      blocks[i] = bloom_block(bf, hashes[i]);
+      if (prefetch)
+        ABLOOM_PREFETCH(blocks[i]);
+    }
+    for (size_t i = 0; i < n; i++)
+      *blocks[i] |= register_mask_k(k, (uint32_t)hashes[i]);
+    return;
+  }
+
+  // The block kernels are SBBF-512 only
+  if (bf->layout != ABLOOM_LAYOUT_SBBF512) {
+    if (prefetch) {
+      for (size_t i = 0; i < n; i++)
+        ABLOOM_PREFETCH(bloom_block(bf, hashes[i]));
+    }
+    for (size_t i = 0; i < n; i++)
+      bloom_insert(bf, hashes[i]);
+    return;
+  }
+
+  for (size_t i = 0; i < n; i++) {
+    blocks[i] = bloom_block(bf, hashes[i]);
+    if (prefetch)
+      ABLOOM_PREFETCH(blocks[i]);
+  }
+
+  if (bf->free_threading) {
+    for (size_t i = 0; i < n; i++)
+      bloom_set_bits(bf, blocks[i], (uint32_t)hashes[i]);
+  } else {
+    block_kernel->set_bits(blocks, hashes, n);
+  }
+  if (bf->dirty != NULL) {
+    for (size_t i = 0; i < n; i++)
+      bloom_mark_dirty(bf, blocks[i]);
+  }
+}
+
+// Inserts the hashes in order, so a repeated hash within the window is seen
+// as present. Writes 1 to `out` for each hash that was new and returns the
+// number of new hashes. `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static inline size_t bloom_add_new_many(BloomFilter *bf, const uint64_t *hashes,
+                                        size_t n, unsigned char *out) {
+  uint64_t *blocks[ABLOOM_MAX_PREFETCH_DISTANCE];
+  int prefetch = bloom_should_prefetch(bf);
+  size_t added = 0;
+
+  for (size_t i = 0; i < n; i++) {
+    blocks[i] = bloom_block(bf, hashes[i]);
+    if (prefetch)
+      ABLOOM_PREFETCH(blocks[i]);
+  }
+
+  for (size_t i = 0; i < n; i++) {
+    out[i] = (unsigned char)!bloom_test_and_set_bits(bf, blocks[i],
+                                                      (uint32_t)hashes[i]);
+    added += out[i];
+    if (out[i] && bf->dirty != NULL)
+      bloom_mark_dirty(bf, blocks[i]);
+  }
+  return added;
+}
+
+// Writes one 0/1 byte per hash to `out` and returns the number of hits.
+// `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static inline size_t bloom_check_many(BloomFilter *bf, const uint64_t *hashes,
+                                      size_t n, unsigned char *out) {
+  const uint64_t *blocks[ABLOOM_MAX_PREFETCH_DISTANCE];
+  int prefetch = bloom_should_prefetch(bf);
+
+  for (size_t i = 0; i < n; i++) {
+    blocks[i] = bloom_block(bf, hashes[i]);
+    if (prefetch)
+      ABLOOM_PREFETCH(blocks[i]);
+  }
+
+  // k is read once: the stores to `out` may alias `bf` as far as the
+  // compiler knows, which would reload it for every item
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER && !bf->free_threading) {
+    int k = bf->k;
+    size_t found = 0;
+    for (size_t i = 0; i < n; i++) {
+      uint64_t mask = register_mask_k(k, (uint32_t)hashes[i]);
+      int hit = (*blocks[i] & mask) == mask;
+      out[i] = (unsigned char)hit;
+      found += hit;
+    }
+    return found;
+  }
+  if (bf->free_threading || bf->layout != ABLOOM_LAYOUT_SBBF512) {
+    size_t found = 0;
+    for (size_t i = 0; i < n; i++) {
+      out[i] = (unsigned char)bloom_test_bits(bf, blocks[i], (uint32_t)hashes[i]);
+      found += out[i];
+    }
+    return found;
+  }
+  return block_kernel->test_bits(blocks, hashes, n, out);
+}
+
+// Operations on raw memory (whole-filter ops and buffer inputs) release the
+// GIL once they touch at least ABLOOM_NOGIL_MIN_BYTES. Readers simply run
+// without the GIL: bits only ever go from 0 to 1 outside of clear(), so a
+// concurrent lookup or snapshot sees each bit either before or after a write.
+//
+// Writers need more care. free_threading filters set bits with atomic ORs
+// and need no coordination. Default filters use plain read-modify-writes, so
+// a bulk writer that released the GIL holds the filter's bulk_lock, and every
+// writer that keeps the GIL (add, update, small buffers) first waits until
+// no bulk writer is active. Bulk writers are thus serialized with each other
+// and with single-item writers, and no bit can be lost to a racing store.
+#define ABLOOM_NOGIL_MIN_BYTES (64 * 1024)
+
+// Called with the GIL held before a default-mode write that keeps the GIL
+static void bloom_wait_for_bulk_writers(BloomFilter *bf) {
+  while (bf->bulk_writers > 0) {
+    Py_BEGIN_ALLOW_THREADS
+    PyThread_acquire_lock(bf->bulk_lock, WAIT_LOCK);
+    PyThread_release_lock(bf->bulk_lock);
+    Py_END_ALLOW_THREADS
+  }
+}
+
+// Starts a write touching `nbytes` bytes. On success *save is the released
+// thread state, or NULL if the write runs with the GIL held. Must be paired
+// with bloom_end_write().
+static int bloom_begin_write(BloomFilter *bf, size_t nbytes,
+                             PyThreadState **save) {
+  *save = NULL;
+  // Counted before waiting, which releases the GIL too
+  bf->active_ops++;
+  if (nbytes < ABLOOM_NOGIL_MIN_BYTES) {
+    bloom_wait_for_bulk_writers(bf);
+    return 0;
+  }
+  if (bf->free_threading) {
+    *save = PyEval_SaveThread();
+    return 0;
+  }
+  if (bf->bulk_lock == NULL) {
+    bf->bulk_lock = PyThread_allocate_lock();
+    if (bf->bulk_lock == NULL) {
+      bf->active_ops--;
+      PyErr_NoMemory();
+      return -1;
+    }
+  }
+  bf->bulk_writers++;
+  *save = PyEval_SaveThread();
+  PyThread_acquire_lock(bf->bulk_lock, WAIT_LOCK);
+  return 0;
+}
+
+static void bloom_end_write(BloomFilter *bf, PyThreadState *save) {
+  if (save != NULL) {
+    if (!bf->free_threading)
+      PyThread_release_lock(bf->bulk_lock);
+    PyEval_RestoreThread(save);
+    if (!bf->free_threading)
+      bf->bulk_writers--;
+  }
+  bf->active_ops--;
+}
+
+// Releases the GIL for a pass over `nbytes` bytes of raw memory; returns NULL
+// if the pass is too small to be worth it
+static inline PyThreadState *nogil_begin(size_t nbytes) {
+  return nbytes >= ABLOOM_NOGIL_MIN_BYTES ? PyEval_SaveThread() : NULL;
+}
+
+static inline void nogil_end(PyThreadState *save) {
+  if (save != NULL)
+    PyEval_RestoreThread(save);
+}
+
+// Starts a read of `bf` touching `nbytes` bytes, releasing the GIL if it is
+// large enough. Must be paired with bloom_end_read().
+static inline PyThreadState *bloom_begin_read(BloomFilter *bf, size_t nbytes) {
+  bf->active_ops++;
+  return nogil_begin(nbytes);
+}
+
+static inline void bloom_end_read(BloomFilter *bf, PyThreadState *save) {
+  nogil_end(save);
+  bf->active_ops--;
+}
+
+// Fast path: uses Python's hash (not deterministic across processes)
+static inline int get_hash_fast(PyObject *item, uint64_t *out_hash) {
+  Py_hash_t py_hash = PyObject_Hash(item);
+  if (py_hash == -1 && PyErr_Occurred())
+    return -1;
+  *out_hash = mix64((uint64_t)py_hash);
+  return 0;
+}
+
+// Deterministic hashing for serialization support
+static inline int get_hash_serializable(PyObject *item, uint64_t *out_hash) {
+  if (PyBytes_Check(item)) {
+    *out_hash = XXH64(PyBytes_AS_STRING(item), PyBytes_GET_SIZE(item), 0);
+  } else if (PyUnicode_Check(item)) {
+    Py_ssize_t size;
+    const char *utf8 = PyUnicode_AsUTF8AndSize(item, &size);
+    if (!utf8)
+      return -1;
+    *out_hash = XXH64(utf8, size, 0);
+  } else if (PyLong_Check(item) || PyFloat_Check(item)) {
+    Py_hash_t py_hash = PyObject_Hash(item);
+    if (py_hash == -1 && PyErr_Occurred())
+      return -1;
+    *out_hash = mix64((uint64_t)py_hash);
+  } else {
+    PyErr_SetString(
+        PyExc_TypeError,
+        "Only bytes, str, int, and float are supported in serializable mode");
+    return -1;
+  }
+  return 0;
+}
+
+// Parquet hashes the PLAIN encoding of a value with XXH64 (seed 0): the raw
+// bytes of BYTE_ARRAY and FIXED_LEN_BYTE_ARRAY values, and 8 little-endian
+// bytes for INT64 and DOUBLE. Python ints are hashed as INT64 (values up to
+// 2**64 - 1 as the UINT_64 bit pattern) and floats as DOUBLE; values of
+// INT32 and FLOAT columns can be passed as their 4 packed bytes.
+static inline uint64_t hash_parquet_u64(uint64_t value) {
+  unsigned char buf[8];
+  write_le64(buf, value);
+  return XXH64(buf, 8, 0);
+}
+
+static inline uint64_t hash_parquet_u32(uint32_t value) {
+  unsigned char buf[4] = {value & 0xFF, (value >> 8) & 0xFF,
+                          (value >> 16) & 0xFF, value >> 24};
+  return XXH64(buf, 4, 0);
+}
+
+static inline int get_hash_parquet(PyObject *item, uint64_t *out_hash) {
+  if (PyBytes_Check(item) || PyUnicode_Check(item))
+    return get_hash_serializable(item, out_hash);
+  if (PyLong_Check(item)) {
+    int overflow;
+    long long value = PyLong_AsLongLongAndOverflow(item, &overflow);
+    if (value == -1 && PyErr_Occurred())
+      return -1;
+    if (overflow == 0) {
+      *out_hash = hash_parquet_u64((uint64_t)value);
+      return 0;
+    }
+    unsigned long long uvalue =
+        overflow > 0 ? PyLong_AsUnsignedLongLong(item) : (unsigned long long)-1;
+    if (overflow < 0 || (uvalue == (unsigned long long)-1 && PyErr_Occurred())) {
+      PyErr_Clear();
+      PyErr_SetString(PyExc_OverflowError,
+                      "int out of range for a Parquet INT64 value");
+      return -1;
+    }
+    *out_hash = hash_parquet_u64(uvalue);
+    return 0;
+  }
+  if (PyFloat_Check(item)) {
+    double d = PyFloat_AS_DOUBLE(item);
+    uint64_t bits;
+    memcpy(&bits, &d, 8);
+    *out_hash = hash_parquet_u64(bits);
+    return 0;
+  }
+  PyErr_SetString(PyExc_TypeError,
+                  "Only bytes, str, int, and float are supported with "
+                  "layout='parquet'");
+  return -1;
+}
+
+// How a filter hashes Python objects
+typedef enum { HASH_FAST, HASH_SERIALIZABLE, HASH_PARQUET } HashMode;
+
+static inline HashMode bloom_hash_mode(const BloomFilter *bf) {
+  if (bf->layout == ABLOOM_LAYOUT_PARQUET)
+    return HASH_PARQUET;
+  return bf->serializable ? HASH_SERIALIZABLE : HASH_FAST;
+}
+
+static inline int get_hash(PyObject *item, HashMode mode, uint64_t *out_hash) {
+  switch (mode) {
+  case HASH_SERIALIZABLE:
+    return get_hash_serializable(item, out_hash);
+  case HASH_PARQUET:
+    return get_hash_parquet(item, out_hash);
+  default:
+    return get_hash_fast(item, out_hash);
+  }
+}
+
+// CPython reduces ints modulo the Mersenne prime 2**61 - 1 (2**31 - 1 on
+// 32-bit builds). Mirroring that lets raw integers hash exactly like the
+// equivalent Python int without creating one.
+#if SIZEOF_VOID_P >= 8
+#define ABLOOM_PYHASH_BITS 61
+#else
+#define ABLOOM_PYHASH_BITS 31
+#endif
+#define ABLOOM_PYHASH_MODULUS (((uint64_t)1 << ABLOOM_PYHASH_BITS) - 1)
+
+static inline uint64_t pyhash_reduce(uint64_t x) {
+  x = (x & ABLOOM_PYHASH_MODULUS) + (x >> ABLOOM_PYHASH_BITS);
+  x = (x & ABLOOM_PYHASH_MODULUS) + (x >> ABLOOM_PYHASH_BITS);
+  if (x >= ABLOOM_PYHASH_MODULUS)
+    x -= ABLOOM_PYHASH_MODULUS;
+  return x;
+}
+
+// Equivalent to get_hash_fast(PyLong_FromLongLong(value))
+static inline uint64_t hash_int64(int64_t value) {
+  Py_hash_t h;
+  if (value < 0) {
+    h = -(Py_hash_t)pyhash_reduce((uint64_t)0 - (uint64_t)value);
+    if (h == -1)
+      h = -2;
+  } else {
+    h = (Py_hash_t)pyhash_reduce((uint64_t)value);
+  }
+  return mix64((uint64_t)h);
+}
+
+// Equivalent to get_hash_fast(PyLong_FromUnsignedLongLong(value))
+static inline uint64_t hash_uint64(uint64_t value) {
+  return mix64((uint64_t)(Py_hash_t)pyhash_reduce(value));
+}
+
+static inline uint64_t byteswap64(uint64_t x) {
+  return ((x & 0x00000000000000FFULL) << 56) |
+         ((x & 0x000000000000FF00ULL) << 40) |
+         ((x & 0x0000000000FF0000ULL) << 24) |
+         ((x & 0x00000000FF000000ULL) << 8) |
+         ((x & 0x000000FF00000000ULL) >> 8) |
+         ((x & 0x0000FF0000000000ULL) >> 24) |
+         ((x & 0x00FF000000000000ULL) >> 40) |
+         ((x & 0xFF00000000000000ULL) >> 56);
+}
+
+static inline int host_is_little_endian(void) {
+  const uint16_t probe = 1;
+  return *(const unsigned char *)&probe == 1;
+}
+
+// Acquires a C-contiguous buffer of 64-bit integers. On success, `view` must
+// be released by the caller, and `is_signed`/`byteswap` describe how to read
+// each element.
+static int get_int64_buffer(PyObject *obj, Py_buffer *view, int *is_signed,
+                            int *byteswap) {
+  if (PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
+    return -1;
+
+  // The itemsize check below is authoritative, so byte-order prefixes only
+  // matter for deciding whether elements need to be swapped.
+  const char *fmt = view->format ? view->format : "B";
+  *byteswap = 0;
+  switch (*fmt) {
+  case '@':
+  case '=':
+    fmt++;
+    break;
+  case '<':
+    fmt++;
+    *byteswap = !host_is_little_endian();
+    break;
+  case '>':
+  case '!':
+    fmt++;
+    *byteswap = host_is_little_endian();
+    break;
+  }
+
+  int valid = view->itemsize == 8 && fmt[0] != '\0' && fmt[1] == '\0';
+  if (valid) {
+    switch (fmt[0]) {
+    case 'q':
+    case 'l':
+    case 'n':
+      *is_signed = 1;
+      break;
+    case 'Q':
+    case 'L':
+    case 'N':
+      *is_signed = 0;
+      break;
+    default:
+      valid = 0;
+    }
+  }
+
+  if (!valid) {
+    PyErr_Format(PyExc_TypeError,
+                 "expected a buffer of int64 or uint64 values, got format "
+                 "'%s' with itemsize %zd",
+                 view->format ? view->format : "B", view->itemsize);
+    PyBuffer_Release(view);
+    return -1;
+  }
+  return 0;
+}
+
+static int BloomFilter_compatible(BloomFilter *self, BloomFilter *other) {
+  return self->capacity == other->capacity && self->fp_rate == other->fp_rate &&
+         self->layout == other->layout &&
+         self->serializable == other->serializable &&
+         self->free_threading == other->free_threading;
+}
+
+static PyObject *BloomFilter_richcompare(BloomFilter *self, PyObject *other,
+                                         int op) {
+  if (op != Py_EQ && op != Py_NE) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  BloomFilter *other_bf = (BloomFilter *)other;
+
+  int equal = BloomFilter_compatible(self, other_bf);
+
+  if (equal) {
+    size_t num_bytes = bloom_nbytes(self);
+    // other_bf is read without the GIL too, so it can't be reinitialized
+    other_bf->active_ops++;
+    PyThreadState *save = bloom_begin_read(self, num_bytes);
+    equal = (memcmp(self->blocks, other_bf->blocks, num_bytes) == 0);
+    bloom_end_read(self, save);
+    other_bf->active_ops--;
+  }
+
+  if (op == Py_EQ) {
+    return PyBool_FromLong(equal);
+  } else {
+    return PyBool_FromLong(!equal);
+  }
+}
+
+static PyObject *BloomFilter_or(BloomFilter *self, PyObject *other) {
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  BloomFilter *other_bf = (BloomFilter *)other;
+
+  if (!BloomFilter_compatible(self, other_bf)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "BloomFilters must have the same capacity, fp_rate, "
+                    "layout, serializable, and free_threading");
+    return NULL;
+  }
+
+  BloomFilter *result =
+      (BloomFilter *)Py_TYPE(self)->tp_alloc(Py_TYPE(self), 0);
+  if (result == NULL) {
+    return NULL;
+  }
+
+  result->block_count = self->block_count;
+  result->layout = self->layout;
+  result->k = self->k;
+  result->capacity = self->capacity;
+  result->fp_rate = self->fp_rate;
+  result->serializable = self->serializable;
+  result->free_threading = self->free_threading;
+
+  size_t num_bytes = bloom_nbytes(self);
+  if (bloom_alloc_blocks(result, num_bytes, 0) < 0) {
+    Py_DECREF(result);
+    return NULL;
   }
 
   uint64_t *self_blocks = self->blocks;
   uint64_t *other_blocks = other_bf->blocks;
   uint64_t *result_blocks = result->blocks;
-  size_t num_words = self->block_count * BLOCK_WORDS;
+  size_t num_words = bloom_nbytes(self) / 8;
 
+  other_bf->active_ops++;
+  PyThreadState *save = bloom_begin_read(self, num_bytes);
   for (size_t i = 0; i < num_words; i++) {
     result_blocks[i] = self_blocks[i] | other_blocks[i];
   }
+  bloom_end_read(self, save);
+  other_bf->active_ops--;
+
+  return (PyObject *)result;
+}
+
+static PyObject *BloomFilter_ior(BloomFilter *self, PyObject *other) {
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  BloomFilter *other_bf = (BloomFilter *)other;
+
+  if (!BloomFilter_compatible(self, other_bf)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "BloomFilters must have the same capacity, fp_rate, "
+                    "layout, serializable, and free_threading");
+    return NULL;
+  }
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  uint64_t *self_blocks = self->blocks;
+  uint64_t *other_blocks = other_bf->blocks;
+  size_t num_words = bloom_nbytes(self) / 8;
+
+  // other_bf is read without the GIL too, and waiting for bulk writers
+  // releases it before that
+  other_bf->active_ops++;
+  PyThreadState *save;
+  if (bloom_begin_write(self, num_words * 8, &save) < 0) {
+    other_bf->active_ops--;
+    return NULL;
+  }
+  if (self->dirty != NULL) {
+    // Tracked filters mark exactly the blocks that gained bits
+    for (uint64_t b = 0; b < self->block_count; b++) {
+      uint64_t *block = self_blocks + b * BLOCK_WORDS;
+      uint64_t gained = 0;
+      for (int i = 0; i < BLOCK_WORDS; i++) {
+#if ABLOOM_HAS_ATOMICS
+        if (self->free_threading) {
+          uint64_t bits = ATOMIC_LOAD64(&other_blocks[b * BLOCK_WORDS + i]);
+          if (bits)
+            gained |= bits & ~ATOMIC_OR64(&block[i], bits);
+          continue;
+        }
+#endif
+        uint64_t bits = other_blocks[b * BLOCK_WORDS + i];
+        gained |= bits & ~block[i];
+        block[i] |= bits;
+      }
+      if (gained)
+        bloom_mark_dirty(self, block);
+    }
+  }
+#if ABLOOM_HAS_ATOMICS
+  else if (self->free_threading) {
+    for (size_t i = 0; i < num_words; i++) {
+      uint64_t bits = ATOMIC_LOAD64(&other_blocks[i]);
+      if (bits)
+        ATOMIC_OR64(&self_blocks[i], bits);
+    }
+  }
+#endif
+  else {
+    for (size_t i = 0; i < num_words; i++) {
+      self_blocks[i] |= other_blocks[i];
+    }
+  }
+  bloom_end_write(self, save);
+  other_bf->active_ops--;
+
+  Py_INCREF(self);
+  return (PyObject *)self;
+}
+
+static int BloomFilter_bool(BloomFilter *self) {
+  size_t num_words = bloom_nbytes(self) / 8;
+  for (size_t i = 0; i < num_words; i++) {
+    if (self->blocks[i] != 0) {
+      return 1;
+    }
+  }
+  return 0;
+}
+
+static size_t dirty_words(const BloomFilter *bf) {
+  return (size_t)((bf->block_count + 63) / 64);
+}
+
+static void bloom_mark_all_dirty(BloomFilter *bf) {
+  size_t words = dirty_words(bf);
+  memset(bf->dirty, 0xFF, words * 8);
+  if (bf->block_count % 64)
+    bf->dirty[words - 1] = (1ULL << (bf->block_count % 64)) - 1;
+}
+
+static PyObject *BloomFilter_clear(BloomFilter *self,
+                                   PyObject *Py_UNUSED(ignored)) {
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  size_t num_bytes = bloom_nbytes(self);
+  PyThreadState *save;
+  if (bloom_begin_write(self, num_bytes, &save) < 0)
+    return NULL;
+  memset(self->blocks, 0, num_bytes);
+  if (self->dirty != NULL)
+    bloom_mark_all_dirty(self);
+  bloom_end_write(self, save);
+  Py_RETURN_NONE;
+}
+
+static PyObject *BloomFilter_copy(BloomFilter *self,
+                                  PyObject *Py_UNUSED(ignored)) {
+  BloomFilter *copy = (BloomFilter *)Py_TYPE(self)->tp_alloc(Py_TYPE(self), 0);
+  if (copy == NULL) {
+    return NULL;
+  }
+
+  copy->block_count = self->block_count;
+  copy->layout = self->layout;
+  copy->k = self->k;
+  copy->capacity = self->capacity;
+  copy->fp_rate = self->fp_rate;
+  copy->serializable = self->serializable;
+  copy->free_threading = self->free_threading;
+
+  size_t num_bytes = bloom_nbytes(self);
+  if (bloom_alloc_blocks(copy, num_bytes, 0) < 0) {
+    Py_DECREF(copy);
+    return NULL;
+  }
+  PyThreadState *save = bloom_begin_read(self, num_bytes);
+  memcpy(copy->blocks, self->blocks, num_bytes);
+  bloom_end_read(self, save);
+
+  return (PyObject *)copy;
+}
+
+static void write_header(unsigned char *buf, BloomFilter *bf) {
+  union {
+    double d;
+    uint64_t u;
+  } fp_union;
+  fp_union.d = bf->fp_rate;
+
+  memset(buf, 0, ABLOOM_HEADER_SIZE);
+  memcpy(buf, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE);
+  buf[4] = ABLOOM_VERSION;
+  buf[5] = bf->free_threading ? ABLOOM_FLAG_FREE_THREADING : 0;
+  buf[6] = (unsigned char)bf->layout;
+  buf[7] = bf->layout == ABLOOM_LAYOUT_PARQUET ? ABLOOM_HASH_PARQUET
+                                               : ABLOOM_HASH_SERIALIZABLE;
+  write_le64(buf + 8, bf->capacity);
+  write_le64(buf + 16, fp_union.u);
+  write_le64(buf + 24, bf->block_count);
+  if (bf->layout == ABLOOM_LAYOUT_REGISTER)
+    buf[40] = (unsigned char)bf->k;
+}
+
+// Parsed header of a serialized filter.
+typedef struct {
+  uint64_t capacity;
+  double fp_rate;
+  uint64_t block_count;
+  int free_threading;
+  int layout;
+  int k;
+  size_t header_size;
+  // Payload size of the compact encoding, 0 for plain blocks
+  uint64_t compact_size;
+} FilterHeader;
+
+// Size of the block array described by `h`
+static inline size_t header_nbytes(const FilterHeader *h) {
+  return (size_t)h->block_count * layout_block_bytes(h->layout);
+}
+
+// Checks the fields every format version shares against each other.
+static int check_header(const FilterHeader *h) {
+  if (h->capacity == 0) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: capacity is 0");
+    return -1;
+  }
+  if (!(h->fp_rate > 0.0 && h->fp_rate < 1.0)) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: fp_rate out of range");
+    return -1;
+  }
+  int64_t expected_blocks =
+      layout_block_count(h->layout, h->capacity, h->fp_rate);
+  if (expected_blocks <= 0 || h->block_count != (uint64_t)expected_blocks) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Invalid data: block_count doesn't match capacity/fp_rate");
+    return -1;
+  }
+  if (h->k != layout_k(h->layout, h->fp_rate)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Invalid data: k doesn't match fp_rate");
+    return -1;
+  }
+  // The compact encoding is only written when smaller than the blocks
+  if (h->compact_size / BLOCK_BYTES >= h->block_count) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Invalid data: compact payload size out of range");
+    return -1;
+  }
+  if (h->free_threading && !ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(
+        PyExc_RuntimeError,
+        "Serialized filter has free_threading=True, but C11 atomics "
+        "are not available in this build. Use a pre-built wheel or "
+        "rebuild with a modern compiler.");
+    return -1;
+  }
+  return 0;
+}
+
+// Parses and validates the header at the start of `len` bytes of serialized
+// data. v2 headers are only accepted when `allow_v2` is set.
+static int read_header(const unsigned char *buf, size_t len, int allow_v2,
+                       FilterHeader *h) {
+  if (len < ABLOOM_MAGIC_SIZE + 1) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: too short for header");
+    return -1;
+  }
+  if (memcmp(buf, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE) != 0) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: wrong magic bytes");
+    return -1;
+  }
+
+  union {
+    double d;
+    uint64_t u;
+  } fp_union;
+  uint8_t version = buf[4];
+  if (version == ABLOOM_V2_VERSION && allow_v2) {
+    if (len < ABLOOM_V2_HEADER_SIZE) {
+      PyErr_SetString(PyExc_ValueError, "Invalid data: too short for header");
+      return -1;
+    }
+    h->capacity = read_be64(buf + 5);
+    fp_union.u = read_be64(buf + 13);
+    h->block_count = read_be64(buf + 21);
+    h->free_threading = buf[29] != 0;
+    h->layout = ABLOOM_LAYOUT_SBBF512;
+    h->k = BLOCK_WORDS;
+    h->header_size = ABLOOM_V2_HEADER_SIZE;
+    h->compact_size = 0;
+  } else if (version == ABLOOM_VERSION) {
+    if (len < ABLOOM_HEADER_SIZE) {
+      PyErr_SetString(PyExc_ValueError, "Invalid data: too short for header");
+      return -1;
+    }
+    if (buf[5] & ABLOOM_FLAG_DELTA) {
+      PyErr_SetString(PyExc_ValueError,
+                      "Delta data must be applied with apply_delta()");
+      return -1;
+    }
+    if (buf[5] & ABLOOM_FLAG_SCALABLE) {
+      PyErr_SetString(PyExc_ValueError,
+                      "ScalableBloomFilter data must be loaded with "
+                      "ScalableBloomFilter.from_bytes()");
+      return -1;
+    }
+    if (buf[6] == ABLOOM_LAYOUT_FUSE8 || buf[6] == ABLOOM_LAYOUT_FUSE16) {
+      PyErr_SetString(PyExc_ValueError,
+                      "FrozenFilter data must be loaded with "
+                      "FrozenFilter.from_bytes()");
+      return -1;
+    }
+    if (buf[5] & ~(ABLOOM_FLAG_FREE_THREADING | ABLOOM_FLAG_COMPACT)) {
+      PyErr_SetString(PyExc_ValueError, "Invalid data: unknown flags");
+      return -1;
+    }
+    if (buf[6] != ABLOOM_LAYOUT_SBBF512 && buf[6] != ABLOOM_LAYOUT_PARQUET &&
+        buf[6] != ABLOOM_LAYOUT_REGISTER) {
+      PyErr_Format(PyExc_ValueError, "Unsupported layout: %u", buf[6]);
+      return -1;
+    }
+    // Each layout has exactly one hash algorithm
+    if (buf[7] != (buf[6] == ABLOOM_LAYOUT_PARQUET ? ABLOOM_HASH_PARQUET
+                                                   : ABLOOM_HASH_SERIALIZABLE)) {
+      PyErr_Format(PyExc_ValueError, "Unsupported hash algorithm: %u", buf[7]);
+      return -1;
+    }
+    h->layout = buf[6];
+    h->k = h->layout == ABLOOM_LAYOUT_REGISTER ? buf[40] : BLOCK_WORDS;
+    h->capacity = read_le64(buf + 8);
+    fp_union.u = read_le64(buf + 16);
+    h->block_count = read_le64(buf + 24);
+    h->free_threading = (buf[5] & ABLOOM_FLAG_FREE_THREADING) != 0;
+    h->header_size = ABLOOM_HEADER_SIZE;
+    h->compact_size = 0;
+    if (buf[5] & ABLOOM_FLAG_COMPACT) {
+      h->compact_size = read_le64(buf + 32);
+      // The compact encoding works on 512-bit blocks
+      if (h->compact_size == 0 || h->layout != ABLOOM_LAYOUT_SBBF512) {
+        PyErr_SetString(PyExc_ValueError,
+                        "Invalid data: compact payload size out of range");
+        return -1;
+      }
+    }
+  } else {
+    PyErr_Format(PyExc_ValueError,
+                 allow_v2 ? "Unsupported version: %u (expected 2 or 3)"
+                          : "Unsupported version: %u (expected 3)",
+                 version);
+    return -1;
+  }
+  h->fp_rate = fp_union.d;
+  return check_header(h);
+}
+
+// Checks that serialized data of `len` bytes holds exactly the header and
+// payload described by `h`.
+static int check_data_size(const FilterHeader *h, size_t len) {
+  size_t expected_total =
+      h->header_size + (h->compact_size ? (size_t)h->compact_size
+                                        : header_nbytes(h));
+  if (len != expected_total) {
+    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zu",
+                 expected_total, len);
+    return -1;
+  }
+  return 0;
+}
+
+// Compact encoding for sparsely filled filters. A filter sized for peak load
+// but holding a fraction of its capacity is mostly zero blocks, and most
+// non-zero blocks hold one or two items, i.e. 8-16 of their 512 bits. The
+// payload is a bitmap of the non-zero blocks (bit i % 8 of byte i / 8), then
+// one record per non-zero block, in order:
+//   n in 1..ABLOOM_COMPACT_MAX_BITS: n little-endian uint16 bit positions
+//                                    (word * 64 + bit) of the set bits
+//   0:                               the 64-byte block as little-endian words
+// to_bytes() uses it only when it is smaller than the plain blocks.
+#define ABLOOM_COMPACT_MAX_BITS 31
+
+// The builtin is a libgcc call unless the target has a popcount instruction
+static inline int popcount64(uint64_t x) {
+#if defined(__POPCNT__) || defined(__aarch64__)
+  return __builtin_popcountll(x);
+#else
+  x = x - ((x >> 1) & 0x5555555555555555ULL);
+  x = (x & 0x3333333333333333ULL) + ((x >> 2) & 0x3333333333333333ULL);
+  x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0FULL;
+  return (int)((x * 0x0101010101010101ULL) >> 56);
+#endif
+}
+
+static inline int block_popcount(const uint64_t *block) {
+  uint64_t any = 0;
+  for (int i = 0; i < BLOCK_WORDS; i++)
+    any |= block[i];
+  if (any == 0)
+    return 0;
+  int n = 0;
+  for (int i = 0; i < BLOCK_WORDS; i++)
+    n += popcount64(block[i]);
+  return n;
+}
+
+static inline size_t compact_bitmap_size(uint64_t block_count) {
+  return (size_t)((block_count + 7) / 8);
+}
+
+// Size of the compact payload for the filter's current bits, or `limit` as
+// soon as it reaches `limit`, so dense filters stop counting early
+static size_t compact_size(const BloomFilter *bf, size_t limit) {
+  size_t size = compact_bitmap_size(bf->block_count);
+  for (uint64_t b = 0; b < bf->block_count && size < limit; b++) {
+    int n = block_popcount(bf->blocks + b * BLOCK_WORDS);
+    if (n == 0)
+      continue;
+    size += 1 + (n <= ABLOOM_COMPACT_MAX_BITS ? 2 * (size_t)n : BLOCK_BYTES);
+  }
+  return size < limit ? size : limit;
+}
+
+// Encodes the blocks into the `limit` bytes at `out`. Other threads may add
+// items after compact_size() ran, so each block is encoded from a snapshot
+// and the encoder stops with SIZE_MAX once the payload would exceed `limit`.
+// Returns the payload size.
+static size_t encode_compact(const BloomFilter *bf, unsigned char *out,
+                             size_t limit) {
+  unsigned char *start = out;
+  unsigned char *bitmap = out;
+  size_t bitmap_size = compact_bitmap_size(bf->block_count);
+  memset(bitmap, 0, bitmap_size);
+  out += bitmap_size;
+  for (uint64_t b = 0; b < bf->block_count; b++) {
+    uint64_t block[BLOCK_WORDS];
+    memcpy(block, bf->blocks + b * BLOCK_WORDS, BLOCK_BYTES);
+    int n = block_popcount(block);
+    if (n == 0)
+      continue;
+    size_t record =
+        1 + (n <= ABLOOM_COMPACT_MAX_BITS ? 2 * (size_t)n : BLOCK_BYTES);
+    if (record > limit - (size_t)(out - start))
+      return SIZE_MAX;
+    bitmap[b / 8] |= (unsigned char)(1u << (b % 8));
+    if (n > ABLOOM_COMPACT_MAX_BITS) {
+      *out++ = 0;
+      for (int i = 0; i < BLOCK_WORDS; i++, out += 8)
+        write_le64(out, block[i]);
+      continue;
+    }
+    *out++ = (unsigned char)n;
+    for (int i = 0; i < BLOCK_WORDS; i++) {
+      for (uint64_t word = block[i]; word != 0; word &= word - 1) {
+        unsigned pos = (unsigned)(i * 64 + popcount64((word & -word) - 1));
+        out[0] = pos & 0xFF;
+        out[1] = (unsigned char)(pos >> 8);
+        out += 2;
+      }
+    }
+  }
+  return (size_t)(out - start);
+}
+
+// Decodes a compact payload into zeroed blocks. Runs without the GIL, so
+// malformed data is reported by the return value (-1) only.
+static int decode_compact(uint64_t *blocks, uint64_t block_count,
+                          const unsigned char *p, size_t len) {
+  size_t bitmap_size = compact_bitmap_size(block_count);
+  if (len < bitmap_size)
+    return -1;
+  const unsigned char *bitmap = p;
+  const unsigned char *end = p + len;
+  p += bitmap_size;
+  // Bits past the last block must be clear
+  if (block_count % 8 && bitmap[bitmap_size - 1] >> (block_count % 8))
+    return -1;
+  for (uint64_t b = 0; b < block_count; b++) {
+    if (!(bitmap[b / 8] & (1u << (b % 8))))
+      continue;
+    if (p == end)
+      return -1;
+    uint64_t *block = blocks + b * BLOCK_WORDS;
+    unsigned n = *p++;
+    if (n == 0) {
+      if ((size_t)(end - p) < BLOCK_BYTES)
+        return -1;
+      for (int i = 0; i < BLOCK_WORDS; i++, p += 8)
+        block[i] = read_le64(p);
+    } else {
+      if (n > ABLOOM_COMPACT_MAX_BITS || (size_t)(end - p) < 2 * (size_t)n)
+        return -1;
+      for (unsigned j = 0; j < n; j++, p += 2) {
+        unsigned pos = p[0] | ((unsigned)p[1] << 8);
+        if (pos >= BLOCK_WORDS * 64)
+          return -1;
+        block[pos / 64] |= (uint64_t)1 << (pos % 64);
+      }
+    }
+  }
+  return p == end ? 0 : -1;
+}
+
+// Fills the zeroed blocks of `bf` from a compact payload, releasing the GIL
+static int bloom_decode_compact(BloomFilter *bf, const unsigned char *data,
+                                size_t len) {
+  PyThreadState *save = bloom_begin_read(bf, len);
+  int result = decode_compact(bf->blocks, bf->block_count, data, len);
+  bloom_end_read(bf, save);
+  if (result < 0)
+    PyErr_SetString(PyExc_ValueError, "Invalid data: corrupt compact payload");
+  return result;
+}
+
+// Serializes a serializable filter; with `compact`, sparsely filled SBBF-512
+// filters use the compact encoding when it is smaller
+static PyObject *bloom_to_bytes(BloomFilter *self, int compact) {
+  size_t block_data_size = bloom_nbytes(self);
+  PyThreadState *save;
+  // The compact encoding works on 512-bit blocks
+  if (compact && self->layout == ABLOOM_LAYOUT_SBBF512) {
+    save = bloom_begin_read(self, block_data_size);
+    size_t size = compact_size(self, block_data_size);
+    bloom_end_read(self, save);
+    if (size < block_data_size) {
+      PyObject *result =
+          PyBytes_FromStringAndSize(NULL, ABLOOM_HEADER_SIZE + size);
+      if (result == NULL)
+        return NULL;
+      unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
+      save = bloom_begin_read(self, block_data_size);
+      size_t written = encode_compact(self, buf + ABLOOM_HEADER_SIZE, size);
+      bloom_end_read(self, save);
+      // Concurrent clear() can only shrink the payload; concurrent adds
+      // that outgrow it fall back to the plain blocks below
+      if (written != SIZE_MAX) {
+        if (written < size &&
+            _PyBytes_Resize(&result, ABLOOM_HEADER_SIZE + written) < 0)
+          return NULL;
+        buf = (unsigned char *)PyBytes_AS_STRING(result);
+        write_header(buf, self);
+        buf[5] |= ABLOOM_FLAG_COMPACT;
+        write_le64(buf + 32, written);
+        return result;
+      }
+      Py_DECREF(result);
+    }
+  }
+
+  PyObject *result =
+      PyBytes_FromStringAndSize(NULL, ABLOOM_HEADER_SIZE + block_data_size);
+  if (result == NULL) {
+    return NULL;
+  }
+
+  unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
+  write_header(buf, self);
+  buf += ABLOOM_HEADER_SIZE;
+
+  save = bloom_begin_read(self, block_data_size);
+  if (host_is_little_endian()) {
+    memcpy(buf, self->blocks, block_data_size);
+  } else {
+    size_t num_words = bloom_nbytes(self) / 8;
+    for (size_t i = 0; i < num_words; i++)
+      write_le64(buf + 8 * i, self->blocks[i]);
+  }
+  bloom_end_read(self, save);
+
+  return result;
+}
+
+static PyObject *BloomFilter_to_bytes(BloomFilter *self, PyObject *args,
+                                      PyObject *kwds) {
+  static char *kwlist[] = {"compact", NULL};
+  int compact = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "|$p:to_bytes", kwlist,
+                                   &compact)) {
+    return NULL;
+  }
+  if (!self->serializable) {
+    PyErr_SetString(PyExc_ValueError, "to_bytes() requires serializable=True");
+    return NULL;
+  }
+  return bloom_to_bytes(self, compact);
+}
+
+// Decodes a filter image written by to_bytes(). `data` must stay unchanged
+// while the GIL is released, e.g. because it belongs to a bytes object.
+static PyObject *bloom_from_data(PyTypeObject *type, const unsigned char *data,
+                                 size_t data_len) {
+  FilterHeader h;
+  if (read_header(data, data_len, 1, &h) < 0 ||
+      check_data_size(&h, data_len) < 0)
+    return NULL;
+
+  BloomFilter *self = (BloomFilter *)type->tp_alloc(type, 0);
+  if (self == NULL) {
+    return NULL;
+  }
+
+  self->capacity = h.capacity;
+  self->fp_rate = h.fp_rate;
+  self->serializable = 1;
+  self->free_threading = h.free_threading;
+  self->block_count = h.block_count;
+  self->layout = h.layout;
+  self->k = h.k;
+
+  size_t num_bytes = header_nbytes(&h);
+  if (bloom_alloc_blocks(self, num_bytes, h.compact_size != 0) < 0) {
+    Py_DECREF(self);
+    return NULL;
+  }
+  if (h.compact_size) {
+    if (bloom_decode_compact(self, data + h.header_size,
+                             (size_t)h.compact_size) < 0) {
+      Py_DECREF(self);
+      return NULL;
+    }
+    return (PyObject *)self;
+  }
+
+  // The new filter is not shared yet, so decoding only needs to release the
+  // GIL; the bytes object is immutable and kept alive by the caller
+  const unsigned char *words = data + h.header_size;
+  size_t num_words = header_nbytes(&h) / 8;
+  PyThreadState *save = bloom_begin_read(self, num_bytes);
+  if (h.header_size == ABLOOM_V2_HEADER_SIZE) {
+    for (size_t i = 0; i < num_words; i++)
+      self->blocks[i] = read_be64(words + 8 * i);
+  } else if (host_is_little_endian()) {
+    memcpy(self->blocks, words, num_bytes);
+  } else {
+    for (size_t i = 0; i < num_words; i++)
+      self->blocks[i] = read_le64(words + 8 * i);
+  }
+  bloom_end_read(self, save);
+
+  return (PyObject *)self;
+}
+
+static PyObject *BloomFilter_from_bytes(PyTypeObject *type, PyObject *args) {
+  PyObject *data_obj;
+
+  if (!PyArg_ParseTuple(args, "O", &data_obj)) {
+    return NULL;
+  }
+
+  if (!PyBytes_Check(data_obj)) {
+    PyErr_SetString(PyExc_TypeError, "from_bytes() requires bytes");
+    return NULL;
+  }
+
+  return bloom_from_data(type, (const unsigned char *)PyBytes_AS_STRING(data_obj),
+                         (size_t)PyBytes_GET_SIZE(data_obj));
+}
+
+// Deltas carry the blocks changed since the last checkpoint(), so a replica
+// built from to_bytes() can be kept in sync by shipping only what changed.
+// After the 64-byte header (flag ABLOOM_FLAG_DELTA, block count n at offset
+// 32) come the n blocks as little-endian words, then their indices in
+// increasing order as LEB128 varints: the first index, then each gap minus
+// one. apply_delta() overwrites the blocks, so a delta also carries clear().
+
+static size_t varint_size(uint64_t v) {
+  size_t n = 1;
+  while (v >= 0x80) {
+    v >>= 7;
+    n++;
+  }
+  return n;
+}
+
+static unsigned char *write_varint(unsigned char *p, uint64_t v) {
+  while (v >= 0x80) {
+    *p++ = (unsigned char)(v | 0x80);
+    v >>= 7;
+  }
+  *p++ = (unsigned char)v;
+  return p;
+}
+
+// Returns the byte after the varint, or NULL if it is truncated or overlong
+static const unsigned char *read_varint(const unsigned char *p,
+                                        const unsigned char *end,
+                                        uint64_t *v) {
+  *v = 0;
+  for (int shift = 0; shift < 64 && p < end; shift += 7) {
+    unsigned char byte = *p++;
+    *v |= (uint64_t)(byte & 0x7F) << shift;
+    if (!(byte & 0x80))
+      return p;
+  }
+  return NULL;
+}
+
+// Copies the change bitmap into `out` (if not NULL), clearing it if `reset`.
+// Clearing
+// before the blocks are copied means a racing add is either in the copy or
+// still marked for the next delta.
+static void bloom_take_dirty(BloomFilter *bf, uint64_t *out, int reset) {
+  size_t words = dirty_words(bf);
+#if ABLOOM_HAS_ATOMICS
+  if (bf->free_threading) {
+    for (size_t i = 0; i < words; i++) {
+      uint64_t marks = reset ? ATOMIC_EXCHANGE64(&bf->dirty[i], 0)
+                             : ATOMIC_LOAD64(&bf->dirty[i]);
+      if (out != NULL)
+        out[i] = marks;
+    }
+    return;
+  }
+#endif
+  if (out != NULL)
+    memcpy(out, bf->dirty, words * 8);
+  if (reset)
+    memset(bf->dirty, 0, words * 8);
+}
+
+static PyObject *BloomFilter_checkpoint(BloomFilter *self,
+                                        PyObject *Py_UNUSED(ignored)) {
+  if (self->layout != ABLOOM_LAYOUT_SBBF512) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Change tracking is only supported for layout='sbbf'");
+    return NULL;
+  }
+  size_t words = dirty_words(self);
+  if (self->dirty == NULL) {
+    self->dirty = (uint64_t *)PyMem_Calloc(words, 8);
+    if (self->dirty == NULL)
+      return PyErr_NoMemory();
+    Py_RETURN_NONE;
+  }
+  PyThreadState *save;
+  if (bloom_begin_write(self, words * 8, &save) < 0)
+    return NULL;
+  bloom_take_dirty(self, NULL, 1);
+  bloom_end_write(self, save);
+  Py_RETURN_NONE;
+}
+
+static PyObject *BloomFilter_to_delta(BloomFilter *self, PyObject *args,
+                                      PyObject *kwds) {
+  static char *kwlist[] = {"checkpoint", NULL};
+  int checkpoint = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "|$p:to_delta", kwlist,
+                                   &checkpoint)) {
+    return NULL;
+  }
+  if (!self->serializable) {
+    PyErr_SetString(PyExc_ValueError, "to_delta() requires serializable=True");
+    return NULL;
+  }
+  if (self->dirty == NULL) {
+    PyErr_SetString(PyExc_ValueError,
+                    "to_delta() requires change tracking; call checkpoint() "
+                    "first");
+    return NULL;
+  }
+
+  size_t words = dirty_words(self);
+  uint64_t *marks = (uint64_t *)PyMem_Malloc(words * 8);
+  if (marks == NULL)
+    return PyErr_NoMemory();
+  PyThreadState *save;
+  if (bloom_begin_write(self, words * 8, &save) < 0) {
+    PyMem_Free(marks);
+    return NULL;
+  }
+  bloom_take_dirty(self, marks, checkpoint);
+  bloom_end_write(self, save);
+
+  size_t count = 0, index_size = 0;
+  uint64_t next = 0;
+  for (size_t i = 0; i < words; i++) {
+    for (uint64_t w = marks[i]; w != 0; w &= w - 1) {
+      uint64_t b = i * 64 + (uint64_t)popcount64((w & -w) - 1);
+      index_size += varint_size(b - next);
+      next = b + 1;
+      count++;
+    }
+  }
+
+  PyObject *result = PyBytes_FromStringAndSize(
+      NULL, ABLOOM_HEADER_SIZE + count * BLOCK_BYTES + index_size);
+  if (result == NULL) {
+    PyMem_Free(marks);
+    return NULL;
+  }
+  unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
+  write_header(buf, self);
+  buf[5] |= ABLOOM_FLAG_DELTA;
+  write_le64(buf + 32, count);
+
+  unsigned char *out = buf + ABLOOM_HEADER_SIZE;
+  unsigned char *index = out + count * BLOCK_BYTES;
+  int little_endian = host_is_little_endian();
+  next = 0;
+  save = bloom_begin_read(self, count * BLOCK_BYTES);
+  for (size_t i = 0; i < words; i++) {
+    for (uint64_t w = marks[i]; w != 0; w &= w - 1) {
+      uint64_t b = i * 64 + (uint64_t)popcount64((w & -w) - 1);
+      const uint64_t *block = self->blocks + b * BLOCK_WORDS;
+      if (little_endian) {
+        memcpy(out, block, BLOCK_BYTES);
+      } else {
+        for (int j = 0; j < BLOCK_WORDS; j++)
+          write_le64(out + 8 * j, block[j]);
+      }
+      out += BLOCK_BYTES;
+      index = write_varint(index, b - next);
+      next = b + 1;
+    }
+  }
+  bloom_end_read(self, save);
+  PyMem_Free(marks);
+  return result;
+}
+
+// Checks the block indices of a delta; returns -1 if any is out of range or
+// the list doesn't end exactly at `end`
+static int check_delta_index(const unsigned char *p, const unsigned char *end,
+                             uint64_t count, uint64_t block_count) {
+  uint64_t next = 0;
+  for (uint64_t i = 0; i < count; i++) {
+    uint64_t gap;
+    p = read_varint(p, end, &gap);
+    if (p == NULL || gap >= block_count - next)
+      return -1;
+    next += gap + 1;
+  }
+  return p == end ? 0 : -1;
+}
+
+static PyObject *BloomFilter_apply_delta(BloomFilter *self, PyObject *args) {
+  Py_buffer data;
+
+  if (!PyArg_ParseTuple(args, "y*:apply_delta", &data)) {
+    return NULL;
+  }
+  if (!self->serializable) {
+    // Deltas hold serializable hashes, which a standard filter can't look up
+    PyErr_SetString(PyExc_ValueError,
+                    "apply_delta() requires serializable=True");
+    goto error;
+  }
+  const unsigned char *buf = (const unsigned char *)data.buf;
+  size_t len = (size_t)data.len;
+  FilterHeader h;
+
+  if (len < ABLOOM_HEADER_SIZE || buf[4] != ABLOOM_VERSION ||
+      !(buf[5] & ABLOOM_FLAG_DELTA)) {
+    // Let read_header() say what the data is, if anything
+    if (read_header(buf, len, 1, &h) == 0)
+      PyErr_SetString(PyExc_ValueError,
+                      "apply_delta() requires data from to_delta(); load full "
+                      "filters with from_bytes()");
+    goto error;
+  }
+
+  // Validate the rest of the header as a plain filter's
+  unsigned char header[ABLOOM_HEADER_SIZE];
+  memcpy(header, buf, ABLOOM_HEADER_SIZE);
+  header[5] &= (unsigned char)~ABLOOM_FLAG_DELTA;
+  uint64_t count = read_le64(header + 32);
+  memset(header + 32, 0, 8);
+  if (header[5] & ABLOOM_FLAG_COMPACT) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: unknown flags");
+    goto error;
+  }
+  if (read_header(header, ABLOOM_HEADER_SIZE, 0, &h) < 0)
+    goto error;
+  if (h.capacity != self->capacity || h.fp_rate != self->fp_rate ||
+      h.layout != self->layout) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Delta was taken from a filter with a different "
+                    "capacity/fp_rate");
+    goto error;
+  }
+  size_t payload = len - ABLOOM_HEADER_SIZE;
+  if (count > h.block_count || count > payload / BLOCK_BYTES) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: corrupt delta");
+    goto error;
+  }
+  const unsigned char *blocks = buf + ABLOOM_HEADER_SIZE;
+  const unsigned char *index = blocks + count * BLOCK_BYTES;
+  if (check_delta_index(index, buf + len, count, h.block_count) < 0) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: corrupt delta");
+    goto error;
+  }
+  if (bloom_check_writable(self) < 0)
+    goto error;
+
+  PyThreadState *save;
+  if (bloom_begin_write(self, count * BLOCK_BYTES, &save) < 0)
+    goto error;
+  int little_endian = host_is_little_endian();
+  uint64_t next = 0;
+  for (uint64_t i = 0; i < count; i++, blocks += BLOCK_BYTES) {
+    uint64_t gap;
+    index = read_varint(index, buf + len, &gap);
+    next += gap;
+    uint64_t *block = self->blocks + next * BLOCK_WORDS;
+    if (little_endian) {
+      memcpy(block, blocks, BLOCK_BYTES);
+    } else {
+      for (int j = 0; j < BLOCK_WORDS; j++)
+        block[j] = read_le64(blocks + 8 * j);
+    }
+    if (self->dirty != NULL)
+      bloom_mark_dirty(self, block);
+    next++;
+  }
+  bloom_end_write(self, save);
+
+  PyBuffer_Release(&data);
+  Py_RETURN_NONE;
+
+error:
+  PyBuffer_Release(&data);
+  return NULL;
+}
+
+// Parquet stores the Bloom filter of a column chunk at its
+// bloom_filter_offset as a Thrift compact protocol BloomFilterHeader,
+// followed by the bitset:
+//   1: required i32 numBytes
+//   2: required BloomFilterAlgorithm algorithm      (union, 1: BLOCK)
+//   3: required BloomFilterHash hash                (union, 1: XXHASH)
+//   4: required BloomFilterCompression compression  (union, 1: UNCOMPRESSED)
+// The bitset is the layout='parquet' block array as little-endian 32-bit
+// words. Only the Thrift types needed to skip unknown fields are decoded.
+#define THRIFT_STOP 0
+#define THRIFT_TRUE 1
+#define THRIFT_FALSE 2
+#define THRIFT_BYTE 3
+#define THRIFT_I16 4
+#define THRIFT_I32 5
+#define THRIFT_I64 6
+#define THRIFT_DOUBLE 7
+#define THRIFT_BINARY 8
+#define THRIFT_LIST 9
+#define THRIFT_SET 10
+#define THRIFT_MAP 11
+#define THRIFT_STRUCT 12
+#define THRIFT_MAX_DEPTH 32
+
+typedef struct {
+  const unsigned char *p;
+  const unsigned char *end;
+} ThriftReader;
+
+static inline int64_t zigzag_decode(uint64_t v) {
+  return (int64_t)(v >> 1) ^ -(int64_t)(v & 1);
+}
+
+static int thrift_varint(ThriftReader *r, uint64_t *v) {
+  const unsigned char *p = read_varint(r->p, r->end, v);
+  if (p == NULL)
+    return -1;
+  r->p = p;
+  return 0;
+}
+
+// Reads a field header and returns its type, THRIFT_STOP at the end of the
+// struct, or -1 if the data is malformed. `id` holds the previous field id.
+static int thrift_read_field(ThriftReader *r, int64_t *id) {
+  if (r->p == r->end)
+    return -1;
+  unsigned char byte = *r->p++;
+  int type = byte & 0x0F;
+  if (type == THRIFT_STOP)
+    return THRIFT_STOP;
+  if (byte >> 4) {
+    *id += byte >> 4;
+  } else {
+    uint64_t v;
+    if (thrift_varint(r, &v) < 0)
+      return -1;
+    *id = zigzag_decode(v);
+  }
+  return type;
+}
+
+// Skips a value of `type`; returns -1 if the data is malformed
+static int thrift_skip(ThriftReader *r, int type, int depth) {
+  uint64_t v, n;
+  if (depth > THRIFT_MAX_DEPTH)
+    return -1;
+  switch (type) {
+  case THRIFT_TRUE:
+  case THRIFT_FALSE:
+    return 0;
+  case THRIFT_BYTE:
+    if (r->p == r->end)
+      return -1;
+    r->p++;
+    return 0;
+  case THRIFT_I16:
+  case THRIFT_I32:
+  case THRIFT_I64:
+    return thrift_varint(r, &v);
+  case THRIFT_DOUBLE:
+    if (r->end - r->p < 8)
+      return -1;
+    r->p += 8;
+    return 0;
+  case THRIFT_BINARY:
+    if (thrift_varint(r, &n) < 0 || n > (uint64_t)(r->end - r->p))
+      return -1;
+    r->p += n;
+    return 0;
+  case THRIFT_LIST:
+  case THRIFT_SET: {
+    if (r->p == r->end)
+      return -1;
+    unsigned char header = *r->p++;
+    int elem = header & 0x0F;
+    n = header >> 4;
+    if (n == 15 && thrift_varint(r, &n) < 0)
+      return -1;
+    // Booleans in containers take a byte each
+    if (elem == THRIFT_TRUE || elem == THRIFT_FALSE)
+      elem = THRIFT_BYTE;
+    for (uint64_t i = 0; i < n; i++) {
+      if (thrift_skip(r, elem, depth + 1) < 0)
+        return -1;
+    }
+    return 0;
+  }
+  case THRIFT_MAP: {
+    if (thrift_varint(r, &n) < 0)
+      return -1;
+    if (n == 0)
+      return 0;
+    if (r->p == r->end)
+      return -1;
+    int key = *r->p >> 4, value = *r->p & 0x0F;
+    r->p++;
+    if (key == THRIFT_TRUE || key == THRIFT_FALSE)
+      key = THRIFT_BYTE;
+    if (value == THRIFT_TRUE || value == THRIFT_FALSE)
+      value = THRIFT_BYTE;
+    for (uint64_t i = 0; i < n; i++) {
+      if (thrift_skip(r, key, depth + 1) < 0 ||
+          thrift_skip(r, value, depth + 1) < 0)
+        return -1;
+    }
+    return 0;
+  }
+  case THRIFT_STRUCT: {
+    int64_t id = 0;
+    for (;;) {
+      int field = thrift_read_field(r, &id);
+      if (field < 0)
+        return -1;
+      if (field == THRIFT_STOP)
+        return 0;
+      if (thrift_skip(r, field, depth + 1) < 0)
+        return -1;
+    }
+  }
+  default:
+    return -1;
+  }
+}
+
+// Reads one of the header's unions; returns the id of its member, or -1
+static int64_t thrift_read_union(ThriftReader *r) {
+  int64_t id = 0, member = -1;
+  for (;;) {
+    int field = thrift_read_field(r, &id);
+    if (field < 0)
+      return -1;
+    if (field == THRIFT_STOP)
+      return member;
+    // A union holds exactly one member
+    if (member != -1 || field != THRIFT_STRUCT)
+      return -1;
+    member = id;
+    if (thrift_skip(r, field, 1) < 0)
+      return -1;
+  }
+}
+
+// Parses a BloomFilterHeader. Returns the header size and sets *num_bytes,
+// or returns -1 with ValueError set.
+static Py_ssize_t parquet_read_header(const unsigned char *buf, size_t len,
+                                      uint64_t *num_bytes) {
+  static const char *const union_names[] = {"algorithm", "hash",
+                                            "compression"};
+  ThriftReader r = {buf, buf + len};
+  int64_t id = 0, size = -1;
+  int seen = 0;
+
+  for (;;) {
+    int field = thrift_read_field(&r, &id);
+    if (field < 0)
+      goto corrupt;
+    if (field == THRIFT_STOP)
+      break;
+    if (id == 1 && field == THRIFT_I32) {
+      uint64_t v;
+      if (thrift_varint(&r, &v) < 0)
+        goto corrupt;
+      size = zigzag_decode(v);
+    } else if (id >= 2 && id <= 4 && field == THRIFT_STRUCT) {
+      // Parquet defines one member of each: BLOCK, XXHASH, UNCOMPRESSED
+      int64_t member = thrift_read_union(&r);
+      if (member < 0)
+        goto corrupt;
+      if (member != 1) {
+        PyErr_Format(PyExc_ValueError,
+                     "Unsupported Parquet Bloom filter %s: %lld",
+                     union_names[id - 2], (long long)member);
+        return -1;
+      }
+      seen |= 1 << id;
+    } else if (thrift_skip(&r, field, 1) < 0) {
+      goto corrupt;
+    }
+  }
+  if (size < 0 || seen != ((1 << 2) | (1 << 3) | (1 << 4)))
+    goto corrupt;
+  if (size < PARQUET_MIN_BYTES || size > PARQUET_MAX_BYTES ||
+      (size & (size - 1)) != 0) {
+    PyErr_Format(PyExc_ValueError,
+                 "Invalid data: Parquet bitset size %lld is not a power of "
+                 "two between %d and %d",
+                 (long long)size, PARQUET_MIN_BYTES, PARQUET_MAX_BYTES);
+    return -1;
+  }
+  *num_bytes = (uint64_t)size;
+  return (Py_ssize_t)(r.p - buf);
+
+corrupt:
+  PyErr_SetString(PyExc_ValueError,
+                  "Invalid data: corrupt Parquet Bloom filter header");
+  return -1;
+}
+
+// Parquet stores only the bitset, so the capacity of a loaded filter is the
+// largest number of distinct values a writer would size this bitset for at
+// fp_rate. Returns 0 if there is none.
+static uint64_t parquet_capacity(uint64_t block_count, double fp_rate) {
+  double bits_per_item = -8.0 / log(1.0 - pow(fp_rate, 1.0 / 8));
+  double bits = (double)block_count * PARQUET_BLOCK_BYTES * 8;
+  uint64_t capacity = (uint64_t)(bits / bits_per_item) + 1;
+  while (capacity > 0 &&
+         (uint64_t)parquet_block_count(capacity, fp_rate) > block_count)
+    capacity--;
+  if (capacity == 0 ||
+      (uint64_t)parquet_block_count(capacity, fp_rate) != block_count)
+    return 0;
+  return capacity;
+}
+
+static PyObject *BloomFilter_to_parquet(BloomFilter *self,
+                                        PyObject *Py_UNUSED(ignored)) {
+  if (self->layout != ABLOOM_LAYOUT_PARQUET) {
+    PyErr_SetString(PyExc_ValueError,
+                    "to_parquet() requires layout='parquet'");
+    return NULL;
+  }
+
+  size_t num_bytes = bloom_nbytes(self);
+  unsigned char header[16];
+  unsigned char *p = header;
+  *p++ = (1 << 4) | THRIFT_I32;
+  p = write_varint(p, (uint64_t)num_bytes << 1);
+  for (int i = 0; i < 3; i++) {
+    *p++ = (1 << 4) | THRIFT_STRUCT; // algorithm, hash, compression
+    *p++ = (1 << 4) | THRIFT_STRUCT; // BLOCK, XXHASH, UNCOMPRESSED
+    *p++ = THRIFT_STOP;
+    *p++ = THRIFT_STOP;
+  }
+  *p++ = THRIFT_STOP;
+  size_t header_size = (size_t)(p - header);
+
+  PyObject *result =
+      PyBytes_FromStringAndSize(NULL, (Py_ssize_t)(header_size + num_bytes));
+  if (result == NULL)
+    return NULL;
+  unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
+  memcpy(buf, header, header_size);
+  buf += header_size;
+
+  PyThreadState *save = bloom_begin_read(self, num_bytes);
+  if (host_is_little_endian()) {
+    memcpy(buf, self->blocks, num_bytes);
+  } else {
+    for (size_t i = 0; i < num_bytes / 8; i++)
+      write_le64(buf + 8 * i, self->blocks[i]);
+  }
+  bloom_end_read(self, save);
+  return result;
+}
+
+static PyObject *BloomFilter_from_parquet(PyTypeObject *type, PyObject *args,
+                                          PyObject *kwds) {
+  static char *kwlist[] = {"data", "fp_rate", NULL};
+  Py_buffer data;
+  double fp_rate = 0.01;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "y*|d:from_parquet", kwlist,
+                                   &data, &fp_rate)) {
+    return NULL;
+  }
+  const unsigned char *buf = (const unsigned char *)data.buf;
+  size_t len = (size_t)data.len;
+  BloomFilter *self = NULL;
+
+  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    goto done;
+  }
+  uint64_t num_bytes;
+  Py_ssize_t header_size = parquet_read_header(buf, len, &num_bytes);
+  if (header_size < 0)
+    goto done;
+  // Anything after the bitset is ignored, so a read from bloom_filter_offset
+  // can run past the filter when the file doesn't record its length
+  if (len - (size_t)header_size < num_bytes) {
+    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zu",
+                 (size_t)header_size + (size_t)num_bytes, len);
+    goto done;
+  }
+  uint64_t block_count = num_bytes / PARQUET_BLOCK_BYTES;
+  uint64_t capacity = parquet_capacity(block_count, fp_rate);
+  if (capacity == 0) {
+    PyErr_Format(PyExc_ValueError,
+                 "fp_rate is too low for a %llu-byte Parquet bitset",
+                 (unsigned long long)num_bytes);
+    goto done;
+  }
+
+  self = (BloomFilter *)type->tp_alloc(type, 0);
+  if (self == NULL)
+    goto done;
+  self->capacity = capacity;
+  self->fp_rate = fp_rate;
+  self->serializable = 1;
+  self->layout = ABLOOM_LAYOUT_PARQUET;
+  self->k = BLOCK_WORDS;
+  self->block_count = block_count;
+  if (bloom_alloc_blocks(self, (size_t)num_bytes, 0) < 0) {
+    Py_CLEAR(self);
+    goto done;
+  }
+
+  const unsigned char *words = buf + header_size;
+  PyThreadState *save = bloom_begin_read(self, (size_t)num_bytes);
+  if (host_is_little_endian()) {
+    memcpy(self->blocks, words, (size_t)num_bytes);
+  } else {
+    for (size_t i = 0; i < num_bytes / 8; i++)
+      self->blocks[i] = read_le64(words + 8 * i);
+  }
+  bloom_end_read(self, save);
+
+done:
+  PyBuffer_Release(&data);
+  return (PyObject *)self;
+}
+
+// Streams are copied in bounded chunks through memoryviews over the block
+// array, so no intermediate bytes object of the filter's size is created.
+#define ABLOOM_STREAM_CHUNK (1024 * 1024)
+
+// Releases a memoryview over filter memory, so a stream that kept a
+// reference to it cannot reach that memory later. Keeps any pending error.
+static int stream_release_view(PyObject *view) {
+  PyObject *exc_type, *exc_value, *exc_tb;
+  PyErr_Fetch(&exc_type, &exc_value, &exc_tb);
+  PyObject *res = PyObject_CallMethod(view, "release", NULL);
+  Py_DECREF(view);
+  if (exc_type != NULL) {
+    Py_XDECREF(res);
+    PyErr_Clear();
+    PyErr_Restore(exc_type, exc_value, exc_tb);
+    return -1;
+  }
+  if (res == NULL)
+    return -1;
+  Py_DECREF(res);
+  return 0;
+}
+
+// Writes `len` bytes with `write`, a bound write() method. Raw streams may
+// write fewer bytes than asked, so the rest is retried; a None result (from
+// file-likes that don't report a count) is taken as a full write.
+static int stream_write(PyObject *write, const unsigned char *buf,
+                        size_t len) {
+  while (len > 0) {
+    PyObject *view =
+        PyMemoryView_FromMemory((char *)buf, (Py_ssize_t)len, PyBUF_READ);
+    if (view == NULL)
+      return -1;
+    PyObject *res = PyObject_CallFunctionObjArgs(write, view, NULL);
+    if (stream_release_view(view) < 0) {
+      Py_XDECREF(res);
+      return -1;
+    }
+    size_t written = len;
+    if (res != Py_None) {
+      Py_ssize_t n = PyLong_AsSsize_t(res);
+      Py_DECREF(res);
+      if (n == -1 && PyErr_Occurred())
+        return -1;
+      if (n <= 0 || (size_t)n > len) {
+        PyErr_Format(PyExc_OSError, "write() returned %zd for %zu bytes", n,
+                     len);
+        return -1;
+      }
+      written = (size_t)n;
+    } else {
+      Py_DECREF(res);
+    }
+    buf += written;
+    len -= written;
+  }
+  return 0;
+}
+
+// Reads up to `len` bytes into `buf` with `readinto`, or with `read` for
+// file-likes without readinto(), in chunks of at most ABLOOM_STREAM_CHUNK.
+// Stops early only at end of stream; `*got` is the number of bytes read.
+static int stream_read(PyObject *readinto, PyObject *read, unsigned char *buf,
+                       size_t len, size_t *got) {
+  *got = 0;
+  while (*got < len) {
+    size_t want = len - *got;
+    if (want > ABLOOM_STREAM_CHUNK)
+      want = ABLOOM_STREAM_CHUNK;
+    Py_ssize_t n;
+    if (readinto != NULL) {
+      PyObject *view = PyMemoryView_FromMemory((char *)buf + *got,
+                                               (Py_ssize_t)want, PyBUF_WRITE);
+      if (view == NULL)
+        return -1;
+      PyObject *res = PyObject_CallFunctionObjArgs(readinto, view, NULL);
+      if (stream_release_view(view) < 0) {
+        Py_XDECREF(res);
+        return -1;
+      }
+      if (res == Py_None) {
+        Py_DECREF(res);
+        PyErr_SetString(PyExc_BlockingIOError,
+                        "read_from() requires a blocking stream");
+        return -1;
+      }
+      n = PyLong_AsSsize_t(res);
+      Py_DECREF(res);
+      if (n == -1 && PyErr_Occurred())
+        return -1;
+      if (n < 0 || (size_t)n > want) {
+        PyErr_Format(PyExc_OSError, "readinto() returned %zd for %zu bytes",
+                     n, want);
+        return -1;
+      }
+    } else {
+      PyObject *res = PyObject_CallFunction(read, "n", (Py_ssize_t)want);
+      if (res == NULL)
+        return -1;
+      if (res == Py_None) {
+        Py_DECREF(res);
+        PyErr_SetString(PyExc_BlockingIOError,
+                        "read_from() requires a blocking stream");
+        return -1;
+      }
+      Py_buffer chunk;
+      if (PyObject_GetBuffer(res, &chunk, PyBUF_SIMPLE) < 0) {
+        Py_DECREF(res);
+        return -1;
+      }
+      n = chunk.len;
+      if ((size_t)n > want) {
+        PyBuffer_Release(&chunk);
+        Py_DECREF(res);
+        PyErr_Format(PyExc_OSError, "read() returned %zd bytes for %zu", n,
+                     want);
+        return -1;
+      }
+      memcpy(buf + *got, chunk.buf, (size_t)n);
+      PyBuffer_Release(&chunk);
+      Py_DECREF(res);
+    }
+    if (n == 0)
+      break;
+    *got += (size_t)n;
+  }
+  return 0;
+}
+
+static PyObject *BloomFilter_write_to(BloomFilter *self, PyObject *args,
+                                      PyObject *kwds) {
+  static char *kwlist[] = {"fileobj", "chunk_size", NULL};
+  PyObject *fileobj;
+  Py_ssize_t chunk_size = ABLOOM_STREAM_CHUNK;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|$n:write_to", kwlist,
+                                   &fileobj, &chunk_size)) {
+    return NULL;
+  }
+  if (!self->serializable) {
+    PyErr_SetString(PyExc_ValueError, "write_to() requires serializable=True");
+    return NULL;
+  }
+  if (chunk_size <= 0) {
+    PyErr_SetString(PyExc_ValueError, "chunk_size must be greater than 0");
+    return NULL;
+  }
+  // Whole words per chunk, so big-endian hosts can convert chunk by chunk
+  size_t chunk = ((size_t)chunk_size + 7) & ~(size_t)7;
+
+  PyObject *write = PyObject_GetAttrString(fileobj, "write");
+  if (write == NULL)
+    return NULL;
+
+  unsigned char header[ABLOOM_HEADER_SIZE];
+  write_header(header, self);
+  size_t block_data_size = bloom_nbytes(self);
+  unsigned char *scratch = NULL;
+  int result = -1;
+
+  // write() may release the GIL, so keep __init__ from freeing the blocks
+  self->active_ops++;
+  if (stream_write(write, header, ABLOOM_HEADER_SIZE) < 0)
+    goto done;
+  if (!host_is_little_endian()) {
+    scratch = PyMem_Malloc(chunk < block_data_size ? chunk : block_data_size);
+    if (scratch == NULL) {
+      PyErr_NoMemory();
+      goto done;
+    }
+  }
+  for (size_t offset = 0; offset < block_data_size; offset += chunk) {
+    size_t len = block_data_size - offset;
+    if (len > chunk)
+      len = chunk;
+    const unsigned char *src = (const unsigned char *)self->blocks + offset;
+    if (scratch != NULL) {
+      const uint64_t *words = self->blocks + offset / 8;
+      PyThreadState *save = bloom_begin_read(self, len);
+      for (size_t i = 0; i < len / 8; i++)
+        write_le64(scratch + 8 * i, words[i]);
+      bloom_end_read(self, save);
+      src = scratch;
+    }
+    if (stream_write(write, src, len) < 0)
+      goto done;
+  }
+  result = 0;
+
+done:
+  self->active_ops--;
+  PyMem_Free(scratch);
+  Py_DECREF(write);
+  if (result < 0)
+    return NULL;
+  return PyLong_FromSize_t(ABLOOM_HEADER_SIZE + block_data_size);
+}
+
+static PyObject *BloomFilter_read_from(PyTypeObject *type, PyObject *fileobj) {
+  PyObject *readinto = NULL, *read = NULL;
+  if (PyObject_HasAttrString(fileobj, "readinto")) {
+    readinto = PyObject_GetAttrString(fileobj, "readinto");
+  } else {
+    read = PyObject_GetAttrString(fileobj, "read");
+  }
+  if (readinto == NULL && read == NULL)
+    return NULL;
+
+  BloomFilter *self = NULL;
+  unsigned char header[ABLOOM_HEADER_SIZE];
+  size_t got;
+  FilterHeader h;
+
+  // The magic and version tell how much more header there is to read
+  size_t header_size = ABLOOM_MAGIC_SIZE + 1;
+  if (stream_read(readinto, read, header, header_size, &got) < 0)
+    goto error;
+  if (got == header_size) {
+    if (header[4] == ABLOOM_V2_VERSION)
+      header_size = ABLOOM_V2_HEADER_SIZE;
+    else if (header[4] == ABLOOM_VERSION)
+      header_size = ABLOOM_HEADER_SIZE;
+    size_t rest = 0;
+    if (stream_read(readinto, read, header + got, header_size - got, &rest) <
+        0)
+      goto error;
+    got += rest;
+  }
+  if (read_header(header, got, 1, &h) < 0)
+    goto error;
+
+  self = (BloomFilter *)type->tp_alloc(type, 0);
+  if (self == NULL)
+    goto error;
+  self->capacity = h.capacity;
+  self->fp_rate = h.fp_rate;
+  self->serializable = 1;
+  self->free_threading = h.free_threading;
+  self->block_count = h.block_count;
+  self->layout = h.layout;
+  self->k = h.k;
+
+  size_t num_bytes = header_nbytes(&h);
+  if (bloom_alloc_blocks(self, num_bytes, h.compact_size != 0) < 0)
+    goto error;
+  if (h.compact_size) {
+    // Compact payloads are smaller than the blocks, so they are read whole
+    size_t payload_size = (size_t)h.compact_size;
+    unsigned char *payload = PyMem_Malloc(payload_size);
+    if (payload == NULL) {
+      PyErr_NoMemory();
+      goto error;
+    }
+    int decoded = -1;
+    if (stream_read(readinto, read, payload, payload_size, &got) == 0) {
+      if (got != payload_size)
+        PyErr_Format(PyExc_ValueError,
+                     "Invalid data: expected %zu bytes, got %zu",
+                     h.header_size + payload_size, h.header_size + got);
+      else
+        decoded = bloom_decode_compact(self, payload, payload_size);
+    }
+    PyMem_Free(payload);
+    if (decoded < 0)
+      goto error;
+    Py_XDECREF(readinto);
+    Py_XDECREF(read);
+    return (PyObject *)self;
+  }
+  if (stream_read(readinto, read, (unsigned char *)self->blocks, num_bytes,
+                  &got) < 0)
+    goto error;
+  if (got != num_bytes) {
+    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zu",
+                 h.header_size + num_bytes, h.header_size + got);
+    goto error;
+  }
+
+  // The words were read in file byte order; convert them in place
+  int big_endian = h.header_size == ABLOOM_V2_HEADER_SIZE;
+  if (big_endian == host_is_little_endian()) {
+    size_t num_words = header_nbytes(&h) / 8;
+    PyThreadState *save = bloom_begin_read(self, num_bytes);
+    for (size_t i = 0; i < num_words; i++)
+      self->blocks[i] = byteswap64(self->blocks[i]);
+    bloom_end_read(self, save);
+  }
+
+  Py_XDECREF(readinto);
+  Py_XDECREF(read);
+  return (PyObject *)self;
+
+error:
+  Py_XDECREF(self);
+  Py_XDECREF(readinto);
+  Py_XDECREF(read);
+  return NULL;
+}
+
+// Standard-mode filters hash str and bytes with the process's hash secret,
+// which pickle can't carry. A pickle records the hash of a fixed bytes
+// object, and unpickling compares it with the hash in the new process.
+static int hash_secret_fingerprint(Py_hash_t *out) {
+  PyObject *probe = PyBytes_FromString("abloom");
+  if (probe == NULL)
+    return -1;
+  *out = PyObject_Hash(probe);
+  Py_DECREF(probe);
+  return *out == -1 && PyErr_Occurred() ? -1 : 0;
+}
+
+static PyObject *BloomFilter_reduce_ex(BloomFilter *self, PyObject *arg) {
+  int protocol = PyLong_AsLong(arg);
+  if (protocol == -1 && PyErr_Occurred())
+    return NULL;
+
+  // Shared filters are passed by name, so workers attach to the segment
+  if (self->storage == STORAGE_SHARED) {
+    PyObject *attach =
+        PyObject_GetAttrString((PyObject *)Py_TYPE(self), "attach");
+    if (attach == NULL)
+      return NULL;
+    PyObject *name = PyObject_GetAttrString(self->shm, "name");
+    if (name == NULL) {
+      Py_DECREF(attach);
+      return NULL;
+    }
+    return Py_BuildValue("N(N)", attach, name);
+  }
+
+  PyObject *fingerprint;
+  if (self->serializable) {
+    Py_INCREF(Py_None);
+    fingerprint = Py_None;
+  } else {
+    Py_hash_t h;
+    if (hash_secret_fingerprint(&h) < 0)
+      return NULL;
+    fingerprint = PyLong_FromSsize_t(h);
+    if (fingerprint == NULL)
+      return NULL;
+  }
+
+  // Protocol 5 passes the block array as a PickleBuffer over the filter's
+  // buffer export, so it is copied into the pickle stream once, or not at
+  // all when the pickler takes out-of-band buffers
+  PyObject *blocks;
+  if (protocol >= 5) {
+    blocks = PyPickleBuffer_FromObject((PyObject *)self);
+  } else {
+    size_t num_bytes = bloom_nbytes(self);
+    blocks = PyBytes_FromStringAndSize(NULL, (Py_ssize_t)num_bytes);
+    if (blocks != NULL) {
+      PyThreadState *save = bloom_begin_read(self, num_bytes);
+      memcpy(PyBytes_AS_STRING(blocks), self->blocks, num_bytes);
+      bloom_end_read(self, save);
+    }
+  }
+  if (blocks == NULL) {
+    Py_DECREF(fingerprint);
+    return NULL;
+  }
+
+  PyObject *constructor =
+      PyObject_GetAttrString((PyObject *)Py_TYPE(self), "_from_pickle");
+  if (constructor == NULL) {
+    Py_DECREF(fingerprint);
+    Py_DECREF(blocks);
+    return NULL;
+  }
+  return Py_BuildValue("N(KdiiNisN)", constructor,
+                       (unsigned long long)self->capacity, self->fp_rate,
+                       self->serializable, self->free_threading, fingerprint,
+                       host_is_little_endian(), layout_names[self->layout],
+                       blocks);
+}
+
+static PyObject *BloomFilter_from_pickle(PyTypeObject *type, PyObject *args) {
+  unsigned long long capacity;
+  double fp_rate;
+  int serializable, free_threading, little_endian;
+  PyObject *fingerprint;
+  Py_buffer data;
+  const char *layout;
+
+  if (!PyArg_ParseTuple(args, "KdppOpsy*:_from_pickle", &capacity, &fp_rate,
+                        &serializable, &free_threading, &fingerprint,
+                        &little_endian, &layout, &data)) {
+    return NULL;
+  }
+
+  if (fingerprint != Py_None) {
+    Py_hash_t expected = PyLong_AsSsize_t(fingerprint);
+    Py_hash_t h;
+    if ((expected == -1 && PyErr_Occurred()) ||
+        hash_secret_fingerprint(&h) < 0) {
+      PyBuffer_Release(&data);
+      return NULL;
+    }
+    if (h != expected) {
+      PyBuffer_Release(&data);
+      PyErr_SetString(PyExc_ValueError,
+                      "Cannot unpickle a BloomFilter created with "
+                      "serializable=False in a process with a different hash "
+                      "seed: str and bytes items would not be found. Set the "
+                      "same PYTHONHASHSEED in both processes or use "
+                      "serializable=True.");
+      return NULL;
+    }
+  }
+
+  BloomFilter *self = (BloomFilter *)PyObject_CallFunction(
+      (PyObject *)type, "Kdiis", capacity, fp_rate, serializable,
+      free_threading, layout);
+  if (self == NULL) {
+    PyBuffer_Release(&data);
+    return NULL;
+  }
+
+  size_t num_bytes = bloom_nbytes(self);
+  if ((size_t)data.len != num_bytes) {
+    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zd",
+                 num_bytes, data.len);
+    PyBuffer_Release(&data);
+    Py_DECREF(self);
+    return NULL;
+  }
+
+  PyThreadState *save = bloom_begin_read(self, num_bytes);
+  memcpy(self->blocks, data.buf, num_bytes);
+  if (little_endian != host_is_little_endian()) {
+    size_t num_words = bloom_nbytes(self) / 8;
+    for (size_t i = 0; i < num_words; i++)
+      self->blocks[i] = byteswap64(self->blocks[i]);
+  }
+  bloom_end_read(self, save);
+  PyBuffer_Release(&data);
+
+  return (PyObject *)self;
+}
+
+// Maps `path` with Python's mmap module, which handles the platform
+// differences (and keeps its own handle, so the file object is closed here).
+// Returns the exported buffer of the mapping in `view`.
+static int map_file(PyObject *path, const char *file_mode, int writable,
+                    Py_ssize_t create_size, Py_buffer *view) {
+  PyObject *io = NULL, *file = NULL, *res = NULL, *mmap_mod = NULL;
+  PyObject *mapping = NULL, *kwargs = NULL;
+  int result = -1;
+
+  io = PyImport_ImportModule("io");
+  if (io == NULL)
+    goto done;
+  file = PyObject_CallMethod(io, "open", "Os", path, file_mode);
+  if (file == NULL)
+    goto done;
+  if (create_size > 0) {
+    res = PyObject_CallMethod(file, "truncate", "n", create_size);
+    if (res == NULL)
+      goto done;
+    Py_CLEAR(res);
+  }
+  res = PyObject_CallMethod(file, "fileno", NULL);
+  if (res == NULL)
+    goto done;
+
+  mmap_mod = PyImport_ImportModule("mmap");
+  if (mmap_mod == NULL)
+    goto done;
+  kwargs = PyDict_New();
+  if (kwargs == NULL)
+    goto done;
+  PyObject *access = PyObject_GetAttrString(
+      mmap_mod, writable ? "ACCESS_WRITE" : "ACCESS_READ");
+  if (access == NULL || PyDict_SetItemString(kwargs, "access", access) < 0) {
+    Py_XDECREF(access);
+    goto done;
+  }
+  Py_DECREF(access);
+
+  PyObject *mmap_type = PyObject_GetAttrString(mmap_mod, "mmap");
+  if (mmap_type == NULL)
+    goto done;
+  PyObject *call_args = Py_BuildValue("(Oi)", res, 0);
+  if (call_args != NULL) {
+    mapping = PyObject_Call(mmap_type, call_args, kwargs);
+    Py_DECREF(call_args);
+  }
+  Py_DECREF(mmap_type);
+  if (mapping == NULL)
+    goto done;
+
+  if (PyObject_GetBuffer(mapping, view,
+                         writable ? PyBUF_WRITABLE : PyBUF_SIMPLE) < 0)
+    goto done;
+  result = 0;
+
+done:
+  if (file != NULL) {
+    // Keep the original error, if any, over one raised by close()
+    PyObject *exc_type, *exc_value, *exc_tb;
+    PyErr_Fetch(&exc_type, &exc_value, &exc_tb);
+    PyObject *closed = PyObject_CallMethod(file, "close", NULL);
+    if (closed == NULL && exc_type == NULL && result == 0) {
+      PyBuffer_Release(view);
+      result = -1;
+    } else {
+      Py_XDECREF(closed);
+      PyErr_Restore(exc_type, exc_value, exc_tb);
+    }
+  }
+  Py_XDECREF(mapping);
+  Py_XDECREF(kwargs);
+  Py_XDECREF(mmap_mod);
+  Py_XDECREF(res);
+  Py_XDECREF(file);
+  Py_XDECREF(io);
+  return result;
+}
+
+static PyObject *BloomFilter_open(PyTypeObject *type, PyObject *args,
+                                  PyObject *kwds) {
+  static char *kwlist[] = {"path",    "mode",           "capacity",
+                           "fp_rate", "free_threading", NULL};
+  PyObject *path;
+  const char *mode = "r";
+  long long capacity_signed = 0;
+  double fp_rate = 0.01;
+  int free_threading = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|s$Ldp:open", kwlist, &path,
+                                   &mode, &capacity_signed, &fp_rate,
+                                   &free_threading)) {
+    return NULL;
+  }
+
+  const char *file_mode;
+  if (strcmp(mode, "r") == 0) {
+    file_mode = "rb";
+  } else if (strcmp(mode, "r+") == 0) {
+    file_mode = "r+b";
+  } else if (strcmp(mode, "w") == 0) {
+    file_mode = "w+b";
+  } else {
+    PyErr_Format(PyExc_ValueError, "mode must be 'r', 'r+' or 'w', not '%s'",
+                 mode);
+    return NULL;
+  }
+  int create = mode[0] == 'w';
+  int writable = create || mode[1] == '+';
+
+  if (!host_is_little_endian()) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "open() requires a little-endian host; use to_bytes() "
+                    "and from_bytes() instead");
+    return NULL;
+  }
+
+  int64_t block_count = 0;
+  if (create) {
+    if (capacity_signed <= 0) {
+      PyErr_SetString(PyExc_ValueError,
+                      "open() with mode='w' requires a capacity greater than 0");
+      return NULL;
+    }
+    if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+      PyErr_SetString(PyExc_ValueError,
+                      "False positive rate must be between 0.0 and 1.0");
+      return NULL;
+    }
+    if (free_threading && !ABLOOM_HAS_ATOMICS) {
+      PyErr_SetString(
+          PyExc_RuntimeError,
+          "free_threading=True requires C11 atomics, which are not "
+          "available in this build. Use a pre-built wheel or rebuild "
+          "with a modern compiler.");
+      return NULL;
+    }
+    block_count = calculate_block_count((uint64_t)capacity_signed, fp_rate);
+    if (block_count < 0 ||
+        (uint64_t)block_count >
+            (PY_SSIZE_T_MAX - ABLOOM_HEADER_SIZE) / BLOCK_BYTES) {
+      PyErr_SetString(PyExc_ValueError,
+                      "Capacity too large: would cause integer overflow");
+      return NULL;
+    }
+  } else if (capacity_signed != 0 || free_threading) {
+    PyErr_SetString(PyExc_ValueError,
+                    "capacity, fp_rate and free_threading are read from the "
+                    "file unless mode='w'");
+    return NULL;
+  }
+
+  Py_buffer view;
+  Py_ssize_t create_size =
+      create ? ABLOOM_HEADER_SIZE + (Py_ssize_t)block_count * BLOCK_BYTES
+             : 0;
+  if (map_file(path, file_mode, writable, create_size, &view) < 0)
+    return NULL;
+
+  BloomFilter *self = (BloomFilter *)type->tp_alloc(type, 0);
+  if (self == NULL) {
+    PyBuffer_Release(&view);
+    return NULL;
+  }
+
+  unsigned char *buf = (unsigned char *)view.buf;
+  if (create) {
+    self->capacity = (uint64_t)capacity_signed;
+    self->fp_rate = fp_rate;
+    self->block_count = (uint64_t)block_count;
+    self->k = BLOCK_WORDS;
+    self->free_threading = free_threading;
+    write_header(buf, self);
+  } else {
+    FilterHeader h;
+    if (read_header(buf, (size_t)view.len, 0, &h) < 0 ||
+        check_data_size(&h, (size_t)view.len) < 0) {
+      PyBuffer_Release(&view);
+      Py_DECREF(self);
+      return NULL;
+    }
+    if (h.compact_size) {
+      PyErr_SetString(PyExc_ValueError,
+                      "Compact data can't be mapped; save the filter with "
+                      "to_bytes(compact=False) or write_to()");
+      PyBuffer_Release(&view);
+      Py_DECREF(self);
+      return NULL;
+    }
+    self->capacity = h.capacity;
+    self->fp_rate = h.fp_rate;
+    self->block_count = h.block_count;
+    self->layout = h.layout;
+    self->k = h.k;
+    self->free_threading = h.free_threading;
+  }
+
+  // Files are read by other processes, so they always hash deterministically
+  self->serializable = 1;
+  self->file_view = view;
+  self->storage = STORAGE_FILE;
+  self->storage_base = view.buf;
+  self->storage_bytes = (size_t)view.len;
+  self->blocks = (uint64_t *)(buf + ABLOOM_HEADER_SIZE);
+  self->readonly = !writable;
+  return (PyObject *)self;
+}
+
+static PyObject *BloomFilter_flush(BloomFilter *self,
+                                   PyObject *Py_UNUSED(ignored)) {
+  if (self->storage != STORAGE_FILE || self->readonly)
+    Py_RETURN_NONE;
+  return PyObject_CallMethod(self->file_view.obj, "flush", NULL);
+}
+
+// Shared-memory filters live in a multiprocessing.shared_memory segment
+// holding the same image as a mapped file: the v3 header, then the blocks.
+// Python's SharedMemory handles the platform differences (shm_open on POSIX,
+// named file mappings on Windows), and the filter keeps it in `shm`.
+// Segments are never tracked: the resource tracker would unlink them when
+// the tracking process exits, even while other processes still use them.
+// They stay until unlink() (on Windows, until the last handle is closed).
+#if PY_VERSION_HEX < 0x030D0000
+// Before 3.13 SharedMemory always registers POSIX segments with the resource
+// tracker, so the registration is undone by hand. `action` is "register" or
+// "unregister".
+static int shared_memory_track(PyObject *shm, const char *action) {
+  PyObject *mod = PyImport_ImportModule("multiprocessing.shared_memory");
+  if (mod == NULL)
+    return -1;
+  PyObject *use_posix = PyObject_GetAttrString(mod, "_USE_POSIX");
+  Py_DECREF(mod);
+  int posix = use_posix ? PyObject_IsTrue(use_posix) : -1;
+  Py_XDECREF(use_posix);
+  if (posix <= 0)
+    return posix;
+
+  PyObject *res = NULL;
+  PyObject *tracker = PyImport_ImportModule("multiprocessing.resource_tracker");
+  PyObject *name = PyObject_GetAttrString(shm, "_name");
+  if (tracker != NULL && name != NULL)
+    res = PyObject_CallMethod(tracker, action, "Os", name, "shared_memory");
+  Py_XDECREF(name);
+  Py_XDECREF(tracker);
+  if (res == NULL)
+    return -1;
+  Py_DECREF(res);
+  return 0;
+}
+#endif
+
+static PyObject *shared_memory_open(PyObject *name, Py_ssize_t create_size) {
+  PyObject *mod = PyImport_ImportModule("multiprocessing.shared_memory");
+  if (mod == NULL)
+    return NULL;
+  PyObject *shm = NULL;
+  PyObject *cls = PyObject_GetAttrString(mod, "SharedMemory");
+  Py_DECREF(mod);
+  PyObject *kwargs = cls ? PyDict_New() : NULL;
+  if (kwargs == NULL)
+    goto done;
+  if (create_size > 0) {
+    PyObject *size = PyLong_FromSsize_t(create_size);
+    if (size == NULL || PyDict_SetItemString(kwargs, "create", Py_True) < 0 ||
+        PyDict_SetItemString(kwargs, "size", size) < 0) {
+      Py_XDECREF(size);
+      goto done;
+    }
+    Py_DECREF(size);
+  }
+#if PY_VERSION_HEX >= 0x030D0000
+  if (PyDict_SetItemString(kwargs, "track", Py_False) < 0)
+    goto done;
+#endif
+  PyObject *call_args = PyTuple_Pack(1, name);
+  if (call_args == NULL)
+    goto done;
+  shm = PyObject_Call(cls, call_args, kwargs);
+  Py_DECREF(call_args);
+#if PY_VERSION_HEX < 0x030D0000
+  if (shm != NULL && shared_memory_track(shm, "unregister") < 0) {
+    PyObject *exc_type, *exc_value, *exc_tb;
+    PyErr_Fetch(&exc_type, &exc_value, &exc_tb);
+    PyObject *res = PyObject_CallMethod(
+        shm, create_size > 0 ? "unlink" : "close", NULL);
+    Py_XDECREF(res);
+    PyErr_Clear();
+    PyErr_Restore(exc_type, exc_value, exc_tb);
+    Py_CLEAR(shm);
+  }
+#endif
+
+done:
+  Py_XDECREF(kwargs);
+  Py_XDECREF(cls);
+  return shm;
+}
+
+// Creates a filter over the shared-memory segment `shm`. Takes ownership of
+// `shm`; when `create` is set the header is written from the given
+// parameters, otherwise it is read from the segment.
+static PyObject *bloom_from_shared(PyTypeObject *type, PyObject *shm,
+                                   int create, uint64_t capacity,
+                                   double fp_rate, uint64_t block_count) {
+  Py_buffer view;
+  PyObject *buf_obj = PyObject_GetAttrString(shm, "buf");
+  if (buf_obj == NULL)
+    goto fail;
+  int got_view = PyObject_GetBuffer(buf_obj, &view, PyBUF_WRITABLE);
+  Py_DECREF(buf_obj);
+  if (got_view < 0)
+    goto fail;
+
+  BloomFilter *self = (BloomFilter *)type->tp_alloc(type, 0);
+  if (self == NULL) {
+    PyBuffer_Release(&view);
+    goto fail;
+  }
+  // The filter owns the segment from here; dealloc releases the view and
+  // closes it
+  self->shm = shm;
+  self->file_view = view;
+  self->storage = STORAGE_SHARED;
+  self->storage_base = view.buf;
+  self->storage_bytes = (size_t)view.len;
+
+  unsigned char *buf = (unsigned char *)view.buf;
+  if (create) {
+    self->capacity = capacity;
+    self->fp_rate = fp_rate;
+    self->block_count = block_count;
+    self->k = BLOCK_WORDS;
+    self->free_threading = 1;
+    write_header(buf, self);
+  } else {
+    FilterHeader h;
+    if (read_header(buf, (size_t)view.len, 0, &h) < 0) {
+      Py_DECREF(self);
+      return NULL;
+    }
+    // Segments may be rounded up to whole pages
+    size_t needed = ABLOOM_HEADER_SIZE + header_nbytes(&h);
+    if (h.compact_size || !h.free_threading || (size_t)view.len < needed) {
+      PyErr_SetString(PyExc_ValueError,
+                      "Shared memory segment does not hold a shared "
+                      "BloomFilter");
+      Py_DECREF(self);
+      return NULL;
+    }
+    self->capacity = h.capacity;
+    self->fp_rate = h.fp_rate;
+    self->block_count = h.block_count;
+    self->layout = h.layout;
+    self->k = h.k;
+    self->free_threading = 1;
+  }
+  self->serializable = 1;
+  self->blocks = (uint64_t *)(buf + ABLOOM_HEADER_SIZE);
+  return (PyObject *)self;
+
+fail:
+  {
+    PyObject *exc_type, *exc_value, *exc_tb;
+    PyErr_Fetch(&exc_type, &exc_value, &exc_tb);
+    PyObject *res = PyObject_CallMethod(shm, create ? "unlink" : "close", NULL);
+    Py_XDECREF(res);
+    PyErr_Clear();
+    PyErr_Restore(exc_type, exc_value, exc_tb);
+  }
+  Py_DECREF(shm);
+  return NULL;
+}
+
+static PyObject *BloomFilter_create_shared(PyTypeObject *type, PyObject *args,
+                                           PyObject *kwds) {
+  static char *kwlist[] = {"name", "capacity", "fp_rate", NULL};
+  PyObject *name;
+  long long capacity_signed;
+  double fp_rate = 0.01;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OL|d:create_shared", kwlist,
+                                   &name, &capacity_signed, &fp_rate)) {
+    return NULL;
+  }
+  if (!ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "Shared-memory filters require C11 atomics, which are not "
+                    "available in this build. Use a pre-built wheel or "
+                    "rebuild with a modern compiler.");
+    return NULL;
+  }
+  if (capacity_signed <= 0) {
+    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
+    return NULL;
+  }
+  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    return NULL;
+  }
+  int64_t block_count =
+      calculate_block_count((uint64_t)capacity_signed, fp_rate);
+  if (block_count < 0 || (uint64_t)block_count >
+                             (PY_SSIZE_T_MAX - ABLOOM_HEADER_SIZE) / BLOCK_BYTES) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Capacity too large: would cause integer overflow");
+    return NULL;
+  }
+
+  // New segments are zero-filled by the OS
+  PyObject *shm = shared_memory_open(
+      name, ABLOOM_HEADER_SIZE + (Py_ssize_t)block_count * BLOCK_BYTES);
+  if (shm == NULL)
+    return NULL;
+  return bloom_from_shared(type, shm, 1, (uint64_t)capacity_signed, fp_rate,
+                           (uint64_t)block_count);
+}
+
+static PyObject *BloomFilter_attach(PyTypeObject *type, PyObject *name) {
+  PyObject *shm = shared_memory_open(name, 0);
+  if (shm == NULL)
+    return NULL;
+  return bloom_from_shared(type, shm, 0, 0, 0.0, 0);
+}
+
+static PyObject *BloomFilter_unlink(BloomFilter *self,
+                                    PyObject *Py_UNUSED(ignored)) {
+  if (self->storage != STORAGE_SHARED) {
+    PyErr_SetString(PyExc_ValueError,
+                    "unlink() requires a filter created with create_shared() "
+                    "or attach()");
+    return NULL;
+  }
+#if PY_VERSION_HEX < 0x030D0000
+  // SharedMemory.unlink() unregisters the segment, so register it first
+  if (shared_memory_track(self->shm, "register") < 0)
+    return NULL;
+#endif
+  return PyObject_CallMethod(self->shm, "unlink", NULL);
+}
+
+// Arrow PyCapsule interface. Objects exporting `__arrow_c_array__` or
+// `__arrow_c_stream__` (PyArrow, Polars, ...) are read directly through the
+// Arrow C data interface, without a pyarrow dependency and without creating
+// a Python object per element. Integer columns hash like the equivalent
+// Python ints; utf8/binary columns hash like str/bytes in serializable mode.
+// https://arrow.apache.org/docs/format/CDataInterface.html
+struct ArrowSchema {
+  const char *format;
+  const char *name;
+  const char *metadata;
+  int64_t flags;
+  int64_t n_children;
+  struct ArrowSchema **children;
+  struct ArrowSchema *dictionary;
+  void (*release)(struct ArrowSchema *);
+  void *private_data;
+};
+
+struct ArrowArray {
+  int64_t length;
+  int64_t null_count;
+  int64_t offset;
+  int64_t n_buffers;
+  int64_t n_children;
+  const void **buffers;
+  struct ArrowArray **children;
+  struct ArrowArray *dictionary;
+  void (*release)(struct ArrowArray *);
+  void *private_data;
+};
+
+struct ArrowArrayStream {
+  int (*get_schema)(struct ArrowArrayStream *, struct ArrowSchema *out);
+  int (*get_next)(struct ArrowArrayStream *, struct ArrowArray *out);
+  const char *(*get_last_error)(struct ArrowArrayStream *);
+  void (*release)(struct ArrowArrayStream *);
+  void *private_data;
+};
+
+typedef enum {
+  ARROW_UNSUPPORTED,
+  ARROW_INT,          // c s i l
+  ARROW_UINT,         // C S I L
+  ARROW_BINARY,       // u z: int32 offsets
+  ARROW_LARGE_BINARY, // U Z: int64 offsets
+  ARROW_BINARY_VIEW,  // vu vz: 16-byte views
+  ARROW_FIXED_BINARY, // w:N
+} ArrowKind;
+
+typedef struct {
+  ArrowKind kind;
+  Py_ssize_t width; // bytes per element for ARROW_INT/UINT/FIXED_BINARY
+  // Hash integers like Parquet: as INT32 up to 32 bits, else as INT64
+  int parquet;
+} ArrowType;
+
+static ArrowType arrow_parse_type(const struct ArrowSchema *schema) {
+  ArrowType type = {ARROW_UNSUPPORTED, 0, 0};
+  const char *fmt = schema->format;
+
+  // Dictionary-encoded columns report the format of their indices
+  if (fmt == NULL || schema->dictionary != NULL || schema->n_children != 0)
+    return type;
+
+  if (fmt[0] != '\0' && fmt[1] == '\0') {
+    // Integer formats in order of width: signed, then unsigned
+    static const char int_formats[] = "csilCSIL";
+    const char *p = strchr(int_formats, fmt[0]);
+    if (p != NULL) {
+      int index = (int)(p - int_formats);
+      type.kind = index < 4 ? ARROW_INT : ARROW_UINT;
+      type.width = (Py_ssize_t)1 << (index % 4);
+    } else if (fmt[0] == 'u' || fmt[0] == 'z') {
+      type.kind = ARROW_BINARY;
+    } else if (fmt[0] == 'U' || fmt[0] == 'Z') {
+      type.kind = ARROW_LARGE_BINARY;
+    }
+  } else if (strcmp(fmt, "vu") == 0 || strcmp(fmt, "vz") == 0) {
+    type.kind = ARROW_BINARY_VIEW;
+  } else if (fmt[0] == 'w' && fmt[1] == ':') {
+    char *end;
+    long width = strtol(fmt + 2, &end, 10);
+    if (*end == '\0' && width > 0) {
+      type.kind = ARROW_FIXED_BINARY;
+      type.width = width;
+    }
+  }
+  return type;
+}
+
+static inline int arrow_is_binary(ArrowKind kind) {
+  return kind == ARROW_BINARY || kind == ARROW_LARGE_BINARY ||
+         kind == ARROW_BINARY_VIEW || kind == ARROW_FIXED_BINARY;
+}
+
+static inline int arrow_is_valid(const uint8_t *validity, int64_t j) {
+  return validity == NULL || ((validity[j >> 3] >> (j & 7)) & 1);
+}
+
+// Views that don't inline their value point into one of the variadic data
+// buffers between the views and the trailing buffer of their sizes. Hashing
+// may run without the GIL, so every non-null view is checked up front.
+static int arrow_check_views(const struct ArrowArray *array) {
+  int64_t data_buffers = array->n_buffers - 3;
+  const int64_t *sizes = (const int64_t *)array->buffers[array->n_buffers - 1];
+  const uint8_t *validity =
+      array->null_count != 0 ? (const uint8_t *)array->buffers[0] : NULL;
+  const unsigned char *views = (const unsigned char *)array->buffers[1];
+
+  for (int64_t j = array->offset; j < array->offset + array->length; j++) {
+    if (!arrow_is_valid(validity, j))
+      continue;
+    const unsigned char *view = views + j * 16;
+    int32_t length, buffer_index, offset;
+    memcpy(&length, view, 4);
+    if (length <= 12) {
+      if (length >= 0)
+        continue;
+      goto invalid;
+    }
+    memcpy(&buffer_index, view + 8, 4);
+    memcpy(&offset, view + 12, 4);
+    if (buffer_index < 0 || buffer_index >= data_buffers || offset < 0 ||
+        array->buffers[2 + buffer_index] == NULL ||
+        (sizes != NULL && (int64_t)offset + length > sizes[buffer_index]))
+      goto invalid;
+  }
+  return 0;
+
+invalid:
+  PyErr_SetString(PyExc_ValueError,
+                  "Invalid Arrow array: binary view out of bounds");
+  return -1;
+}
+
+static int arrow_check_layout(const ArrowType *type,
+                              const struct ArrowArray *array) {
+  // Validity and values, plus data (offset types) or a sizes buffer (views)
+  int64_t min_buffers = type->kind == ARROW_BINARY ||
+                                type->kind == ARROW_LARGE_BINARY ||
+                                type->kind == ARROW_BINARY_VIEW
+                            ? 3
+                            : 2;
+  int valid = array->length >= 0 && array->offset >= 0 &&
+              array->n_buffers >= min_buffers && array->buffers != NULL;
+  if (valid && array->length > 0) {
+    valid = array->buffers[1] != NULL &&
+            (array->null_count == 0 || array->buffers[0] != NULL);
+  }
+  if (!valid) {
+    PyErr_SetString(PyExc_ValueError, "Invalid Arrow array layout");
+    return -1;
+  }
+  if (type->kind == ARROW_BINARY_VIEW && array->length > 0)
+    return arrow_check_views(array);
+  return 0;
+}
+
+// Integer columns with layout='parquet' hash like the Parquet column the
+// writer makes of them: 8-, 16- and 32-bit columns as INT32 (sign- or
+// zero-extended), 64-bit columns as INT64
+static inline uint64_t arrow_parquet_int_hash(const ArrowType *type,
+                                              const unsigned char *values,
+                                              int64_t j) {
+  int is_signed = type->kind == ARROW_INT;
+  switch (type->width) {
+  case 1:
+    return hash_parquet_u32(is_signed ? (uint32_t)(int32_t)(int8_t)values[j]
+                                      : values[j]);
+  case 2: {
+    uint16_t v;
+    memcpy(&v, values + j * 2, 2);
+    return hash_parquet_u32(is_signed ? (uint32_t)(int32_t)(int16_t)v : v);
+  }
+  case 4: {
+    uint32_t v;
+    memcpy(&v, values + j * 4, 4);
+    return hash_parquet_u32(v);
+  }
+  default: {
+    uint64_t v;
+    memcpy(&v, values + j * 8, 8);
+    return hash_parquet_u64(v);
+  }
+  }
+}
+
+static inline uint64_t arrow_int_hash(const ArrowType *type,
+                                      const unsigned char *values, int64_t j) {
+  if (type->parquet)
+    return arrow_parquet_int_hash(type, values, j);
+  switch (type->width) {
+  case 1:
+    return type->kind == ARROW_INT ? hash_int64((int8_t)values[j])
+                                   : hash_uint64(values[j]);
+  case 2: {
+    uint16_t v;
+    memcpy(&v, values + j * 2, 2);
+    return type->kind == ARROW_INT ? hash_int64((int16_t)v) : hash_uint64(v);
+  }
+  case 4: {
+    uint32_t v;
+    memcpy(&v, values + j * 4, 4);
+    return type->kind == ARROW_INT ? hash_int64((int32_t)v) : hash_uint64(v);
+  }
+  default: {
+    uint64_t v;
+    memcpy(&v, values + j * 8, 8);
+    return type->kind == ARROW_INT ? hash_int64((int64_t)v) : hash_uint64(v);
+  }
+  }
+}
+
+// The view must have passed arrow_check_views()
+static inline uint64_t arrow_view_hash(const struct ArrowArray *array,
+                                       int64_t j) {
+  const unsigned char *view = (const unsigned char *)array->buffers[1] + j * 16;
+  int32_t length;
+  memcpy(&length, view, 4);
+  if (length <= 12)
+    return XXH64(view + 4, (size_t)length, 0);
+
+  int32_t buffer_index, offset;
+  memcpy(&buffer_index, view + 8, 4);
+  memcpy(&offset, view + 12, 4);
+  const unsigned char *data =
+      (const unsigned char *)array->buffers[2 + buffer_index];
+  return XXH64(data + offset, (size_t)length, 0);
+}
+
+// Hashes elements [start, start + n) of `array`. Null elements get hash 0
+// and valid[i] = 0. Returns the number of valid elements.
+static size_t arrow_hash_window(const ArrowType *type,
+                                const struct ArrowArray *array, int64_t start,
+                                size_t n, uint64_t *hashes,
+                                unsigned char *valid) {
+  const uint8_t *validity =
+      array->null_count != 0 ? (const uint8_t *)array->buffers[0] : NULL;
+  const unsigned char *values = (const unsigned char *)array->buffers[1];
+  size_t count = 0;
+
+  for (size_t i = 0; i < n; i++) {
+    int64_t j = array->offset + start + (int64_t)i;
+    valid[i] = (unsigned char)arrow_is_valid(validity, j);
+    if (!valid[i]) {
+      hashes[i] = 0;
+      continue;
+    }
+    count++;
+    switch (type->kind) {
+    case ARROW_BINARY: {
+      const int32_t *offsets = (const int32_t *)values;
+      const unsigned char *data = (const unsigned char *)array->buffers[2];
+      hashes[i] = XXH64(data + offsets[j], (size_t)(offsets[j + 1] - offsets[j]),
+                        0);
+      break;
+    }
+    case ARROW_LARGE_BINARY: {
+      const int64_t *offsets = (const int64_t *)values;
+      const unsigned char *data = (const unsigned char *)array->buffers[2];
+      hashes[i] = XXH64(data + offsets[j], (size_t)(offsets[j + 1] - offsets[j]),
+                        0);
+      break;
+    }
+    case ARROW_BINARY_VIEW:
+      hashes[i] = arrow_view_hash(array, j);
+      break;
+    case ARROW_FIXED_BINARY:
+      hashes[i] = XXH64(values + j * type->width, (size_t)type->width, 0);
+      break;
+    default:
+      hashes[i] = arrow_int_hash(type, values, j);
+      break;
+    }
+  }
+  return count;
+}
+
+typedef enum {
+  ARROW_CHECK,      // contains_many(), count_present()
+  ARROW_INSERT,     // update()
+  ARROW_INSERT_NEW, // update_new()
+} ArrowOp;
+
+// Applies `op` to one Arrow array. Null elements are skipped on insert and
+// reported as 0 (absent, or not new). When `mask` is non-NULL it is extended
+// by one byte per element. `found` accumulates the hits or new items.
+static int arrow_apply_array(BloomFilter *self, const ArrowType *type,
+                             const struct ArrowArray *array, ArrowOp op,
+                             PyObject *mask, Py_ssize_t *found) {
+  if (arrow_check_layout(type, array) < 0)
+    return -1;
+
+  int64_t length = array->length;
+  unsigned char *out = NULL;
+  if (mask != NULL) {
+    Py_ssize_t old_size = PyByteArray_GET_SIZE(mask);
+    if (PyByteArray_Resize(mask, old_size + (Py_ssize_t)length) < 0)
+      return -1;
+    out = (unsigned char *)PyByteArray_AS_STRING(mask) + old_size;
+  }
+
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char valid[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char result[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t nbytes = (size_t)length * 8;
+  Py_ssize_t hits = 0;
+  PyThreadState *save;
+
+  if (op != ARROW_CHECK) {
+    if (bloom_begin_write(self, nbytes, &save) < 0)
+      return -1;
+  } else {
+    save = bloom_begin_read(self, nbytes);
+  }
+
+  for (int64_t start = 0; start < length; start += (int64_t)window) {
+    size_t n = (size_t)(length - start) < window ? (size_t)(length - start)
+                                                 : window;
+    size_t n_valid = arrow_hash_window(type, array, start, n, hashes, valid);
+    unsigned char *dest = out ? out + start : result;
+
+    if (op == ARROW_CHECK) {
+      hits += (Py_ssize_t)bloom_check_many(self, hashes, n, dest);
+      if (n_valid < n) {
+        for (size_t i = 0; i < n; i++) {
+          if (!valid[i]) {
+            hits -= dest[i];
+            dest[i] = 0;
+          }
+        }
+      }
+      continue;
+    }
+
+    // Inserts only see the valid hashes, compacted to the front
+    if (n_valid < n) {
+      size_t k = 0;
+      for (size_t i = 0; i < n; i++) {
+        if (valid[i])
+          hashes[k++] = hashes[i];
+      }
+    }
+    if (op == ARROW_INSERT) {
+      bloom_insert_many(self, hashes, n_valid);
+      continue;
+    }
+    hits += (Py_ssize_t)bloom_add_new_many(self, hashes, n_valid, result);
+    if (out != NULL) {
+      size_t k = 0;
+      for (size_t i = 0; i < n; i++)
+        dest[i] = valid[i] ? result[k++] : 0;
+    }
+  }
+
+  if (op != ARROW_CHECK)
+    bloom_end_write(self, save);
+  else
+    bloom_end_read(self, save);
+  *found += hits;
+  return 0;
+}
+
+// Returns the column type, or ARROW_UNSUPPORTED if this filter should fall
+// back to iterating the object. Binary columns need serializable mode, as
+// standard mode hashes str/bytes with Python's salted hash().
+static ArrowType arrow_filter_type(BloomFilter *self,
+                                   const struct ArrowSchema *schema) {
+  ArrowType type = arrow_parse_type(schema);
+  if (arrow_is_binary(type.kind) && !self->serializable)
+    type.kind = ARROW_UNSUPPORTED;
+  type.parquet = self->layout == ABLOOM_LAYOUT_PARQUET;
+  return type;
+}
+
+static int arrow_stream_error(struct ArrowArrayStream *stream, int code) {
+  const char *message =
+      stream->get_last_error ? stream->get_last_error(stream) : NULL;
+  PyErr_Format(PyExc_RuntimeError, "Arrow stream error %d: %s", code,
+               message ? message : "unknown error");
+  return -1;
+}
+
+static int arrow_apply_stream(BloomFilter *self, PyObject *capsule, ArrowOp op,
+                              PyObject *mask, Py_ssize_t *found) {
+  struct ArrowArrayStream *stream =
+      PyCapsule_GetPointer(capsule, "arrow_array_stream");
+  if (stream == NULL)
+    return -1;
+
+  struct ArrowSchema schema;
+  int code = stream->get_schema(stream, &schema);
+  if (code != 0)
+    return arrow_stream_error(stream, code);
+  ArrowType type = arrow_filter_type(self, &schema);
+  schema.release(&schema);
+  if (type.kind == ARROW_UNSUPPORTED)
+    return 0;
+
+  for (;;) {
+    struct ArrowArray array;
+    code = stream->get_next(stream, &array);
+    if (code != 0)
+      return arrow_stream_error(stream, code);
+    if (array.release == NULL)
+      return 1;
+    int err = arrow_apply_array(self, &type, &array, op, mask, found);
+    array.release(&array);
+    if (err < 0)
+      return -1;
+  }
+}
+
+static int arrow_apply_capsules(BloomFilter *self, PyObject *capsules,
+                                ArrowOp op, PyObject *mask,
+                                Py_ssize_t *found) {
+  if (!PyTuple_Check(capsules) || PyTuple_GET_SIZE(capsules) != 2) {
+    PyErr_SetString(PyExc_TypeError,
+                    "__arrow_c_array__ must return a (schema, array) tuple");
+    return -1;
+  }
+  struct ArrowSchema *schema =
+      PyCapsule_GetPointer(PyTuple_GET_ITEM(capsules, 0), "arrow_schema");
+  if (schema == NULL)
+    return -1;
+  struct ArrowArray *array =
+      PyCapsule_GetPointer(PyTuple_GET_ITEM(capsules, 1), "arrow_array");
+  if (array == NULL)
+    return -1;
+
+  ArrowType type = arrow_filter_type(self, schema);
+  if (type.kind == ARROW_UNSUPPORTED)
+    return 0;
+  if (arrow_apply_array(self, &type, array, op, mask, found) < 0)
+    return -1;
+  return 1;
+}
+
+// Applies `op` to `obj` through the Arrow C data interface. Returns 1 if
+// handled, 0 if `obj` is not Arrow data of a supported type (the caller then
+// iterates it as usual), or -1 on error. The capsules release the exported
+// data when they are destroyed.
+static int bloom_apply_arrow(BloomFilter *self, PyObject *obj, ArrowOp op,
+                             PyObject *mask, Py_ssize_t *found) {
+  // Skip the attribute lookups for the common built-in iterables
+  if (PyList_CheckExact(obj) || PyTuple_CheckExact(obj) ||
+      PyAnySet_CheckExact(obj) || PyDict_CheckExact(obj))
+    return 0;
+
+  int is_stream;
+  if (PyObject_HasAttrString(obj, "__arrow_c_array__"))
+    is_stream = 0;
+  else if (PyObject_HasAttrString(obj, "__arrow_c_stream__"))
+    is_stream = 1;
+  else
+    return 0;
+
+  PyObject *exported = PyObject_CallMethod(
+      obj, is_stream ? "__arrow_c_stream__" : "__arrow_c_array__", NULL);
+  if (exported == NULL)
+    return -1;
+  int result = is_stream
+                   ? arrow_apply_stream(self, exported, op, mask, found)
+                   : arrow_apply_capsules(self, exported, op, mask, found);
+  Py_DECREF(exported);
+  return result;
+}
+
+// Shared loop for update(). The `mode` argument is always a literal at the
+// call sites, so each caller gets a specialized loop without per-item mode
+// branching. Items hashed before an error are still inserted.
+static inline int bloom_update_iter(BloomFilter *self, PyObject *iter,
+                                    HashMode mode) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  PyObject *item;
+
+  while ((item = PyIter_Next(iter)) != NULL) {
+    int err = get_hash(item, mode, &hashes[n]);
+    Py_DECREF(item);
+    if (err < 0) {
+      bloom_wait_for_bulk_writers(self);
+      bloom_insert_many(self, hashes, n);
+      return -1;
+    }
+    if (++n == window) {
+      bloom_wait_for_bulk_writers(self);
+      bloom_insert_many(self, hashes, n);
+      n = 0;
+    }
+  }
+
+  bloom_wait_for_bulk_writers(self);
+  bloom_insert_many(self, hashes, n);
+  return PyErr_Occurred() ? -1 : 0;
+}
+
+static PyObject *BloomFilter_update(BloomFilter *self, PyObject *iterable) {
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  Py_ssize_t unused = 0;
+  int arrow = bloom_apply_arrow(self, iterable, ARROW_INSERT, NULL, &unused);
+  if (arrow < 0)
+    return NULL;
+  if (arrow > 0)
+    Py_RETURN_NONE;
+
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return NULL;
+
+  // Dispatch once outside the loop to avoid per-item branching
+  int err;
+  switch (bloom_hash_mode(self)) {
+  case HASH_SERIALIZABLE:
+    err = bloom_update_iter(self, iter, HASH_SERIALIZABLE);
+    break;
+  case HASH_PARQUET:
+    err = bloom_update_iter(self, iter, HASH_PARQUET);
+    break;
+  default:
+    err = bloom_update_iter(self, iter, HASH_FAST);
+  }
+  Py_DECREF(iter);
+  if (err < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+// Reads element `i` of a 64-bit integer buffer. memcpy keeps unaligned
+// buffers (e.g. sliced memoryviews) safe; it compiles to a plain load.
+static inline uint64_t buffer_u64(const unsigned char *data, Py_ssize_t i,
+                                  int byteswap) {
+  uint64_t raw;
+  memcpy(&raw, data + i * 8, 8);
+  return byteswap ? byteswap64(raw) : raw;
+}
+
+// How the elements of a 64-bit buffer become filter hashes
+typedef enum {
+  BUFFER_RAW_HASHES, // update_hashes(): used as-is
+  BUFFER_INT64,      // update_buffer(): hashed like Python ints
+  BUFFER_UINT64,
+  BUFFER_PARQUET,    // update_buffer() with layout='parquet': INT64 values
+} BufferKind;
+
+static inline uint64_t buffer_hash(const unsigned char *data, Py_ssize_t i,
+                                   BufferKind kind, int byteswap) {
+  uint64_t raw = buffer_u64(data, i, byteswap);
+  switch (kind) {
+  case BUFFER_INT64:
+    return hash_int64((int64_t)raw);
+  case BUFFER_UINT64:
+    return hash_uint64(raw);
+  case BUFFER_PARQUET:
+    return hash_parquet_u64(raw);
+  default:
+    return raw;
+  }
+}
+
+// Inserts elements [start, end) of a buffer a window at a time. `kind` is
+// branched on per window, not per element.
+static void bloom_insert_buffer(BloomFilter *bf, const unsigned char *data,
+                                Py_ssize_t start, Py_ssize_t end,
+                                BufferKind kind, int byteswap) {
+  Py_ssize_t window = (Py_ssize_t)bloom_window();
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+
+  for (; start < end; start += window) {
+    Py_ssize_t n = end - start < window ? end - start : window;
+    if (kind == BUFFER_INT64) {
+      for (Py_ssize_t i = 0; i < n; i++)
+        hashes[i] = hash_int64((int64_t)buffer_u64(data, start + i, byteswap));
+    } else if (kind == BUFFER_UINT64) {
+      for (Py_ssize_t i = 0; i < n; i++)
+        hashes[i] = hash_uint64(buffer_u64(data, start + i, byteswap));
+    } else if (kind == BUFFER_PARQUET) {
+      for (Py_ssize_t i = 0; i < n; i++)
+        hashes[i] = hash_parquet_u64(buffer_u64(data, start + i, byteswap));
+    } else {
+      for (Py_ssize_t i = 0; i < n; i++)
+        hashes[i] = buffer_u64(data, start + i, byteswap);
+    }
+    bloom_insert_many(bf, hashes, (size_t)n);
+  }
+}
+
+// Multi-threaded buffer insert. The filter is split into `nthreads`
+// contiguous block ranges ("partitions") and the input is processed in
+// rounds of up to nthreads * ABLOOM_THREAD_CHUNK elements:
+//
+//   1. count:   each thread hashes its slice of the round and counts how many
+//               hashes land in each partition
+//   2. scatter: each thread hashes its slice again and writes the hashes into
+//               a scratch array grouped by partition
+//   3. insert:  thread p inserts the hashes of partition p
+//
+// In phase 3 no two threads touch the same block, so default-mode filters
+// need no atomics, and since OR is order-independent the result is
+// bit-for-bit the single-threaded filter. free_threading filters keep their
+// atomic ORs, as other Python threads may be writing concurrently.
+//
+// Workers are started once per call and driven phase by phase with a pair of
+// locks each: the caller releases `go` to start a phase and acquires `done`
+// to wait for it. The calling thread runs share 0 of every phase itself.
+#define ABLOOM_MAX_THREADS 256
+#define ABLOOM_THREAD_CHUNK (256 * 1024)
+#define ABLOOM_MIN_THREAD_ITEMS (64 * 1024)
+
+typedef enum {
+  BULK_COUNT,
+  BULK_SCATTER,
+  BULK_INSERT,
+  BULK_EXIT,
+} BulkPhase;
+
+typedef struct BulkInsert BulkInsert;
+
+typedef struct {
+  BulkInsert *job;
+  int index;
+  PyThread_type_lock go;
+  PyThread_type_lock done;
+} BulkWorker;
+
+struct BulkInsert {
+  BloomFilter *bf;
+  const unsigned char *data;
+  BufferKind kind;
+  int byteswap;
+  int nthreads;
+  BulkPhase phase;
+  Py_ssize_t round_start; // first element of the current round
+  Py_ssize_t round_count;
+  uint64_t blocks_per_part;
+  // offsets[t * nthreads + p]: count of thread t's hashes in partition p,
+  // then the scratch position where thread t writes them
+  Py_ssize_t *offsets;
+  Py_ssize_t *part_start; // nthreads + 1 scratch boundaries
+  uint64_t *scratch;
+  BulkWorker *workers;
+};
+
+static inline int bulk_partition(const BulkInsert *job, uint64_t hash) {
+  return (int)(bloom_block_index(job->bf, hash) / job->blocks_per_part);
+}
+
+static void bulk_run_phase(BulkInsert *job, int t) {
+  int n = job->nthreads;
+  Py_ssize_t per_thread = (job->round_count + n - 1) / n;
+  Py_ssize_t lo = job->round_start + t * per_thread;
+  Py_ssize_t hi = lo + per_thread;
+  Py_ssize_t round_end = job->round_start + job->round_count;
+  Py_ssize_t *offsets = job->offsets + (size_t)t * n;
+
+  if (hi > round_end)
+    hi = round_end;
+
+  switch (job->phase) {
+  case BULK_COUNT:
+    memset(offsets, 0, n * sizeof(Py_ssize_t));
+    for (Py_ssize_t i = lo; i < hi; i++) {
+      uint64_t hash = buffer_hash(job->data, i, job->kind, job->byteswap);
+      offsets[bulk_partition(job, hash)]++;
+    }
+    break;
+  case BULK_SCATTER:
+    for (Py_ssize_t i = lo; i < hi; i++) {
+      uint64_t hash = buffer_hash(job->data, i, job->kind, job->byteswap);
+      job->scratch[offsets[bulk_partition(job, hash)]++] = hash;
+    }
+    break;
+  case BULK_INSERT: {
+    size_t window = bloom_window();
+    Py_ssize_t end = job->part_start[t + 1];
+    for (Py_ssize_t i = job->part_start[t]; i < end; i += window) {
+      size_t m = (size_t)(end - i) < window ? (size_t)(end - i) : window;
+      bloom_insert_many(job->bf, job->scratch + i, m);
+    }
+    break;
+  }
+  case BULK_EXIT:
+    break;
+  }
+}
+
+static void bulk_worker_main(void *arg) {
+  BulkWorker *worker = (BulkWorker *)arg;
+  for (;;) {
+    PyThread_acquire_lock(worker->go, WAIT_LOCK);
+    BulkPhase phase = worker->job->phase;
+    bulk_run_phase(worker->job, worker->index);
+    // `worker` may be freed as soon as `done` is released
+    PyThread_release_lock(worker->done);
+    if (phase == BULK_EXIT)
+      return;
+  }
+}
+
+static void bulk_run(BulkInsert *job, BulkPhase phase) {
+  job->phase = phase;
+  for (int t = 1; t < job->nthreads; t++)
+    PyThread_release_lock(job->workers[t].go);
+  bulk_run_phase(job, 0);
+  for (int t = 1; t < job->nthreads; t++)
+    PyThread_acquire_lock(job->workers[t].done, WAIT_LOCK);
+}
+
+// Turns the per-thread partition counts into scratch write positions
+static void bulk_prefix_offsets(BulkInsert *job) {
+  int n = job->nthreads;
+  Py_ssize_t pos = 0;
+  for (int p = 0; p < n; p++) {
+    job->part_start[p] = pos;
+    for (int t = 0; t < n; t++) {
+      Py_ssize_t c = job->offsets[(size_t)t * n + p];
+      job->offsets[(size_t)t * n + p] = pos;
+      pos += c;
+    }
+  }
+  job->part_start[n] = pos;
+}
+
+// Called between bloom_begin_write() and bloom_end_write(), with the GIL
+// released (threaded inserts are always large enough), so it only uses the
+// GIL-free PyThread_* calls and must not touch Python objects or set an
+// exception. Returns the number of worker threads started, which may be
+// fewer than requested if thread creation fails.
+static int bulk_start_workers(BulkInsert *job, int requested) {
+  int started = 1;
+  for (int t = 1; t < requested; t++) {
+    BulkWorker *w = &job->workers[t];
+    w->job = job;
+    w->index = t;
+    w->go = PyThread_allocate_lock();
+    w->done = PyThread_allocate_lock();
+    if (w->go != NULL && w->done != NULL) {
+      PyThread_acquire_lock(w->go, WAIT_LOCK);
+      PyThread_acquire_lock(w->done, WAIT_LOCK);
+      if (PyThread_start_new_thread(bulk_worker_main, w) !=
+          PYTHREAD_INVALID_THREAD_ID) {
+        started++;
+        continue;
+      }
+    }
+    if (w->go != NULL)
+      PyThread_free_lock(w->go);
+    if (w->done != NULL)
+      PyThread_free_lock(w->done);
+    break;
+  }
+  return started;
+}
+
+static void bulk_stop_workers(BulkInsert *job) {
+  bulk_run(job, BULK_EXIT);
+  for (int t = 1; t < job->nthreads; t++) {
+    PyThread_free_lock(job->workers[t].go);
+    PyThread_free_lock(job->workers[t].done);
+  }
+}
+
+// Inserts `count` buffer elements using up to `threads` threads. Small
+// inputs use fewer threads, down to the plain single-threaded loop.
+static int bloom_insert_buffer_threaded(BloomFilter *bf,
+                                        const unsigned char *data,
+                                        Py_ssize_t count, BufferKind kind,
+                                        int byteswap, Py_ssize_t threads) {
+  Py_ssize_t n = threads;
+  if (n > ABLOOM_MAX_THREADS)
+    n = ABLOOM_MAX_THREADS;
+  if ((uint64_t)n > bf->block_count)
+    n = (Py_ssize_t)bf->block_count;
+  if (n > count / ABLOOM_MIN_THREAD_ITEMS)
+    n = count / ABLOOM_MIN_THREAD_ITEMS;
+
+  PyThreadState *save;
+  if (n <= 1) {
+    if (bloom_begin_write(bf, (size_t)count * 8, &save) < 0)
+      return -1;
+    bloom_insert_buffer(bf, data, 0, count, kind, byteswap);
+    bloom_end_write(bf, save);
+    return 0;
+  }
+
+  Py_ssize_t round_size = n * ABLOOM_THREAD_CHUNK;
+  if (round_size > count)
+    round_size = count;
+
+  BulkInsert job = {0};
+  job.bf = bf;
+  job.data = data;
+  job.kind = kind;
+  job.byteswap = byteswap;
+  job.offsets = PyMem_Malloc((size_t)n * n * sizeof(Py_ssize_t));
+  job.part_start = PyMem_Malloc((size_t)(n + 1) * sizeof(Py_ssize_t));
+  job.scratch = PyMem_Malloc((size_t)round_size * sizeof(uint64_t));
+  job.workers = PyMem_Calloc((size_t)n, sizeof(BulkWorker));
+  if (job.offsets == NULL || job.part_start == NULL || job.scratch == NULL ||
+      job.workers == NULL) {
+    PyErr_NoMemory();
+    goto done;
+  }
+
+  if (bloom_begin_write(bf, (size_t)count * 8, &save) < 0)
+    goto done;
+
+  job.nthreads = bulk_start_workers(&job, (int)n);
+  job.blocks_per_part =
+      (bf->block_count + job.nthreads - 1) / (uint64_t)job.nthreads;
+
+  for (Py_ssize_t start = 0; start < count; start += round_size) {
+    job.round_start = start;
+    job.round_count = count - start < round_size ? count - start : round_size;
+    bulk_run(&job, BULK_COUNT);
+    bulk_prefix_offsets(&job);
+    bulk_run(&job, BULK_SCATTER);
+    bulk_run(&job, BULK_INSERT);
+  }
+
+  bulk_stop_workers(&job);
+  bloom_end_write(bf, save);
+
+done:
+  PyMem_Free(job.offsets);
+  PyMem_Free(job.part_start);
+  PyMem_Free(job.scratch);
+  PyMem_Free(job.workers);
+  return PyErr_Occurred() ? -1 : 0;
+}
+
+static PyObject *BloomFilter_update_buffer(BloomFilter *self, PyObject *args,
+                                           PyObject *kwds) {
+  static char *kwlist[] = {"data", "threads", NULL};
+  PyObject *obj;
+  Py_ssize_t threads = 1;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|$n:update_buffer", kwlist,
+                                   &obj, &threads)) {
+    return NULL;
+  }
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  if (threads < 1) {
+    PyErr_SetString(PyExc_ValueError, "threads must be at least 1");
+    return NULL;
+  }
+
+  Py_buffer view;
+  int is_signed, byteswap;
+  if (get_int64_buffer(obj, &view, &is_signed, &byteswap) < 0)
+    return NULL;
+
+  int err = bloom_insert_buffer_threaded(
+      self, (const unsigned char *)view.buf, view.len / 8,
+      self->layout == ABLOOM_LAYOUT_PARQUET ? BUFFER_PARQUET
+      : is_signed                           ? BUFFER_INT64
+                                            : BUFFER_UINT64,
+      byteswap, threads);
+  PyBuffer_Release(&view);
+  if (err < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+// Shared loop for contains_many(), count_present() and update_new(). When
+// `mask` is non-NULL, one byte per item is written to it (grown as needed).
+// With `add_new`, items are inserted as they are tested and the result counts
+// new items; like update(), items hashed before an error are still inserted.
+// Like bloom_update_iter, `mode` and `add_new` are always literals at the
+// call sites.
+static inline Py_ssize_t bloom_check_iter(BloomFilter *self, PyObject *iter,
+                                          PyObject *mask, HashMode mode,
+                                          int add_new) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char present[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  Py_ssize_t total = 0;
+  Py_ssize_t found = 0;
+  Py_ssize_t allocated = mask ? PyByteArray_GET_SIZE(mask) : 0;
+  PyObject *item;
+
+  for (;;) {
+    item = PyIter_Next(iter);
+    if (item != NULL) {
+      int err = get_hash(item, mode, &hashes[n]);
+      Py_DECREF(item);
+      if (err < 0)
+        goto error;
+      if (++n < window)
+        continue;
+    } else if (PyErr_Occurred()) {
+      goto error;
+    }
+
+    if (add_new) {
+      bloom_wait_for_bulk_writers(self);
+      found += (Py_ssize_t)bloom_add_new_many(self, hashes, n, present);
+    } else {
+      found += (Py_ssize_t)bloom_check_many(self, hashes, n, present);
+    }
+    if (mask) {
+      if (total + (Py_ssize_t)n > allocated) {
+        allocated = allocated + (allocated >> 1) + ABLOOM_MAX_PREFETCH_DISTANCE;
+        if (PyByteArray_Resize(mask, allocated) < 0)
+          return -1;
+      }
+      memcpy(PyByteArray_AS_STRING(mask) + total, present, n);
+    }
+    total += (Py_ssize_t)n;
+    n = 0;
+
+    if (item == NULL)
+      break;
+  }
+
+  if (mask && PyByteArray_Resize(mask, total) < 0)
+    return -1;
+  return found;
+
+error:
+  if (add_new) {
+    bloom_wait_for_bulk_writers(self);
+    bloom_add_new_many(self, hashes, n, present);
+  }
+  return -1;
+}
+
+// Runs bloom_check_iter() specialized for the filter's hash mode
+static Py_ssize_t bloom_check_iter_dispatch(BloomFilter *self, PyObject *iter,
+                                            PyObject *mask, int add_new) {
+  switch (bloom_hash_mode(self)) {
+  case HASH_SERIALIZABLE:
+    return add_new ? bloom_check_iter(self, iter, mask, HASH_SERIALIZABLE, 1)
+                   : bloom_check_iter(self, iter, mask, HASH_SERIALIZABLE, 0);
+  case HASH_PARQUET:
+    return add_new ? bloom_check_iter(self, iter, mask, HASH_PARQUET, 1)
+                   : bloom_check_iter(self, iter, mask, HASH_PARQUET, 0);
+  default:
+    return add_new ? bloom_check_iter(self, iter, mask, HASH_FAST, 1)
+                   : bloom_check_iter(self, iter, mask, HASH_FAST, 0);
+  }
+}
+
+static PyObject *BloomFilter_contains_many(BloomFilter *self,
+                                           PyObject *iterable) {
+  PyObject *arrow_mask = PyByteArray_FromStringAndSize(NULL, 0);
+  if (arrow_mask == NULL)
+    return NULL;
+  Py_ssize_t arrow_found = 0;
+  int arrow =
+      bloom_apply_arrow(self, iterable, ARROW_CHECK, arrow_mask, &arrow_found);
+  if (arrow != 0) {
+    if (arrow < 0)
+      Py_CLEAR(arrow_mask);
+    return arrow_mask;
+  }
+  Py_DECREF(arrow_mask);
+
+  Py_ssize_t hint = PyObject_LengthHint(iterable, 0);
+  if (hint < 0)
+    return NULL;
+
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return NULL;
+
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, hint);
+  if (mask == NULL) {
+    Py_DECREF(iter);
+    return NULL;
+  }
+
+  Py_ssize_t found = bloom_check_iter_dispatch(self, iter, mask, 0);
+  Py_DECREF(iter);
+  if (found < 0) {
+    Py_DECREF(mask);
+    return NULL;
+  }
+  return mask;
+}
+
+static PyObject *BloomFilter_count_present(BloomFilter *self,
+                                           PyObject *iterable) {
+  Py_ssize_t arrow_found = 0;
+  int arrow = bloom_apply_arrow(self, iterable, ARROW_CHECK, NULL, &arrow_found);
+  if (arrow < 0)
+    return NULL;
+  if (arrow > 0)
+    return PyLong_FromSsize_t(arrow_found);
+
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return NULL;
+
+  Py_ssize_t found = bloom_check_iter_dispatch(self, iter, NULL, 0);
+  Py_DECREF(iter);
+  if (found < 0)
+    return NULL;
+  return PyLong_FromSsize_t(found);
+}
+
+static PyObject *BloomFilter_update_new(BloomFilter *self, PyObject *args,
+                                        PyObject *kwds) {
+  static char *kwlist[] = {"items", "mask", NULL};
+  PyObject *iterable;
+  int want_mask = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|$p:update_new", kwlist,
+                                   &iterable, &want_mask)) {
+    return NULL;
+  }
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  PyObject *mask = NULL;
+  if (want_mask) {
+    mask = PyByteArray_FromStringAndSize(NULL, 0);
+    if (mask == NULL)
+      return NULL;
+  }
+
+  Py_ssize_t added = 0;
+  int arrow = bloom_apply_arrow(self, iterable, ARROW_INSERT_NEW, mask, &added);
+  if (arrow == 0) {
+    PyObject *iter = PyObject_GetIter(iterable);
+    if (iter == NULL) {
+      Py_XDECREF(mask);
+      return NULL;
+    }
+    added = bloom_check_iter_dispatch(self, iter, mask, 1);
+    Py_DECREF(iter);
+  }
+  if (arrow < 0 || added < 0) {
+    Py_XDECREF(mask);
+    return NULL;
+  }
+  return mask ? mask : PyLong_FromSsize_t(added);
+}
+
+static PyObject *BloomFilter_add(BloomFilter *self, PyObject *item) {
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  uint64_t hash;
+  int err = get_hash(item, bloom_hash_mode(self), &hash);
+  if (err < 0)
+    return NULL;
+
+  bloom_wait_for_bulk_writers(self);
+  bloom_insert(self, hash);
+  Py_RETURN_NONE;
+}
+
+static PyObject *BloomFilter_add_if_absent(BloomFilter *self, PyObject *item) {
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  uint64_t hash;
+  int err = get_hash(item, bloom_hash_mode(self), &hash);
+  if (err < 0)
+    return NULL;
+
+  bloom_wait_for_bulk_writers(self);
+  uint64_t *block = bloom_block(self, hash);
+  int present = bloom_test_and_set_bits(self, block, (uint32_t)hash);
+  if (!present && self->dirty != NULL)
+    bloom_mark_dirty(self, block);
+  return PyBool_FromLong(present);
+}
+
+static int BloomFilter_contains(BloomFilter *self, PyObject *item) {
+  uint64_t hash;
+  int err = get_hash(item, bloom_hash_mode(self), &hash);
+  if (err < 0)
+    return -1;
+
+  return bloom_check(self, hash);
+}
+
+// Raw hash entry points: the caller supplies the final 64-bit hash, which is
+// fed to bloom_insert/bloom_check without mix64 or xxHash.
+static int get_raw_hash(PyObject *obj, uint64_t *out_hash) {
+  if (!PyLong_Check(obj)) {
+    PyErr_Format(PyExc_TypeError, "hash must be an int, not %.200s",
+                 Py_TYPE(obj)->tp_name);
+    return -1;
+  }
+  uint64_t hash = PyLong_AsUnsignedLongLong(obj);
+  if (hash == (uint64_t)-1 && PyErr_Occurred()) {
+    if (PyErr_ExceptionMatches(PyExc_OverflowError)) {
+      PyErr_Clear();
+      PyErr_SetString(PyExc_OverflowError,
+                      "hash must be in the range [0, 2**64)");
+    }
+    return -1;
+  }
+  *out_hash = hash;
+  return 0;
+}
+
+static PyObject *BloomFilter_add_hash(BloomFilter *self, PyObject *obj) {
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  uint64_t hash;
+  if (get_raw_hash(obj, &hash) < 0)
+    return NULL;
+
+  bloom_wait_for_bulk_writers(self);
+  bloom_insert(self, hash);
+  Py_RETURN_NONE;
+}
+
+static PyObject *BloomFilter_contains_hash(BloomFilter *self, PyObject *obj) {
+  uint64_t hash;
+  if (get_raw_hash(obj, &hash) < 0)
+    return NULL;
+
+  return PyBool_FromLong(bloom_check(self, hash));
+}
+
+static PyObject *BloomFilter_update_hashes(BloomFilter *self, PyObject *args,
+                                           PyObject *kwds) {
+  static char *kwlist[] = {"hashes", "threads", NULL};
+  PyObject *obj;
+  Py_ssize_t threads = 1;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|$n:update_hashes", kwlist,
+                                   &obj, &threads)) {
+    return NULL;
+  }
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  if (threads < 1) {
+    PyErr_SetString(PyExc_ValueError, "threads must be at least 1");
+    return NULL;
+  }
+
+  Py_buffer view;
+  int is_signed, byteswap;
+  if (get_int64_buffer(obj, &view, &is_signed, &byteswap) < 0)
+    return NULL;
+
+  // Signedness is irrelevant for raw hashes: the 64 bits are used as-is.
+  int err = bloom_insert_buffer_threaded(self, (const unsigned char *)view.buf,
+                                         view.len / 8, BUFFER_RAW_HASHES,
+                                         byteswap, threads);
+  PyBuffer_Release(&view);
+  if (err < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+static PyObject *BloomFilter_contains_hashes(BloomFilter *self,
+                                             PyObject *obj) {
+  Py_buffer view;
+  int is_signed, byteswap;
+  if (get_int64_buffer(obj, &view, &is_signed, &byteswap) < 0)
+    return NULL;
+
+  Py_ssize_t count = view.len / 8;
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, count);
+  if (mask == NULL) {
+    PyBuffer_Release(&view);
+    return NULL;
+  }
+
+  const unsigned char *data = (const unsigned char *)view.buf;
+  unsigned char *out = (unsigned char *)PyByteArray_AS_STRING(mask);
+  Py_ssize_t window = (Py_ssize_t)bloom_window();
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+
+  PyThreadState *save = bloom_begin_read(self, (size_t)view.len);
+  for (Py_ssize_t start = 0; start < count; start += window) {
+    Py_ssize_t n = count - start < window ? count - start : window;
+    for (Py_ssize_t i = 0; i < n; i++)
+      hashes[i] = buffer_u64(data, start + i, byteswap);
+    bloom_check_many(self, hashes, (size_t)n, out + start);
+  }
+  bloom_end_read(self, save);
+
+  PyBuffer_Release(&view);
+  return mask;
+}
+
+// Fixed-width binary keys: a buffer of len / itemsize keys, each hashed
+// exactly like bytes(key) in serializable mode, so keys ingested from packed
+// files can be queried with ordinary bytes objects.
+// `format` is the "On:<method>" parse format and `method` the name used in
+// errors
+static int get_fixed_buffer(BloomFilter *self, PyObject *args, PyObject *kwds,
+                            const char *format, const char *method,
+                            Py_buffer *view, Py_ssize_t *itemsize) {
+  static char *kwlist[] = {"data", "itemsize", NULL};
+  PyObject *obj;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, format, kwlist, &obj,
+                                   itemsize)) {
+    return -1;
+  }
+  if (!self->serializable) {
+    PyErr_Format(PyExc_ValueError, "%s() requires serializable=True", method);
+    return -1;
+  }
+  if (*itemsize < 1) {
+    PyErr_SetString(PyExc_ValueError, "itemsize must be at least 1");
+    return -1;
+  }
+  if (PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS) < 0)
+    return -1;
+  if (view->len % *itemsize != 0) {
+    PyErr_Format(PyExc_ValueError,
+                 "buffer length %zd is not a multiple of itemsize %zd",
+                 view->len, *itemsize);
+    PyBuffer_Release(view);
+    return -1;
+  }
+  return 0;
+}
+
+static PyObject *BloomFilter_update_fixed(BloomFilter *self, PyObject *args,
+                                          PyObject *kwds) {
+  if (bloom_check_writable(self) < 0)
+    return NULL;
+
+  Py_buffer view;
+  Py_ssize_t itemsize;
+  if (get_fixed_buffer(self, args, kwds, "On:update_fixed", "update_fixed",
+                       &view, &itemsize) < 0)
+    return NULL;
+
+  const unsigned char *data = (const unsigned char *)view.buf;
+  Py_ssize_t count = view.len / itemsize;
+  Py_ssize_t window = (Py_ssize_t)bloom_window();
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+
+  PyThreadState *save;
+  if (bloom_begin_write(self, (size_t)view.len, &save) < 0) {
+    PyBuffer_Release(&view);
+    return NULL;
+  }
+  for (Py_ssize_t start = 0; start < count; start += window) {
+    Py_ssize_t n = count - start < window ? count - start : window;
+    for (Py_ssize_t i = 0; i < n; i++)
+      hashes[i] = XXH64(data + (start + i) * itemsize, (size_t)itemsize, 0);
+    bloom_insert_many(self, hashes, (size_t)n);
+  }
+  bloom_end_write(self, save);
+
+  PyBuffer_Release(&view);
+  Py_RETURN_NONE;
+}
+
+static PyObject *BloomFilter_contains_fixed(BloomFilter *self, PyObject *args,
+                                            PyObject *kwds) {
+  Py_buffer view;
+  Py_ssize_t itemsize;
+  if (get_fixed_buffer(self, args, kwds, "On:contains_fixed", "contains_fixed",
+                       &view, &itemsize) < 0)
+    return NULL;
+
+  Py_ssize_t count = view.len / itemsize;
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, count);
+  if (mask == NULL) {
+    PyBuffer_Release(&view);
+    return NULL;
+  }
+
+  const unsigned char *data = (const unsigned char *)view.buf;
+  unsigned char *out = (unsigned char *)PyByteArray_AS_STRING(mask);
+  Py_ssize_t window = (Py_ssize_t)bloom_window();
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+
+  PyThreadState *save = bloom_begin_read(self, (size_t)view.len);
+  for (Py_ssize_t start = 0; start < count; start += window) {
+    Py_ssize_t n = count - start < window ? count - start : window;
+    for (Py_ssize_t i = 0; i < n; i++)
+      hashes[i] = XXH64(data + (start + i) * itemsize, (size_t)itemsize, 0);
+    bloom_check_many(self, hashes, (size_t)n, out + start);
+  }
+  bloom_end_read(self, save);
+
+  PyBuffer_Release(&view);
+  return mask;
+}
+
+static PyObject *BloomFilter_get_capacity(BloomFilter *self, void *closure) {
+  return PyLong_FromUnsignedLongLong(self->capacity);
+}
+
+static PyObject *BloomFilter_get_fp_rate(BloomFilter *self, void *closure) {
+  return PyFloat_FromDouble(self->fp_rate);
+}
+
+static PyObject *BloomFilter_get_k(BloomFilter *self, void *closure) {
+  return PyLong_FromLong(self->k);
+}
+
+static PyObject *BloomFilter_get_byte_count(BloomFilter *self, void *closure) {
+  uint64_t bytes = bloom_nbytes(self);
+  return PyLong_FromUnsignedLongLong(bytes);
+}
+
+static PyObject *BloomFilter_get_bit_count(BloomFilter *self, void *closure) {
+  uint64_t bits = (uint64_t)bloom_nbytes(self) * 8;
+  return PyLong_FromUnsignedLongLong(bits);
+}
+
+static PyObject *BloomFilter_get_serializable(BloomFilter *self,
+                                              void *closure) {
+  return PyBool_FromLong(self->serializable);
+}
+
+static PyObject *BloomFilter_get_free_threading(BloomFilter *self,
+                                                void *closure) {
+  return PyBool_FromLong(self->free_threading);
+}
+
+static PyObject *BloomFilter_get_storage(BloomFilter *self, void *closure) {
+  return PyUnicode_FromString(storage_names[self->storage]);
+}
+
+static PyObject *BloomFilter_get_layout(BloomFilter *self, void *closure) {
+  return PyUnicode_FromString(layout_names[self->layout]);
+}
+
+static void BloomFilter_dealloc(BloomFilter *self) {
+  bloom_free_blocks(self);
+  if (self->bulk_lock) {
+    PyThread_free_lock(self->bulk_lock);
+  }
+  Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static int BloomFilter_init(BloomFilter *self, PyObject *args, PyObject *kwds) {
+  static char *kwlist[] = {"capacity", "fp_rate", "serializable",
+                           "free_threading", "layout", NULL};
+  long long capacity_signed;
+  double fp_rate = 0.01;
+  int serializable = 0;
+  int free_threading = 0;
+  const char *layout_name = "sbbf";
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "L|dpps", kwlist,
+                                   &capacity_signed, &fp_rate, &serializable,
+                                   &free_threading, &layout_name)) {
+    return -1;
+  }
+
+  int layout = parse_layout(layout_name);
+  if (layout < 0)
+    return -1;
+
+  if (self->exports > 0) {
+    PyErr_SetString(PyExc_BufferError,
+                    "Cannot reinitialize a BloomFilter while its buffer is "
+                    "exported");
+    return -1;
+  }
+  if (self->active_ops > 0) {
+    PyErr_SetString(PyExc_BufferError,
+                    "Cannot reinitialize a BloomFilter while another "
+                    "operation is using it");
+    return -1;
+  }
+
+  if (capacity_signed <= 0) {
+    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
+    return -1;
+  }
+
+  uint64_t capacity = (uint64_t)capacity_signed;
+
+  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    return -1;
+  }
+  if (layout == ABLOOM_LAYOUT_REGISTER && fp_rate < REGISTER_MIN_FP_RATE) {
+    PyErr_SetString(PyExc_ValueError,
+                    "layout='register' needs fp_rate >= 1e-5; use "
+                    "layout='sbbf' for lower rates");
+    return -1;
+  }
+
+  if (free_threading && !ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "free_threading=True requires C11 atomics, which are not "
+                    "available in this build. Use a pre-built wheel or rebuild "
+                    "with a modern compiler.");
+    return -1;
+  }
+
+  int64_t block_count = layout_block_count(layout, capacity, fp_rate);
+  if (block_count < 0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Capacity too large: would cause integer overflow");
+    return -1;
+  }
+
+  // The new blocks are allocated first so that a failure leaves the filter
+  // as it was
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  size_t num_bytes = (size_t)block_count * layout_block_bytes(layout);
+  uint64_t *blocks =
+      storage_alloc(num_bytes, 1, &storage_base, &storage_bytes, &storage);
+  if (blocks == NULL)
+    return -1;
+  bloom_free_blocks(self);
+  self->blocks = blocks;
+  self->storage_base = storage_base;
+  self->storage_bytes = storage_bytes;
+  self->storage = storage;
+
+  self->capacity = capacity;
+  self->fp_rate = fp_rate;
+  // Parquet's hashing is deterministic, so those filters always serialize
+  self->serializable = serializable || layout == ABLOOM_LAYOUT_PARQUET;
+  self->free_threading = free_threading;
+  self->layout = layout;
+  self->k = layout_k(layout, fp_rate);
+  self->block_count = (uint64_t)block_count;
+
+  return 0;
+}
+
+static PyObject *BloomFilter_new(PyTypeObject *type, PyObject *args,
+                                 PyObject *kwds) {
+  BloomFilter *self = (BloomFilter *)type->tp_alloc(type, 0);
+  if (self != NULL) {
+    self->blocks = NULL;
+    self->storage_base = NULL;
+    self->storage_bytes = 0;
+    self->storage = STORAGE_ALIGNED;
+    self->shm = NULL;
+    self->readonly = 0;
+    self->exports = 0;
+    self->active_ops = 0;
+    self->block_count = 0;
+    self->capacity = 0;
+    self->fp_rate = 0.0;
+    self->serializable = 0;
+    self->free_threading = 0;
+    self->k = BLOCK_WORDS;
+    self->bulk_lock = NULL;
+    self->bulk_writers = 0;
+    self->dirty = NULL;
+  }
+  return (PyObject *)self;
+}
+
+static PyMethodDef BloomFilter_methods[] = {
+    {"add", (PyCFunction)BloomFilter_add, METH_O,
+     "Add an item to the bloom filter"},
+    {"add_if_absent", (PyCFunction)BloomFilter_add_if_absent, METH_O,
+     "Add an item, returning True if it was probably already present"},
+    {"update", (PyCFunction)BloomFilter_update, METH_O,
+     "Add items from an iterable to the bloom filter"},
+    {"update_buffer", (PyCFunction)(void (*)(void))BloomFilter_update_buffer,
+     METH_VARARGS | METH_KEYWORDS,
+     "Add every integer of an int64/uint64 buffer to the bloom filter"},
+    {"contains_many", (PyCFunction)BloomFilter_contains_many, METH_O,
+     "Test every item of an iterable, returning a bytearray mask"},
+    {"count_present", (PyCFunction)BloomFilter_count_present, METH_O,
+     "Count the items of an iterable that might be in the bloom filter"},
+    {"update_new", (PyCFunction)(void (*)(void))BloomFilter_update_new,
+     METH_VARARGS | METH_KEYWORDS,
+     "Add items from an iterable, returning how many were new"},
+    {"add_hash", (PyCFunction)BloomFilter_add_hash, METH_O,
+     "Add a precomputed 64-bit hash to the bloom filter"},
+    {"contains_hash", (PyCFunction)BloomFilter_contains_hash, METH_O,
+     "Test whether a precomputed 64-bit hash might be in the bloom filter"},
+    {"update_hashes", (PyCFunction)(void (*)(void))BloomFilter_update_hashes,
+     METH_VARARGS | METH_KEYWORDS,
+     "Add every precomputed hash of a 64-bit integer buffer"},
+    {"contains_hashes", (PyCFunction)BloomFilter_contains_hashes, METH_O,
+     "Test every precomputed hash of a 64-bit integer buffer"},
+    {"update_fixed", (PyCFunction)(void (*)(void))BloomFilter_update_fixed,
+     METH_VARARGS | METH_KEYWORDS,
+     "Add every fixed-width binary key of a buffer (serializable mode)"},
+    {"contains_fixed",
+     (PyCFunction)(void (*)(void))BloomFilter_contains_fixed,
+     METH_VARARGS | METH_KEYWORDS,
+     "Test every fixed-width binary key of a buffer, returning a mask"},
+    {"copy", (PyCFunction)BloomFilter_copy, METH_NOARGS,
+     "Return a shallow copy of the bloom filter"},
+    {"clear", (PyCFunction)BloomFilter_clear, METH_NOARGS,
+     "Remove all items from the bloom filter"},
+    {"to_bytes", (PyCFunction)(void (*)(void))BloomFilter_to_bytes,
+     METH_VARARGS | METH_KEYWORDS,
+     "Serialize the filter to bytes. Requires serializable=True."},
+    {"from_bytes", (PyCFunction)BloomFilter_from_bytes,
+     METH_VARARGS | METH_CLASS,
+     "Deserialize a filter from bytes. Returns a serializable filter."},
+    {"write_to", (PyCFunction)(void (*)(void))BloomFilter_write_to,
+     METH_VARARGS | METH_KEYWORDS,
+     "Stream the serialized filter to a binary file object"},
+    {"read_from", (PyCFunction)BloomFilter_read_from, METH_O | METH_CLASS,
+     "Read a filter streamed by write_to() from a binary file object"},
+    {"__reduce_ex__", (PyCFunction)BloomFilter_reduce_ex, METH_O,
+     "Support pickling; protocol 5 passes the blocks as a PickleBuffer"},
+    {"_from_pickle", (PyCFunction)BloomFilter_from_pickle,
+     METH_VARARGS | METH_CLASS, "Rebuild a pickled filter"},
+    {"to_parquet", (PyCFunction)BloomFilter_to_parquet, METH_NOARGS,
+     "Serialize a layout='parquet' filter as a Parquet Bloom filter"},
+    {"from_parquet", (PyCFunction)(void (*)(void))BloomFilter_from_parquet,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "Load the Bloom filter stored in a Parquet column chunk"},
+    {"checkpoint", (PyCFunction)BloomFilter_checkpoint, METH_NOARGS,
+     "Start tracking changed blocks, or restart from the current state"},
+    {"to_delta", (PyCFunction)(void (*)(void))BloomFilter_to_delta,
+     METH_VARARGS | METH_KEYWORDS,
+     "Serialize the blocks changed since the last checkpoint()"},
+    {"apply_delta", (PyCFunction)BloomFilter_apply_delta, METH_VARARGS,
+     "Overwrite the blocks carried by a delta from to_delta()"},
+    {"open", (PyCFunction)(void (*)(void))BloomFilter_open,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "Open a filter backed by a memory-mapped file"},
+    {"flush", (PyCFunction)BloomFilter_flush, METH_NOARGS,
+     "Write changes of a file-backed filter to disk"},
+    {"create_shared", (PyCFunction)(void (*)(void))BloomFilter_create_shared,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "Create a filter in a named shared memory segment"},
+    {"attach", (PyCFunction)BloomFilter_attach, METH_O | METH_CLASS,
+     "Attach to a filter created with create_shared()"},
+    {"unlink", (PyCFunction)BloomFilter_unlink, METH_NOARGS,
+     "Remove the shared memory segment of a shared filter"},
+    {NULL}};
+
+static PyGetSetDef BloomFilter_getsetters[] = {
+    {"capacity", (getter)BloomFilter_get_capacity, NULL,
+     "Expected number of items", NULL},
+    {"fp_rate", (getter)BloomFilter_get_fp_rate, NULL,
+     "Target false positive rate", NULL},
+    {"k", (getter)BloomFilter_get_k, NULL,
+     "Number of hash functions (8, or 1-8 for layout='register')", NULL},
+    {"byte_count", (getter)BloomFilter_get_byte_count, NULL,
+     "Memory usage in bytes", NULL},
+    {"bit_count", (getter)BloomFilter_get_bit_count, NULL,
+     "Total bits in filter", NULL},
+    {"serializable", (getter)BloomFilter_get_serializable, NULL,
+     "Whether the filter uses deterministic hashing for serialization", NULL},
+    {"free_threading", (getter)BloomFilter_get_free_threading, NULL,
+     "Whether the filter uses atomic operations for free-threaded Python",
+     NULL},
+    {"storage", (getter)BloomFilter_get_storage, NULL,
+     "Backend holding the filter's blocks", NULL},
+    {"layout", (getter)BloomFilter_get_layout, NULL,
+     "Block layout and hashing: 'sbbf', 'parquet' or 'register'", NULL},
+    {NULL}};
+
+static PySequenceMethods BloomFilter_as_sequence = {
+    .sq_contains = (objobjproc)BloomFilter_contains,
+};
+
+static PyNumberMethods BloomFilter_as_number = {
+    .nb_bool = (inquiry)BloomFilter_bool,
+    .nb_or = (binaryfunc)BloomFilter_or,
+    .nb_inplace_or = (binaryfunc)BloomFilter_ior,
+};
+
+static PyObject *BloomFilter_repr(BloomFilter *self) {
+  PyObject *fp_obj = PyFloat_FromDouble(self->fp_rate);
+  if (!fp_obj)
+    return NULL;
+
+  PyObject *repr;
+  if (self->layout == ABLOOM_LAYOUT_SBBF512) {
+    repr = PyUnicode_FromFormat(
+        "<BloomFilter capacity=%llu fp_rate=%R serializable=%s>",
+        self->capacity, fp_obj, self->serializable ? "True" : "False");
+  } else if (self->layout == ABLOOM_LAYOUT_PARQUET) {
+    repr = PyUnicode_FromFormat(
+        "<BloomFilter capacity=%llu fp_rate=%R layout='%s'>", self->capacity,
+        fp_obj, layout_names[self->layout]);
+  } else {
+    repr = PyUnicode_FromFormat(
+        "<BloomFilter capacity=%llu fp_rate=%R serializable=%s layout='%s'>",
+        self->capacity, fp_obj, self->serializable ? "True" : "False",
+        layout_names[self->layout]);
+  }
+
+  Py_DECREF(fp_obj);
+  return repr;
+}
+
+// Buffer protocol: exposes the block array as bytes in native word order
+// (the to_bytes() payload on little-endian hosts). Exports of read-only file
+// mappings are read-only. Blocks are only ever freed or replaced by
+// dealloc and __init__, and __init__ refuses while exports are held or
+// another operation is active.
+static int BloomFilter_getbuffer(BloomFilter *self, Py_buffer *view,
+                                 int flags) {
+  if (self->blocks == NULL) {
+    PyErr_SetString(PyExc_BufferError, "BloomFilter is not initialized");
+    view->obj = NULL;
+    return -1;
+  }
+  if (PyBuffer_FillInfo(view, (PyObject *)self, self->blocks,
+                        (Py_ssize_t)(bloom_nbytes(self)),
+                        self->readonly, flags) < 0)
+    return -1;
+  self->exports++;
+  return 0;
+}
+
+static void BloomFilter_releasebuffer(BloomFilter *self, Py_buffer *view) {
+  self->exports--;
+}
+
+static PyBufferProcs BloomFilter_as_buffer = {
+    .bf_getbuffer = (getbufferproc)BloomFilter_getbuffer,
+    .bf_releasebuffer = (releasebufferproc)BloomFilter_releasebuffer,
+};
+
+static PyTypeObject BloomFilterType = {
+    PyVarObject_HEAD_INIT(NULL, 0).tp_name = "abloom._abloom.BloomFilter",
+    .tp_doc = "High-performance Split Block Bloom Filter",
+    .tp_basicsize = sizeof(BloomFilter),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = BloomFilter_new,
+    .tp_init = (initproc)BloomFilter_init,
+    .tp_dealloc = (destructor)BloomFilter_dealloc,
+    .tp_repr = (reprfunc)BloomFilter_repr,
+    .tp_richcompare = (richcmpfunc)BloomFilter_richcompare,
+    .tp_methods = BloomFilter_methods,
+    .tp_getset = BloomFilter_getsetters,
+    .tp_as_sequence = &BloomFilter_as_sequence,
+    .tp_as_number = &BloomFilter_as_number,
+    .tp_as_buffer = &BloomFilter_as_buffer,
+};
+
+// CountingBloomFilter: the SBBF-256 scheme with every bit replaced by a
+// 4-bit saturating counter, so items can be removed. A 128-byte block holds
+// 8 words of 32 counters, and an item increments one counter per word, chosen
+// like Parquet's bit: (h_low * SALT[i]) >> 27. Word i is the 64-bit words
+// 2i and 2i + 1 of the block, 16 counters each, so an item touches exactly
+// the two cache lines of its block. A counter that reaches 15 stays there,
+// because its true count is lost; remove() never decrements it, which keeps
+// false negatives impossible for items that were added.
+#define COUNTING_BLOCK_COUNTERS 256
+#define COUNTING_BLOCK_BYTES 128
+#define COUNTING_BLOCK_WORDS 16
+#define COUNTING_WORD_COUNTERS 32
+#define COUNTER_BITS 4
+#define COUNTER_MAX 15
+
+typedef struct {
+  PyObject_HEAD uint64_t *counters;
+  // Allocation that owns `counters` (see storage_alloc())
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  // Passes over `counters` that may run without the GIL; __init__ refuses
+  // while any are active
+  Py_ssize_t active_ops;
+  uint64_t block_count;
+  uint64_t capacity;
+  double fp_rate;
+  int serializable;
+  int free_threading;
+} CountingBloomFilter;
+
+// An item is present when all of its counters are non-zero, which is the
+// SBBF-256 membership test, so the filter is sized with that model
+static int64_t counting_block_count(uint64_t capacity, double fp_rate) {
+  double bits_per_item = blocked_bits_for_fpr(
+      fp_rate, COUNTING_BLOCK_COUNTERS, COUNTING_WORD_COUNTERS, 1);
+  if (capacity > (double)UINT64_MAX / bits_per_item) {
+    return -1;
+  }
+
+  uint64_t total_counters = (uint64_t)ceil(capacity * bits_per_item);
+  uint64_t block_count =
+      (total_counters + COUNTING_BLOCK_COUNTERS - 1) / COUNTING_BLOCK_COUNTERS;
+  if (block_count > SIZE_MAX / COUNTING_BLOCK_BYTES)
+    return -1;
+  return (int64_t)block_count;
+}
+
+static inline size_t counting_nbytes(const CountingBloomFilter *cf) {
+  return (size_t)cf->block_count * COUNTING_BLOCK_BYTES;
+}
+
+static inline uint64_t *counting_block(CountingBloomFilter *cf,
+                                       uint64_t hash) {
+  return &cf->counters[(hash >> 32) % cf->block_count * COUNTING_BLOCK_WORDS];
+}
+
+// Returns the 64-bit word holding the counter of `h_low` in word i of
+// `block`, and stores the counter's bit offset in `shift`
+static inline uint64_t *counter_word(uint64_t *block, uint32_t h_low, int i,
+                                     int *shift) {
+  uint32_t slot = (h_low * SALT[i]) >> 27;
+  *shift = (int)(slot % 16) * COUNTER_BITS;
+  return &block[2 * i + slot / 16];
+}
+
+static inline unsigned counter_value(uint64_t word, int shift) {
+  return (unsigned)(word >> shift) & COUNTER_MAX;
+}
+
+static inline void counting_increment(CountingBloomFilter *cf,
+                                      uint64_t *block, uint32_t h_low) {
+  int shift;
+#if ABLOOM_HAS_ATOMICS
+  if (cf->free_threading) {
+    for (int i = 0; i < BLOCK_WORDS; i++) {
+      uint64_t *word = counter_word(block, h_low, i, &shift);
+      uint64_t old = ATOMIC_LOAD64(word);
+      while (counter_value(old, shift) != COUNTER_MAX &&
+             !ATOMIC_CAS64(word, &old, old + (1ULL << shift))) {
+      }
+    }
+    return;
+  }
+#endif
+  for (int i = 0; i < BLOCK_WORDS; i++) {
+    uint64_t *word = counter_word(block, h_low, i, &shift);
+    if (counter_value(*word, shift) != COUNTER_MAX)
+      *word += 1ULL << shift;
+  }
+}
+
+static inline int counting_test(CountingBloomFilter *cf, uint64_t *block,
+                                uint32_t h_low) {
+  int shift;
+  for (int i = 0; i < BLOCK_WORDS; i++) {
+    uint64_t *word = counter_word(block, h_low, i, &shift);
+#if ABLOOM_HAS_ATOMICS
+    uint64_t value = cf->free_threading ? ATOMIC_LOAD64(word) : *word;
+#else
+    uint64_t value = *word;
+#endif
+    if (counter_value(value, shift) == 0)
+      return 0;
+  }
+  return 1;
+}
+
+// Decrements the counters of `h_low` and returns 1, or returns 0 without
+// touching them if any counter is zero, i.e. the item is definitely absent.
+// In free_threading mode the test and the decrements hold the block's claim
+// lock, so two threads removing the same item can't both pass the test on
+// its last copy. Adds stay lock-free; each counter update is its own CAS.
+static inline int counting_remove(CountingBloomFilter *cf, uint64_t *block,
+                                  uint32_t h_low) {
+  int shift;
+#if ABLOOM_HAS_ATOMICS
+  if (cf->free_threading) {
+    uint32_t *lock = claim_lock(block);
+    int present = counting_test(cf, block, h_low);
+    for (int i = 0; present && i < BLOCK_WORDS; i++) {
+      uint64_t *word = counter_word(block, h_low, i, &shift);
+      uint64_t old = ATOMIC_LOAD64(word);
+      unsigned value;
+      while ((value = counter_value(old, shift)) != 0 && value != COUNTER_MAX &&
+             !ATOMIC_CAS64(word, &old, old - (1ULL << shift))) {
+      }
+    }
+    ATOMIC_STORE32(lock, 0);
+    return present;
+  }
+#endif
+  if (!counting_test(cf, block, h_low))
+    return 0;
+  for (int i = 0; i < BLOCK_WORDS; i++) {
+    uint64_t *word = counter_word(block, h_low, i, &shift);
+    if (counter_value(*word, shift) != COUNTER_MAX)
+      *word -= 1ULL << shift;
+  }
+  return 1;
+}
+
+typedef enum { COUNTING_ADD, COUNTING_REMOVE, COUNTING_CHECK } CountingOp;
+
+// Applies `op` to a window of hashes in order, after computing and
+// prefetching both cache lines of every block. Writes one 0/1 byte per hash
+// to `out` (removed or found; always 1 for COUNTING_ADD) and returns the
+// number of ones. `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static inline size_t counting_apply_many(CountingBloomFilter *cf,
+                                         const uint64_t *hashes, size_t n,
+                                         CountingOp op, unsigned char *out) {
+  uint64_t *blocks[ABLOOM_MAX_PREFETCH_DISTANCE];
+  int prefetch =
+      prefetch_distance > 0 && counting_nbytes(cf) >= ABLOOM_PREFETCH_MIN_BYTES;
+  size_t hits = 0;
+
+  for (size_t i = 0; i < n; i++) {
+    blocks[i] = counting_block(cf, hashes[i]);
+    if (prefetch) {
+      ABLOOM_PREFETCH(blocks[i]);
+      ABLOOM_PREFETCH(blocks[i] + BLOCK_WORDS);
+    }
+  }
+
+  for (size_t i = 0; i < n; i++) {
+    uint32_t h_low = (uint32_t)hashes[i];
+    switch (op) {
+    case COUNTING_ADD:
+      counting_increment(cf, blocks[i], h_low);
+      out[i] = 1;
+      break;
+    case COUNTING_REMOVE:
+      out[i] = (unsigned char)counting_remove(cf, blocks[i], h_low);
+      break;
+    default:
+      out[i] = (unsigned char)counting_test(cf, blocks[i], h_low);
+    }
+    hits += out[i];
+  }
+  return hits;
+}
+
+static inline HashMode counting_hash_mode(const CountingBloomFilter *cf) {
+  return cf->serializable ? HASH_SERIALIZABLE : HASH_FAST;
+}
+
+// Shared loop for update(), remove_many(), contains_many() and
+// count_present(), in the style of bloom_check_iter(). Appends one byte per
+// item to `mask` if given and returns the number of ones. Items hashed
+// before an error are still added or removed.
+static inline Py_ssize_t counting_apply_iter(CountingBloomFilter *self,
+                                             PyObject *iter, PyObject *mask,
+                                             HashMode mode, CountingOp op) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char hits[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  Py_ssize_t total = 0;
+  Py_ssize_t found = 0;
+  Py_ssize_t allocated = mask ? PyByteArray_GET_SIZE(mask) : 0;
+  PyObject *item;
+
+  for (;;) {
+    item = PyIter_Next(iter);
+    if (item != NULL) {
+      int err = get_hash(item, mode, &hashes[n]);
+      Py_DECREF(item);
+      if (err < 0)
+        goto error;
+      if (++n < window)
+        continue;
+    } else if (PyErr_Occurred()) {
+      goto error;
+    }
+
+    found += (Py_ssize_t)counting_apply_many(self, hashes, n, op, hits);
+    if (mask) {
+      if (total + (Py_ssize_t)n > allocated) {
+        allocated = allocated + (allocated >> 1) + ABLOOM_MAX_PREFETCH_DISTANCE;
+        if (PyByteArray_Resize(mask, allocated) < 0)
+          return -1;
+      }
+      memcpy(PyByteArray_AS_STRING(mask) + total, hits, n);
+    }
+    total += (Py_ssize_t)n;
+    n = 0;
+
+    if (item == NULL)
+      break;
+  }
+
+  if (mask && PyByteArray_Resize(mask, total) < 0)
+    return -1;
+  return found;
+
+error:
+  if (op != COUNTING_CHECK)
+    counting_apply_many(self, hashes, n, op, hits);
+  return -1;
+}
+
+// Runs counting_apply_iter() specialized for the filter's hash mode
+static Py_ssize_t counting_apply_iterable(CountingBloomFilter *self,
+                                          PyObject *iterable, PyObject *mask,
+                                          CountingOp op) {
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return -1;
+
+  Py_ssize_t found;
+  if (counting_hash_mode(self) == HASH_SERIALIZABLE)
+    found = counting_apply_iter(self, iter, mask, HASH_SERIALIZABLE, op);
+  else
+    found = counting_apply_iter(self, iter, mask, HASH_FAST, op);
+  Py_DECREF(iter);
+  return found;
+}
+
+static PyObject *CountingBloomFilter_add(CountingBloomFilter *self,
+                                         PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, counting_hash_mode(self), &hash) < 0)
+    return NULL;
+  counting_increment(self, counting_block(self, hash), (uint32_t)hash);
+  Py_RETURN_NONE;
+}
+
+static PyObject *CountingBloomFilter_remove(CountingBloomFilter *self,
+                                            PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, counting_hash_mode(self), &hash) < 0)
+    return NULL;
+  if (!counting_remove(self, counting_block(self, hash), (uint32_t)hash)) {
+    PyErr_SetObject(PyExc_KeyError, item);
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+static int CountingBloomFilter_contains(CountingBloomFilter *self,
+                                        PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, counting_hash_mode(self), &hash) < 0)
+    return -1;
+  return counting_test(self, counting_block(self, hash), (uint32_t)hash);
+}
+
+static PyObject *CountingBloomFilter_update(CountingBloomFilter *self,
+                                            PyObject *iterable) {
+  if (counting_apply_iterable(self, iterable, NULL, COUNTING_ADD) < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+static PyObject *CountingBloomFilter_remove_many(CountingBloomFilter *self,
+                                                 PyObject *iterable) {
+  Py_ssize_t removed =
+      counting_apply_iterable(self, iterable, NULL, COUNTING_REMOVE);
+  if (removed < 0)
+    return NULL;
+  return PyLong_FromSsize_t(removed);
+}
+
+static PyObject *CountingBloomFilter_contains_many(CountingBloomFilter *self,
+                                                   PyObject *iterable) {
+  Py_ssize_t hint = PyObject_LengthHint(iterable, 0);
+  if (hint < 0)
+    return NULL;
+
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, hint);
+  if (mask == NULL)
+    return NULL;
+
+  if (counting_apply_iterable(self, iterable, mask, COUNTING_CHECK) < 0) {
+    Py_DECREF(mask);
+    return NULL;
+  }
+  return mask;
+}
+
+static PyObject *CountingBloomFilter_count_present(CountingBloomFilter *self,
+                                                   PyObject *iterable) {
+  Py_ssize_t found =
+      counting_apply_iterable(self, iterable, NULL, COUNTING_CHECK);
+  if (found < 0)
+    return NULL;
+  return PyLong_FromSsize_t(found);
+}
+
+static PyObject *CountingBloomFilter_clear(CountingBloomFilter *self,
+                                           PyObject *Py_UNUSED(ignored)) {
+  // Keeps the GIL: a default-mode add racing the memset could write back a
+  // counter word from before the clear
+  memset(self->counters, 0, counting_nbytes(self));
+  Py_RETURN_NONE;
+}
+
+static PyObject *CountingBloomFilter_copy(CountingBloomFilter *self,
+                                          PyObject *Py_UNUSED(ignored)) {
+  CountingBloomFilter *copy =
+      (CountingBloomFilter *)Py_TYPE(self)->tp_alloc(Py_TYPE(self), 0);
+  if (copy == NULL) {
+    return NULL;
+  }
+
+  copy->block_count = self->block_count;
+  copy->capacity = self->capacity;
+  copy->fp_rate = self->fp_rate;
+  copy->serializable = self->serializable;
+  copy->free_threading = self->free_threading;
+
+  size_t num_bytes = counting_nbytes(self);
+  copy->counters = storage_alloc(num_bytes, 0, &copy->storage_base,
+                                 &copy->storage_bytes, &copy->storage);
+  if (copy->counters == NULL) {
+    Py_DECREF(copy);
+    return NULL;
+  }
+  self->active_ops++;
+  PyThreadState *save = nogil_begin(num_bytes);
+  memcpy(copy->counters, self->counters, num_bytes);
+  nogil_end(save);
+  self->active_ops--;
+
+  return (PyObject *)copy;
+}
+
+static int CountingBloomFilter_bool(CountingBloomFilter *self) {
+  size_t num_words = counting_nbytes(self) / 8;
+  for (size_t i = 0; i < num_words; i++) {
+    if (self->counters[i] != 0) {
+      return 1;
+    }
+  }
+  return 0;
+}
+
+static PyObject *CountingBloomFilter_richcompare(CountingBloomFilter *self,
+                                                 PyObject *other, int op) {
+  if (op != Py_EQ && op != Py_NE) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  CountingBloomFilter *other_cf = (CountingBloomFilter *)other;
+  int equal = self->capacity == other_cf->capacity &&
+              self->fp_rate == other_cf->fp_rate &&
+              self->serializable == other_cf->serializable &&
+              self->free_threading == other_cf->free_threading;
+
+  if (equal) {
+    size_t num_bytes = counting_nbytes(self);
+    self->active_ops++;
+    other_cf->active_ops++;
+    PyThreadState *save = nogil_begin(num_bytes);
+    equal = (memcmp(self->counters, other_cf->counters, num_bytes) == 0);
+    nogil_end(save);
+    self->active_ops--;
+    other_cf->active_ops--;
+  }
+
+  if (op == Py_EQ) {
+    return PyBool_FromLong(equal);
+  }
+  return PyBool_FromLong(!equal);
+}
+
+static PyObject *CountingBloomFilter_get_capacity(CountingBloomFilter *self,
+                                                  void *closure) {
+  return PyLong_FromUnsignedLongLong(self->capacity);
+}
+
+static PyObject *CountingBloomFilter_get_fp_rate(CountingBloomFilter *self,
+                                                 void *closure) {
+  return PyFloat_FromDouble(self->fp_rate);
+}
+
+static PyObject *CountingBloomFilter_get_k(CountingBloomFilter *self,
+                                           void *closure) {
+  return PyLong_FromLong(BLOCK_WORDS);
+}
+
+static PyObject *CountingBloomFilter_get_byte_count(CountingBloomFilter *self,
+                                                    void *closure) {
+  return PyLong_FromUnsignedLongLong((uint64_t)counting_nbytes(self));
+}
+
+static PyObject *
+CountingBloomFilter_get_counter_count(CountingBloomFilter *self,
+                                      void *closure) {
+  return PyLong_FromUnsignedLongLong(self->block_count *
+                                     COUNTING_BLOCK_COUNTERS);
+}
+
+static PyObject *
+CountingBloomFilter_get_serializable(CountingBloomFilter *self,
+                                     void *closure) {
+  return PyBool_FromLong(self->serializable);
+}
+
+static PyObject *
+CountingBloomFilter_get_free_threading(CountingBloomFilter *self,
+                                       void *closure) {
+  return PyBool_FromLong(self->free_threading);
+}
+
+static void CountingBloomFilter_free_counters(CountingBloomFilter *self) {
+  if (self->storage_base != NULL)
+    storage_free(self->storage_base, self->storage_bytes, self->storage);
+  self->storage_base = NULL;
+  self->counters = NULL;
+}
+
+static void CountingBloomFilter_dealloc(CountingBloomFilter *self) {
+  CountingBloomFilter_free_counters(self);
+  Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static int CountingBloomFilter_init(CountingBloomFilter *self, PyObject *args,
+                                    PyObject *kwds) {
+  static char *kwlist[] = {"capacity", "fp_rate", "serializable",
+                           "free_threading", NULL};
+  long long capacity_signed;
+  double fp_rate = 0.01;
+  int serializable = 0;
+  int free_threading = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "L|dpp", kwlist,
+                                   &capacity_signed, &fp_rate, &serializable,
+                                   &free_threading)) {
+    return -1;
+  }
+
+  if (self->active_ops > 0) {
+    PyErr_SetString(PyExc_BufferError,
+                    "Cannot reinitialize a CountingBloomFilter while another "
+                    "operation is using it");
+    return -1;
+  }
+
+  if (capacity_signed <= 0) {
+    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
+    return -1;
+  }
+
+  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    return -1;
+  }
+
+  if (free_threading && !ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "free_threading=True requires C11 atomics, which are not "
+                    "available in this build. Use a pre-built wheel or rebuild "
+                    "with a modern compiler.");
+    return -1;
+  }
+
+  int64_t block_count =
+      counting_block_count((uint64_t)capacity_signed, fp_rate);
+  if (block_count < 0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Capacity too large: would cause integer overflow");
+    return -1;
+  }
+
+  // The new counters are allocated first so that a failure leaves the filter
+  // as it was
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  size_t num_bytes = (size_t)block_count * COUNTING_BLOCK_BYTES;
+  uint64_t *counters =
+      storage_alloc(num_bytes, 1, &storage_base, &storage_bytes, &storage);
+  if (counters == NULL)
+    return -1;
+  CountingBloomFilter_free_counters(self);
+  self->counters = counters;
+  self->storage_base = storage_base;
+  self->storage_bytes = storage_bytes;
+  self->storage = storage;
+
+  self->capacity = (uint64_t)capacity_signed;
+  self->fp_rate = fp_rate;
+  self->serializable = serializable;
+  self->free_threading = free_threading;
+  self->block_count = (uint64_t)block_count;
+  return 0;
+}
+
+static PyObject *CountingBloomFilter_new(PyTypeObject *type, PyObject *args,
+                                         PyObject *kwds) {
+  CountingBloomFilter *self = (CountingBloomFilter *)type->tp_alloc(type, 0);
+  if (self != NULL) {
+    self->counters = NULL;
+    self->storage_base = NULL;
+    self->storage_bytes = 0;
+    self->storage = STORAGE_ALIGNED;
+    self->active_ops = 0;
+    self->block_count = 0;
+    self->capacity = 0;
+    self->fp_rate = 0.0;
+    self->serializable = 0;
+    self->free_threading = 0;
+  }
+  return (PyObject *)self;
+}
+
+static PyObject *CountingBloomFilter_repr(CountingBloomFilter *self) {
+  PyObject *fp_obj = PyFloat_FromDouble(self->fp_rate);
+  if (!fp_obj)
+    return NULL;
+
+  PyObject *repr = PyUnicode_FromFormat(
+      "<CountingBloomFilter capacity=%llu fp_rate=%R serializable=%s>",
+      self->capacity, fp_obj, self->serializable ? "True" : "False");
+
+  Py_DECREF(fp_obj);
+  return repr;
+}
+
+static PyMethodDef CountingBloomFilter_methods[] = {
+    {"add", (PyCFunction)CountingBloomFilter_add, METH_O,
+     "Add an item to the counting bloom filter"},
+    {"remove", (PyCFunction)CountingBloomFilter_remove, METH_O,
+     "Remove an item, raising KeyError if it is definitely absent"},
+    {"update", (PyCFunction)CountingBloomFilter_update, METH_O,
+     "Add items from an iterable to the counting bloom filter"},
+    {"remove_many", (PyCFunction)CountingBloomFilter_remove_many, METH_O,
+     "Remove items from an iterable, returning how many were removed"},
+    {"contains_many", (PyCFunction)CountingBloomFilter_contains_many, METH_O,
+     "Test every item of an iterable, returning a bytearray mask"},
+    {"count_present", (PyCFunction)CountingBloomFilter_count_present, METH_O,
+     "Count the items of an iterable that might be in the filter"},
+    {"copy", (PyCFunction)CountingBloomFilter_copy, METH_NOARGS,
+     "Return a copy of the counting bloom filter"},
+    {"clear", (PyCFunction)CountingBloomFilter_clear, METH_NOARGS,
+     "Remove all items from the counting bloom filter"},
+    {NULL}};
+
+static PyGetSetDef CountingBloomFilter_getsetters[] = {
+    {"capacity", (getter)CountingBloomFilter_get_capacity, NULL,
+     "Expected number of items", NULL},
+    {"fp_rate", (getter)CountingBloomFilter_get_fp_rate, NULL,
+     "Target false positive rate", NULL},
+    {"k", (getter)CountingBloomFilter_get_k, NULL,
+     "Number of counters per item (always 8)", NULL},
+    {"byte_count", (getter)CountingBloomFilter_get_byte_count, NULL,
+     "Memory usage in bytes", NULL},
+    {"counter_count", (getter)CountingBloomFilter_get_counter_count, NULL,
+     "Total 4-bit counters in filter", NULL},
+    {"serializable", (getter)CountingBloomFilter_get_serializable, NULL,
+     "Whether the filter uses deterministic hashing", NULL},
+    {"free_threading", (getter)CountingBloomFilter_get_free_threading, NULL,
+     "Whether the filter uses atomic operations for free-threaded Python",
+     NULL},
+    {NULL}};
+
+static PySequenceMethods CountingBloomFilter_as_sequence = {
+    .sq_contains = (objobjproc)CountingBloomFilter_contains,
+};
+
+static PyNumberMethods CountingBloomFilter_as_number = {
+    .nb_bool = (inquiry)CountingBloomFilter_bool,
+};
+
+static PyTypeObject CountingBloomFilterType = {
+    PyVarObject_HEAD_INIT(NULL, 0).tp_name =
+        "abloom._abloom.CountingBloomFilter",
+    .tp_doc = "Blocked counting Bloom filter with 4-bit counters",
+    .tp_basicsize = sizeof(CountingBloomFilter),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = CountingBloomFilter_new,
+    .tp_init = (initproc)CountingBloomFilter_init,
+    .tp_dealloc = (destructor)CountingBloomFilter_dealloc,
+    .tp_repr = (reprfunc)CountingBloomFilter_repr,
+    .tp_richcompare = (richcmpfunc)CountingBloomFilter_richcompare,
+    .tp_methods = CountingBloomFilter_methods,
+    .tp_getset = CountingBloomFilter_getsetters,
+    .tp_as_sequence = &CountingBloomFilter_as_sequence,
+    .tp_as_number = &CountingBloomFilter_as_number,
+};
+
+// ScalableBloomFilter: a chain of BloomFilter stages. Stage i holds up to
+// initial_capacity * growth**i items at fp_rate * (1 - r) * r**i, with r the
+// tightening ratio, so the false positive rates of all stages that can ever
+// exist sum to at most fp_rate. Items go to the last (active) stage, which
+// is followed by a new one once it holds its capacity. Items are hashed once
+// and every stage is probed with the same hash.
+//
+// Stages live in a fixed array and are never freed before the filter, so in
+// free_threading mode readers only need the active index, which is
+// published with a release store after the new stage pointer. Growth is
+// serialized by grow_lock; item counts are atomic.
+#define SCALABLE_MAX_STAGES 64
+
+typedef struct {
+  PyObject_HEAD BloomFilter *stages[SCALABLE_MAX_STAGES];
+  // Items added to each stage
+  uint64_t counts[SCALABLE_MAX_STAGES];
+  // Allocated stages. Stages after `active` exist only after clear(), and
+  // are empty.
+  uint32_t stage_count;
+  uint32_t active;
+  uint64_t initial_capacity;
+  double fp_rate;
+  uint64_t growth;
+  double tightening;
+  int serializable;
+  int free_threading;
+  // Allocated in free_threading mode
+  PyThread_type_lock grow_lock;
+  // Operations holding stage pointers across calls that may release the GIL;
+  // __init__ refuses while any are active
+  Py_ssize_t active_ops;
+} ScalableBloomFilter;
+
+static inline uint32_t scalable_active(ScalableBloomFilter *sf) {
+#if ABLOOM_HAS_ATOMICS
+  if (sf->free_threading)
+    return ATOMIC_LOAD32_ACQUIRE(&sf->active);
+#endif
+  return sf->active;
+}
+
+// Computes the capacity and fp_rate of stage `i`. Sets OverflowError and
+// returns -1 if the stage can't exist.
+static int scalable_stage_params(const ScalableBloomFilter *sf, uint32_t i,
+                                 uint64_t *capacity, double *fp_rate) {
+  uint64_t cap = sf->initial_capacity;
+  double fp = sf->fp_rate * (1.0 - sf->tightening);
+  for (uint32_t j = 0; j < i; j++) {
+    if (cap > UINT64_MAX / sf->growth)
+      cap = 0;
+    cap *= sf->growth;
+    fp *= sf->tightening;
+  }
+  if (i >= SCALABLE_MAX_STAGES || cap == 0 || fp < DBL_MIN) {
+    PyErr_SetString(PyExc_OverflowError,
+                    "ScalableBloomFilter can't grow any further");
+    return -1;
+  }
+  *capacity = cap;
+  *fp_rate = fp;
+  return 0;
+}
+
+static BloomFilter *scalable_new_stage(ScalableBloomFilter *sf, uint32_t i) {
+  uint64_t capacity;
+  double fp_rate;
+  if (scalable_stage_params(sf, i, &capacity, &fp_rate) < 0)
+    return NULL;
+  return (BloomFilter *)PyObject_CallFunction(
+      (PyObject *)&BloomFilterType, "Kdii", (unsigned long long)capacity,
+      fp_rate, sf->serializable, sf->free_threading);
+}
+
+static int scalable_lock(ScalableBloomFilter *sf) {
+  if (sf->grow_lock == NULL)
+    return 0;
+  if (!PyThread_acquire_lock(sf->grow_lock, NOWAIT_LOCK)) {
+    Py_BEGIN_ALLOW_THREADS
+    PyThread_acquire_lock(sf->grow_lock, WAIT_LOCK);
+    Py_END_ALLOW_THREADS
+  }
+  return 1;
+}
+
+static void scalable_unlock(ScalableBloomFilter *sf, int locked) {
+  if (locked)
+    PyThread_release_lock(sf->grow_lock);
+}
+
+// Makes the stage after `full` the active one, allocating it unless clear()
+// left it behind. Does nothing if another thread already moved past `full`.
+static int scalable_grow(ScalableBloomFilter *sf, uint32_t full) {
+  sf->active_ops++;
+  int locked = scalable_lock(sf);
+  int err = 0;
+  if (sf->active == full) {
+    uint32_t next = full + 1;
+    if (next == sf->stage_count) {
+      BloomFilter *stage = scalable_new_stage(sf, next);
+      if (stage == NULL) {
+        err = -1;
+        goto done;
+      }
+      sf->stages[next] = stage;
+      sf->counts[next] = 0;
+      sf->stage_count = next + 1;
+    }
+#if ABLOOM_HAS_ATOMICS
+    if (sf->free_threading)
+      ATOMIC_STORE32(&sf->active, next);
+    else
+#endif
+      sf->active = next;
+  }
+done:
+  scalable_unlock(sf, locked);
+  sf->active_ops--;
+  return err;
+}
+
+static inline int scalable_check(ScalableBloomFilter *sf, uint64_t hash) {
+  for (int64_t s = scalable_active(sf); s >= 0; s--) {
+    if (bloom_check(sf->stages[s], hash))
+      return 1;
+  }
+  return 0;
+}
+
+// Adds `hash` to the active stage unless one of stages [first, active)
+// already holds it; stages before `first` have been checked by the caller.
+// Returns 1 if the item was new, 0 if it was present, or -1 if the stage it
+// filled could not be followed by a new one (the item is added either way).
+static inline int scalable_add_hash(ScalableBloomFilter *sf, uint64_t hash,
+                                    uint32_t first) {
+  uint32_t active = scalable_active(sf);
+  for (uint32_t s = first; s < active; s++) {
+    if (bloom_check(sf->stages[s], hash))
+      return 0;
+  }
+
+  BloomFilter *stage = sf->stages[active];
+  bloom_wait_for_bulk_writers(stage);
+  if (bloom_test_and_set_bits(stage, bloom_block(stage, hash), (uint32_t)hash))
+    return 0;
+
+  uint64_t count;
+#if ABLOOM_HAS_ATOMICS
+  if (sf->free_threading)
+    count = ATOMIC_ADD64(&sf->counts[active], 1) + 1;
+  else
+#endif
+    count = ++sf->counts[active];
+  if (count >= stage->capacity && scalable_grow(sf, active) < 0)
+    return -1;
+  return 1;
+}
+
+// Adds a window of hashes. The stages before the active one are tested for
+// the whole window at once, which lets bloom_check_many() prefetch and use
+// the block kernels; the active stage then takes the new items in order.
+// `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static int scalable_add_many(ScalableBloomFilter *sf, const uint64_t *hashes,
+                             size_t n) {
+  unsigned char present[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char hits[ABLOOM_MAX_PREFETCH_DISTANCE];
+  uint32_t first = scalable_active(sf);
+
+  memset(present, 0, n);
+  for (uint32_t s = 0; s < first; s++) {
+    bloom_check_many(sf->stages[s], hashes, n, hits);
+    for (size_t i = 0; i < n; i++)
+      present[i] |= hits[i];
+  }
+
+  BloomFilter *stage = sf->stages[first];
+  if (bloom_should_prefetch(stage)) {
+    for (size_t i = 0; i < n; i++) {
+      if (!present[i])
+        ABLOOM_PREFETCH(bloom_block(stage, hashes[i]));
+    }
+  }
+
+  for (size_t i = 0; i < n; i++) {
+    if (!present[i] && scalable_add_hash(sf, hashes[i], first) < 0)
+      return -1;
+  }
+  return 0;
+}
+
+// Writes one 0/1 byte per hash to `out` and returns the number of hits.
+// `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static size_t scalable_check_many(ScalableBloomFilter *sf,
+                                  const uint64_t *hashes, size_t n,
+                                  unsigned char *out) {
+  unsigned char hits[ABLOOM_MAX_PREFETCH_DISTANCE];
+  int64_t active = scalable_active(sf);
+  size_t found = 0;
+
+  bloom_check_many(sf->stages[active], hashes, n, out);
+  for (int64_t s = active - 1; s >= 0; s--) {
+    bloom_check_many(sf->stages[s], hashes, n, hits);
+    for (size_t i = 0; i < n; i++)
+      out[i] |= hits[i];
+  }
+  for (size_t i = 0; i < n; i++)
+    found += out[i];
+  return found;
+}
+
+static inline HashMode scalable_hash_mode(const ScalableBloomFilter *sf) {
+  return sf->serializable ? HASH_SERIALIZABLE : HASH_FAST;
+}
+
+// Shared loop for update(). Items hashed before an error are still added.
+static inline int scalable_update_iter(ScalableBloomFilter *self,
+                                       PyObject *iter, HashMode mode) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  PyObject *item;
+
+  while ((item = PyIter_Next(iter)) != NULL) {
+    int err = get_hash(item, mode, &hashes[n]);
+    Py_DECREF(item);
+    if (err < 0) {
+      scalable_add_many(self, hashes, n);
+      return -1;
+    }
+    if (++n == window) {
+      if (scalable_add_many(self, hashes, n) < 0)
+        return -1;
+      n = 0;
+    }
+  }
+
+  if (scalable_add_many(self, hashes, n) < 0)
+    return -1;
+  return PyErr_Occurred() ? -1 : 0;
+}
+
+// Shared loop for contains_many() and count_present(), in the style of
+// bloom_check_iter()
+static inline Py_ssize_t scalable_check_iter(ScalableBloomFilter *self,
+                                             PyObject *iter, PyObject *mask,
+                                             HashMode mode) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char present[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  Py_ssize_t total = 0;
+  Py_ssize_t found = 0;
+  Py_ssize_t allocated = mask ? PyByteArray_GET_SIZE(mask) : 0;
+  PyObject *item;
+
+  for (;;) {
+    item = PyIter_Next(iter);
+    if (item != NULL) {
+      int err = get_hash(item, mode, &hashes[n]);
+      Py_DECREF(item);
+      if (err < 0)
+        return -1;
+      if (++n < window)
+        continue;
+    } else if (PyErr_Occurred()) {
+      return -1;
+    }
+
+    found += (Py_ssize_t)scalable_check_many(self, hashes, n, present);
+    if (mask) {
+      if (total + (Py_ssize_t)n > allocated) {
+        allocated = allocated + (allocated >> 1) + ABLOOM_MAX_PREFETCH_DISTANCE;
+        if (PyByteArray_Resize(mask, allocated) < 0)
+          return -1;
+      }
+      memcpy(PyByteArray_AS_STRING(mask) + total, present, n);
+    }
+    total += (Py_ssize_t)n;
+    n = 0;
+
+    if (item == NULL)
+      break;
+  }
+
+  if (mask && PyByteArray_Resize(mask, total) < 0)
+    return -1;
+  return found;
+}
+
+static Py_ssize_t scalable_check_iterable(ScalableBloomFilter *self,
+                                          PyObject *iterable, PyObject *mask) {
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return -1;
+
+  Py_ssize_t found;
+  if (scalable_hash_mode(self) == HASH_SERIALIZABLE)
+    found = scalable_check_iter(self, iter, mask, HASH_SERIALIZABLE);
+  else
+    found = scalable_check_iter(self, iter, mask, HASH_FAST);
+  Py_DECREF(iter);
+  return found;
+}
+
+static PyObject *ScalableBloomFilter_add(ScalableBloomFilter *self,
+                                         PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, scalable_hash_mode(self), &hash) < 0)
+    return NULL;
+  if (scalable_add_hash(self, hash, 0) < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+static int ScalableBloomFilter_contains(ScalableBloomFilter *self,
+                                        PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, scalable_hash_mode(self), &hash) < 0)
+    return -1;
+  return scalable_check(self, hash);
+}
+
+static PyObject *ScalableBloomFilter_update(ScalableBloomFilter *self,
+                                            PyObject *iterable) {
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return NULL;
+
+  int err;
+  if (scalable_hash_mode(self) == HASH_SERIALIZABLE)
+    err = scalable_update_iter(self, iter, HASH_SERIALIZABLE);
+  else
+    err = scalable_update_iter(self, iter, HASH_FAST);
+  Py_DECREF(iter);
+  if (err < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+static PyObject *ScalableBloomFilter_contains_many(ScalableBloomFilter *self,
+                                                   PyObject *iterable) {
+  Py_ssize_t hint = PyObject_LengthHint(iterable, 0);
+  if (hint < 0)
+    return NULL;
+
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, hint);
+  if (mask == NULL)
+    return NULL;
+
+  if (scalable_check_iterable(self, iterable, mask) < 0) {
+    Py_DECREF(mask);
+    return NULL;
+  }
+  return mask;
+}
+
+static PyObject *ScalableBloomFilter_count_present(ScalableBloomFilter *self,
+                                                   PyObject *iterable) {
+  Py_ssize_t found = scalable_check_iterable(self, iterable, NULL);
+  if (found < 0)
+    return NULL;
+  return PyLong_FromSsize_t(found);
+}
+
+static void scalable_free_stages(ScalableBloomFilter *sf) {
+  for (uint32_t s = 0; s < sf->stage_count; s++)
+    Py_CLEAR(sf->stages[s]);
+  sf->stage_count = 0;
+  sf->active = 0;
+}
+
+// Allocates an uninitialized filter with the parameters of `src`
+static ScalableBloomFilter *scalable_alloc_like(ScalableBloomFilter *src) {
+  ScalableBloomFilter *sf =
+      (ScalableBloomFilter *)Py_TYPE(src)->tp_alloc(Py_TYPE(src), 0);
+  if (sf == NULL)
+    return NULL;
+  sf->initial_capacity = src->initial_capacity;
+  sf->fp_rate = src->fp_rate;
+  sf->growth = src->growth;
+  sf->tightening = src->tightening;
+  sf->serializable = src->serializable;
+  sf->free_threading = src->free_threading;
+  if (sf->free_threading) {
+    sf->grow_lock = PyThread_allocate_lock();
+    if (sf->grow_lock == NULL) {
+      Py_DECREF(sf);
+      PyErr_NoMemory();
+      return NULL;
+    }
+  }
+  return sf;
+}
+
+static PyObject *ScalableBloomFilter_copy(ScalableBloomFilter *self,
+                                          PyObject *Py_UNUSED(ignored)) {
+  ScalableBloomFilter *copy = scalable_alloc_like(self);
+  if (copy == NULL)
+    return NULL;
+
+  self->active_ops++;
+  uint32_t active = scalable_active(self);
+  for (uint32_t s = 0; s <= active; s++) {
+    copy->stages[s] =
+        (BloomFilter *)BloomFilter_copy(self->stages[s], NULL);
+    if (copy->stages[s] == NULL) {
+      self->active_ops--;
+      Py_DECREF(copy);
+      return NULL;
+    }
+    copy->counts[s] = self->counts[s];
+    copy->stage_count = s + 1;
+  }
+  self->active_ops--;
+  copy->active = active;
+  return (PyObject *)copy;
+}
+
+static PyObject *ScalableBloomFilter_clear(ScalableBloomFilter *self,
+                                           PyObject *Py_UNUSED(ignored)) {
+  self->active_ops++;
+  int locked = scalable_lock(self);
+  for (uint32_t s = 0; s < self->stage_count; s++) {
+    PyObject *res = BloomFilter_clear(self->stages[s], NULL);
+    if (res == NULL) {
+      scalable_unlock(self, locked);
+      self->active_ops--;
+      return NULL;
+    }
+    Py_DECREF(res);
+    self->counts[s] = 0;
+  }
+  // Stages stay allocated and are reused as the filter grows again
+#if ABLOOM_HAS_ATOMICS
+  if (self->free_threading)
+    ATOMIC_STORE32(&self->active, 0);
+  else
+#endif
+    self->active = 0;
+  scalable_unlock(self, locked);
+  self->active_ops--;
+  Py_RETURN_NONE;
+}
+
+static int ScalableBloomFilter_bool(ScalableBloomFilter *self) {
+  uint32_t active = scalable_active(self);
+  for (uint32_t s = 0; s <= active; s++) {
+    if (BloomFilter_bool(self->stages[s]))
+      return 1;
+  }
+  return 0;
+}
+
+static int ScalableBloomFilter_compatible(ScalableBloomFilter *self,
+                                          ScalableBloomFilter *other) {
+  return self->initial_capacity == other->initial_capacity &&
+         self->fp_rate == other->fp_rate && self->growth == other->growth &&
+         self->tightening == other->tightening &&
+         self->serializable == other->serializable &&
+         self->free_threading == other->free_threading;
+}
+
+static PyObject *ScalableBloomFilter_richcompare(ScalableBloomFilter *self,
+                                                 PyObject *other, int op) {
+  if (op != Py_EQ && op != Py_NE) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  ScalableBloomFilter *other_sf = (ScalableBloomFilter *)other;
+  uint32_t active = scalable_active(self);
+  int equal = ScalableBloomFilter_compatible(self, other_sf) &&
+              active == scalable_active(other_sf);
+
+  self->active_ops++;
+  other_sf->active_ops++;
+  for (uint32_t s = 0; equal > 0 && s <= active; s++) {
+    equal = PyObject_RichCompareBool((PyObject *)self->stages[s],
+                                     (PyObject *)other_sf->stages[s], Py_EQ);
+  }
+  self->active_ops--;
+  other_sf->active_ops--;
+  if (equal < 0)
+    return NULL;
+
+  if (op == Py_EQ) {
+    return PyBool_FromLong(equal);
+  }
+  return PyBool_FromLong(!equal);
+}
+
+static int scalable_check_union(ScalableBloomFilter *self, PyObject *other) {
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    PyErr_SetString(PyExc_TypeError,
+                    "Can only combine ScalableBloomFilter with "
+                    "ScalableBloomFilter");
+    return -1;
+  }
+  if (!ScalableBloomFilter_compatible(self, (ScalableBloomFilter *)other)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "ScalableBloomFilters must have the same initial_capacity, "
+                    "fp_rate, growth, tightening, serializable, and "
+                    "free_threading");
+    return -1;
+  }
+  return 0;
+}
+
+// ORs the stages of `other` into `self` stage by stage, copying the stages
+// `self` doesn't have yet. Item counts are added, which can only overstate
+// how full a stage is, so the merged filter grows early rather than late.
+static int scalable_merge(ScalableBloomFilter *self,
+                          ScalableBloomFilter *other) {
+  uint32_t other_active = scalable_active(other);
+  self->active_ops++;
+  other->active_ops++;
+  int locked = scalable_lock(self);
+  int err = 0;
+
+  for (uint32_t s = 0; s <= other_active; s++) {
+    if (s < self->stage_count) {
+      PyObject *res = BloomFilter_ior(self->stages[s], (PyObject *)other->stages[s]);
+      if (res == NULL) {
+        err = -1;
+        break;
+      }
+      Py_DECREF(res);
+    } else {
+      self->stages[s] = (BloomFilter *)BloomFilter_copy(other->stages[s], NULL);
+      if (self->stages[s] == NULL) {
+        err = -1;
+        break;
+      }
+      self->stage_count = s + 1;
+    }
+    self->counts[s] += other->counts[s];
+  }
+
+  if (other_active > self->active) {
+#if ABLOOM_HAS_ATOMICS
+    if (self->free_threading)
+      ATOMIC_STORE32(&self->active, other_active);
+    else
+#endif
+      self->active = other_active;
+  }
+  scalable_unlock(self, locked);
+  self->active_ops--;
+  other->active_ops--;
+  return err;
+}
+
+static PyObject *ScalableBloomFilter_or(ScalableBloomFilter *self,
+                                        PyObject *other) {
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+  if (scalable_check_union(self, other) < 0)
+    return NULL;
+
+  ScalableBloomFilter *result =
+      (ScalableBloomFilter *)ScalableBloomFilter_copy(self, NULL);
+  if (result == NULL)
+    return NULL;
+  if (scalable_merge(result, (ScalableBloomFilter *)other) < 0) {
+    Py_DECREF(result);
+    return NULL;
+  }
+  return (PyObject *)result;
+}
+
+static PyObject *ScalableBloomFilter_ior(ScalableBloomFilter *self,
+                                         PyObject *other) {
+  if (scalable_check_union(self, other) < 0)
+    return NULL;
+  if (scalable_merge(self, (ScalableBloomFilter *)other) < 0)
+    return NULL;
+  Py_INCREF(self);
+  return (PyObject *)self;
+}
+
+// Format: a 64-byte v3 header with ABLOOM_FLAG_SCALABLE, then for each stage
+// its item count and image size (little-endian uint64) and the image
+// written by BloomFilter.to_bytes().
+//   0 magic "ABLM"  4 version  5 flags  6 layout  7 hash
+//   8 initial_capacity  16 fp_rate  24 stage count  32 growth
+//   40 tightening  48-63 reserved (zero)
+#define SCALABLE_STAGE_HEADER_SIZE 16
+
+static PyObject *ScalableBloomFilter_to_bytes(ScalableBloomFilter *self,
+                                              PyObject *Py_UNUSED(ignored)) {
+  if (!self->serializable) {
+    PyErr_SetString(PyExc_ValueError, "to_bytes() requires serializable=True");
+    return NULL;
+  }
+
+  uint32_t stage_count = scalable_active(self) + 1;
+  PyObject *images[SCALABLE_MAX_STAGES] = {NULL};
+  size_t total = ABLOOM_HEADER_SIZE;
+  PyObject *result = NULL;
+
+  self->active_ops++;
+  for (uint32_t s = 0; s < stage_count; s++) {
+    images[s] = bloom_to_bytes(self->stages[s], 1);
+    if (images[s] == NULL)
+      goto done;
+    total += SCALABLE_STAGE_HEADER_SIZE + (size_t)PyBytes_GET_SIZE(images[s]);
+  }
+
+  result = PyBytes_FromStringAndSize(NULL, (Py_ssize_t)total);
+  if (result == NULL)
+    goto done;
+
+  unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
+  union {
+    double d;
+    uint64_t u;
+  } fp_union;
+  memset(buf, 0, ABLOOM_HEADER_SIZE);
+  memcpy(buf, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE);
+  buf[4] = ABLOOM_VERSION;
+  buf[5] = ABLOOM_FLAG_SCALABLE |
+           (self->free_threading ? ABLOOM_FLAG_FREE_THREADING : 0);
+  buf[6] = ABLOOM_LAYOUT_SBBF512;
+  buf[7] = ABLOOM_HASH_SERIALIZABLE;
+  write_le64(buf + 8, self->initial_capacity);
+  fp_union.d = self->fp_rate;
+  write_le64(buf + 16, fp_union.u);
+  write_le64(buf + 24, stage_count);
+  write_le64(buf + 32, self->growth);
+  fp_union.d = self->tightening;
+  write_le64(buf + 40, fp_union.u);
+  buf += ABLOOM_HEADER_SIZE;
+
+  for (uint32_t s = 0; s < stage_count; s++) {
+    size_t len = (size_t)PyBytes_GET_SIZE(images[s]);
+    write_le64(buf, self->counts[s]);
+    write_le64(buf + 8, len);
+    memcpy(buf + SCALABLE_STAGE_HEADER_SIZE, PyBytes_AS_STRING(images[s]), len);
+    buf += SCALABLE_STAGE_HEADER_SIZE + len;
+  }
+
+done:
+  self->active_ops--;
+  for (uint32_t s = 0; s < stage_count; s++)
+    Py_XDECREF(images[s]);
+  return result;
+}
+
+static int scalable_check_params(uint64_t initial_capacity, double fp_rate,
+                                 uint64_t growth, double tightening) {
+  if (initial_capacity == 0) {
+    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
+    return -1;
+  }
+  if (!(fp_rate > 0.0 && fp_rate < 1.0)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    return -1;
+  }
+  if (growth < 2) {
+    PyErr_SetString(PyExc_ValueError, "growth must be at least 2");
+    return -1;
+  }
+  if (!(tightening > 0.0 && tightening < 1.0)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "tightening must be between 0.0 and 1.0");
+    return -1;
+  }
+  return 0;
+}
+
+static PyObject *ScalableBloomFilter_from_bytes(PyTypeObject *type,
+                                                PyObject *args) {
+  PyObject *data_obj;
+
+  if (!PyArg_ParseTuple(args, "O", &data_obj)) {
+    return NULL;
+  }
+
+  if (!PyBytes_Check(data_obj)) {
+    PyErr_SetString(PyExc_TypeError, "from_bytes() requires bytes");
+    return NULL;
+  }
+
+  const unsigned char *data =
+      (const unsigned char *)PyBytes_AS_STRING(data_obj);
+  size_t len = (size_t)PyBytes_GET_SIZE(data_obj);
+  if (len < ABLOOM_HEADER_SIZE) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: too short for header");
+    return NULL;
+  }
+  if (memcmp(data, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE) != 0) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: wrong magic bytes");
+    return NULL;
+  }
+  if (data[4] != ABLOOM_VERSION) {
+    PyErr_Format(PyExc_ValueError, "Unsupported version: %u (expected 3)",
+                 data[4]);
+    return NULL;
+  }
+  if (!(data[5] & ABLOOM_FLAG_SCALABLE)) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Invalid data: not a ScalableBloomFilter (use "
+                    "BloomFilter.from_bytes())");
+    return NULL;
+  }
+  if (data[5] & ~(ABLOOM_FLAG_SCALABLE | ABLOOM_FLAG_FREE_THREADING)) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: unknown flags");
+    return NULL;
+  }
+  if (data[6] != ABLOOM_LAYOUT_SBBF512) {
+    PyErr_Format(PyExc_ValueError, "Unsupported layout: %u", data[6]);
+    return NULL;
+  }
+  if (data[7] != ABLOOM_HASH_SERIALIZABLE) {
+    PyErr_Format(PyExc_ValueError, "Unsupported hash algorithm: %u", data[7]);
+    return NULL;
+  }
+
+  union {
+    double d;
+    uint64_t u;
+  } fp_union, tightening_union;
+  fp_union.u = read_le64(data + 16);
+  tightening_union.u = read_le64(data + 40);
+  uint64_t stage_count = read_le64(data + 24);
+  int free_threading = (data[5] & ABLOOM_FLAG_FREE_THREADING) != 0;
+  if (scalable_check_params(read_le64(data + 8), fp_union.d,
+                            read_le64(data + 32), tightening_union.d) < 0)
+    return NULL;
+  if (stage_count == 0 || stage_count > SCALABLE_MAX_STAGES) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: stage count out of range");
+    return NULL;
+  }
+  if (free_threading && !ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "free_threading=True requires C11 atomics, which are not "
+                    "available in this build.");
+    return NULL;
+  }
+
+  ScalableBloomFilter *self = (ScalableBloomFilter *)type->tp_alloc(type, 0);
+  if (self == NULL)
+    return NULL;
+  self->initial_capacity = read_le64(data + 8);
+  self->fp_rate = fp_union.d;
+  self->growth = read_le64(data + 32);
+  self->tightening = tightening_union.d;
+  self->serializable = 1;
+  self->free_threading = free_threading;
+  if (free_threading) {
+    self->grow_lock = PyThread_allocate_lock();
+    if (self->grow_lock == NULL) {
+      Py_DECREF(self);
+      return PyErr_NoMemory();
+    }
+  }
+
+  size_t pos = ABLOOM_HEADER_SIZE;
+  for (uint32_t s = 0; s < stage_count; s++) {
+    if (len - pos < SCALABLE_STAGE_HEADER_SIZE ||
+        read_le64(data + pos + 8) > len - pos - SCALABLE_STAGE_HEADER_SIZE) {
+      PyErr_SetString(PyExc_ValueError, "Invalid data: truncated stage");
+      goto error;
+    }
+    uint64_t count = read_le64(data + pos);
+    size_t image_len = (size_t)read_le64(data + pos + 8);
+    pos += SCALABLE_STAGE_HEADER_SIZE;
+
+    BloomFilter *stage = (BloomFilter *)bloom_from_data(
+        &BloomFilterType, data + pos, image_len);
+    if (stage == NULL)
+      goto error;
+    self->stages[s] = stage;
+    self->counts[s] = count;
+    self->stage_count = s + 1;
+    pos += image_len;
+
+    uint64_t capacity;
+    double fp_rate;
+    if (scalable_stage_params(self, s, &capacity, &fp_rate) < 0)
+      goto error;
+    if (stage->capacity != capacity || stage->fp_rate != fp_rate ||
+        stage->layout != ABLOOM_LAYOUT_SBBF512 ||
+        stage->free_threading != free_threading) {
+      PyErr_Format(PyExc_ValueError,
+                   "Invalid data: stage %u doesn't match the filter's "
+                   "parameters",
+                   s);
+      goto error;
+    }
+  }
+  if (pos != len) {
+    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zu",
+                 pos, len);
+    goto error;
+  }
+  self->active = (uint32_t)stage_count - 1;
+  return (PyObject *)self;
+
+error:
+  Py_DECREF(self);
+  return NULL;
+}
+
+static PyObject *ScalableBloomFilter_get_initial_capacity(
+    ScalableBloomFilter *self, void *closure) {
+  return PyLong_FromUnsignedLongLong(self->initial_capacity);
+}
+
+static PyObject *ScalableBloomFilter_get_capacity(ScalableBloomFilter *self,
+                                                  void *closure) {
+  uint64_t capacity = 0;
+  uint32_t active = scalable_active(self);
+  for (uint32_t s = 0; s <= active; s++)
+    capacity += self->stages[s]->capacity;
+  return PyLong_FromUnsignedLongLong(capacity);
+}
+
+static PyObject *ScalableBloomFilter_get_fp_rate(ScalableBloomFilter *self,
+                                                 void *closure) {
+  return PyFloat_FromDouble(self->fp_rate);
+}
+
+static PyObject *ScalableBloomFilter_get_growth(ScalableBloomFilter *self,
+                                                void *closure) {
+  return PyLong_FromUnsignedLongLong(self->growth);
+}
+
+static PyObject *ScalableBloomFilter_get_tightening(ScalableBloomFilter *self,
+                                                    void *closure) {
+  return PyFloat_FromDouble(self->tightening);
+}
+
+static PyObject *ScalableBloomFilter_get_stage_count(ScalableBloomFilter *self,
+                                                     void *closure) {
+  return PyLong_FromUnsignedLong(scalable_active(self) + 1);
+}
+
+static PyObject *ScalableBloomFilter_get_item_count(ScalableBloomFilter *self,
+                                                    void *closure) {
+  uint64_t items = 0;
+  uint32_t active = scalable_active(self);
+  for (uint32_t s = 0; s <= active; s++)
+    items += self->counts[s];
+  return PyLong_FromUnsignedLongLong(items);
+}
+
+static PyObject *ScalableBloomFilter_get_byte_count(ScalableBloomFilter *self,
+                                                    void *closure) {
+  uint64_t bytes = 0;
+  for (uint32_t s = 0; s < self->stage_count; s++)
+    bytes += bloom_nbytes(self->stages[s]);
+  return PyLong_FromUnsignedLongLong(bytes);
+}
+
+static PyObject *
+ScalableBloomFilter_get_serializable(ScalableBloomFilter *self,
+                                     void *closure) {
+  return PyBool_FromLong(self->serializable);
+}
+
+static PyObject *
+ScalableBloomFilter_get_free_threading(ScalableBloomFilter *self,
+                                       void *closure) {
+  return PyBool_FromLong(self->free_threading);
+}
+
+static void ScalableBloomFilter_dealloc(ScalableBloomFilter *self) {
+  scalable_free_stages(self);
+  if (self->grow_lock) {
+    PyThread_free_lock(self->grow_lock);
+  }
+  Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static int ScalableBloomFilter_init(ScalableBloomFilter *self, PyObject *args,
+                                    PyObject *kwds) {
+  static char *kwlist[] = {"initial_capacity", "fp_rate", "growth",
+                           "tightening", "serializable", "free_threading",
+                           NULL};
+  long long capacity_signed;
+  double fp_rate = 0.01;
+  long long growth = 2;
+  double tightening = 0.5;
+  int serializable = 0;
+  int free_threading = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "L|dLdpp", kwlist,
+                                   &capacity_signed, &fp_rate, &growth,
+                                   &tightening, &serializable,
+                                   &free_threading)) {
+    return -1;
+  }
+
+  if (self->active_ops > 0) {
+    PyErr_SetString(PyExc_BufferError,
+                    "Cannot reinitialize a ScalableBloomFilter while another "
+                    "operation is using it");
+    return -1;
+  }
+
+  if (capacity_signed <= 0) {
+    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
+    return -1;
+  }
+  if (scalable_check_params((uint64_t)capacity_signed, fp_rate,
+                            growth < 0 ? 0 : (uint64_t)growth, tightening) < 0)
+    return -1;
+
+  if (free_threading && !ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "free_threading=True requires C11 atomics, which are not "
+                    "available in this build. Use a pre-built wheel or rebuild "
+                    "with a modern compiler.");
+    return -1;
+  }
+
+  scalable_free_stages(self);
+  self->initial_capacity = (uint64_t)capacity_signed;
+  self->fp_rate = fp_rate;
+  self->growth = (uint64_t)growth;
+  self->tightening = tightening;
+  self->serializable = serializable;
+  self->free_threading = free_threading;
+  if (free_threading && self->grow_lock == NULL) {
+    self->grow_lock = PyThread_allocate_lock();
+    if (self->grow_lock == NULL) {
+      PyErr_NoMemory();
+      return -1;
+    }
+  }
+
+  self->stages[0] = scalable_new_stage(self, 0);
+  if (self->stages[0] == NULL)
+    return -1;
+  self->counts[0] = 0;
+  self->stage_count = 1;
+  return 0;
+}
+
+static PyObject *ScalableBloomFilter_new(PyTypeObject *type, PyObject *args,
+                                         PyObject *kwds) {
+  // tp_alloc zeroes the object, so stages are NULL and counts zero
+  ScalableBloomFilter *self = (ScalableBloomFilter *)type->tp_alloc(type, 0);
+  return (PyObject *)self;
+}
+
+static PyObject *ScalableBloomFilter_repr(ScalableBloomFilter *self) {
+  PyObject *fp_obj = PyFloat_FromDouble(self->fp_rate);
+  if (!fp_obj)
+    return NULL;
+
+  PyObject *repr = PyUnicode_FromFormat(
+      "<ScalableBloomFilter initial_capacity=%llu fp_rate=%R stages=%u>",
+      self->initial_capacity, fp_obj, (unsigned)scalable_active(self) + 1);
+
+  Py_DECREF(fp_obj);
+  return repr;
+}
+
+static PyMethodDef ScalableBloomFilter_methods[] = {
+    {"add", (PyCFunction)ScalableBloomFilter_add, METH_O,
+     "Add an item to the scalable bloom filter"},
+    {"update", (PyCFunction)ScalableBloomFilter_update, METH_O,
+     "Add items from an iterable to the scalable bloom filter"},
+    {"contains_many", (PyCFunction)ScalableBloomFilter_contains_many, METH_O,
+     "Test every item of an iterable, returning a bytearray mask"},
+    {"count_present", (PyCFunction)ScalableBloomFilter_count_present, METH_O,
+     "Count the items of an iterable that might be in the filter"},
+    {"copy", (PyCFunction)ScalableBloomFilter_copy, METH_NOARGS,
+     "Return a copy of the scalable bloom filter"},
+    {"clear", (PyCFunction)ScalableBloomFilter_clear, METH_NOARGS,
+     "Remove all items from the scalable bloom filter"},
+    {"to_bytes", (PyCFunction)ScalableBloomFilter_to_bytes, METH_NOARGS,
+     "Serialize the filter to bytes. Requires serializable=True."},
+    {"from_bytes", (PyCFunction)ScalableBloomFilter_from_bytes,
+     METH_VARARGS | METH_CLASS,
+     "Deserialize a filter from bytes. Returns a serializable filter."},
+    {NULL}};
+
+static PyGetSetDef ScalableBloomFilter_getsetters[] = {
+    {"initial_capacity", (getter)ScalableBloomFilter_get_initial_capacity,
+     NULL, "Capacity of the first stage", NULL},
+    {"capacity", (getter)ScalableBloomFilter_get_capacity, NULL,
+     "Total capacity of the current stages", NULL},
+    {"fp_rate", (getter)ScalableBloomFilter_get_fp_rate, NULL,
+     "Bound on the combined false positive rate", NULL},
+    {"growth", (getter)ScalableBloomFilter_get_growth, NULL,
+     "Capacity ratio between consecutive stages", NULL},
+    {"tightening", (getter)ScalableBloomFilter_get_tightening, NULL,
+     "False positive rate ratio between consecutive stages", NULL},
+    {"stage_count", (getter)ScalableBloomFilter_get_stage_count, NULL,
+     "Number of stages in use", NULL},
+    {"item_count", (getter)ScalableBloomFilter_get_item_count, NULL,
+     "Number of items added that were new", NULL},
+    {"byte_count", (getter)ScalableBloomFilter_get_byte_count, NULL,
+     "Memory usage of all stages in bytes", NULL},
+    {"serializable", (getter)ScalableBloomFilter_get_serializable, NULL,
+     "Whether the filter uses deterministic hashing for serialization", NULL},
+    {"free_threading", (getter)ScalableBloomFilter_get_free_threading, NULL,
+     "Whether the filter uses atomic operations for free-threaded Python",
+     NULL},
+    {NULL}};
+
+static PySequenceMethods ScalableBloomFilter_as_sequence = {
+    .sq_contains = (objobjproc)ScalableBloomFilter_contains,
+};
+
+static PyNumberMethods ScalableBloomFilter_as_number = {
+    .nb_bool = (inquiry)ScalableBloomFilter_bool,
+    .nb_or = (binaryfunc)ScalableBloomFilter_or,
+    .nb_inplace_or = (binaryfunc)ScalableBloomFilter_ior,
+};
+
+static PyTypeObject ScalableBloomFilterType = {
+    PyVarObject_HEAD_INIT(NULL, 0).tp_name =
+        "abloom._abloom.ScalableBloomFilter",
+    .tp_doc = "Bloom filter that grows past its initial capacity",
+    .tp_basicsize = sizeof(ScalableBloomFilter),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = ScalableBloomFilter_new,
+    .tp_init = (initproc)ScalableBloomFilter_init,
+    .tp_dealloc = (destructor)ScalableBloomFilter_dealloc,
+    .tp_repr = (reprfunc)ScalableBloomFilter_repr,
+    .tp_richcompare = (richcmpfunc)ScalableBloomFilter_richcompare,
+    .tp_methods = ScalableBloomFilter_methods,
+    .tp_getset = ScalableBloomFilter_getsetters,
+    .tp_as_sequence = &ScalableBloomFilter_as_sequence,
+    .tp_as_number = &ScalableBloomFilter_as_number,
+};
+
+// CuckooFilter: partial-key cuckoo hashing (Fan et al. 2014) with buckets
+// of 4 fingerprints. Fingerprints are 12 to 16 bits, the fewest that meet
+// fp_rate at a 95% load, and are packed back to back, so a bucket is 48 to
+// 64 bits and is read with one unaligned 64-bit load and tested for a
+// fingerprint with SWAR lane compares. An item's buckets are
+// i1 = (hash >> 32) % bucket_count and i2 = (mix64(fp) - i1) mod
+// bucket_count; the map from one to the other is its own inverse for any
+// bucket count, so the table needs no power-of-two rounding. A fingerprint
+// that finds both buckets full evicts a random one, which moves to its other
+// bucket, for up to CUCKOO_MAX_KICKS moves. The fingerprint left over after
+// that is kept in a one-entry victim stash, and the filter is full.
+//
+// In free_threading mode writers hold write_lock and readers use a
+// sequence lock: writers make `seq` odd while they move fingerprints, and
+// readers retry if it changed, so a fingerprint being moved is never missed.
+#define CUCKOO_SLOTS 4
+#define CUCKOO_MIN_FP_BITS 12
+#define CUCKOO_MAX_FP_BITS 16
+#define CUCKOO_MAX_LOAD 0.95
+// Below this load, 16-bit fingerprints cost more than a BloomFilter
+#define CUCKOO_MIN_LOAD 0.7
+#define CUCKOO_MAX_KICKS 500
+#define CUCKOO_RNG_SEED 0x9e3779b97f4a7c15ULL
+
+typedef struct {
+  PyObject_HEAD unsigned char *table;
+  // Allocation that owns `table` (see storage_alloc())
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  size_t table_bytes;
+  uint64_t bucket_count;
+  uint64_t capacity;
+  double fp_rate;
+  int fp_bits;
+  // SWAR constants for 4 lanes of fp_bits bits
+  uint64_t lane_ones;
+  uint64_t lane_high;
+  uint64_t bucket_mask;
+  uint64_t item_count;
+  uint64_t victim_bucket;
+  uint32_t victim_fp;
+  int victim_used;
+  // xorshift state for picking evictions; deterministic, so filters built
+  // from the same items are equal
+  uint64_t rng;
+  uint32_t seq;
+  int serializable;
+  int free_threading;
+  // Allocated in free_threading mode
+  PyThread_type_lock write_lock;
+  // Writers between cuckoo_write_begin() and cuckoo_write_end(), and
+  // comparisons, which may run without the GIL; __init__ refuses while any
+  // are active
+  Py_ssize_t active_ops;
+} CuckooFilter;
+
+// Chance that a lookup matches one of the 2 * 4 * load fingerprints it
+// compares against. Fingerprint 0 marks an empty slot, so each matches with
+// probability 1 / (2^fp_bits - 1).
+static double cuckoo_fpr(int fp_bits, double load) {
+  return 1.0 - pow(1.0 - 1.0 / (ldexp(1.0, fp_bits) - 1.0),
+                   2.0 * CUCKOO_SLOTS * load);
+}
+
+// Picks the fingerprint width and bucket count for `capacity` items at
+// `fp_rate`. Returns 0, -1 if the table would overflow, or -2 if fp_rate is
+// below what 16-bit fingerprints reach at CUCKOO_MIN_LOAD.
+static int cuckoo_size(uint64_t capacity, double fp_rate, int *fp_bits,
+                       uint64_t *bucket_count) {
+  double load = CUCKOO_MAX_LOAD;
+  int bits = CUCKOO_MIN_FP_BITS;
+  while (bits < CUCKOO_MAX_FP_BITS && cuckoo_fpr(bits, load) > fp_rate)
+    bits++;
+  if (cuckoo_fpr(bits, load) > fp_rate) {
+    // Trade load for accuracy: solve cuckoo_fpr(16, load) == fp_rate
+    load = log1p(-fp_rate) /
+           (2.0 * CUCKOO_SLOTS * log1p(-1.0 / (ldexp(1.0, bits) - 1.0)));
+    if (load < CUCKOO_MIN_LOAD)
+      return -2;
+  }
+
+  double buckets = ceil((double)capacity / (CUCKOO_SLOTS * load));
+  if (buckets > (double)(SIZE_MAX / 8 - 64) / bits)
+    return -1;
+  *fp_bits = bits;
+  *bucket_count = (uint64_t)buckets;
+  return 0;
+}
+
+static size_t cuckoo_table_bytes(int fp_bits, uint64_t bucket_count) {
+  uint64_t bucket_bits = (uint64_t)CUCKOO_SLOTS * fp_bits;
+  // The last bucket is read with an 8-byte load that starts at most
+  // bucket_bits / 8 - 1 bytes before the end of the packed buckets
+  size_t bytes = (size_t)((bucket_count * bucket_bits + 7) / 8) + 2;
+  return (bytes + 7) & ~(size_t)7;
+}
+
+static void cuckoo_set_geometry(CuckooFilter *cf, int fp_bits,
+                                uint64_t bucket_count) {
+  uint64_t bucket_bits = (uint64_t)CUCKOO_SLOTS * fp_bits;
+  cf->fp_bits = fp_bits;
+  cf->bucket_count = bucket_count;
+  cf->lane_ones = 0;
+  for (int j = 0; j < CUCKOO_SLOTS; j++)
+    cf->lane_ones |= 1ULL << (j * fp_bits);
+  cf->lane_high = cf->lane_ones << (fp_bits - 1);
+  cf->bucket_mask = bucket_bits == 64 ? ~0ULL : (1ULL << bucket_bits) - 1;
+  cf->table_bytes = cuckoo_table_bytes(fp_bits, bucket_count);
+}
+
+static inline uint64_t cuckoo_index(const CuckooFilter *cf, uint64_t hash) {
+  return (hash >> 32) % cf->bucket_count;
+}
+
+// Maps the low half of the hash onto 1 .. 2^fp_bits - 1
+static inline uint32_t cuckoo_fingerprint(const CuckooFilter *cf,
+                                          uint64_t hash) {
+  uint64_t range = (1ULL << cf->fp_bits) - 1;
+  return (uint32_t)(((uint64_t)(uint32_t)hash * range) >> 32) + 1;
+}
+
+static inline uint64_t cuckoo_alt_index(const CuckooFilter *cf,
+                                        uint64_t index, uint32_t fp) {
+  uint64_t base = mix64(fp) % cf->bucket_count;
+  return base >= index ? base - index : base + cf->bucket_count - index;
+}
+
+static inline unsigned char *cuckoo_bucket_addr(const CuckooFilter *cf,
+                                                uint64_t index, int *shift) {
+  uint64_t bit = index * CUCKOO_SLOTS * (uint64_t)cf->fp_bits;
+  *shift = (int)(bit & 7);
+  return cf->table + (bit >> 3);
+}
+
+static inline uint64_t cuckoo_load_word(const unsigned char *at) {
+  uint64_t word;
+  memcpy(&word, at, sizeof(word));
+  return host_is_little_endian() ? word : byteswap64(word);
+}
+
+static inline void cuckoo_store_word(unsigned char *at, uint64_t word) {
+  if (!host_is_little_endian())
+    word = byteswap64(word);
+  memcpy(at, &word, sizeof(word));
+}
+
+static inline uint64_t cuckoo_read_bucket(const CuckooFilter *cf,
+                                          uint64_t index) {
+  int shift;
+  const unsigned char *at = cuckoo_bucket_addr(cf, index, &shift);
+  return (cuckoo_load_word(at) >> shift) & cf->bucket_mask;
+}
+
+// Nonzero if any lane of `bucket` equals `fp` (exact: the borrow of the
+// subtraction can only flag lanes above a lane that really is zero)
+static inline int cuckoo_bucket_has(const CuckooFilter *cf, uint64_t bucket,
+                                    uint32_t fp) {
+  uint64_t x = bucket ^ (fp * cf->lane_ones);
+  return ((x - cf->lane_ones) & ~x & cf->lane_high) != 0;
+}
+
+// Returns the first lane of bucket `index` holding `fp`, or -1
+static inline int cuckoo_find_lane(const CuckooFilter *cf, uint64_t index,
+                                   uint32_t fp) {
+  uint64_t bucket = cuckoo_read_bucket(cf, index);
+  uint64_t lane_mask = (1ULL << cf->fp_bits) - 1;
+  if (!cuckoo_bucket_has(cf, bucket, fp))
+    return -1;
+  for (int j = 0; j < CUCKOO_SLOTS; j++) {
+    if (((bucket >> (j * cf->fp_bits)) & lane_mask) == fp)
+      return j;
+  }
+  return -1;
+}
+
+// Stores `fp` in lane `lane` of bucket `index` and returns the old value
+static inline uint32_t cuckoo_set_lane(CuckooFilter *cf, uint64_t index,
+                                       int lane, uint32_t fp) {
+  int shift;
+  unsigned char *at = cuckoo_bucket_addr(cf, index, &shift);
+  uint64_t word = cuckoo_load_word(at);
+  int pos = shift + lane * cf->fp_bits;
+  uint64_t lane_mask = ((1ULL << cf->fp_bits) - 1) << pos;
+  uint32_t old = (uint32_t)((word & lane_mask) >> pos);
+  cuckoo_store_word(at, (word & ~lane_mask) | ((uint64_t)fp << pos));
+  return old;
+}
+
+static inline int cuckoo_put(CuckooFilter *cf, uint64_t index, uint32_t fp) {
+  int lane = cuckoo_find_lane(cf, index, 0);
+  if (lane < 0)
+    return 0;
+  cuckoo_set_lane(cf, index, lane, fp);
+  return 1;
+}
+
+static inline uint64_t cuckoo_random(CuckooFilter *cf) {
+  cf->rng ^= cf->rng << 13;
+  cf->rng ^= cf->rng >> 7;
+  cf->rng ^= cf->rng << 17;
+  return cf->rng;
+}
+
+static inline int cuckoo_lookup(const CuckooFilter *cf, uint64_t i1,
+                                uint32_t fp) {
+  uint64_t i2 = cuckoo_alt_index(cf, i1, fp);
+  if (cuckoo_bucket_has(cf, cuckoo_read_bucket(cf, i1), fp) ||
+      cuckoo_bucket_has(cf, cuckoo_read_bucket(cf, i2), fp))
+    return 1;
+  return cf->victim_used && cf->victim_fp == fp &&
+         (cf->victim_bucket == i1 || cf->victim_bucket == i2);
+}
+
+// Returns 1 if the fingerprint was stored, or 0 if the filter is full. A
+// full filter still takes items whose buckets have a free slot.
+static int cuckoo_insert(CuckooFilter *cf, uint64_t i1, uint32_t fp) {
+  uint64_t i2 = cuckoo_alt_index(cf, i1, fp);
+  if (cuckoo_put(cf, i1, fp) || cuckoo_put(cf, i2, fp)) {
+    cf->item_count++;
+    return 1;
+  }
+  if (cf->victim_used)
+    return 0;
+
+  uint64_t index = (cuckoo_random(cf) & 1) ? i1 : i2;
+  for (int kick = 0; kick < CUCKOO_MAX_KICKS; kick++) {
+    int lane = (int)(cuckoo_random(cf) % CUCKOO_SLOTS);
+    fp = cuckoo_set_lane(cf, index, lane, fp);
+    index = cuckoo_alt_index(cf, index, fp);
+    if (cuckoo_put(cf, index, fp)) {
+      cf->item_count++;
+      return 1;
+    }
+  }
+  cf->victim_bucket = index;
+  cf->victim_fp = fp;
+  cf->victim_used = 1;
+  cf->item_count++;
+  return 1;
+}
+
+// Removes one copy of the fingerprint and returns 1, or returns 0 if it is
+// in neither bucket. A freed slot takes back the stashed victim if it can.
+static int cuckoo_delete(CuckooFilter *cf, uint64_t i1, uint32_t fp) {
+  uint64_t i2 = cuckoo_alt_index(cf, i1, fp);
+  uint64_t index = i1;
+  int lane = cuckoo_find_lane(cf, i1, fp);
+  if (lane < 0) {
+    index = i2;
+    lane = cuckoo_find_lane(cf, i2, fp);
+  }
+
+  if (lane >= 0) {
+    cuckoo_set_lane(cf, index, lane, 0);
+  } else if (cf->victim_used && cf->victim_fp == fp &&
+             (cf->victim_bucket == i1 || cf->victim_bucket == i2)) {
+    cf->victim_used = 0;
+  } else {
+    return 0;
+  }
+  cf->item_count--;
+
+  if (cf->victim_used &&
+      (cuckoo_put(cf, cf->victim_bucket, cf->victim_fp) ||
+       cuckoo_put(cf,
+                  cuckoo_alt_index(cf, cf->victim_bucket, cf->victim_fp),
+                  cf->victim_fp)))
+    cf->victim_used = 0;
+  return 1;
+}
+
+// Must be paired with cuckoo_write_end(). Waiting for write_lock releases
+// the GIL, so the write counts as active from the start.
+static void cuckoo_write_begin(CuckooFilter *cf) {
+  cf->active_ops++;
+#if ABLOOM_HAS_ATOMICS
+  if (cf->write_lock == NULL)
+    return;
+  if (!PyThread_acquire_lock(cf->write_lock, NOWAIT_LOCK)) {
+    Py_BEGIN_ALLOW_THREADS
+    PyThread_acquire_lock(cf->write_lock, WAIT_LOCK);
+    Py_END_ALLOW_THREADS
+  }
+  ATOMIC_STORE32(&cf->seq, cf->seq + 1);
+  // Keeps the table writes after the odd sequence number
+  ATOMIC_FENCE();
+#endif
+}
+
+static void cuckoo_write_end(CuckooFilter *cf) {
+#if ABLOOM_HAS_ATOMICS
+  if (cf->write_lock != NULL) {
+    ATOMIC_STORE32(&cf->seq, cf->seq + 1);
+    PyThread_release_lock(cf->write_lock);
+  }
+#endif
+  cf->active_ops--;
+}
+
+static inline uint32_t cuckoo_read_begin(CuckooFilter *cf) {
+#if ABLOOM_HAS_ATOMICS
+  if (cf->free_threading) {
+    uint32_t seq;
+    while ((seq = ATOMIC_LOAD32_ACQUIRE(&cf->seq)) & 1) {
+    }
+    return seq;
+  }
+#endif
+  return 0;
+}
+
+// Nonzero if a writer ran since cuckoo_read_begin() returned `seq`
+static inline int cuckoo_read_retry(CuckooFilter *cf, uint32_t seq) {
+#if ABLOOM_HAS_ATOMICS
+  if (cf->free_threading) {
+    ATOMIC_FENCE();
+    return ATOMIC_LOAD32(&cf->seq) != seq;
+  }
+#endif
+  return 0;
+}
+
+typedef enum { CUCKOO_ADD, CUCKOO_REMOVE, CUCKOO_CHECK } CuckooOp;
+
+// Applies `op` to a window of hashes in order, after computing and
+// prefetching both buckets of every item. Writes one 0/1 byte per hash to
+// `out` (removed or found; always 1 for CUCKOO_ADD) and returns the number
+// of ones, or -1 if the filter filled up, after adding the items before the
+// one that didn't fit. `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static inline Py_ssize_t cuckoo_apply_many(CuckooFilter *cf,
+                                           const uint64_t *hashes, size_t n,
+                                           CuckooOp op, unsigned char *out) {
+  uint64_t indexes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  uint32_t fps[ABLOOM_MAX_PREFETCH_DISTANCE];
+  int prefetch =
+      prefetch_distance > 0 && cf->table_bytes >= ABLOOM_PREFETCH_MIN_BYTES;
+  Py_ssize_t hits = 0;
+  int shift;
+
+  for (size_t i = 0; i < n; i++) {
+    indexes[i] = cuckoo_index(cf, hashes[i]);
+    fps[i] = cuckoo_fingerprint(cf, hashes[i]);
+    if (prefetch) {
+      ABLOOM_PREFETCH(cuckoo_bucket_addr(cf, indexes[i], &shift));
+      ABLOOM_PREFETCH(cuckoo_bucket_addr(
+          cf, cuckoo_alt_index(cf, indexes[i], fps[i]), &shift));
+    }
+  }
+
+  if (op == CUCKOO_CHECK) {
+    uint32_t seq;
+    do {
+      seq = cuckoo_read_begin(cf);
+      for (size_t i = 0; i < n; i++)
+        out[i] = (unsigned char)cuckoo_lookup(cf, indexes[i], fps[i]);
+    } while (cuckoo_read_retry(cf, seq));
+    for (size_t i = 0; i < n; i++)
+      hits += out[i];
+    return hits;
+  }
+
+  cuckoo_write_begin(cf);
+  for (size_t i = 0; i < n; i++) {
+    if (op == CUCKOO_ADD) {
+      if (!cuckoo_insert(cf, indexes[i], fps[i])) {
+        hits = -1;
+        break;
+      }
+      out[i] = 1;
+    } else {
+      out[i] = (unsigned char)cuckoo_delete(cf, indexes[i], fps[i]);
+    }
+    hits += out[i];
+  }
+  cuckoo_write_end(cf);
+  return hits;
+}
+
+static inline HashMode cuckoo_hash_mode(const CuckooFilter *cf) {
+  return cf->serializable ? HASH_SERIALIZABLE : HASH_FAST;
+}
+
+static void cuckoo_set_full_error(void) {
+  PyErr_SetString(PyExc_OverflowError,
+                  "CuckooFilter is full; create it with a larger capacity");
+}
+
+// Shared loop for update(), remove_many(), contains_many() and
+// count_present(), in the style of counting_apply_iter(). Items hashed
+// before an error are still added or removed.
+static inline Py_ssize_t cuckoo_apply_iter(CuckooFilter *self, PyObject *iter,
+                                           PyObject *mask, HashMode mode,
+                                           CuckooOp op) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char hits[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  Py_ssize_t total = 0;
+  Py_ssize_t found = 0;
+  Py_ssize_t allocated = mask ? PyByteArray_GET_SIZE(mask) : 0;
+  PyObject *item;
+
+  for (;;) {
+    item = PyIter_Next(iter);
+    if (item != NULL) {
+      int err = get_hash(item, mode, &hashes[n]);
+      Py_DECREF(item);
+      if (err < 0)
+        goto error;
+      if (++n < window)
+        continue;
+    } else if (PyErr_Occurred()) {
+      goto error;
+    }
+
+    Py_ssize_t window_hits = cuckoo_apply_many(self, hashes, n, op, hits);
+    if (window_hits < 0) {
+      cuckoo_set_full_error();
+      return -1;
+    }
+    found += window_hits;
+    if (mask) {
+      if (total + (Py_ssize_t)n > allocated) {
+        allocated = allocated + (allocated >> 1) + ABLOOM_MAX_PREFETCH_DISTANCE;
+        if (PyByteArray_Resize(mask, allocated) < 0)
+          return -1;
+      }
+      memcpy(PyByteArray_AS_STRING(mask) + total, hits, n);
+    }
+    total += (Py_ssize_t)n;
+    n = 0;
+
+    if (item == NULL)
+      break;
+  }
+
+  if (mask && PyByteArray_Resize(mask, total) < 0)
+    return -1;
+  return found;
+
+error:
+  // Keeps the hashing error even if the filter fills up here
+  if (op != CUCKOO_CHECK)
+    cuckoo_apply_many(self, hashes, n, op, hits);
+  return -1;
+}
+
+// Runs cuckoo_apply_iter() specialized for the filter's hash mode
+static Py_ssize_t cuckoo_apply_iterable(CuckooFilter *self,
+                                        PyObject *iterable, PyObject *mask,
+                                        CuckooOp op) {
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return -1;
+
+  Py_ssize_t found;
+  if (cuckoo_hash_mode(self) == HASH_SERIALIZABLE)
+    found = cuckoo_apply_iter(self, iter, mask, HASH_SERIALIZABLE, op);
+  else
+    found = cuckoo_apply_iter(self, iter, mask, HASH_FAST, op);
+  Py_DECREF(iter);
+  return found;
+}
+
+static PyObject *CuckooFilter_add(CuckooFilter *self, PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, cuckoo_hash_mode(self), &hash) < 0)
+    return NULL;
+
+  cuckoo_write_begin(self);
+  int stored = cuckoo_insert(self, cuckoo_index(self, hash),
+                             cuckoo_fingerprint(self, hash));
+  cuckoo_write_end(self);
+  if (!stored) {
+    cuckoo_set_full_error();
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+static PyObject *CuckooFilter_remove(CuckooFilter *self, PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, cuckoo_hash_mode(self), &hash) < 0)
+    return NULL;
+
+  cuckoo_write_begin(self);
+  int removed = cuckoo_delete(self, cuckoo_index(self, hash),
+                              cuckoo_fingerprint(self, hash));
+  cuckoo_write_end(self);
+  if (!removed) {
+    PyErr_SetObject(PyExc_KeyError, item);
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+static int CuckooFilter_contains(CuckooFilter *self, PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, cuckoo_hash_mode(self), &hash) < 0)
+    return -1;
+
+  uint64_t index = cuckoo_index(self, hash);
+  uint32_t fp = cuckoo_fingerprint(self, hash);
+  uint32_t seq;
+  int found;
+  do {
+    seq = cuckoo_read_begin(self);
+    found = cuckoo_lookup(self, index, fp);
+  } while (cuckoo_read_retry(self, seq));
+  return found;
+}
+
+static PyObject *CuckooFilter_update(CuckooFilter *self, PyObject *iterable) {
+  if (cuckoo_apply_iterable(self, iterable, NULL, CUCKOO_ADD) < 0)
+    return NULL;
+  Py_RETURN_NONE;
+}
+
+static PyObject *CuckooFilter_remove_many(CuckooFilter *self,
+                                          PyObject *iterable) {
+  Py_ssize_t removed =
+      cuckoo_apply_iterable(self, iterable, NULL, CUCKOO_REMOVE);
+  if (removed < 0)
+    return NULL;
+  return PyLong_FromSsize_t(removed);
+}
+
+static PyObject *CuckooFilter_contains_many(CuckooFilter *self,
+                                            PyObject *iterable) {
+  Py_ssize_t hint = PyObject_LengthHint(iterable, 0);
+  if (hint < 0)
+    return NULL;
+
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, hint);
+  if (mask == NULL)
+    return NULL;
+
+  if (cuckoo_apply_iterable(self, iterable, mask, CUCKOO_CHECK) < 0) {
+    Py_DECREF(mask);
+    return NULL;
+  }
+  return mask;
+}
+
+static PyObject *CuckooFilter_count_present(CuckooFilter *self,
+                                            PyObject *iterable) {
+  Py_ssize_t found = cuckoo_apply_iterable(self, iterable, NULL, CUCKOO_CHECK);
+  if (found < 0)
+    return NULL;
+  return PyLong_FromSsize_t(found);
+}
+
+static PyObject *CuckooFilter_clear(CuckooFilter *self,
+                                    PyObject *Py_UNUSED(ignored)) {
+  cuckoo_write_begin(self);
+  memset(self->table, 0, self->table_bytes);
+  self->item_count = 0;
+  self->victim_used = 0;
+  self->rng = CUCKOO_RNG_SEED;
+  cuckoo_write_end(self);
+  Py_RETURN_NONE;
+}
+
+static PyObject *CuckooFilter_copy(CuckooFilter *self,
+                                   PyObject *Py_UNUSED(ignored)) {
+  CuckooFilter *copy =
+      (CuckooFilter *)Py_TYPE(self)->tp_alloc(Py_TYPE(self), 0);
+  if (copy == NULL) {
+    return NULL;
+  }
+
+  cuckoo_set_geometry(copy, self->fp_bits, self->bucket_count);
+  copy->capacity = self->capacity;
+  copy->fp_rate = self->fp_rate;
+  copy->serializable = self->serializable;
+  copy->free_threading = self->free_threading;
+  if (copy->free_threading) {
+    copy->write_lock = PyThread_allocate_lock();
+    if (copy->write_lock == NULL) {
+      Py_DECREF(copy);
+      return PyErr_NoMemory();
+    }
+  }
+
+  copy->table = storage_alloc(copy->table_bytes, 0, &copy->storage_base,
+                              &copy->storage_bytes, &copy->storage);
+  if (copy->table == NULL) {
+    Py_DECREF(copy);
+    return NULL;
+  }
+  // Holding the write lock keeps the table, count and victim consistent
+  cuckoo_write_begin(self);
+  memcpy(copy->table, self->table, self->table_bytes);
+  copy->item_count = self->item_count;
+  copy->victim_bucket = self->victim_bucket;
+  copy->victim_fp = self->victim_fp;
+  copy->victim_used = self->victim_used;
+  copy->rng = self->rng;
+  cuckoo_write_end(self);
+
+  return (PyObject *)copy;
+}
+
+static int CuckooFilter_bool(CuckooFilter *self) {
+  return self->item_count != 0;
+}
+
+static PyObject *CuckooFilter_richcompare(CuckooFilter *self, PyObject *other,
+                                          int op) {
+  if (op != Py_EQ && op != Py_NE) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  CuckooFilter *other_cf = (CuckooFilter *)other;
+  int equal = self->capacity == other_cf->capacity &&
+              self->fp_rate == other_cf->fp_rate &&
+              self->serializable == other_cf->serializable &&
+              self->free_threading == other_cf->free_threading &&
+              self->item_count == other_cf->item_count &&
+              self->victim_used == other_cf->victim_used;
+
+  if (equal && self->victim_used) {
+    equal = self->victim_fp == other_cf->victim_fp &&
+            self->victim_bucket == other_cf->victim_bucket;
+  }
+  if (equal) {
+    self->active_ops++;
+    other_cf->active_ops++;
+    PyThreadState *save = nogil_begin(self->table_bytes);
+    equal = (memcmp(self->table, other_cf->table, self->table_bytes) == 0);
+    nogil_end(save);
+    self->active_ops--;
+    other_cf->active_ops--;
+  }
+
+  if (op == Py_EQ) {
+    return PyBool_FromLong(equal);
+  }
+  return PyBool_FromLong(!equal);
+}
+
+static PyObject *CuckooFilter_get_capacity(CuckooFilter *self, void *closure) {
+  return PyLong_FromUnsignedLongLong(self->capacity);
+}
+
+static PyObject *CuckooFilter_get_fp_rate(CuckooFilter *self, void *closure) {
+  return PyFloat_FromDouble(self->fp_rate);
+}
+
+static PyObject *CuckooFilter_get_fingerprint_bits(CuckooFilter *self,
+                                                   void *closure) {
+  return PyLong_FromLong(self->fp_bits);
+}
+
+static PyObject *CuckooFilter_get_bucket_count(CuckooFilter *self,
+                                               void *closure) {
+  return PyLong_FromUnsignedLongLong(self->bucket_count);
+}
+
+static PyObject *CuckooFilter_get_byte_count(CuckooFilter *self,
+                                             void *closure) {
+  return PyLong_FromUnsignedLongLong((uint64_t)self->table_bytes);
+}
+
+static PyObject *CuckooFilter_get_item_count(CuckooFilter *self,
+                                             void *closure) {
+  return PyLong_FromUnsignedLongLong(self->item_count);
+}
+
+static PyObject *CuckooFilter_get_serializable(CuckooFilter *self,
+                                               void *closure) {
+  return PyBool_FromLong(self->serializable);
+}
+
+static PyObject *CuckooFilter_get_free_threading(CuckooFilter *self,
+                                                 void *closure) {
+  return PyBool_FromLong(self->free_threading);
+}
+
+static void CuckooFilter_free_table(CuckooFilter *self) {
+  if (self->storage_base != NULL)
+    storage_free(self->storage_base, self->storage_bytes, self->storage);
+  self->storage_base = NULL;
+  self->table = NULL;
+}
+
+static void CuckooFilter_dealloc(CuckooFilter *self) {
+  CuckooFilter_free_table(self);
+  if (self->write_lock) {
+    PyThread_free_lock(self->write_lock);
+  }
+  Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static int CuckooFilter_init(CuckooFilter *self, PyObject *args,
+                             PyObject *kwds) {
+  static char *kwlist[] = {"capacity", "fp_rate", "serializable",
+                           "free_threading", NULL};
+  long long capacity_signed;
+  double fp_rate = 0.01;
+  int serializable = 0;
+  int free_threading = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "L|dpp", kwlist,
+                                   &capacity_signed, &fp_rate, &serializable,
+                                   &free_threading)) {
+    return -1;
+  }
+
+  if (self->active_ops > 0) {
+    PyErr_SetString(PyExc_BufferError,
+                    "Cannot reinitialize a CuckooFilter while another "
+                    "operation is using it");
+    return -1;
+  }
+
+  if (capacity_signed <= 0) {
+    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
+    return -1;
+  }
+
+  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    return -1;
+  }
+
+  if (free_threading && !ABLOOM_HAS_ATOMICS) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "free_threading=True requires C11 atomics, which are not "
+                    "available in this build. Use a pre-built wheel or rebuild "
+                    "with a modern compiler.");
+    return -1;
+  }
+
+  int fp_bits;
+  uint64_t bucket_count;
+  int err = cuckoo_size((uint64_t)capacity_signed, fp_rate, &fp_bits,
+                        &bucket_count);
+  if (err == -2) {
+    PyErr_SetString(PyExc_ValueError,
+                    "fp_rate is too low for 16-bit fingerprints (minimum "
+                    "about 8.6e-05); use BloomFilter for lower rates");
+    return -1;
+  }
+  if (err < 0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Capacity too large: would cause integer overflow");
+    return -1;
+  }
+
+  if (free_threading && self->write_lock == NULL) {
+    self->write_lock = PyThread_allocate_lock();
+    if (self->write_lock == NULL) {
+      PyErr_NoMemory();
+      return -1;
+    }
+  }
+
+  // The new table is allocated first so that a failure leaves the filter as
+  // it was
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  unsigned char *table =
+      storage_alloc(cuckoo_table_bytes(fp_bits, bucket_count), 1,
+                    &storage_base, &storage_bytes, &storage);
+  if (table == NULL)
+    return -1;
+  CuckooFilter_free_table(self);
+  self->table = table;
+  self->storage_base = storage_base;
+  self->storage_bytes = storage_bytes;
+  self->storage = storage;
+
+  cuckoo_set_geometry(self, fp_bits, bucket_count);
+  self->capacity = (uint64_t)capacity_signed;
+  self->fp_rate = fp_rate;
+  self->serializable = serializable;
+  self->free_threading = free_threading;
+  self->item_count = 0;
+  self->victim_used = 0;
+  self->rng = CUCKOO_RNG_SEED;
+  return 0;
+}
+
+static PyObject *CuckooFilter_new(PyTypeObject *type, PyObject *args,
+                                  PyObject *kwds) {
+  // tp_alloc zeroes the object, so the table is NULL until __init__
+  CuckooFilter *self = (CuckooFilter *)type->tp_alloc(type, 0);
+  if (self != NULL) {
+    self->storage = STORAGE_ALIGNED;
+  }
+  return (PyObject *)self;
+}
 
-  return (PyObject *)result;
+static PyObject *CuckooFilter_repr(CuckooFilter *self) {
+  PyObject *fp_obj = PyFloat_FromDouble(self->fp_rate);
+  if (!fp_obj)
+    return NULL;
+
+  PyObject *repr = PyUnicode_FromFormat(
+      "<CuckooFilter capacity=%llu fp_rate=%R serializable=%s>",
+      self->capacity, fp_obj, self->serializable ? "True" : "False");
+
+  Py_DECREF(fp_obj);
+  return repr;
 }
 
-static PyObject *BloomFilter_ior(BloomFilter *self, PyObject *other) {
-  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
-    Py_RETURN_NOTIMPLEMENTED;
-  }
+static PyMethodDef CuckooFilter_methods[] = {
+    {"add", (PyCFunction)CuckooFilter_add, METH_O,
+     "Add an item to the cuckoo filter"},
+    {"remove", (PyCFunction)CuckooFilter_remove, METH_O,
+     "Remove an item, raising KeyError if it is definitely absent"},
+    {"update", (PyCFunction)CuckooFilter_update, METH_O,
+     "Add items from an iterable to the cuckoo filter"},
+    {"remove_many", (PyCFunction)CuckooFilter_remove_many, METH_O,
+     "Remove items from an iterable, returning how many were removed"},
+    {"contains_many", (PyCFunction)CuckooFilter_contains_many, METH_O,
+     "Test every item of an iterable, returning a bytearray mask"},
+    {"count_present", (PyCFunction)CuckooFilter_count_present, METH_O,
+     "Count the items of an iterable that might be in the filter"},
+    {"copy", (PyCFunction)CuckooFilter_copy, METH_NOARGS,
+     "Return a copy of the cuckoo filter"},
+    {"clear", (PyCFunction)CuckooFilter_clear, METH_NOARGS,
+     "Remove all items from the cuckoo filter"},
+    {NULL}};
 
-  BloomFilter *other_bf = (BloomFilter *)other;
+static PyGetSetDef CuckooFilter_getsetters[] = {
+    {"capacity", (getter)CuckooFilter_get_capacity, NULL,
+     "Expected number of items", NULL},
+    {"fp_rate", (getter)CuckooFilter_get_fp_rate, NULL,
+     "Target false positive rate", NULL},
+    {"fingerprint_bits", (getter)CuckooFilter_get_fingerprint_bits, NULL,
+     "Bits per stored fingerprint (12 to 16)", NULL},
+    {"bucket_count", (getter)CuckooFilter_get_bucket_count, NULL,
+     "Number of 4-slot buckets", NULL},
+    {"byte_count", (getter)CuckooFilter_get_byte_count, NULL,
+     "Memory usage in bytes", NULL},
+    {"item_count", (getter)CuckooFilter_get_item_count, NULL,
+     "Number of fingerprints stored", NULL},
+    {"serializable", (getter)CuckooFilter_get_serializable, NULL,
+     "Whether the filter uses deterministic hashing", NULL},
+    {"free_threading", (getter)CuckooFilter_get_free_threading, NULL,
+     "Whether the filter locks writers for free-threaded Python", NULL},
+    {NULL}};
 
-  if (!BloomFilter_compatible(self, other_bf)) {
-    PyErr_SetString(PyExc_ValueError,
-                    "BloomFilters must have the same capacity, fp_rate, "
-                    "serializable, and free_threading");
-    return NULL;
-  }
+static PySequenceMethods CuckooFilter_as_sequence = {
+    .sq_contains = (objobjproc)CuckooFilter_contains,
+};
 
-  uint64_t *self_blocks = self->blocks;
-  uint64_t *other_blocks = other_bf->blocks;
-  size_t num_words = self->block_count * BLOCK_WORDS;
+static PyNumberMethods CuckooFilter_as_number = {
+    .nb_bool = (inquiry)CuckooFilter_bool,
+};
 
-  for (size_t i = 0; i < num_words; i++) {
-    self_blocks[i] |= other_blocks[i];
-  }
+static PyTypeObject CuckooFilterType = {
+    PyVarObject_HEAD_INIT(NULL, 0).tp_name = "abloom._abloom.CuckooFilter",
+    .tp_doc = "Cuckoo filter with 4-slot buckets of 12-16 bit fingerprints",
+    .tp_basicsize = sizeof(CuckooFilter),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = CuckooFilter_new,
+    .tp_init = (initproc)CuckooFilter_init,
+    .tp_dealloc = (destructor)CuckooFilter_dealloc,
+    .tp_repr = (reprfunc)CuckooFilter_repr,
+    .tp_richcompare = (richcmpfunc)CuckooFilter_richcompare,
+    .tp_methods = CuckooFilter_methods,
+    .tp_getset = CuckooFilter_getsetters,
+    .tp_as_sequence = &CuckooFilter_as_sequence,
+    .tp_as_number = &CuckooFilter_as_number,
+};
 
-  Py_INCREF(self);
-  return (PyObject *)self;
+// FrozenFilter: an immutable binary fuse filter (Graf and Lemire, "Binary
+// Fuse Filters: Fast and Smaller Than Xor Filters", 2022). The array holds
+// 8- or 16-bit fingerprints at about 1.13x the information-theoretic minimum
+// for large sets, against 1.44x for a Bloom filter. Each key maps to three
+// cells in consecutive segments of the array and is present when the XOR of
+// the cells equals its fingerprint. Cells and fingerprint come from
+// mix64(hash + seed), where hash is the item's get_hash() value.
+//
+// build() solves for the array by peeling: a cell that only one key maps to
+// can be assigned last to fix that key's XOR, so keys are removed cell by
+// cell, then assigned in reverse. A seed that leaves keys unpeeled is
+// replaced, which is rare at the sizes below.
+#define FUSE_MIN_SEGMENT_LENGTH 4
+#define FUSE_MAX_SEGMENT_LENGTH 262144
+#define FUSE_MAX_ATTEMPTS 100
+// Start of the splitmix64 sequence the seeds are drawn from. It is fixed, so
+// building from the same items in the same order gives the same bytes.
+#define FUSE_SEED_STATE 0x726b2b9d438b9d4dULL
+
+typedef struct {
+  PyObject_HEAD unsigned char *fingerprints;
+  // Allocation that owns `fingerprints` (see storage_alloc()), or the
+  // mapping made by open() for STORAGE_FILE
+  void *storage_base;
+  size_t storage_bytes;
+  StorageKind storage;
+  Py_buffer file_view;
+  uint64_t seed;
+  uint32_t segment_length;
+  uint32_t segment_length_mask;
+  uint32_t segment_count_length;
+  uint32_t array_length;
+  uint64_t item_count;
+  double fp_rate;
+  int fp_bits;
+  int serializable;
+} FrozenFilter;
+
+// Fingerprint width for a target rate: an absent key matches with
+// probability 2^-fp_bits. Returns 0 if 16 bits are not enough.
+static int fuse_fingerprint_bits(double fp_rate) {
+  if (fp_rate >= 1.0 / 256)
+    return 8;
+  if (fp_rate >= 1.0 / 65536)
+    return 16;
+  return 0;
 }
 
-static int BloomFilter_bool(BloomFilter *self) {
-  size_t num_words = self->block_count * BLOCK_WORDS;
-  for (size_t i = 0; i < num_words; i++) {
-    if (self->blocks[i] != 0) {
-      return 1;
-    }
-  }
+// Sizing of the reference implementation for 3-wise filters of n keys.
+// Returns -1 if the array would need more than 2^32 - 1 cells.
+static int fuse_set_geometry(FrozenFilter *ff, uint64_t n) {
+  uint64_t segment_length = FUSE_MIN_SEGMENT_LENGTH;
+  if (n > 1)
+    segment_length = (uint64_t)1
+                     << (int)floor(log((double)n) / log(3.33) + 2.25);
+  if (segment_length > FUSE_MAX_SEGMENT_LENGTH)
+    segment_length = FUSE_MAX_SEGMENT_LENGTH;
+
+  double size_factor =
+      n <= 1 ? 0.0 : fmax(1.125, 0.875 + 0.25 * log(1e6) / log((double)n));
+  double cells = round((double)n * size_factor);
+  double segment_count = ceil(cells / (double)segment_length) - 2;
+  if (segment_count < 1)
+    segment_count = 1;
+  if ((segment_count + 2) * (double)segment_length > (double)UINT32_MAX)
+    return -1;
+
+  ff->segment_length = (uint32_t)segment_length;
+  ff->segment_length_mask = (uint32_t)segment_length - 1;
+  ff->segment_count_length = (uint32_t)segment_count * (uint32_t)segment_length;
+  ff->array_length = ff->segment_count_length + 2 * (uint32_t)segment_length;
   return 0;
 }
 
-static PyObject *BloomFilter_clear(BloomFilter *self,
-                                   PyObject *Py_UNUSED(ignored)) {
-  size_t num_bytes = self->block_count * BLOCK_BYTES;
-  memset(self->blocks, 0, num_bytes);
-  Py_RETURN_NONE;
+static inline size_t frozen_nbytes(const FrozenFilter *ff) {
+  return (size_t)ff->array_length * (size_t)(ff->fp_bits / 8);
 }
 
-static PyObject *BloomFilter_copy(BloomFilter *self,
-                                  PyObject *Py_UNUSED(ignored)) {
-  BloomFilter *copy = (BloomFilter *)Py_TYPE(self)->tp_alloc(Py_TYPE(self), 0);
-  if (copy == NULL) {
-    return NULL;
+// High 64 bits of the 128-bit product, which maps a hash onto [0, b)
+static inline uint64_t fuse_mulhi(uint64_t a, uint64_t b) {
+#if defined(__SIZEOF_INT128__)
+  return (uint64_t)(((unsigned __int128)a * b) >> 64);
+#elif defined(_MSC_VER) && (defined(_M_X64) || defined(_M_ARM64))
+  return __umulh(a, b);
+#else
+  uint64_t a_lo = (uint32_t)a, a_hi = a >> 32;
+  uint64_t b_lo = (uint32_t)b, b_hi = b >> 32;
+  uint64_t lo_lo = a_lo * b_lo;
+  uint64_t hi_lo = a_hi * b_lo;
+  uint64_t cross = (lo_lo >> 32) + (uint32_t)hi_lo + a_lo * b_hi;
+  return a_hi * b_hi + (hi_lo >> 32) + (cross >> 32);
+#endif
+}
+
+static inline uint64_t fuse_splitmix64(uint64_t *state) {
+  uint64_t z = (*state += 0x9E3779B97F4A7C15ULL);
+  z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+  z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+  return z ^ (z >> 31);
+}
+
+// The three cells of a mixed hash: one in each of three consecutive segments
+static inline void fuse_positions(const FrozenFilter *ff, uint64_t mixed,
+                                  uint32_t *pos) {
+  uint32_t h0 = (uint32_t)fuse_mulhi(mixed, ff->segment_count_length);
+  pos[0] = h0;
+  pos[1] = (h0 + ff->segment_length) ^
+           ((uint32_t)(mixed >> 18) & ff->segment_length_mask);
+  pos[2] = (h0 + 2 * ff->segment_length) ^
+           ((uint32_t)mixed & ff->segment_length_mask);
+}
+
+static inline uint32_t fuse_fingerprint(uint64_t mixed) {
+  return (uint32_t)(mixed ^ (mixed >> 32));
+}
+
+static inline int frozen_match(const FrozenFilter *ff, uint64_t mixed,
+                               const uint32_t *pos) {
+  // The cells of an empty filter are all zero, which would match every
+  // fingerprint of zero
+  if (ff->item_count == 0)
+    return 0;
+  uint32_t fp = fuse_fingerprint(mixed);
+  if (ff->fp_bits == 8) {
+    const uint8_t *f = ff->fingerprints;
+    return (uint8_t)(fp ^ f[pos[0]] ^ f[pos[1]] ^ f[pos[2]]) == 0;
   }
+  const uint16_t *f = (const uint16_t *)ff->fingerprints;
+  return (uint16_t)(fp ^ f[pos[0]] ^ f[pos[1]] ^ f[pos[2]]) == 0;
+}
 
-  copy->block_count = self->block_count;
-  copy->capacity = self->capacity;
-  copy->fp_rate = self->fp_rate;
-  copy->serializable = self->serializable;
-  copy->free_threading = self->free_threading;
+// Scratch arrays of one build(), allocated with the GIL held
+typedef struct {
+  // The mixed hashes grouped by segment, then the peeled keys in order
+  uint64_t *order;
+  // Which of its three cells each peeled key was removed from
+  uint8_t *order_slot;
+  // Per cell: XOR of the mixed hashes of the keys mapped to it
+  uint64_t *t2hash;
+  // Per cell: 4 * number of keys, plus the XOR of their slot indexes
+  uint8_t *t2count;
+  uint32_t *alone;
+  uint32_t *start;
+  int block_bits;
+} FuseScratch;
+
+// Bits of the mixed hash used to group keys by segment before adding them,
+// which keeps the cell updates close to each other in memory
+static int fuse_block_bits(const FrozenFilter *ff) {
+  uint32_t segment_count = ff->segment_count_length / ff->segment_length;
+  int bits = 1;
+  while (((uint32_t)1 << bits) < segment_count)
+    bits++;
+  return bits;
+}
 
-  size_t num_bytes = self->block_count * BLOCK_BYTES;
-  copy->blocks = PyMem_Malloc(num_bytes);
-  if (copy->blocks == NULL) {
-    Py_DECREF(copy);
-    return PyErr_NoMemory();
+static int fuse_compare_u64(const void *a, const void *b) {
+  uint64_t x = *(const uint64_t *)a;
+  uint64_t y = *(const uint64_t *)b;
+  return (x > y) - (x < y);
+}
+
+// Sorts the keys and drops repeats, returning the new count
+static size_t fuse_dedup(uint64_t *keys, size_t n) {
+  if (n == 0)
+    return 0;
+  qsort(keys, n, sizeof(uint64_t), fuse_compare_u64);
+  size_t m = 1;
+  for (size_t i = 1; i < n; i++) {
+    if (keys[i] != keys[m - 1])
+      keys[m++] = keys[i];
   }
-  memcpy(copy->blocks, self->blocks, num_bytes);
+  return m;
+}
 
-  return (PyObject *)copy;
+// Adds or removes one mixed hash at one of its cells
+static inline void fuse_toggle(FuseScratch *s, uint32_t cell, uint64_t mixed,
+                               int slot, int add) {
+  s->t2count[cell] = (uint8_t)(add ? s->t2count[cell] + 4
+                                   : s->t2count[cell] - 4);
+  s->t2count[cell] ^= (uint8_t)slot;
+  s->t2hash[cell] ^= mixed;
 }
 
-static PyObject *BloomFilter_to_bytes(BloomFilter *self,
-                                      PyObject *Py_UNUSED(ignored)) {
-  if (!self->serializable) {
-    PyErr_SetString(PyExc_ValueError, "to_bytes() requires serializable=True");
-    return NULL;
+// Finds a seed and fills the fingerprints for the `*count` keys, which are
+// item hashes. Repeated keys are dropped; `*count` is updated to the number
+// of distinct ones. Runs without the GIL. Returns -1 if every seed failed.
+static int fuse_populate(FrozenFilter *ff, uint64_t *keys, size_t *count,
+                         FuseScratch *s) {
+  size_t n = *count;
+  size_t cells = ff->array_length;
+  uint32_t block = (uint32_t)1 << s->block_bits;
+  uint64_t state = FUSE_SEED_STATE;
+  int deduped = 0;
+
+  for (int attempt = 0; attempt < FUSE_MAX_ATTEMPTS; attempt++) {
+    ff->seed = fuse_splitmix64(&state);
+    memset(s->order, 0, n * sizeof(uint64_t));
+    // Keeps the probe below from running past the end
+    s->order[n] = 1;
+    memset(s->t2count, 0, cells);
+    memset(s->t2hash, 0, cells * sizeof(uint64_t));
+
+    for (uint32_t b = 0; b < block; b++)
+      s->start[b] = (uint32_t)(((uint64_t)b * n) >> s->block_bits);
+    for (size_t i = 0; i < n; i++) {
+      uint64_t mixed = mix64(keys[i] + ff->seed);
+      uint32_t b = (uint32_t)(mixed >> (64 - s->block_bits));
+      while (s->order[s->start[b]] != 0)
+        b = (b + 1) & (block - 1);
+      s->order[s->start[b]++] = mixed;
+    }
+
+    int overflow = 0;
+    size_t duplicates = 0;
+    uint32_t pos[5];
+    for (size_t i = 0; i < n; i++) {
+      uint64_t mixed = s->order[i];
+      fuse_positions(ff, mixed, pos);
+      for (int slot = 0; slot < 3; slot++)
+        fuse_toggle(s, pos[slot], mixed, slot, 1);
+      // A key added twice cancels out of t2hash and leaves a count of 2,
+      // unless other keys share its cells; those are left to fuse_dedup()
+      if ((s->t2hash[pos[0]] & s->t2hash[pos[1]] & s->t2hash[pos[2]]) == 0 &&
+          ((s->t2hash[pos[0]] == 0 && s->t2count[pos[0]] == 8) ||
+           (s->t2hash[pos[1]] == 0 && s->t2count[pos[1]] == 8) ||
+           (s->t2hash[pos[2]] == 0 && s->t2count[pos[2]] == 8))) {
+        duplicates++;
+        for (int slot = 0; slot < 3; slot++)
+          fuse_toggle(s, pos[slot], mixed, slot, 0);
+      }
+      // More than 63 keys in a cell wrap the count
+      for (int slot = 0; slot < 3; slot++)
+        overflow |= s->t2count[pos[slot]] < 4;
+    }
+
+    size_t peeled = 0;
+    if (!overflow) {
+      size_t queued = 0;
+      for (size_t i = 0; i < cells; i++) {
+        s->alone[queued] = (uint32_t)i;
+        queued += (s->t2count[i] >> 2) == 1;
+      }
+      while (queued > 0) {
+        uint32_t cell = s->alone[--queued];
+        if ((s->t2count[cell] >> 2) != 1)
+          continue;
+        uint64_t mixed = s->t2hash[cell];
+        int found = s->t2count[cell] & 3;
+        fuse_positions(ff, mixed, pos);
+        pos[3] = pos[0];
+        pos[4] = pos[1];
+        s->order_slot[peeled] = (uint8_t)found;
+        s->order[peeled++] = mixed;
+        for (int k = 1; k <= 2; k++) {
+          uint32_t other = pos[found + k];
+          s->alone[queued] = other;
+          queued += (s->t2count[other] >> 2) == 2;
+          fuse_toggle(s, other, mixed, (found + k) % 3, 0);
+        }
+      }
+      if (peeled + duplicates == n) {
+        *count = peeled;
+        for (size_t i = peeled; i-- > 0;) {
+          uint64_t mixed = s->order[i];
+          int slot = s->order_slot[i];
+          fuse_positions(ff, mixed, pos);
+          pos[3] = pos[0];
+          pos[4] = pos[1];
+          uint32_t fp = fuse_fingerprint(mixed);
+          if (ff->fp_bits == 8) {
+            uint8_t *f = ff->fingerprints;
+            f[pos[slot]] = (uint8_t)(fp ^ f[pos[slot + 1]] ^ f[pos[slot + 2]]);
+          } else {
+            uint16_t *f = (uint16_t *)ff->fingerprints;
+            f[pos[slot]] =
+                (uint16_t)(fp ^ f[pos[slot + 1]] ^ f[pos[slot + 2]]);
+          }
+        }
+        return 0;
+      }
+    }
+
+    // Repeats the inline check missed keep keys unpeelable and can overflow
+    // counts under every seed, so drop them before trying again
+    if (!deduped) {
+      n = fuse_dedup(keys, n);
+      deduped = 1;
+    }
   }
+  return -1;
+}
 
-  size_t block_data_size = self->block_count * BLOCK_BYTES;
-  size_t total_size = ABLOOM_HEADER_SIZE + block_data_size;
+static inline uint16_t byteswap16(uint16_t v) {
+  return (uint16_t)((v >> 8) | (v << 8));
+}
 
-  PyObject *result = PyBytes_FromStringAndSize(NULL, total_size);
-  if (result == NULL) {
-    return NULL;
+// Converts 16-bit fingerprints between host and little-endian order
+static void frozen_swap_fingerprints(FrozenFilter *ff, unsigned char *data) {
+  if (ff->fp_bits != 16 || host_is_little_endian())
+    return;
+  uint16_t *f = (uint16_t *)data;
+  for (uint32_t i = 0; i < ff->array_length; i++)
+    f[i] = byteswap16(f[i]);
+}
+
+static inline HashMode frozen_hash_mode(const FrozenFilter *ff) {
+  return ff->serializable ? HASH_SERIALIZABLE : HASH_FAST;
+}
+
+// `n` must not exceed ABLOOM_MAX_PREFETCH_DISTANCE
+static inline Py_ssize_t frozen_check_many(const FrozenFilter *ff,
+                                           const uint64_t *hashes, size_t n,
+                                           unsigned char *out) {
+  uint64_t mixed[ABLOOM_MAX_PREFETCH_DISTANCE];
+  uint32_t pos[ABLOOM_MAX_PREFETCH_DISTANCE][3];
+  int prefetch =
+      prefetch_distance > 0 && frozen_nbytes(ff) >= ABLOOM_PREFETCH_MIN_BYTES;
+  size_t width = (size_t)(ff->fp_bits / 8);
+  Py_ssize_t hits = 0;
+
+  for (size_t i = 0; i < n; i++) {
+    mixed[i] = mix64(hashes[i] + ff->seed);
+    fuse_positions(ff, mixed[i], pos[i]);
+    if (prefetch) {
+      for (int k = 0; k < 3; k++)
+        ABLOOM_PREFETCH(ff->fingerprints + (size_t)pos[i][k] * width);
+    }
   }
+  for (size_t i = 0; i < n; i++) {
+    out[i] = (unsigned char)frozen_match(ff, mixed[i], pos[i]);
+    hits += out[i];
+  }
+  return hits;
+}
 
-  unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
-  size_t offset = 0;
+// Shared loop for contains_many() and count_present(), in the style of
+// cuckoo_apply_iter()
+static inline Py_ssize_t frozen_check_iter(FrozenFilter *self, PyObject *iter,
+                                           PyObject *mask, HashMode mode) {
+  uint64_t hashes[ABLOOM_MAX_PREFETCH_DISTANCE];
+  unsigned char hits[ABLOOM_MAX_PREFETCH_DISTANCE];
+  size_t window = bloom_window();
+  size_t n = 0;
+  Py_ssize_t total = 0;
+  Py_ssize_t found = 0;
+  Py_ssize_t allocated = mask ? PyByteArray_GET_SIZE(mask) : 0;
+  PyObject *item;
 
-  memcpy(buf + offset, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE);
-  offset += ABLOOM_MAGIC_SIZE;
+  for (;;) {
+    item = PyIter_Next(iter);
+    if (item != NULL) {
+      int err = get_hash(item, mode, &hashes[n]);
+      Py_DECREF(item);
+      if (err < 0)
+        return -1;
+      if (++n < window)
+        continue;
+    } else if (PyErr_Occurred()) {
+      return -1;
+    }
 
-  buf[offset++] = ABLOOM_VERSION;
+    found += frozen_check_many(self, hashes, n, hits);
+    if (mask) {
+      if (total + (Py_ssize_t)n > allocated) {
+        allocated = allocated + (allocated >> 1) + ABLOOM_MAX_PREFETCH_DISTANCE;
+        if (PyByteArray_Resize(mask, allocated) < 0)
+          return -1;
+      }
+      memcpy(PyByteArray_AS_STRING(mask) + total, hits, n);
+    }
+    total += (Py_ssize_t)n;
+    n = 0;
 
-  write_be64(buf + offset, self->capacity);
-  offset += 8;
+    if (item == NULL)
+      break;
+  }
 
-  union {
-    double d;
-    uint64_t u;
-  } fp_union;
-  fp_union.d = self->fp_rate;
-  write_be64(buf + offset, fp_union.u);
-  offset += 8;
+  if (mask && PyByteArray_Resize(mask, total) < 0)
+    return -1;
+  return found;
+}
 
-  write_be64(buf + offset, self->block_count);
-  offset += 8;
+// Runs frozen_check_iter() specialized for the filter's hash mode
+static Py_ssize_t frozen_check_iterable(FrozenFilter *self, PyObject *iterable,
+                                        PyObject *mask) {
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return -1;
 
-  buf[offset++] = self->free_threading ? 1 : 0;
+  Py_ssize_t found;
+  if (frozen_hash_mode(self) == HASH_SERIALIZABLE)
+    found = frozen_check_iter(self, iter, mask, HASH_SERIALIZABLE);
+  else
+    found = frozen_check_iter(self, iter, mask, HASH_FAST);
+  Py_DECREF(iter);
+  return found;
+}
 
-  size_t num_words = self->block_count * BLOCK_WORDS;
-  for (size_t i = 0; i < num_words; i++) {
-    write_be64(buf + offset, self->blocks[i]);
-    offset += 8;
+// Collects the hashes of every item of `iterable` into a PyMem array
+static uint64_t *frozen_collect_hashes(PyObject *iterable, HashMode mode,
+                                       size_t *count) {
+  Py_ssize_t hint = PyObject_LengthHint(iterable, 0);
+  if (hint < 0)
+    return NULL;
+  PyObject *iter = PyObject_GetIter(iterable);
+  if (iter == NULL)
+    return NULL;
+
+  size_t allocated = hint > ABLOOM_MAX_PREFETCH_DISTANCE
+                         ? (size_t)hint
+                         : ABLOOM_MAX_PREFETCH_DISTANCE;
+  size_t n = 0;
+  uint64_t *keys = PyMem_Malloc(allocated * sizeof(uint64_t));
+  if (keys == NULL) {
+    PyErr_NoMemory();
+    goto error;
   }
 
-  return result;
+  PyObject *item;
+  while ((item = PyIter_Next(iter)) != NULL) {
+    if (n == allocated) {
+      size_t grown = allocated + (allocated >> 1);
+      uint64_t *resized = grown > PY_SSIZE_T_MAX / sizeof(uint64_t)
+                              ? NULL
+                              : PyMem_Realloc(keys, grown * sizeof(uint64_t));
+      if (resized == NULL) {
+        Py_DECREF(item);
+        PyErr_NoMemory();
+        goto error;
+      }
+      keys = resized;
+      allocated = grown;
+    }
+    int err = get_hash(item, mode, &keys[n]);
+    Py_DECREF(item);
+    if (err < 0)
+      goto error;
+    n++;
+  }
+  if (PyErr_Occurred())
+    goto error;
+
+  Py_DECREF(iter);
+  *count = n;
+  return keys;
+
+error:
+  PyMem_Free(keys);
+  Py_DECREF(iter);
+  return NULL;
 }
 
-static PyObject *BloomFilter_from_bytes(PyTypeObject *type, PyObject *args) {
-  PyObject *data_obj;
+static PyObject *FrozenFilter_build(PyTypeObject *type, PyObject *args,
+                                    PyObject *kwds) {
+  static char *kwlist[] = {"iterable", "fp_rate", "serializable", NULL};
+  PyObject *iterable;
+  double fp_rate = 0.01;
+  int serializable = 0;
 
-  if (!PyArg_ParseTuple(args, "O", &data_obj)) {
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|d$p:build", kwlist,
+                                   &iterable, &fp_rate, &serializable)) {
     return NULL;
   }
 
-  if (!PyBytes_Check(data_obj)) {
-    PyErr_SetString(PyExc_TypeError, "from_bytes() requires bytes");
+  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "False positive rate must be between 0.0 and 1.0");
+    return NULL;
+  }
+  int fp_bits = fuse_fingerprint_bits(fp_rate);
+  if (fp_bits == 0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "fp_rate is too low for 16-bit fingerprints (minimum "
+                    "2**-16, about 1.5e-05); use BloomFilter for lower rates");
     return NULL;
   }
 
-  const unsigned char *data =
-      (const unsigned char *)PyBytes_AS_STRING(data_obj);
-  Py_ssize_t data_len = PyBytes_GET_SIZE(data_obj);
+  size_t n;
+  uint64_t *keys = frozen_collect_hashes(
+      iterable, serializable ? HASH_SERIALIZABLE : HASH_FAST, &n);
+  if (keys == NULL)
+    return NULL;
 
-  if (data_len < ABLOOM_HEADER_SIZE) {
-    PyErr_SetString(PyExc_ValueError, "Invalid data: too short for header");
+  FrozenFilter *self = (FrozenFilter *)type->tp_alloc(type, 0);
+  if (self == NULL) {
+    PyMem_Free(keys);
     return NULL;
   }
+  self->storage = STORAGE_ALIGNED;
+  self->fp_rate = fp_rate;
+  self->fp_bits = fp_bits;
+  self->serializable = serializable;
+  if (fuse_set_geometry(self, (uint64_t)n) < 0) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Too many items: would cause integer overflow");
+    goto error;
+  }
+  self->fingerprints =
+      storage_alloc(frozen_nbytes(self), 1, &self->storage_base,
+                    &self->storage_bytes, &self->storage);
+  if (self->fingerprints == NULL)
+    goto error;
+
+  if (n > 0) {
+    size_t cells = self->array_length;
+    FuseScratch s = {0};
+    s.block_bits = fuse_block_bits(self);
+    s.order = PyMem_Malloc((n + 1) * sizeof(uint64_t));
+    s.order_slot = PyMem_Malloc(n);
+    s.t2hash = PyMem_Malloc(cells * sizeof(uint64_t));
+    s.t2count = PyMem_Malloc(cells);
+    s.alone = PyMem_Malloc(cells * sizeof(uint32_t));
+    s.start = PyMem_Malloc(((size_t)1 << s.block_bits) * sizeof(uint32_t));
+
+    int built = -2;
+    if (s.order && s.order_slot && s.t2hash && s.t2count && s.alone &&
+        s.start) {
+      PyThreadState *save = nogil_begin(cells * sizeof(uint64_t));
+      built = fuse_populate(self, keys, &n, &s);
+      nogil_end(save);
+    }
+    PyMem_Free(s.order);
+    PyMem_Free(s.order_slot);
+    PyMem_Free(s.t2hash);
+    PyMem_Free(s.t2count);
+    PyMem_Free(s.alone);
+    PyMem_Free(s.start);
+
+    if (built == -2) {
+      PyErr_NoMemory();
+      goto error;
+    }
+    if (built < 0) {
+      PyErr_Format(PyExc_RuntimeError,
+                   "Could not build the FrozenFilter after %d attempts",
+                   FUSE_MAX_ATTEMPTS);
+      goto error;
+    }
+  }
+  self->item_count = (uint64_t)n;
+  PyMem_Free(keys);
+  return (PyObject *)self;
 
-  size_t offset = 0;
+error:
+  PyMem_Free(keys);
+  Py_DECREF(self);
+  return NULL;
+}
 
-  if (memcmp(data + offset, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE) != 0) {
-    PyErr_SetString(PyExc_ValueError, "Invalid data: wrong magic bytes");
+static PyObject *FrozenFilter_new(PyTypeObject *type, PyObject *args,
+                                  PyObject *kwds) {
+  PyErr_SetString(PyExc_TypeError,
+                  "FrozenFilter can't be created directly; use "
+                  "FrozenFilter.build()");
+  return NULL;
+}
+
+static int FrozenFilter_contains(FrozenFilter *self, PyObject *item) {
+  uint64_t hash;
+  if (get_hash(item, frozen_hash_mode(self), &hash) < 0)
+    return -1;
+
+  uint64_t mixed = mix64(hash + self->seed);
+  uint32_t pos[3];
+  fuse_positions(self, mixed, pos);
+  return frozen_match(self, mixed, pos);
+}
+
+static PyObject *FrozenFilter_contains_many(FrozenFilter *self,
+                                            PyObject *iterable) {
+  Py_ssize_t hint = PyObject_LengthHint(iterable, 0);
+  if (hint < 0)
+    return NULL;
+
+  PyObject *mask = PyByteArray_FromStringAndSize(NULL, hint);
+  if (mask == NULL)
+    return NULL;
+
+  if (frozen_check_iterable(self, iterable, mask) < 0) {
+    Py_DECREF(mask);
     return NULL;
   }
-  offset += ABLOOM_MAGIC_SIZE;
+  return mask;
+}
 
-  uint8_t version = data[offset++];
-  if (version != ABLOOM_VERSION) {
-    PyErr_Format(PyExc_ValueError, "Unsupported version: %u (expected %u)",
-                 version, ABLOOM_VERSION);
+static PyObject *FrozenFilter_count_present(FrozenFilter *self,
+                                            PyObject *iterable) {
+  Py_ssize_t found = frozen_check_iterable(self, iterable, NULL);
+  if (found < 0)
+    return NULL;
+  return PyLong_FromSsize_t(found);
+}
+
+// Format v3 header of a FrozenFilter. The layout says the fingerprint width;
+// the fields after the magic, version, flags, layout and hash are:
+//   8 item_count  16 fp_rate  24 array_length  32 seed  40 segment_length
+//   48 segment_count_length  56-63 reserved (zero)
+// The fingerprints follow, 16-bit ones as little-endian words.
+static PyObject *FrozenFilter_to_bytes(FrozenFilter *self,
+                                       PyObject *Py_UNUSED(ignored)) {
+  if (!self->serializable) {
+    PyErr_SetString(PyExc_ValueError, "to_bytes() requires serializable=True");
     return NULL;
   }
 
-  uint64_t capacity = read_be64(data + offset);
-  offset += 8;
+  size_t nbytes = frozen_nbytes(self);
+  PyObject *result =
+      PyBytes_FromStringAndSize(NULL, (Py_ssize_t)(ABLOOM_HEADER_SIZE + nbytes));
+  if (result == NULL)
+    return NULL;
 
+  unsigned char *buf = (unsigned char *)PyBytes_AS_STRING(result);
   union {
     double d;
     uint64_t u;
   } fp_union;
-  fp_union.u = read_be64(data + offset);
-  double fp_rate = fp_union.d;
-  offset += 8;
-
-  uint64_t block_count = read_be64(data + offset);
-  offset += 8;
-
-  int free_threading = data[offset++] != 0;
+  memset(buf, 0, ABLOOM_HEADER_SIZE);
+  memcpy(buf, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE);
+  buf[4] = ABLOOM_VERSION;
+  buf[5] = 0;
+  buf[6] = self->fp_bits == 8 ? ABLOOM_LAYOUT_FUSE8 : ABLOOM_LAYOUT_FUSE16;
+  buf[7] = ABLOOM_HASH_SERIALIZABLE;
+  write_le64(buf + 8, self->item_count);
+  fp_union.d = self->fp_rate;
+  write_le64(buf + 16, fp_union.u);
+  write_le64(buf + 24, self->array_length);
+  write_le64(buf + 32, self->seed);
+  write_le64(buf + 40, self->segment_length);
+  write_le64(buf + 48, self->segment_count_length);
+
+  PyThreadState *save = nogil_begin(nbytes);
+  memcpy(buf + ABLOOM_HEADER_SIZE, self->fingerprints, nbytes);
+  frozen_swap_fingerprints(self, buf + ABLOOM_HEADER_SIZE);
+  nogil_end(save);
+  return result;
+}
 
-  size_t expected_block_data = block_count * BLOCK_BYTES;
-  size_t expected_total = ABLOOM_HEADER_SIZE + expected_block_data;
-  if ((size_t)data_len != expected_total) {
-    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zd",
-                 expected_total, data_len);
-    return NULL;
+// Validates a serialized FrozenFilter of `len` bytes and sets the fields of
+// `ff` from its header
+static int frozen_read_header(FrozenFilter *ff, const unsigned char *buf,
+                              size_t len) {
+  if (len < ABLOOM_HEADER_SIZE) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: too short for header");
+    return -1;
   }
-
-  if (capacity == 0) {
-    PyErr_SetString(PyExc_ValueError, "Invalid data: capacity is 0");
-    return NULL;
+  if (memcmp(buf, ABLOOM_MAGIC, ABLOOM_MAGIC_SIZE) != 0) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: wrong magic bytes");
+    return -1;
   }
-  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
-    PyErr_SetString(PyExc_ValueError, "Invalid data: fp_rate out of range");
-    return NULL;
+  if (buf[4] != ABLOOM_VERSION) {
+    PyErr_Format(PyExc_ValueError, "Unsupported version: %u (expected 3)",
+                 buf[4]);
+    return -1;
   }
-  int64_t expected_blocks = calculate_block_count(capacity, fp_rate);
-  if (expected_blocks <= 0 || block_count != expected_blocks) {
+  if (buf[6] != ABLOOM_LAYOUT_FUSE8 && buf[6] != ABLOOM_LAYOUT_FUSE16) {
     PyErr_SetString(PyExc_ValueError,
-                    "Invalid data: block_count doesn't match capacity/fp_rate");
-    return NULL;
+                    "Invalid data: not a FrozenFilter (use "
+                    "BloomFilter.from_bytes())");
+    return -1;
+  }
+  if (buf[5] != 0) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: unknown flags");
+    return -1;
+  }
+  if (buf[7] != ABLOOM_HASH_SERIALIZABLE) {
+    PyErr_Format(PyExc_ValueError, "Unsupported hash algorithm: %u", buf[7]);
+    return -1;
   }
 
-  if (free_threading && !ABLOOM_HAS_ATOMICS) {
-    PyErr_SetString(
-        PyExc_RuntimeError,
-        "Serialized filter has free_threading=True, but C11 atomics "
-        "are not available in this build. Use a pre-built wheel or "
-        "rebuild with a modern compiler.");
-    return NULL;
+  union {
+    double d;
+    uint64_t u;
+  } fp_union;
+  fp_union.u = read_le64(buf + 16);
+  uint64_t item_count = read_le64(buf + 8);
+  uint64_t array_length = read_le64(buf + 24);
+  uint64_t segment_length = read_le64(buf + 40);
+  uint64_t segment_count_length = read_le64(buf + 48);
+  int fp_bits = buf[6] == ABLOOM_LAYOUT_FUSE8 ? 8 : 16;
+
+  if (!(fp_union.d > 0.0 && fp_union.d < 1.0) ||
+      fuse_fingerprint_bits(fp_union.d) != fp_bits) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Invalid data: fp_rate doesn't match the fingerprint width");
+    return -1;
+  }
+  // Positions stay inside the array only for this geometry
+  if (segment_length < FUSE_MIN_SEGMENT_LENGTH ||
+      segment_length > FUSE_MAX_SEGMENT_LENGTH ||
+      (segment_length & (segment_length - 1)) != 0 ||
+      segment_count_length == 0 || segment_count_length % segment_length ||
+      segment_count_length > UINT32_MAX ||
+      array_length != segment_count_length + 2 * segment_length ||
+      array_length > UINT32_MAX || item_count > array_length) {
+    PyErr_SetString(PyExc_ValueError, "Invalid data: inconsistent geometry");
+    return -1;
   }
 
-  BloomFilter *self = (BloomFilter *)type->tp_alloc(type, 0);
-  if (self == NULL) {
+  ff->item_count = item_count;
+  ff->fp_rate = fp_union.d;
+  ff->fp_bits = fp_bits;
+  ff->seed = read_le64(buf + 32);
+  ff->segment_length = (uint32_t)segment_length;
+  ff->segment_length_mask = (uint32_t)segment_length - 1;
+  ff->segment_count_length = (uint32_t)segment_count_length;
+  ff->array_length = (uint32_t)array_length;
+
+  size_t expected_total = ABLOOM_HEADER_SIZE + frozen_nbytes(ff);
+  if (len != expected_total) {
+    PyErr_Format(PyExc_ValueError, "Invalid data: expected %zu bytes, got %zu",
+                 expected_total, len);
+    return -1;
+  }
+  return 0;
+}
+
+static PyObject *FrozenFilter_from_bytes(PyTypeObject *type, PyObject *args) {
+  PyObject *data_obj;
+
+  if (!PyArg_ParseTuple(args, "O", &data_obj)) {
     return NULL;
   }
 
-  self->capacity = capacity;
-  self->fp_rate = fp_rate;
-  self->serializable = 1;
-  self->free_threading = free_threading;
-  self->block_count = block_count;
+  if (!PyBytes_Check(data_obj)) {
+    PyErr_SetString(PyExc_TypeError, "from_bytes() requires bytes");
+    return NULL;
+  }
 
-  size_t num_bytes = block_count * BLOCK_BYTES;
-  self->blocks = PyMem_Malloc(num_bytes);
-  if (self->blocks == NULL) {
+  const unsigned char *data =
+      (const unsigned char *)PyBytes_AS_STRING(data_obj);
+  FrozenFilter *self = (FrozenFilter *)type->tp_alloc(type, 0);
+  if (self == NULL)
+    return NULL;
+  self->storage = STORAGE_ALIGNED;
+  if (frozen_read_header(self, data, (size_t)PyBytes_GET_SIZE(data_obj)) < 0) {
     Py_DECREF(self);
-    return PyErr_NoMemory();
+    return NULL;
   }
 
-  size_t num_words = block_count * BLOCK_WORDS;
-  for (size_t i = 0; i < num_words; i++) {
-    self->blocks[i] = read_be64(data + offset);
-    offset += 8;
+  size_t nbytes = frozen_nbytes(self);
+  self->fingerprints = storage_alloc(nbytes, 0, &self->storage_base,
+                                     &self->storage_bytes, &self->storage);
+  if (self->fingerprints == NULL) {
+    Py_DECREF(self);
+    return NULL;
   }
+  PyThreadState *save = nogil_begin(nbytes);
+  memcpy(self->fingerprints, data + ABLOOM_HEADER_SIZE, nbytes);
+  frozen_swap_fingerprints(self, self->fingerprints);
+  nogil_end(save);
 
+  self->serializable = 1;
   return (PyObject *)self;
 }
 
-static PyObject *BloomFilter_update(BloomFilter *self, PyObject *iterable) {
-  PyObject *iter = PyObject_GetIter(iterable);
-  if (iter == NULL)
-    return NULL;
+static PyObject *FrozenFilter_open(PyTypeObject *type, PyObject *args) {
+  PyObject *path;
 
-  PyObject *item;
+  if (!PyArg_ParseTuple(args, "O:open", &path)) {
+    return NULL;
+  }
 
-  // Dispatch once outside the loop to avoid per-item branching
-  if (self->serializable) {
-    while ((item = PyIter_Next(iter)) != NULL) {
-      uint64_t hash;
-      if (get_hash_serializable(item, &hash) < 0) {
-        Py_DECREF(item);
-        Py_DECREF(iter);
-        return NULL;
-      }
-      bloom_insert(self, hash);
-      Py_DECREF(item);
-    }
-  } else {
-    while ((item = PyIter_Next(iter)) != NULL) {
-      uint64_t hash;
-      if (get_hash_fast(item, &hash) < 0) {
-        Py_DECREF(item);
-        Py_DECREF(iter);
-        return NULL;
-      }
-      bloom_insert(self, hash);
-      Py_DECREF(item);
-    }
+  if (!host_is_little_endian()) {
+    PyErr_SetString(PyExc_RuntimeError,
+                    "open() requires a little-endian host; use to_bytes() "
+                    "and from_bytes() instead");
+    return NULL;
   }
 
-  Py_DECREF(iter);
-  if (PyErr_Occurred())
+  Py_buffer view;
+  if (map_file(path, "rb", 0, 0, &view) < 0)
     return NULL;
-  Py_RETURN_NONE;
-}
 
-static PyObject *BloomFilter_add(BloomFilter *self, PyObject *item) {
-  uint64_t hash;
-  int err = self->serializable ? get_hash_serializable(item, &hash)
-                               : get_hash_fast(item, &hash);
-  if (err < 0)
+  FrozenFilter *self = (FrozenFilter *)type->tp_alloc(type, 0);
+  if (self == NULL) {
+    PyBuffer_Release(&view);
+    return NULL;
+  }
+  if (frozen_read_header(self, (const unsigned char *)view.buf,
+                         (size_t)view.len) < 0) {
+    PyBuffer_Release(&view);
+    Py_DECREF(self);
     return NULL;
+  }
 
-  bloom_insert(self, hash);
-  Py_RETURN_NONE;
+  // Files are read by other processes, so they always hash deterministically
+  self->serializable = 1;
+  self->file_view = view;
+  self->storage = STORAGE_FILE;
+  self->storage_base = view.buf;
+  self->storage_bytes = (size_t)view.len;
+  self->fingerprints = (unsigned char *)view.buf + ABLOOM_HEADER_SIZE;
+  return (PyObject *)self;
 }
 
-static int BloomFilter_contains(BloomFilter *self, PyObject *item) {
-  uint64_t hash;
-  int err = self->serializable ? get_hash_serializable(item, &hash)
-                               : get_hash_fast(item, &hash);
-  if (err < 0)
-    return -1;
-
-  return bloom_check(self, hash);
+static int FrozenFilter_bool(FrozenFilter *self) {
+  return self->item_count != 0;
 }
 
-static PyObject *BloomFilter_get_capacity(BloomFilter *self, void *closure) {
-  return PyLong_FromUnsignedLongLong(self->capacity);
+static PyObject *FrozenFilter_richcompare(FrozenFilter *self, PyObject *other,
+                                          int op) {
+  if (op != Py_EQ && op != Py_NE) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  if (!PyObject_TypeCheck(other, Py_TYPE(self))) {
+    Py_RETURN_NOTIMPLEMENTED;
+  }
+
+  FrozenFilter *other_ff = (FrozenFilter *)other;
+  int equal = self->fp_rate == other_ff->fp_rate &&
+              self->fp_bits == other_ff->fp_bits &&
+              self->serializable == other_ff->serializable &&
+              self->item_count == other_ff->item_count &&
+              self->seed == other_ff->seed &&
+              self->segment_length == other_ff->segment_length &&
+              self->array_length == other_ff->array_length;
+
+  if (equal) {
+    size_t nbytes = frozen_nbytes(self);
+    PyThreadState *save = nogil_begin(nbytes);
+    equal = (memcmp(self->fingerprints, other_ff->fingerprints, nbytes) == 0);
+    nogil_end(save);
+  }
+
+  if (op == Py_EQ) {
+    return PyBool_FromLong(equal);
+  }
+  return PyBool_FromLong(!equal);
 }
 
-static PyObject *BloomFilter_get_fp_rate(BloomFilter *self, void *closure) {
+static PyObject *FrozenFilter_get_fp_rate(FrozenFilter *self, void *closure) {
   return PyFloat_FromDouble(self->fp_rate);
 }
 
-static PyObject *BloomFilter_get_k(BloomFilter *self, void *closure) {
-  return PyLong_FromLong(BLOCK_WORDS); // Always 8 for SBBF
+static PyObject *FrozenFilter_get_fingerprint_bits(FrozenFilter *self,
+                                                   void *closure) {
+  return PyLong_FromLong(self->fp_bits);
 }
 
-static PyObject *BloomFilter_get_byte_count(BloomFilter *self, void *closure) {
-  uint64_t bytes = self->block_count * BLOCK_BYTES;
-  return PyLong_FromUnsignedLongLong(bytes);
+static PyObject *FrozenFilter_get_item_count(FrozenFilter *self,
+                                             void *closure) {
+  return PyLong_FromUnsignedLongLong(self->item_count);
 }
 
-static PyObject *BloomFilter_get_bit_count(BloomFilter *self, void *closure) {
-  uint64_t bits = self->block_count * BLOCK_BITS;
-  return PyLong_FromUnsignedLongLong(bits);
+static PyObject *FrozenFilter_get_byte_count(FrozenFilter *self,
+                                             void *closure) {
+  return PyLong_FromUnsignedLongLong((uint64_t)frozen_nbytes(self));
 }
 
-static PyObject *BloomFilter_get_serializable(BloomFilter *self,
-                                              void *closure) {
+static PyObject *FrozenFilter_get_serializable(FrozenFilter *self,
+                                               void *closure) {
   return PyBool_FromLong(self->serializable);
 }
 
-static PyObject *BloomFilter_get_free_threading(BloomFilter *self,
-                                                void *closure) {
-  return PyBool_FromLong(self->free_threading);
-}
-
-static void BloomFilter_dealloc(BloomFilter *self) {
-  if (self->blocks) {
-    PyMem_Free(self->blocks);
-  }
+static void FrozenFilter_dealloc(FrozenFilter *self) {
+  if (self->storage == STORAGE_FILE)
+    PyBuffer_Release(&self->file_view);
+  else if (self->storage_base != NULL)
+    storage_free(self->storage_base, self->storage_bytes, self->storage);
   Py_TYPE(self)->tp_free((PyObject *)self);
 }
 
-static int BloomFilter_init(BloomFilter *self, PyObject *args, PyObject *kwds) {
-  static char *kwlist[] = {"capacity", "fp_rate", "serializable",
-                           "free_threading", NULL};
-  long long capacity_signed;
-  double fp_rate = 0.01;
-  int serializable = 0;
-  int free_threading = 0;
-
-  if (!PyArg_ParseTupleAndKeywords(args, kwds, "L|dpp", kwlist,
-                                   &capacity_signed, &fp_rate, &serializable,
-                                   &free_threading)) {
-    return -1;
-  }
-
-  if (capacity_signed <= 0) {
-    PyErr_SetString(PyExc_ValueError, "Capacity must be greater than 0");
-    return -1;
-  }
-
-  uint64_t capacity = (uint64_t)capacity_signed;
-
-  if (fp_rate <= 0.0 || fp_rate >= 1.0) {
-    PyErr_SetString(PyExc_ValueError,
-                    "False positive rate must be between 0.0 and 1.0");
-    return -1;
-  }
-
-  if (free_threading && !ABLOOM_HAS_ATOMICS) {
-    PyErr_SetString(PyExc_RuntimeError,
-                    "free_threading=True requires C11 atomics, which are not "
-                    "available in this build. Use a pre-built wheel or rebuild "
-                    "with a modern compiler.");
-    return -1;
-  }
-
-  int64_t block_count = calculate_block_count(capacity, fp_rate);
-  if (block_count < 0) {
-    PyErr_SetString(PyExc_ValueError,
-                    "Capacity too large: would cause integer overflow");
-    return -1;
-  }
-
-  self->capacity = capacity;
-  self->fp_rate = fp_rate;
-  self->serializable = serializable;
-  self->free_threading = free_threading;
-  self->block_count = (uint64_t)block_count;
-
-  size_t num_bytes = self->block_count * BLOCK_BYTES;
-  self->blocks = PyMem_Calloc(num_bytes, 1);
-  if (self->blocks == NULL) {
-    PyErr_NoMemory();
-    return -1;
-  }
+static PyObject *FrozenFilter_repr(FrozenFilter *self) {
+  PyObject *fp_obj = PyFloat_FromDouble(self->fp_rate);
+  if (!fp_obj)
+    return NULL;
 
-  return 0;
-}
+  PyObject *repr = PyUnicode_FromFormat(
+      "<FrozenFilter item_count=%llu fp_rate=%R serializable=%s>",
+      self->item_count, fp_obj, self->serializable ? "True" : "False");
 
-static PyObject *BloomFilter_new(PyTypeObject *type, PyObject *args,
-                                 PyObject *kwds) {
-  BloomFilter *self = (BloomFilter *)type->tp_alloc(type, 0);
-  if (self != NULL) {
-    self->blocks = NULL;
-    self->block_count = 0;
-    self->capacity = 0;
-    self->fp_rate = 0.0;
-    self->serializable = 0;
-    self->free_threading = 0;
-  }
-  return (PyObject *)self;
+  Py_DECREF(fp_obj);
+  return repr;
 }
 
-static PyMethodDef BloomFilter_methods[] = {
-    {"add", (PyCFunction)BloomFilter_add, METH_O,
-     "Add an item to the bloom filter"},
-    {"update", (PyCFunction)BloomFilter_update, METH_O,
-     "Add items from an iterable to the bloom filter"},
-    {"copy", (PyCFunction)BloomFilter_copy, METH_NOARGS,
-     "Return a shallow copy of the bloom filter"},
-    {"clear", (PyCFunction)BloomFilter_clear, METH_NOARGS,
-     "Remove all items from the bloom filter"},
-    {"to_bytes", (PyCFunction)BloomFilter_to_bytes, METH_NOARGS,
+static PyMethodDef FrozenFilter_methods[] = {
+    {"build", (PyCFunction)(void (*)(void))FrozenFilter_build,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "Build a frozen filter holding the items of an iterable"},
+    {"contains_many", (PyCFunction)FrozenFilter_contains_many, METH_O,
+     "Test every item of an iterable, returning a bytearray mask"},
+    {"count_present", (PyCFunction)FrozenFilter_count_present, METH_O,
+     "Count the items of an iterable that might be in the filter"},
+    {"to_bytes", (PyCFunction)FrozenFilter_to_bytes, METH_NOARGS,
      "Serialize the filter to bytes. Requires serializable=True."},
-    {"from_bytes", (PyCFunction)BloomFilter_from_bytes,
+    {"from_bytes", (PyCFunction)FrozenFilter_from_bytes,
      METH_VARARGS | METH_CLASS,
      "Deserialize a filter from bytes. Returns a serializable filter."},
+    {"open", (PyCFunction)FrozenFilter_open, METH_VARARGS | METH_CLASS,
+     "Open a filter saved with to_bytes() as a read-only memory map"},
     {NULL}};
 
-static PyGetSetDef BloomFilter_getsetters[] = {
-    {"capacity", (getter)BloomFilter_get_capacity, NULL,
-     "Expected number of items", NULL},
-    {"fp_rate", (getter)BloomFilter_get_fp_rate, NULL,
+static PyGetSetDef FrozenFilter_getsetters[] = {
+    {"fp_rate", (getter)FrozenFilter_get_fp_rate, NULL,
      "Target false positive rate", NULL},
-    {"k", (getter)BloomFilter_get_k, NULL,
-     "Number of hash functions (always 8 for SBBF)", NULL},
-    {"byte_count", (getter)BloomFilter_get_byte_count, NULL,
+    {"fingerprint_bits", (getter)FrozenFilter_get_fingerprint_bits, NULL,
+     "Bits per fingerprint (8 or 16)", NULL},
+    {"item_count", (getter)FrozenFilter_get_item_count, NULL,
+     "Number of distinct items the filter was built from", NULL},
+    {"byte_count", (getter)FrozenFilter_get_byte_count, NULL,
      "Memory usage in bytes", NULL},
-    {"bit_count", (getter)BloomFilter_get_bit_count, NULL,
-     "Total bits in filter", NULL},
-    {"serializable", (getter)BloomFilter_get_serializable, NULL,
-     "Whether the filter uses deterministic hashing for serialization", NULL},
-    {"free_threading", (getter)BloomFilter_get_free_threading, NULL,
-     "Whether the filter uses atomic operations for free-threaded Python",
-     NULL},
+    {"serializable", (getter)FrozenFilter_get_serializable, NULL,
+     "Whether the filter uses deterministic hashing", NULL},
     {NULL}};
 
-static PySequenceMethods BloomFilter_as_sequence = {
-    .sq_contains = (objobjproc)BloomFilter_contains,
+static PySequenceMethods FrozenFilter_as_sequence = {
+    .sq_contains = (objobjproc)FrozenFilter_contains,
 };
 
-static PyNumberMethods BloomFilter_as_number = {
-    .nb_bool = (inquiry)BloomFilter_bool,
-    .nb_or = (binaryfunc)BloomFilter_or,
-    .nb_inplace_or = (binaryfunc)BloomFilter_ior,
+static PyNumberMethods FrozenFilter_as_number = {
+    .nb_bool = (inquiry)FrozenFilter_bool,
 };
 
-static PyObject *BloomFilter_repr(BloomFilter *self) {
-  PyObject *fp_obj = PyFloat_FromDouble(self->fp_rate);
-  if (!fp_obj)
+static PyTypeObject FrozenFilterType = {
+    PyVarObject_HEAD_INIT(NULL, 0).tp_name = "abloom._abloom.FrozenFilter",
+    .tp_doc = "Immutable binary fuse filter of 8- or 16-bit fingerprints",
+    .tp_basicsize = sizeof(FrozenFilter),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = FrozenFilter_new,
+    .tp_dealloc = (destructor)FrozenFilter_dealloc,
+    .tp_repr = (reprfunc)FrozenFilter_repr,
+    .tp_richcompare = (richcmpfunc)FrozenFilter_richcompare,
+    .tp_methods = FrozenFilter_methods,
+    .tp_getset = FrozenFilter_getsetters,
+    .tp_as_sequence = &FrozenFilter_as_sequence,
+    .tp_as_number = &FrozenFilter_as_number,
+};
+
+static PyObject *abloom_get_prefetch_distance(PyObject *module,
+                                              PyObject *Py_UNUSED(ignored)) {
+  return PyLong_FromLong(prefetch_distance);
+}
+
+static PyObject *abloom_set_prefetch_distance(PyObject *module,
+                                              PyObject *arg) {
+  long distance = PyLong_AsLong(arg);
+  if (distance == -1 && PyErr_Occurred())
     return NULL;
 
-  PyObject *repr = PyUnicode_FromFormat(
-      "<BloomFilter capacity=%llu fp_rate=%R serializable=%s>", self->capacity,
-      fp_obj, self->serializable ? "True" : "False");
+  if (distance < 0 || distance > ABLOOM_MAX_PREFETCH_DISTANCE) {
+    PyErr_Format(PyExc_ValueError,
+                 "Prefetch distance must be between 0 and %d",
+                 ABLOOM_MAX_PREFETCH_DISTANCE);
+    return NULL;
+  }
 
-  Py_DECREF(fp_obj);
-  return repr;
+  prefetch_distance = (int)distance;
+  Py_RETURN_NONE;
 }
 
-static PyTypeObject BloomFilterType = {
-    PyVarObject_HEAD_INIT(NULL, 0).tp_name = "_abloom.BloomFilter",
-    .tp_doc = "High-performance Split Block Bloom Filter",
-    .tp_basicsize = sizeof(BloomFilter),
-    .tp_itemsize = 0,
-    .tp_flags = Py_TPFLAGS_DEFAULT,
-    .tp_new = BloomFilter_new,
-    .tp_init = (initproc)BloomFilter_init,
-    .tp_dealloc = (destructor)BloomFilter_dealloc,
-    .tp_repr = (reprfunc)BloomFilter_repr,
-    .tp_richcompare = (richcmpfunc)BloomFilter_richcompare,
-    .tp_methods = BloomFilter_methods,
-    .tp_getset = BloomFilter_getsetters,
-    .tp_as_sequence = &BloomFilter_as_sequence,
-    .tp_as_number = &BloomFilter_as_number,
-};
+static PyObject *abloom_get_storage_backend(PyObject *module,
+                                            PyObject *Py_UNUSED(ignored)) {
+  return PyUnicode_FromString(storage_names[storage_backend]);
+}
+
+static PyObject *abloom_set_storage_backend(PyObject *module, PyObject *arg) {
+  const char *name = PyUnicode_AsUTF8(arg);
+  if (name == NULL)
+    return NULL;
+
+  for (int i = STORAGE_ALIGNED; i <= STORAGE_HUGETLB; i++) {
+    if (strcmp(name, storage_names[i]) == 0) {
+      if (!storage_supported((StorageKind)i)) {
+        PyErr_Format(PyExc_ValueError,
+                     "Storage backend '%s' is not available on this platform",
+                     name);
+        return NULL;
+      }
+      storage_backend = (StorageKind)i;
+      Py_RETURN_NONE;
+    }
+  }
+
+  PyErr_Format(PyExc_ValueError,
+               "Unknown storage backend '%s' (expected 'aligned', 'mmap' or "
+               "'hugetlb')",
+               name);
+  return NULL;
+}
+
+static PyMethodDef abloom_methods[] = {
+    {"get_prefetch_distance", abloom_get_prefetch_distance, METH_NOARGS,
+     "Return the number of items hashed and prefetched per batch window"},
+    {"set_prefetch_distance", abloom_set_prefetch_distance, METH_O,
+     "Set the number of items hashed and prefetched per batch window "
+     "(0 disables prefetching)"},
+    {"get_storage_backend", abloom_get_storage_backend, METH_NOARGS,
+     "Return the backend used to allocate large filters"},
+    {"set_storage_backend", abloom_set_storage_backend, METH_O,
+     "Set the backend used to allocate large filters"},
+    {NULL}};
 
 static PyModuleDef abloommodule = {
     PyModuleDef_HEAD_INIT,
     .m_name = "_abloom",
     .m_doc = "High-performance Split Block Bloom Filter for Python",
     .m_size = -1,
+    .m_methods = abloom_methods,
 };
 
 PyMODINIT_FUNC PyInit__abloom(void) {
@@ -762,17 +8957,64 @@ PyMODINIT_FUNC PyInit__abloom(void) {
 
   if (PyType_Ready(&BloomFilterType) < 0)
     return NULL;
+  if (PyType_Ready(&CountingBloomFilterType) < 0)
+    return NULL;
+  if (PyType_Ready(&ScalableBloomFilterType) < 0)
+    return NULL;
+  if (PyType_Ready(&CuckooFilterType) < 0)
+    return NULL;
+  if (PyType_Ready(&FrozenFilterType) < 0)
+    return NULL;
+
+  select_block_kernel();
 
   m = PyModule_Create(&abloommodule);
   if (m == NULL)
     return NULL;
 
+  if (PyModule_AddStringConstant(m, "SIMD_KERNEL", block_kernel->name) < 0) {
+    Py_DECREF(m);
+    return NULL;
+  }
+
   Py_INCREF(&BloomFilterType);
   if (PyModule_AddObject(m, "BloomFilter", (PyObject *)&BloomFilterType) < 0) {
     Py_DECREF(&BloomFilterType);
     Py_DECREF(m);
     return NULL;
   }
+
+  Py_INCREF(&CountingBloomFilterType);
+  if (PyModule_AddObject(m, "CountingBloomFilter",
+                         (PyObject *)&CountingBloomFilterType) < 0) {
+    Py_DECREF(&CountingBloomFilterType);
+    Py_DECREF(m);
+    return NULL;
+  }
+
+  Py_INCREF(&ScalableBloomFilterType);
+  if (PyModule_AddObject(m, "ScalableBloomFilter",
+                         (PyObject *)&ScalableBloomFilterType) < 0) {
+    Py_DECREF(&ScalableBloomFilterType);
+    Py_DECREF(m);
+    return NULL;
+  }
+
+  Py_INCREF(&CuckooFilterType);
+  if (PyModule_AddObject(m, "CuckooFilter", (PyObject *)&CuckooFilterType) <
+      0) {
+    Py_DECREF(&CuckooFilterType);
+    Py_DECREF(m);
+    return NULL;
+  }
+
+  Py_INCREF(&FrozenFilterType);
+  if (PyModule_AddObject(m, "FrozenFilter", (PyObject *)&FrozenFilterType) <
+      0) {
+    Py_DECREF(&FrozenFilterType);
+    Py_DECREF(m);
+    return NULL;
+  }
 #ifdef Py_GIL_DISABLED
   PyUnstable_Module_SetGIL(m, Py_MOD_GIL_NOT_USED);
 #endif
@@ -1,4 +1,16 @@
-from typing import Iterable
+import os
+from typing import Any, BinaryIO, Iterable, Literal, overload
+
+from typing_extensions import Buffer
+
+SIMD_KERNEL: str
+"""Block kernel used by batch operations on this CPU.
+
+One of ``"avx512"``, ``"avx2"``, ``"neon"`` or ``"scalar"``, chosen at import
+time from the CPU's features. Set the ``ABLOOM_SIMD`` environment variable to
+one of these names before importing abloom to force a specific supported
+kernel. All kernels produce bit-for-bit identical filters.
+"""
 
 class BloomFilter:
     """High-performance Split Block Bloom Filter.
@@ -20,6 +32,15 @@ class BloomFilter:
                 free-threaded Python (PEP 703). Adds ~5-10% overhead but
                 guarantees no lost updates under concurrent writes. Default is
                 False, which relies on the GIL for synchronization.
+        layout: Block layout. "sbbf" (default) uses 512-bit blocks.
+                "parquet" uses the 256-bit blocks, sizing and XXH64 hashing
+                of Apache Parquet's Bloom filters, so the filter can be
+                exchanged with Parquet readers and writers through
+                to_parquet() and from_parquet(). Parquet filters are always
+                serializable. "register" sets k bits of a single 64-bit
+                word per item, so a lookup is one load, mask and compare;
+                k is picked from fp_rate, and the filter is smaller than
+                "sbbf" above about 4% and larger below it.
 
     Raises:
         ValueError: If capacity is 0 or fp_rate is not in the valid range.
@@ -41,7 +62,7 @@ class BloomFilter:
     """Target false positive rate (between 0.0 and 1.0)."""
 
     k: int
-    """Number of hash functions used (always 8 for SBBF)."""
+    """Number of hash functions used: 8, or 1-8 chosen from fp_rate for layout="register"."""
 
     byte_count: int
     """Total number of bytes in the filter."""
@@ -52,10 +73,23 @@ class BloomFilter:
     serializable: bool
     """Whether the filter uses deterministic hashing for serialization."""
 
+    layout: str
+    """Block layout: "sbbf", "parquet" or "register"."""
+
     free_threading: bool
     """Whether the filter uses atomic operations for free-threaded Python."""
 
-    def __init__(self, capacity: int, fp_rate: float = 0.01, serializable: bool = False, free_threading: bool = False) -> None:
+    storage: str
+    """Backend holding the filter's blocks: "aligned", "mmap", "hugetlb", "file" for BloomFilter.open(), or "shared" for create_shared()/attach()."""
+
+    def __init__(
+        self,
+        capacity: int,
+        fp_rate: float = 0.01,
+        serializable: bool = False,
+        free_threading: bool = False,
+        layout: Literal["sbbf", "parquet", "register"] = "sbbf",
+    ) -> None:
         """Initialize a new Bloom filter.
 
         Args:
@@ -66,9 +100,14 @@ class BloomFilter:
                     Default is False.
             free_threading: If True, uses atomic operations for compatibility with
                     free-threaded Python. Default is False.
+            layout: "sbbf" (default), "parquet" for Parquet-compatible
+                    256-bit blocks, or "register" for one 64-bit word per
+                    item. "parquet" implies serializable=True.
 
         Raises:
-            ValueError: If capacity is 0 or fp_rate is not in the valid range.
+            ValueError: If capacity is 0, fp_rate is not in the valid range,
+                layout is unknown, or layout="register" with fp_rate below
+                1e-5.
             RuntimeError: If free_threading=True but atomics are unavailable.
         """
         ...
@@ -87,9 +126,47 @@ class BloomFilter:
         """
         ...
 
+    def add_if_absent(self, item: object) -> bool:
+        """Add an item, reporting whether it was already present.
+
+        Tests and sets the item's bits in a single visit to its block. In
+        free-threading mode the test and the set happen atomically, so when
+        several threads add the same new item concurrently exactly one of
+        them gets False.
+
+        Args:
+            item: Any hashable Python object to add to the filter.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+
+        Returns:
+            True if the item might already have been in the filter, False if
+            it was definitely new.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+
+        Example:
+            >>> bf = BloomFilter(1000)
+            >>> bf.add_if_absent("a")
+            False
+            >>> bf.add_if_absent("a")
+            True
+        """
+        ...
+
     def update(self, items: Iterable[object]) -> None:
         """Add items from an iterable to the bloom filter.
 
+        Objects implementing the Arrow PyCapsule interface
+        (``__arrow_c_array__`` or ``__arrow_c_stream__``), such as PyArrow
+        arrays and Polars series, are read directly from their Arrow buffers.
+        Integer columns hash like the equivalent Python ints. utf8 and binary
+        columns hash like str and bytes, and take this path only in
+        serializable mode. Nulls are skipped. Other columns are iterated as
+        usual.
+
         Args:
             items: An iterable of hashable Python objects to add to the filter.
                 In serializable mode, only bytes, str, int,
@@ -101,6 +178,256 @@ class BloomFilter:
         """
         ...
 
+    def update_buffer(self, data: Buffer, *, threads: int = 1) -> None:
+        """Add every integer of a buffer of 64-bit integers.
+
+        Accepts any C-contiguous buffer of int64 or uint64 values, such as
+        ``array.array('q')``, ``array.array('Q')``, a cast ``memoryview`` or a
+        NumPy ``int64``/``uint64`` array. Elements are hashed directly from
+        memory, so no Python ``int`` is created per element. Each value hashes
+        exactly like the equivalent Python ``int``, so the result is identical
+        to ``bf.update(list(data))`` in both standard and serializable mode.
+
+        With ``threads > 1`` the filter is split into block ranges and each
+        range is filled by its own native thread, so no atomics or locks are
+        needed between them. The result is bit-for-bit identical to the
+        single-threaded insert. Inputs too small to split use fewer threads.
+
+        Args:
+            data: A C-contiguous buffer with an 8-byte signed or unsigned
+                integer format.
+            threads: Maximum number of native threads to insert with.
+
+        Raises:
+            TypeError: If data does not support the buffer protocol or its
+                format is not a 64-bit integer.
+            BufferError: If the buffer is not C-contiguous.
+            ValueError: If threads is less than 1.
+
+        Example:
+            >>> from array import array
+            >>> bf = BloomFilter(1000)
+            >>> bf.update_buffer(array('q', [1, 2, 3]))
+            >>> 2 in bf
+            True
+        """
+        ...
+
+    def contains_many(self, items: Iterable[object]) -> bytearray:
+        """Test every item of an iterable for membership.
+
+        Equivalent to ``bytearray(item in bf for item in items)``, but the
+        whole loop runs in C. Arrow columns are read as in update(), and
+        null elements are reported as absent (0).
+
+        Args:
+            items: An iterable of hashable Python objects to test.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+
+        Returns:
+            A bytearray with one byte per item: 1 if the item might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            TypeError: If any item is not hashable or items is not iterable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+
+        Example:
+            >>> bf = BloomFilter(1000)
+            >>> bf.update(["a", "b"])
+            >>> list(bf.contains_many(["a", "x", "b"]))
+            [1, 0, 1]
+        """
+        ...
+
+    def count_present(self, items: Iterable[object]) -> int:
+        """Count the items of an iterable that might be in the bloom filter.
+
+        Equivalent to ``sum(item in bf for item in items)``, without building
+        a result mask. Arrow columns are read as in update(), and null
+        elements are not counted.
+
+        Args:
+            items: An iterable of hashable Python objects to test.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+
+        Returns:
+            The number of items that might be in the filter.
+
+        Raises:
+            TypeError: If any item is not hashable or items is not iterable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    @overload
+    def update_new(self, items: Iterable[object], *, mask: Literal[False] = False) -> int: ...
+    @overload
+    def update_new(self, items: Iterable[object], *, mask: Literal[True]) -> bytearray: ...
+    def update_new(self, items: Iterable[object], *, mask: bool = False) -> int | bytearray:
+        """Add items from an iterable, reporting which were new.
+
+        Equivalent to calling add_if_absent() on each item in order, so a
+        repeated item counts as new only the first time. Arrow columns are
+        read as in update(), and null elements are skipped and reported as
+        not new (0). If an item raises, the items before it have still been
+        added.
+
+        Args:
+            items: An iterable of hashable Python objects to add.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+            mask: If True, return a bytearray with one byte per item instead
+                of a count.
+
+        Returns:
+            The number of items that were definitely new, or with ``mask``, a
+            bytearray holding 1 for each new item and 0 for each item that
+            might already have been present.
+
+        Raises:
+            TypeError: If any item is not hashable or items is not iterable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+
+        Example:
+            >>> bf = BloomFilter(1000)
+            >>> bf.update_new(["a", "b", "a"])
+            2
+            >>> list(bf.update_new(["b", "c"], mask=True))
+            [0, 1]
+        """
+        ...
+
+    def add_hash(self, hash: int) -> None:
+        """Add a precomputed 64-bit hash.
+
+        The hash is used as-is, skipping abloom's own hashing. Block selection
+        uses the upper 32 bits (``(hash >> 32) % block_count``) and the lower
+        32 bits set one bit in each of the block's 8 words
+        (``(lower32 * SALT[i]) >> 26``). Hashes must therefore be well mixed
+        in all 64 bits, e.g. XXH64 or a 64-bit fingerprint. Raw hashes are
+        deterministic, so they can be used in any mode.
+
+        Args:
+            hash: An integer in the range [0, 2**64).
+
+        Raises:
+            TypeError: If hash is not an int.
+            OverflowError: If hash is negative or does not fit in 64 bits.
+
+        Example:
+            >>> bf = BloomFilter(1000)
+            >>> bf.add_hash(0x9E3779B97F4A7C15)
+            >>> bf.contains_hash(0x9E3779B97F4A7C15)
+            True
+        """
+        ...
+
+    def contains_hash(self, hash: int) -> bool:
+        """Test whether a precomputed 64-bit hash might be in the filter.
+
+        See add_hash() for how hashes map to bits.
+
+        Args:
+            hash: An integer in the range [0, 2**64).
+
+        Returns:
+            True if the hash might be in the filter, False if it is definitely not.
+
+        Raises:
+            TypeError: If hash is not an int.
+            OverflowError: If hash is negative or does not fit in 64 bits.
+        """
+        ...
+
+    def update_hashes(self, hashes: Buffer, *, threads: int = 1) -> None:
+        """Add every precomputed hash of a buffer of 64-bit integers.
+
+        Equivalent to calling add_hash() on each element. Signed buffers are
+        reinterpreted bit-for-bit, so int64 and uint64 arrays of the same bits
+        give the same filter. ``threads`` works as in update_buffer().
+
+        Args:
+            hashes: A C-contiguous buffer with an 8-byte signed or unsigned
+                integer format.
+            threads: Maximum number of native threads to insert with.
+
+        Raises:
+            TypeError: If hashes does not support the buffer protocol or its
+                format is not a 64-bit integer.
+            BufferError: If the buffer is not C-contiguous.
+            ValueError: If threads is less than 1.
+        """
+        ...
+
+    def contains_hashes(self, hashes: Buffer) -> bytearray:
+        """Test every precomputed hash of a buffer of 64-bit integers.
+
+        Args:
+            hashes: A C-contiguous buffer with an 8-byte signed or unsigned
+                integer format.
+
+        Returns:
+            A bytearray with one byte per hash: 1 if the hash might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            TypeError: If hashes does not support the buffer protocol or its
+                format is not a 64-bit integer.
+            BufferError: If the buffer is not C-contiguous.
+        """
+        ...
+
+    def update_fixed(self, data: Buffer, itemsize: int) -> None:
+        """Add every fixed-width binary key of a buffer.
+
+        The buffer is split into ``len(data) // itemsize`` keys of
+        ``itemsize`` bytes each, such as 16-byte UUIDs or 20-byte SHA-1
+        digests. Each key is hashed exactly like ``bytes(key)`` in
+        serializable mode, so the filter can later be queried with ordinary
+        bytes objects. No Python object is created per key.
+
+        Args:
+            data: A C-contiguous buffer; its format is ignored.
+            itemsize: The width of each key in bytes.
+
+        Raises:
+            ValueError: If the filter is not serializable, itemsize is less
+                than 1, or the buffer length is not a multiple of itemsize.
+            TypeError: If data does not support the buffer protocol.
+            BufferError: If the buffer is not C-contiguous.
+
+        Example:
+            >>> import uuid
+            >>> keys = [uuid.UUID(int=i).bytes for i in range(3)]
+            >>> bf = BloomFilter(1000, serializable=True)
+            >>> bf.update_fixed(b"".join(keys), 16)
+            >>> keys[1] in bf
+            True
+        """
+        ...
+
+    def contains_fixed(self, data: Buffer, itemsize: int) -> bytearray:
+        """Test every fixed-width binary key of a buffer.
+
+        Args:
+            data: A C-contiguous buffer; its format is ignored.
+            itemsize: The width of each key in bytes.
+
+        Returns:
+            A bytearray with one byte per key: 1 if the key might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            ValueError: If the filter is not serializable, itemsize is less
+                than 1, or the buffer length is not a multiple of itemsize.
+            TypeError: If data does not support the buffer protocol.
+            BufferError: If the buffer is not C-contiguous.
+        """
+        ...
+
     def __contains__(self, item: object) -> bool:
         """Test if an item might be in the bloom filter.
 
@@ -153,10 +480,58 @@ class BloomFilter:
         """
         ...
 
+    def __buffer__(self, flags: int, /) -> memoryview:
+        """Expose the block array through the buffer protocol.
+
+        ``memoryview(bf)`` gives ``byte_count`` bytes of raw blocks in native
+        word order (on little-endian hosts, the to_bytes()
+        payload after its 64-byte header), without copying. The view is writable unless the
+        filter was opened with ``BloomFilter.open(path, "r")``, so
+        ``f.write(memoryview(bf))`` and ``f.readinto(bf)`` move the blocks
+        directly. Writes through the view are plain memory writes, not atomic
+        ORs. Adding items while a view is held is safe and visible through
+        the view; re-running ``__init__`` raises BufferError.
+
+        Example:
+            >>> bf = BloomFilter(1000, serializable=True)
+            >>> len(memoryview(bf)) == bf.byte_count
+            True
+        """
+        ...
+
+    def __release_buffer__(self, buffer: memoryview, /) -> None: ...
+
+    def __reduce_ex__(self, protocol: int, /) -> tuple[Any, ...]:
+        """Support pickling, e.g. for multiprocessing and concurrent.futures.
+
+        Under protocol 5 the block array is passed as a PickleBuffer over the
+        filter's buffer, so it is copied into the pickle once, or not at all
+        when the pickler is given a buffer_callback. Older protocols store a
+        bytes copy of the blocks. Any filter can be pickled; file-backed
+        filters unpickle into in-memory filters, and shared filters are
+        pickled by name and attach to the same segment.
+
+        Filters created with serializable=False hash str and bytes with the
+        process's hash seed. Unpickling one in a process with a different
+        PYTHONHASHSEED raises ValueError, since those items would no longer
+        be found. Use serializable=True, or set the same PYTHONHASHSEED in
+        every process, to move such filters to spawned workers.
+
+        Example:
+            >>> import pickle
+            >>> bf = BloomFilter(1000)
+            >>> bf.add("test")
+            >>> buffers = []
+            >>> data = pickle.dumps(bf, 5, buffer_callback=buffers.append)
+            >>> "test" in pickle.loads(data, buffers=buffers)
+            True
+        """
+        ...
+
     def __or__(self, other: BloomFilter) -> BloomFilter:
         """Return the union of two BloomFilters.
 
-        Both filters must have the same capacity, fp_rate, and serializable setting.
+        Both filters must have the same capacity, fp_rate, layout, and serializable setting.
 
         Args:
             other: Another BloomFilter with matching parameters.
@@ -165,14 +540,14 @@ class BloomFilter:
             A new BloomFilter containing all items from both filters.
 
         Raises:
-            ValueError: If capacity, fp_rate, or serializable differ between filters.
+            ValueError: If capacity, fp_rate, layout, or serializable differ between filters.
         """
         ...
 
     def __ior__(self, other: BloomFilter) -> BloomFilter:
         """Update this BloomFilter with the union of itself and another.
 
-        Both filters must have the same capacity, fp_rate, and serializable setting.
+        Both filters must have the same capacity, fp_rate, layout, and serializable setting.
 
         Args:
             other: Another BloomFilter with matching parameters.
@@ -181,7 +556,7 @@ class BloomFilter:
             This BloomFilter (modified in place).
 
         Raises:
-            ValueError: If capacity, fp_rate, or serializable differ between filters.
+            ValueError: If capacity, fp_rate, layout, or serializable differ between filters.
         """
         ...
 
@@ -201,11 +576,22 @@ class BloomFilter:
         """
         ...
 
-    def to_bytes(self) -> bytes:
+    def to_bytes(self, *, compact: bool = False) -> bytes:
         """Serialize the filter to bytes.
 
         Serializes the filter's metadata and bit array to a bytes object
         that can be stored or transmitted and later restored with from_bytes().
+        The data is format version 3: a 64-byte little-endian header followed
+        by the blocks as little-endian words, which can also be written to a
+        file and mapped with BloomFilter.open(). With compact=True, sparsely
+        filled filters are stored in a compact encoding instead (a bitmap of
+        the non-zero blocks, then the set bit positions of each), whenever
+        that is smaller.
+
+        Args:
+            compact: Use the compact encoding when it is smaller than the
+                plain blocks. Compact output can't be opened with
+                BloomFilter.open(). Defaults to False.
 
         Returns:
             A bytes object containing the serialized filter.
@@ -228,7 +614,9 @@ class BloomFilter:
         """Deserialize a filter from bytes.
 
         Creates a new BloomFilter from data previously serialized with to_bytes().
-        The returned filter always has serializable=True.
+        Both the current format (version 3), plain or compact, and version 2,
+        written by abloom 1.x, are accepted. The returned filter always has
+        serializable=True.
 
         Args:
             data: A bytes object containing a serialized BloomFilter.
@@ -251,3 +639,1356 @@ class BloomFilter:
             True
         """
         ...
+
+    def write_to(self, fileobj: BinaryIO, *, chunk_size: int = 1048576) -> int:
+        """Stream the serialized filter to a binary file object.
+
+        Writes the same bytes as to_bytes(), but in chunks of at most
+        chunk_size bytes taken directly from the filter's memory, so no copy
+        of the whole filter is made. Works with files, pipes, sockets wrapped
+        with makefile() and io.BytesIO. Short writes from raw streams are
+        retried.
+
+        Args:
+            fileobj: A binary file object with a write() method.
+            chunk_size: Maximum number of bytes passed to each write() call.
+                Defaults to 1 MiB.
+
+        Returns:
+            The number of bytes written.
+
+        Raises:
+            ValueError: If the filter was not created with serializable=True,
+                or chunk_size is not positive.
+
+        Example:
+            >>> bf = BloomFilter(1000, 0.01, serializable=True)
+            >>> bf.add("test")
+            >>> with open("filter.abloom", "wb") as f:
+            ...     n = bf.write_to(f)
+        """
+        ...
+
+    @classmethod
+    def read_from(cls, fileobj: BinaryIO) -> BloomFilter:
+        """Read a filter streamed by write_to() from a binary file object.
+
+        Reads the header, then fills the new filter's blocks in bounded
+        chunks with fileobj.readinto(), falling back to read() for objects
+        without it. Accepts the same formats as from_bytes() and leaves the
+        stream positioned right after the filter, so several filters can be
+        read from one stream.
+
+        Args:
+            fileobj: A blocking binary file object.
+
+        Returns:
+            A new BloomFilter with serializable=True.
+
+        Raises:
+            ValueError: If the data is invalid, or the stream ends before
+                the whole filter was read.
+            BlockingIOError: If fileobj is a non-blocking stream with no
+                data available.
+
+        Example:
+            >>> with open("filter.abloom", "rb") as f:
+            ...     bf = BloomFilter.read_from(f)
+        """
+        ...
+
+    def to_parquet(self) -> bytes:
+        """Serialize the filter as a Parquet Bloom filter.
+
+        The result is a Thrift-encoded BloomFilterHeader followed by the
+        bitset, exactly as Parquet writers store a column chunk's Bloom
+        filter. Only filters created with layout="parquet" can be written.
+
+        Str and bytes values are hashed as Parquet BYTE_ARRAY values, int as
+        INT64 and float as DOUBLE. To match an INT32 column, add values as
+        4 little-endian bytes, e.g. with update_fixed(data, 4), or pass an
+        Arrow int32 column to update().
+
+        Returns:
+            A bytes object containing the header and the bitset.
+
+        Raises:
+            ValueError: If the filter's layout is not "parquet".
+
+        Example:
+            >>> bf = BloomFilter(1000, 0.01, layout="parquet")
+            >>> bf.add("test")
+            >>> "test" in BloomFilter.from_parquet(bf.to_parquet())
+            True
+        """
+        ...
+
+    @classmethod
+    def from_parquet(cls, data: Buffer, fp_rate: float = 0.01) -> BloomFilter:
+        """Load a Bloom filter written by a Parquet writer.
+
+        data starts at a column chunk's bloom_filter_offset, as stored in
+        the Parquet footer; bytes after the bitset are ignored. Only the
+        BLOCK algorithm with XXHASH and no compression is supported, which
+        is all the Parquet format defines today.
+
+        Parquet doesn't store the number of distinct values or the target
+        false positive rate, so capacity is the number of items the bitset
+        holds at fp_rate.
+
+        Args:
+            data: A bytes-like object holding the header and the bitset.
+            fp_rate: False positive rate used to derive capacity. Default
+                is 0.01 (1%).
+
+        Returns:
+            A new BloomFilter with layout="parquet".
+
+        Raises:
+            ValueError: If the header is corrupt or unsupported, the data is
+                truncated, or the bitset can't hold one item at fp_rate.
+
+        Example:
+            >>> meta = pq.ParquetFile(path).metadata.row_group(0).column(0)
+            >>> with open(path, "rb") as f:
+            ...     f.seek(meta.bloom_filter_offset)
+            ...     data = f.read(meta.bloom_filter_length)
+            >>> bf = BloomFilter.from_parquet(data)
+        """
+        ...
+
+    def checkpoint(self) -> None:
+        """Start tracking changed blocks, or restart from the current state.
+
+        Change tracking is off until the first checkpoint(), so filters that
+        never produce deltas pay nothing for it. Once on, every add that sets
+        new bits marks its 512-bit block in a side bitmap of one bit per
+        block, and checkpoint() clears the marks.
+
+        Writes through the buffer protocol, and writes to a shared filter
+        from other processes, are not tracked.
+
+        Raises:
+            ValueError: If the filter's layout is not "sbbf".
+
+        Example:
+            >>> bf = BloomFilter(1000, 0.01, serializable=True)
+            >>> bf.checkpoint()
+            >>> bf.add("test")
+            >>> delta = bf.to_delta(checkpoint=True)
+        """
+        ...
+
+    def to_delta(self, *, checkpoint: bool = False) -> bytes:
+        """Serialize the blocks changed since the last checkpoint().
+
+        The delta holds a 64-byte header, the changed blocks and their
+        varint-encoded indices, so it grows with the number of changed
+        blocks rather than the filter's size. Apply it to a replica made
+        from to_bytes() (or an earlier state of this filter) with
+        apply_delta(). Deltas after clear() carry every block.
+
+        Args:
+            checkpoint: Also clear the change marks, as checkpoint() does,
+                so the next delta starts here. Adds racing with the call are
+                either in this delta or marked for the next. Defaults to
+                False.
+
+        Returns:
+            A bytes object containing the delta.
+
+        Raises:
+            ValueError: If the filter was not created with serializable=True,
+                or change tracking was never started with checkpoint().
+        """
+        ...
+
+    def apply_delta(self, data: Buffer) -> None:
+        """Overwrite the blocks carried by a delta from to_delta().
+
+        Deltas must be applied in the order they were taken, to a filter
+        with the same capacity and fp_rate that held the source's state as
+        of the delta's base checkpoint. The blocks are copied over in place;
+        concurrent adds to the same blocks may be lost, so replicas are
+        normally updated only through apply_delta(). If this filter tracks
+        changes, the applied blocks are marked, so replicas can be chained.
+
+        Args:
+            data: A bytes-like object returned by to_delta().
+
+        Raises:
+            ValueError: If serializable=False, if the data is not a valid
+                delta, or if it was taken from a filter with a different
+                capacity or fp_rate.
+            TypeError: If the filter was opened with mode='r'.
+
+        Example:
+            >>> bf = BloomFilter(1000, 0.01, serializable=True)
+            >>> replica = BloomFilter.from_bytes(bf.to_bytes())
+            >>> bf.checkpoint()
+            >>> bf.add("test")
+            >>> replica.apply_delta(bf.to_delta(checkpoint=True))
+            >>> "test" in replica
+            True
+        """
+        ...
+
+    @classmethod
+    def open(
+        cls,
+        path: str | os.PathLike[str],
+        mode: Literal["r", "r+", "w"] = "r",
+        *,
+        capacity: int = ...,
+        fp_rate: float = 0.01,
+        free_threading: bool = False,
+    ) -> BloomFilter:
+        """Open a filter backed by a memory-mapped file.
+
+        The block array is used in place from the mapping, so opening is O(1)
+        and pages are read lazily as they are probed. Processes that open the
+        same file share one copy in the page cache. The file uses the
+        to_bytes() format (version 3), so saved filters can be opened
+        directly. File-backed filters always have serializable=True.
+
+        Args:
+            path: Path of the filter file.
+            mode: ``"r"`` maps the file read-only, and every method that adds
+                items raises TypeError. ``"r+"`` maps it read-write, so added
+                items are written to the file. ``"w"`` creates (or truncates)
+                the file for a new, empty filter.
+            capacity: Expected number of items. Required for ``mode="w"``.
+            fp_rate: Target false positive rate. Only used with ``mode="w"``.
+            free_threading: Use atomic operations. Only used with
+                ``mode="w"``; otherwise it is read from the file.
+
+        Returns:
+            A BloomFilter with serializable=True and storage="file".
+
+        Raises:
+            OSError: If the file cannot be opened or mapped.
+            ValueError: If the mode is invalid, capacity is missing for
+                ``mode="w"`` or given otherwise, or the file is invalid or
+                truncated.
+            RuntimeError: On big-endian hosts, or if the file has
+                free_threading=True but atomics are unavailable.
+
+        Example:
+            >>> bf = BloomFilter.open("seen.abloom", "w", capacity=1_000_000)
+            >>> bf.add("test")
+            >>> bf.flush()
+            >>> "test" in BloomFilter.open("seen.abloom")
+            True
+        """
+        ...
+
+    def flush(self) -> None:
+        """Write changes of a file-backed filter to disk.
+
+        Changes to a filter opened with ``mode="r+"`` or ``"w"`` are visible
+        to other processes immediately and reach the file eventually. flush()
+        waits until they are on disk. Does nothing for other filters.
+
+        Raises:
+            OSError: If the changes cannot be written.
+        """
+        ...
+
+    @classmethod
+    def create_shared(cls, name: str, capacity: int, fp_rate: float = 0.01) -> BloomFilter:
+        """Create a filter in a named shared memory segment.
+
+        The segment (a ``multiprocessing.shared_memory`` block) holds the same
+        image as a BloomFilter.open() file, and other processes map the same
+        blocks with attach() instead of keeping private copies. Shared filters
+        are always serializable and use free_threading=True, so writers in
+        several processes set bits with atomic ORs and lose nothing.
+        add_if_absent() and update_new() only guarantee a single winner among
+        threads of one process.
+
+        The segment stays until unlink() is called, even after every process
+        has closed it (on Windows, it disappears with the last handle).
+
+        Args:
+            name: Name of the new segment.
+            capacity: Expected number of items. Must be greater than 0.
+            fp_rate: Target false positive rate. Default is 0.01 (1%).
+
+        Returns:
+            A new, empty BloomFilter backed by the segment.
+
+        Raises:
+            ValueError: If capacity or fp_rate are invalid.
+            FileExistsError: If a segment with this name already exists.
+            RuntimeError: If C11 atomics are unavailable in this build.
+
+        Example:
+            >>> bf = BloomFilter.create_shared("seen", 100_000_000)
+            >>> # in each worker process:
+            >>> seen = BloomFilter.attach("seen")
+        """
+        ...
+
+    @classmethod
+    def attach(cls, name: str) -> BloomFilter:
+        """Attach to a filter created with create_shared().
+
+        Maps the segment's blocks in place without copying them. Items added
+        through any attached filter are visible to all of them. Pickling a
+        shared filter (e.g. passing it to a multiprocessing worker) attaches
+        to the same segment on the other side.
+
+        Args:
+            name: Name passed to create_shared().
+
+        Returns:
+            A BloomFilter backed by the segment.
+
+        Raises:
+            FileNotFoundError: If no segment with this name exists.
+            ValueError: If the segment does not hold a shared filter.
+        """
+        ...
+
+    def unlink(self) -> None:
+        """Remove the shared memory segment of a shared filter.
+
+        Filters already attached keep working until they are deleted, but no
+        new process can attach. Call it once, when the filter is no longer
+        needed, e.g. from the process that created it.
+
+        Raises:
+            ValueError: If the filter was not created with create_shared()
+                or attach().
+        """
+        ...
+
+
+class CountingBloomFilter:
+    """Blocked counting Bloom filter that supports removal.
+
+    Each bit of a Parquet-style split block Bloom filter is replaced by a
+    4-bit saturating counter. Adding an item increments 8 counters in one
+    128-byte block (two cache lines) and removing it decrements them, so
+    items can be deleted without rebuilding the filter. The filter takes
+    about 4x the memory of a BloomFilter with the same capacity and fp_rate.
+
+    Removing an item that was never added (a false positive) decrements
+    other items' counters and can cause false negatives. Counters that reach
+    15 stay there and are never decremented.
+
+    Args:
+        capacity: Expected number of items to be inserted. Must be greater than 0.
+        fp_rate: Target false positive rate. Must be between 0.0 and 1.0 (exclusive).
+                Default is 0.01 (1%).
+        serializable: If True, uses the deterministic hashing of
+                BloomFilter(serializable=True). Only bytes, str, int, and
+                float are supported in this mode. Default is False.
+        free_threading: If True, updates counters with atomic
+                compare-and-swap for free-threaded Python (PEP 703).
+                Default is False, which relies on the GIL for synchronization.
+
+    Raises:
+        ValueError: If capacity is 0 or fp_rate is not in the valid range.
+        RuntimeError: If free_threading=True but atomics are unavailable (old compiler).
+
+    Example:
+        >>> cbf = CountingBloomFilter(capacity=10000, fp_rate=0.01)
+        >>> cbf.add("token")
+        >>> "token" in cbf
+        True
+        >>> cbf.remove("token")
+        >>> "token" in cbf
+        False
+    """
+
+    capacity: int
+    """Expected number of items that can be inserted."""
+
+    fp_rate: float
+    """Target false positive rate (between 0.0 and 1.0)."""
+
+    k: int
+    """Number of counters per item (always 8)."""
+
+    byte_count: int
+    """Total number of bytes in the filter."""
+
+    counter_count: int
+    """Total number of 4-bit counters in the filter."""
+
+    serializable: bool
+    """Whether the filter uses deterministic hashing."""
+
+    free_threading: bool
+    """Whether the filter uses atomic operations for free-threaded Python."""
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01, serializable: bool = False, free_threading: bool = False) -> None:
+        """Initialize a new counting Bloom filter.
+
+        Args:
+            capacity: Expected number of items to be inserted. Must be greater than 0.
+            fp_rate: Target false positive rate. Must be between 0.0 and 1.0 (exclusive).
+                    Default is 0.01 (1%).
+            serializable: If True, uses deterministic hashing. Default is False.
+            free_threading: If True, uses atomic operations for compatibility with
+                    free-threaded Python. Default is False.
+
+        Raises:
+            ValueError: If capacity is 0 or fp_rate is not in the valid range.
+            RuntimeError: If free_threading=True but atomics are unavailable.
+        """
+        ...
+
+    def add(self, item: object) -> None:
+        """Add an item to the filter.
+
+        Adding the same item twice counts it twice, so it must also be
+        removed twice.
+
+        Args:
+            item: Item to add. Must be hashable.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def remove(self, item: object) -> None:
+        """Remove an item from the filter.
+
+        Only remove items that were added. An absent item that tests as a
+        false positive is "removed" too, which may cause false negatives.
+
+        Args:
+            item: Item to remove.
+
+        Raises:
+            KeyError: If the item is definitely not in the filter. The
+                filter is left unchanged.
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def update(self, items: Iterable[object]) -> None:
+        """Add items from an iterable to the filter.
+
+        Args:
+            items: Iterable of items to add.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def remove_many(self, items: Iterable[object]) -> int:
+        """Remove items from an iterable.
+
+        Items that are definitely not in the filter are skipped instead of
+        raising KeyError.
+
+        Args:
+            items: Iterable of items to remove.
+
+        Returns:
+            The number of items removed.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def contains_many(self, items: Iterable[object]) -> bytearray:
+        """Test every item of an iterable for membership.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            A bytearray with one byte per item: 1 if the item might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def count_present(self, items: Iterable[object]) -> int:
+        """Count the items of an iterable that might be in the filter.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            The number of items that might be in the filter.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __contains__(self, item: object) -> bool:
+        """Check if an item might be in the filter.
+
+        Args:
+            item: Item to check.
+
+        Returns:
+            True if the item might be in the filter, False if it is definitely not.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __eq__(self, other: object) -> bool:
+        """Test equality with another CountingBloomFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if both filters have the same parameters and counters.
+        """
+        ...
+
+    def __ne__(self, other: object) -> bool:
+        """Test inequality with another CountingBloomFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if filters differ in parameters or counters.
+        """
+        ...
+
+    def __bool__(self) -> bool:
+        """Test if the filter is non-empty.
+
+        Returns:
+            True if any counter is non-zero.
+        """
+        ...
+
+    def copy(self) -> CountingBloomFilter:
+        """Return a copy of the counting filter.
+
+        Returns:
+            A new CountingBloomFilter with the same parameters and counters.
+        """
+        ...
+
+    def clear(self) -> None:
+        """Remove all items from the counting filter.
+
+        Resets every counter to zero while preserving capacity and fp_rate
+        settings.
+        """
+        ...
+
+
+class CuckooFilter:
+    """Cuckoo filter with 4-slot buckets that supports removal.
+
+    Each item is stored as a 12- to 16-bit fingerprint in one of two
+    candidate buckets of 4 slots. The fingerprint width is the smallest that
+    meets fp_rate at a 95% load, and fingerprints are packed back to back,
+    so between about 1e-4 and 2e-3 the filter takes less memory than a
+    BloomFilter with the same capacity and fp_rate. Inserting into two full
+    buckets moves fingerprints to their other bucket ("kicks") until one
+    finds a free slot.
+
+    Only remove items that were added. Removing a false positive deletes
+    another item's fingerprint and can cause a false negative.
+
+    Args:
+        capacity: Number of items the filter must hold. Must be greater than 0.
+                Slightly more usually fit; once the filter is full, add()
+                raises OverflowError.
+        fp_rate: Target false positive rate. Must be between about 8.6e-05
+                and 1.0 (exclusive). Default is 0.01 (1%).
+        serializable: If True, uses the deterministic hashing of
+                BloomFilter(serializable=True). Only bytes, str, int, and
+                float are supported in this mode. Default is False.
+        free_threading: If True, writers take a lock and lookups retry if a
+                write ran concurrently, for free-threaded Python (PEP 703).
+                Default is False, which relies on the GIL for synchronization.
+
+    Raises:
+        ValueError: If capacity is 0 or fp_rate is not in the valid range.
+        RuntimeError: If free_threading=True but atomics are unavailable (old compiler).
+
+    Example:
+        >>> cf = CuckooFilter(capacity=10000, fp_rate=0.0001)
+        >>> cf.add("token")
+        >>> "token" in cf
+        True
+        >>> cf.remove("token")
+        >>> "token" in cf
+        False
+    """
+
+    capacity: int
+    """Number of items the filter was sized for."""
+
+    fp_rate: float
+    """Target false positive rate (between 0.0 and 1.0)."""
+
+    fingerprint_bits: int
+    """Bits per stored fingerprint (12 to 16)."""
+
+    bucket_count: int
+    """Number of 4-slot buckets."""
+
+    byte_count: int
+    """Total number of bytes in the filter."""
+
+    item_count: int
+    """Number of fingerprints stored."""
+
+    serializable: bool
+    """Whether the filter uses deterministic hashing."""
+
+    free_threading: bool
+    """Whether the filter locks writers for free-threaded Python."""
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01, serializable: bool = False, free_threading: bool = False) -> None:
+        """Initialize a new cuckoo filter.
+
+        Args:
+            capacity: Number of items the filter must hold. Must be greater than 0.
+            fp_rate: Target false positive rate. Must be between about 8.6e-05
+                    and 1.0 (exclusive). Default is 0.01 (1%).
+            serializable: If True, uses deterministic hashing. Default is False.
+            free_threading: If True, locks writers for compatibility with
+                    free-threaded Python. Default is False.
+
+        Raises:
+            ValueError: If capacity is 0 or fp_rate is not in the valid range.
+            RuntimeError: If free_threading=True but atomics are unavailable.
+        """
+        ...
+
+    def add(self, item: object) -> None:
+        """Add an item to the filter.
+
+        Adding the same item twice stores it twice, so it must also be
+        removed twice. An item's two buckets hold at most 8 copies, so
+        adding it many more times fills the filter.
+
+        Args:
+            item: Item to add. Must be hashable.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+            OverflowError: If the filter is full.
+        """
+        ...
+
+    def remove(self, item: object) -> None:
+        """Remove an item from the filter.
+
+        Only remove items that were added. An absent item that tests as a
+        false positive is "removed" too, which may cause a false negative.
+
+        Args:
+            item: Item to remove.
+
+        Raises:
+            KeyError: If the item is definitely not in the filter. The
+                filter is left unchanged.
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def update(self, items: Iterable[object]) -> None:
+        """Add items from an iterable to the filter.
+
+        Args:
+            items: Iterable of items to add.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+            OverflowError: If the filter fills up. Items before the one that
+                didn't fit are added.
+        """
+        ...
+
+    def remove_many(self, items: Iterable[object]) -> int:
+        """Remove items from an iterable.
+
+        Items that are definitely not in the filter are skipped instead of
+        raising KeyError.
+
+        Args:
+            items: Iterable of items to remove.
+
+        Returns:
+            The number of items removed.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def contains_many(self, items: Iterable[object]) -> bytearray:
+        """Test every item of an iterable for membership.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            A bytearray with one byte per item: 1 if the item might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def count_present(self, items: Iterable[object]) -> int:
+        """Count the items of an iterable that might be in the filter.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            The number of items that might be in the filter.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __contains__(self, item: object) -> bool:
+        """Check if an item might be in the filter.
+
+        Args:
+            item: Item to check.
+
+        Returns:
+            True if the item might be in the filter, False if it is definitely not.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __eq__(self, other: object) -> bool:
+        """Test equality with another CuckooFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if both filters have the same parameters and stored
+            fingerprints in the same slots.
+        """
+        ...
+
+    def __ne__(self, other: object) -> bool:
+        """Test inequality with another CuckooFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if filters differ in parameters or slots.
+        """
+        ...
+
+    def __bool__(self) -> bool:
+        """Test if the filter is non-empty.
+
+        Returns:
+            True if any fingerprint is stored.
+        """
+        ...
+
+    def copy(self) -> CuckooFilter:
+        """Return a copy of the cuckoo filter.
+
+        Returns:
+            A new CuckooFilter with the same parameters and slots.
+        """
+        ...
+
+    def clear(self) -> None:
+        """Remove all items from the cuckoo filter.
+
+        Empties every slot while preserving capacity and fp_rate settings.
+        """
+        ...
+
+
+class FrozenFilter:
+    """Immutable filter built once from a known set of items.
+
+    A binary fuse filter: every item is stored as an 8- or 16-bit
+    fingerprint spread over three cells of an array, and the array is solved
+    for the whole set at once in build(). It takes about 9 bits per item at
+    an fp_rate of 2**-8 (0.39%) and 18 bits at 2**-16 (0.0015%), against
+    about 12 and 33 bits for a BloomFilter with the same rates, and a lookup
+    reads three cells. Items can't be added after build().
+
+    The fingerprint width is the smallest that meets fp_rate: 8 bits for
+    fp_rate >= 2**-8, 16 bits down to 2**-16. The actual false positive rate
+    is 2**-fingerprint_bits, whatever fp_rate was passed.
+
+    Create filters with FrozenFilter.build(), from_bytes() or open(); the
+    class can't be instantiated directly.
+
+    Example:
+        >>> ff = FrozenFilter.build(["apple", "banana"], fp_rate=0.001)
+        >>> "apple" in ff
+        True
+        >>> ff.fingerprint_bits
+        16
+    """
+
+    fp_rate: float
+    """Target false positive rate passed to build()."""
+
+    fingerprint_bits: int
+    """Bits per fingerprint (8 or 16)."""
+
+    item_count: int
+    """Number of distinct items the filter was built from."""
+
+    byte_count: int
+    """Total number of bytes in the fingerprint array."""
+
+    serializable: bool
+    """Whether the filter uses deterministic hashing."""
+
+    @classmethod
+    def build(cls, items: Iterable[object], fp_rate: float = 0.01, *, serializable: bool = False) -> FrozenFilter:
+        """Build a filter holding the items of an iterable.
+
+        Repeated items are stored once. Construction needs about 32 bytes
+        of scratch memory per item and takes about 0.1 s per million items.
+
+        Args:
+            items: Iterable of items to store. Must be hashable.
+            fp_rate: Target false positive rate. Must be between 2**-16
+                    (about 1.5e-05) and 1.0 (exclusive). Default is 0.01 (1%).
+            serializable: If True, uses the deterministic hashing of
+                    BloomFilter(serializable=True), so the filter can be
+                    saved with to_bytes(). Only bytes, str, int, and float
+                    are supported in this mode. Default is False.
+
+        Returns:
+            A new FrozenFilter.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+            ValueError: If fp_rate is not in the valid range.
+        """
+        ...
+
+    def contains_many(self, items: Iterable[object]) -> bytearray:
+        """Test every item of an iterable for membership.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            A bytearray with one byte per item: 1 if the item might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def count_present(self, items: Iterable[object]) -> int:
+        """Count the items of an iterable that might be in the filter.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            The number of items that might be in the filter.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __contains__(self, item: object) -> bool:
+        """Check if an item might be in the filter.
+
+        Args:
+            item: Item to check.
+
+        Returns:
+            True if the item might be in the filter, False if it is definitely not.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __eq__(self, other: object) -> bool:
+        """Test equality with another FrozenFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if both filters have the same parameters, seed and
+            fingerprints.
+        """
+        ...
+
+    def __ne__(self, other: object) -> bool:
+        """Test inequality with another FrozenFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if filters differ in parameters, seed or fingerprints.
+        """
+        ...
+
+    def __bool__(self) -> bool:
+        """Test if the filter is non-empty.
+
+        Returns:
+            True if the filter was built from at least one item.
+        """
+        ...
+
+    def to_bytes(self) -> bytes:
+        """Serialize the filter to bytes.
+
+        Writes the version 3 header followed by the fingerprint array, so a
+        saved file can be mapped with open().
+
+        Returns:
+            The serialized filter.
+
+        Raises:
+            ValueError: If the filter was not built with serializable=True.
+        """
+        ...
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> FrozenFilter:
+        """Deserialize a filter from bytes.
+
+        Args:
+            data: A bytes object written by FrozenFilter.to_bytes().
+
+        Returns:
+            A new FrozenFilter with serializable=True.
+
+        Raises:
+            TypeError: If data is not a bytes object.
+            ValueError: If the data is invalid, truncated, or not a
+                FrozenFilter.
+        """
+        ...
+
+    @classmethod
+    def open(cls, path: str | os.PathLike[str]) -> FrozenFilter:
+        """Open a filter saved with to_bytes() as a read-only memory map.
+
+        The fingerprint array is used in place from the mapping, so opening
+        is O(1) and pages are read lazily as they are probed. Processes that
+        open the same file share one copy in the page cache.
+
+        Args:
+            path: Path of a file holding the output of to_bytes().
+
+        Returns:
+            A FrozenFilter with serializable=True.
+
+        Raises:
+            OSError: If the file can't be opened or mapped.
+            ValueError: If the file is not a valid FrozenFilter.
+            RuntimeError: On big-endian hosts.
+        """
+        ...
+
+
+class ScalableBloomFilter:
+    """Bloom filter that keeps its false positive rate past its initial capacity.
+
+    Items go into a chain of BloomFilter stages. Once the current stage holds
+    its capacity a new stage is added with growth times the capacity and
+    tightening times the false positive rate, so the combined false positive
+    rate stays below fp_rate however many items are added. Lookups probe
+    every stage with a single hash of the item.
+
+    Use it when the number of items isn't known up front. When it is, a
+    BloomFilter with that capacity is smaller and faster.
+
+    Args:
+        initial_capacity: Number of items the first stage holds. Must be greater than 0.
+        fp_rate: Bound on the combined false positive rate. Must be between
+                0.0 and 1.0 (exclusive). Default is 0.01 (1%).
+        growth: Capacity ratio between consecutive stages. Must be at least 2.
+                Default is 2.
+        tightening: False positive rate ratio between consecutive stages.
+                Must be between 0.0 and 1.0 (exclusive). Default is 0.5.
+        serializable: If True, uses the deterministic hashing of
+                BloomFilter(serializable=True) and enables to_bytes().
+                Only bytes, str, int, and float are supported in this mode.
+                Default is False.
+        free_threading: If True, stages use atomic operations and growth is
+                serialized by a lock, for free-threaded Python (PEP 703).
+                Default is False.
+
+    Raises:
+        ValueError: If any parameter is out of range.
+        RuntimeError: If free_threading=True but atomics are unavailable (old compiler).
+
+    Example:
+        >>> sbf = ScalableBloomFilter(initial_capacity=1000, fp_rate=0.01)
+        >>> sbf.update(range(100_000))
+        >>> sbf.stage_count
+        7
+        >>> 42 in sbf
+        True
+    """
+
+    initial_capacity: int
+    """Number of items the first stage holds."""
+
+    capacity: int
+    """Total capacity of the stages in use."""
+
+    fp_rate: float
+    """Bound on the combined false positive rate."""
+
+    growth: int
+    """Capacity ratio between consecutive stages."""
+
+    tightening: float
+    """False positive rate ratio between consecutive stages."""
+
+    stage_count: int
+    """Number of stages in use."""
+
+    item_count: int
+    """Number of added items that weren't already in the filter."""
+
+    byte_count: int
+    """Total number of bytes in all allocated stages."""
+
+    serializable: bool
+    """Whether the filter uses deterministic hashing."""
+
+    free_threading: bool
+    """Whether the filter uses atomic operations for free-threaded Python."""
+
+    def __init__(
+        self,
+        initial_capacity: int,
+        fp_rate: float = 0.01,
+        growth: int = 2,
+        tightening: float = 0.5,
+        serializable: bool = False,
+        free_threading: bool = False,
+    ) -> None:
+        """Initialize a new scalable Bloom filter with one empty stage.
+
+        Args:
+            initial_capacity: Number of items the first stage holds. Must be greater than 0.
+            fp_rate: Bound on the combined false positive rate. Must be between
+                    0.0 and 1.0 (exclusive). Default is 0.01 (1%).
+            growth: Capacity ratio between consecutive stages. Must be at least 2.
+            tightening: False positive rate ratio between consecutive stages.
+                    Must be between 0.0 and 1.0 (exclusive).
+            serializable: If True, uses deterministic hashing. Default is False.
+            free_threading: If True, uses atomic operations for compatibility with
+                    free-threaded Python. Default is False.
+
+        Raises:
+            ValueError: If any parameter is out of range.
+            RuntimeError: If free_threading=True but atomics are unavailable.
+        """
+        ...
+
+    def add(self, item: object) -> None:
+        """Add an item to the filter, adding a stage if the current one fills up.
+
+        Items that might already be in the filter are not added again and
+        don't count towards a stage's capacity.
+
+        Args:
+            item: Item to add. Must be hashable.
+                In serializable mode, only bytes, str, int,
+                and float are supported.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+            OverflowError: If the filter would need more than 64 stages.
+        """
+        ...
+
+    def update(self, items: Iterable[object]) -> None:
+        """Add items from an iterable to the filter.
+
+        Args:
+            items: Iterable of items to add.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+            OverflowError: If the filter would need more than 64 stages.
+        """
+        ...
+
+    def contains_many(self, items: Iterable[object]) -> bytearray:
+        """Test every item of an iterable for membership.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            A bytearray with one byte per item: 1 if the item might be in the
+            filter, 0 if it is definitely not.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def count_present(self, items: Iterable[object]) -> int:
+        """Count the items of an iterable that might be in the filter.
+
+        Args:
+            items: Iterable of items to test.
+
+        Returns:
+            The number of items that might be in the filter.
+
+        Raises:
+            TypeError: If items is not iterable, or any item is not hashable.
+                In serializable mode, if any item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __contains__(self, item: object) -> bool:
+        """Check if an item might be in the filter.
+
+        Args:
+            item: Item to check.
+
+        Returns:
+            True if the item might be in the filter, False if it is definitely not.
+
+        Raises:
+            TypeError: If the item is not hashable, or in serializable mode,
+                if the item is not bytes, str, int, or float.
+        """
+        ...
+
+    def __or__(self, other: ScalableBloomFilter) -> ScalableBloomFilter:
+        """Return the union of two ScalableBloomFilters.
+
+        Stages are combined pairwise. Both filters must have the same
+        parameters. The union has as many stages as the larger input, and
+        the item counts of its stages are the sums of the inputs' counts.
+
+        Args:
+            other: Another ScalableBloomFilter with matching parameters.
+
+        Returns:
+            A new ScalableBloomFilter containing all items from both filters.
+
+        Raises:
+            ValueError: If any parameter differs between filters.
+        """
+        ...
+
+    def __ior__(self, other: ScalableBloomFilter) -> ScalableBloomFilter:
+        """Update this ScalableBloomFilter with the union of itself and another.
+
+        Args:
+            other: Another ScalableBloomFilter with matching parameters.
+
+        Returns:
+            This ScalableBloomFilter (modified in place).
+
+        Raises:
+            ValueError: If any parameter differs between filters.
+        """
+        ...
+
+    def __eq__(self, other: object) -> bool:
+        """Test equality with another ScalableBloomFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if both filters have the same parameters and stages.
+        """
+        ...
+
+    def __ne__(self, other: object) -> bool:
+        """Test inequality with another ScalableBloomFilter.
+
+        Args:
+            other: Another object to compare with.
+
+        Returns:
+            True if filters differ in parameters or stages.
+        """
+        ...
+
+    def __bool__(self) -> bool:
+        """Test if the filter is non-empty.
+
+        Returns:
+            True if any stage has a bit set.
+        """
+        ...
+
+    def copy(self) -> ScalableBloomFilter:
+        """Return a copy of the scalable filter.
+
+        Returns:
+            A new ScalableBloomFilter with the same parameters and stages.
+        """
+        ...
+
+    def clear(self) -> None:
+        """Remove all items from the scalable filter.
+
+        The filter goes back to using its first stage. Stages that were
+        added are kept, empty, and reused as the filter grows again.
+        """
+        ...
+
+    def to_bytes(self) -> bytes:
+        """Serialize the filter to bytes.
+
+        Writes the filter's parameters followed by every stage in use, each
+        in the BloomFilter.to_bytes(compact=True) format.
+
+        Returns:
+            The serialized filter.
+
+        Raises:
+            ValueError: If the filter was not created with serializable=True.
+        """
+        ...
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> ScalableBloomFilter:
+        """Deserialize a filter from bytes.
+
+        Args:
+            data: A bytes object written by ScalableBloomFilter.to_bytes().
+
+        Returns:
+            A new ScalableBloomFilter with serializable=True.
+
+        Raises:
+            TypeError: If data is not a bytes object.
+            ValueError: If the data is invalid, truncated, or not a
+                ScalableBloomFilter.
+        """
+        ...
+
+
+def get_prefetch_distance() -> int:
+    """Return the prefetch distance used by batch operations.
+
+    Batch operations (update, update_buffer, update_hashes, contains_many,
+    count_present, contains_hashes) hash this many items first, prefetch their
+    target blocks, and only then set or test the bits. This overlaps cache
+    misses on filters much larger than the CPU cache. Filters smaller than
+    256 KiB always skip the prefetch pass.
+
+    Returns:
+        The current prefetch distance. 0 means prefetching is disabled.
+    """
+    ...
+
+
+def set_prefetch_distance(distance: int) -> None:
+    """Set the prefetch distance used by batch operations.
+
+    The setting is process-wide. Larger distances hide more memory latency
+    at the cost of more outstanding cache misses; the default of 16 works well
+    on most CPUs. See get_prefetch_distance() for details.
+
+    Args:
+        distance: Number of items per prefetch window, from 0 to 256.
+            0 disables prefetching.
+
+    Raises:
+        ValueError: If distance is outside the range [0, 256].
+    """
+    ...
+
+
+def get_storage_backend() -> str:
+    """Return the backend used to allocate large filters.
+
+    Every backend keeps blocks 64-byte aligned, so each 512-bit block is one
+    cache line. Filters of at least 2 MiB are allocated from the backend:
+
+    - ``"mmap"`` (default where available): an anonymous mapping aligned to
+      2 MiB and, on Linux, advised to use transparent huge pages, which cuts
+      TLB misses on large filters.
+    - ``"hugetlb"``: an anonymous mapping from the explicit huge page pool
+      (``vm.nr_hugepages``), falling back to ``"mmap"`` when the pool is
+      empty.
+    - ``"aligned"``: the Python heap.
+
+    Smaller filters always use the Python heap. The backend a filter ended up
+    with is reported by ``BloomFilter.storage``.
+
+    Returns:
+        The name of the current backend.
+    """
+    ...
+
+
+def set_storage_backend(name: str) -> None:
+    """Set the backend used to allocate large filters.
+
+    The setting is process-wide and applies to filters created afterwards,
+    including copies, unions and deserialized filters. Existing filters keep
+    their storage. See get_storage_backend() for the backends.
+
+    Args:
+        name: One of ``"aligned"``, ``"mmap"`` or ``"hugetlb"``.
+
+    Raises:
+        ValueError: If the name is unknown or the backend is not available on
+            this platform.
+    """
+    ...
@@ -1,4 +1,4 @@
-"""Compare bits per element for Standard BF, SBBF-256, and SBBF-512."""
+"""Compare bits per element for Standard BF, SBBF-256, SBBF-512 and register-blocked BF."""
 
 import math
 
@@ -8,7 +8,37 @@ def sbf_bits_per_element(target_fpr: float) -> float:
     return math.log2(1 / target_fpr) / math.log(2)
 
 
-def sbbf_fpr(bits_per_element: float, block_bits: int, word_bits: int, k: int = 8, max_iter: int = 500) -> float:
+def word_hit_coefficients(word_k: int, word_bits: int) -> list:
+    """
+    Coefficients d[t] with P(hit) = Σ d[t] × (1 - t/w)^n for a lookup making
+    word_k uniform draws into a w-bit word that n earlier draws wrote to.
+
+    The lookup touches j distinct bits with probability
+    S2(word_k, j) × w!/(w-j)! / w^word_k (Stirling numbers of the second kind),
+    and n draws cover j given bits with probability
+    Σ_t (-1)^t C(j, t) (1 - t/w)^n (inclusion-exclusion).
+    """
+    stirling = [[0] * (word_k + 1) for _ in range(word_k + 1)]
+    stirling[0][0] = 1
+    for n in range(1, word_k + 1):
+        for j in range(1, n + 1):
+            stirling[n][j] = j * stirling[n - 1][j] + stirling[n - 1][j - 1]
+
+    coeffs = [0.0] * (word_k + 1)
+    for j in range(1, word_k + 1):
+        p_distinct = stirling[word_k][j] * math.perm(word_bits, j) / word_bits ** word_k
+        for t in range(j + 1):
+            coeffs[t] += (-1) ** t * math.comb(j, t) * p_distinct
+    return coeffs
+
+
+def sbbf_fpr(bits_per_element: float, block_bits: int, word_bits: int, k: int = 8, max_iter: int = 500,
+             word_k: int = 1) -> float:
+    """
+    Poisson model of a blocked filter: each item sets word_k bits in each of
+    the k words of a block. SBBF has word_k=1; a register-blocked filter is a
+    single word (block_bits == word_bits, k=1) with word_k bits per item.
+    """
     if bits_per_element <= 0:
         return 1.0
     
@@ -19,12 +49,16 @@ def sbbf_fpr(bits_per_element: float, block_bits: int, word_bits: int, k: int =
     exp_neg_a = math.exp(-a)
     poisson_pmf = exp_neg_a
     p_miss = (word_bits - 1) / word_bits
+    coeffs = word_hit_coefficients(word_k, word_bits) if word_k > 1 else None
     
     for i in range(max_iter):
         if i > 0:
             poisson_pmf *= a / i
         
-        p_bit_set = 1.0 - (p_miss ** i)
+        if coeffs is None:
+            p_bit_set = 1.0 - (p_miss ** i)
+        else:
+            p_bit_set = sum(d * (1 - t / word_bits) ** (i * word_k) for t, d in enumerate(coeffs))
         f_inner = p_bit_set ** k
         fpr += poisson_pmf * f_inner
         
@@ -34,7 +68,8 @@ def sbbf_fpr(bits_per_element: float, block_bits: int, word_bits: int, k: int =
     return fpr
 
 
-def sbbf_bits_exact(target_fpr: float, block_bits: int, word_bits: int, tol: float = 1e-8) -> float:
+def sbbf_bits_exact(target_fpr: float, block_bits: int, word_bits: int, tol: float = 1e-8,
+                    k: int = 8, word_k: int = 1) -> float:
     if target_fpr <= 0 or target_fpr >= 1:
         raise ValueError("FPR must be in (0, 1)")
     
@@ -42,7 +77,7 @@ def sbbf_bits_exact(target_fpr: float, block_bits: int, word_bits: int, tol: flo
     
     while hi - lo > tol:
         mid = (lo + hi) / 2
-        fpr = sbbf_fpr(mid, block_bits, word_bits)
+        fpr = sbbf_fpr(mid, block_bits, word_bits, k=k, word_k=word_k)
         
         if fpr > target_fpr:
             lo = mid
@@ -62,6 +97,14 @@ def sbbf512_bits(target_fpr: float) -> float:
     return sbbf_bits_exact(target_fpr, block_bits=512, word_bits=64)
 
 
+def register64_bits(target_fpr: float, max_k: int = 8) -> tuple:
+    """Register-blocked: one 64-bit word per item, best k in 1..max_k. Returns (bits, k)"""
+    return min(
+        (sbbf_bits_exact(target_fpr, block_bits=64, word_bits=64, tol=1e-6, k=1, word_k=k), k)
+        for k in range(1, max_k + 1)
+    )
+
+
 def theoretical_min(target_fpr: float) -> float:
     """Information-theoretic minimum: log2(1/ε) bits"""
     return math.log2(1 / target_fpr)
@@ -109,7 +152,7 @@ def compare(fpr_values: list = None):
     print("Bloom Filter Comparison: Bits per Element")
     print("=" * 90)
     print()
-    print(f"{'FPR':>12} | {'x=-log2':>7} | {'Theory':>8} | {'Std BF':>8} | {'SBBF-256':>9} | {'SBBF-512':>9}")
+    print(f"{'FPR':>12} | {'x=-log2':>7} | {'Theory':>8} | {'Std BF':>8} | {'SBBF-256':>9} | {'SBBF-512':>9} | {'Register':>12}")
     print("-" * 90)
 
     for fpr in fpr_values:
@@ -118,8 +161,9 @@ def compare(fpr_values: list = None):
         sbf = sbf_bits_per_element(fpr)
         s256 = sbbf256_bits(fpr)
         s512 = sbbf512_bits(fpr)
+        reg, reg_k = register64_bits(fpr)
 
-        print(f"{fpr*100:>11.5f}% | {x:>7.2f} | {theory:>8.2f} | {sbf:>8.2f} | {s256:>9.2f} | {s512:>9.2f}")
+        print(f"{fpr*100:>11.5f}% | {x:>7.2f} | {theory:>8.2f} | {sbf:>8.2f} | {s256:>9.2f} | {s512:>9.2f} | {reg:>7.2f} k={reg_k}")
 
     print()
     print("=" * 90)
@@ -78,6 +78,8 @@ def bf_factory(request):
     and once with serializable=True. Use this for tests that verify core correctness
     (no false negatives, operations work correctly, etc.).
 
+    Other keyword arguments, e.g. `layout`, are passed to BloomFilter.
+
     Example:
         def test_add_and_contains(self, bf_factory):
             bf = bf_factory(1000)
@@ -86,8 +88,8 @@ def bf_factory(request):
     """
     serializable = request.param
 
-    def _make_filter(capacity, fp_rate=FP_RATE_STANDARD):
-        return BloomFilter(capacity, fp_rate, serializable=serializable)
+    def _make_filter(capacity, fp_rate=FP_RATE_STANDARD, **kwargs):
+        return BloomFilter(capacity, fp_rate, serializable=serializable, **kwargs)
 
     _make_filter.serializable = serializable
     return _make_filter
@@ -131,6 +133,22 @@ def bf_serializable():
     return _make_filter
 
 
+@pytest.fixture(params=[False, True], ids=["standard", "serializable"])
+def serializable(request):
+    """The `serializable` flag, running the test in both hashing modes.
+
+    Use this for the filter types other than BloomFilter, which take the same
+    flag and hash the same way.
+
+    Example:
+        def test_add_and_contains(self, serializable):
+            cbf = CountingBloomFilter(1000, serializable=serializable)
+            cbf.add("test")
+            assert "test" in cbf
+    """
+    return request.param
+
+
 # =============================================================================
 # Test Helpers
 # =============================================================================
@@ -0,0 +1,259 @@
+"""Tests for Arrow PyCapsule ingestion.
+
+This module tests:
+- update() / contains_many() / count_present() on Arrow arrays and streams
+- update_new() on Arrow arrays and streams
+- Integer columns hash like the equivalent Python ints
+- utf8/binary columns hash like str/bytes in serializable mode
+- Null handling, sliced arrays, chunked arrays
+- Fallback to iteration for unsupported columns
+"""
+
+import struct
+import uuid
+
+import pytest
+
+from abloom import BloomFilter
+
+from conftest import (
+    CAPACITY_MEDIUM,
+    CAPACITY_LARGE,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+    assert_filters_equal,
+)
+
+pa = pytest.importorskip("pyarrow")
+
+
+INT_TYPES = ["int8", "int16", "int32", "int64", "uint8", "uint16", "uint32", "uint64"]
+STRING_TYPES = ["string", "large_string", "string_view"]
+BINARY_TYPES = ["binary", "large_binary", "binary_view"]
+
+# Mix of inline (<= 12 bytes) and out-of-line values for the view types
+STRINGS = [f"key_{i}" * (i % 5) for i in range(ITEM_COUNT_LARGE)]
+
+
+def int_values(type_name):
+    """Values spanning the range of an Arrow integer type."""
+    arrow_type = getattr(pa, type_name)()
+    bits = arrow_type.bit_width
+    if type_name.startswith("u"):
+        low, high = 0, 2**bits - 1
+    else:
+        low, high = -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+    step = max(1, (high - low) // ITEM_COUNT_LARGE)
+    return [low, high, 0] + list(range(max(low, 0), high, step))[:ITEM_COUNT_LARGE]
+
+
+class TestArrowIntegers:
+    """Integer columns."""
+
+    @pytest.mark.parametrize("type_name", INT_TYPES)
+    def test_matches_python_ints(self, bf_factory, type_name):
+        """An integer column builds the same filter as the Python ints."""
+        values = int_values(type_name)
+        bf_arrow = bf_factory(CAPACITY_LARGE)
+        bf_list = bf_factory(CAPACITY_LARGE)
+
+        bf_arrow.update(pa.array(values, type=getattr(pa, type_name)()))
+        bf_list.update(values)
+
+        assert_filters_equal(bf_arrow, bf_list, f"{type_name} column must match ints")
+
+    def test_count_present(self, bf_factory):
+        """count_present() counts the column's values."""
+        values = list(range(ITEM_COUNT_LARGE))
+        bf = bf_factory(CAPACITY_LARGE)
+        bf.update(values)
+
+        assert bf.count_present(pa.array(values, type=pa.int64())) == len(values)
+
+
+class TestArrowStrings:
+    """utf8 and binary columns in serializable mode."""
+
+    @pytest.mark.parametrize("type_name", STRING_TYPES)
+    def test_matches_str_keys(self, bf_serializable, type_name):
+        """A string column builds the same filter as the str keys."""
+        bf_arrow = bf_serializable(CAPACITY_LARGE)
+        bf_list = bf_serializable(CAPACITY_LARGE)
+
+        bf_arrow.update(pa.array(STRINGS, type=getattr(pa, type_name)()))
+        bf_list.update(STRINGS)
+
+        assert_filters_equal(bf_arrow, bf_list, f"{type_name} column must match str keys")
+
+    @pytest.mark.parametrize("type_name", BINARY_TYPES)
+    def test_matches_bytes_keys(self, bf_serializable, type_name):
+        """A binary column builds the same filter as the bytes keys."""
+        keys = [s.encode() for s in STRINGS]
+        bf_arrow = bf_serializable(CAPACITY_LARGE)
+        bf_list = bf_serializable(CAPACITY_LARGE)
+
+        bf_arrow.update(pa.array(keys, type=getattr(pa, type_name)()))
+        bf_list.update(keys)
+
+        assert_filters_equal(bf_arrow, bf_list)
+
+    def test_fixed_size_binary(self, bf_serializable):
+        """Fixed-size binary columns (e.g. UUIDs) match bytes keys."""
+        keys = [uuid.UUID(int=i).bytes for i in range(ITEM_COUNT_LARGE)]
+        bf = bf_serializable(CAPACITY_LARGE)
+
+        bf.update(pa.array(keys, type=pa.binary(16)))
+
+        assert_no_false_negatives(bf, keys)
+
+    def test_non_ascii(self, bf_serializable):
+        """Strings are hashed as their UTF-8 bytes."""
+        keys = ["café", "日本語", "emoji 🎉", ""]
+        bf = bf_serializable(CAPACITY_MEDIUM)
+
+        bf.update(pa.array(keys))
+
+        assert_no_false_negatives(bf, keys)
+
+    def test_contains_many_matches_contains(self, bf_serializable):
+        """contains_many() on a string column agrees with `in`."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(STRINGS[::2])
+
+        mask = bf.contains_many(pa.array(STRINGS))
+
+        assert isinstance(mask, bytearray)
+        assert list(mask) == [int(s in bf) for s in STRINGS]
+
+    def test_update_new(self, bf_serializable):
+        """update_new() on a string column matches the str keys."""
+        keys = ["a", "b", "a", None, "c", "b"]
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        expected = bf_serializable(CAPACITY_MEDIUM)
+
+        mask = bf.update_new(pa.array(keys, type=pa.string()), mask=True)
+
+        assert list(mask) == [1, 1, 0, 0, 1, 0]
+        assert bf.update_new(pa.chunked_array([["a"], ["d", "d"]])) == 1
+        expected.update(["a", "b", "c", "d"])
+        assert_filters_equal(bf, expected)
+
+    def test_standard_mode_falls_back_to_iteration(self, bf_standard):
+        """Standard-mode filters iterate string columns instead."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        bf.update(pa.array(["a", "b"]))
+        assert len(bf.contains_many(pa.array(["a", "b", "c"]))) == 3
+
+
+class TestArrowLayout:
+    """Nulls, slices, chunks and unsupported columns."""
+
+    def test_nulls_skipped_on_insert(self, bf_serializable):
+        """Null elements are not inserted."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(pa.array([None, None], type=pa.string()))
+        assert not bf
+
+    def test_nulls_absent_in_mask(self, bf_factory):
+        """Null elements are reported as absent."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update([1, 2, 3])
+
+        arr = pa.array([1, None, 3, None], type=pa.int64())
+
+        assert bf.contains_many(arr) == bytearray([1, 0, 1, 0])
+        assert bf.count_present(arr) == 2
+
+    def test_nulls_in_strings(self, bf_serializable):
+        """Valid strings around nulls are still inserted."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(pa.array(["a", None, "a_long_string_value", None, "c"], type=pa.string_view()))
+
+        assert_no_false_negatives(bf, ["a", "a_long_string_value", "c"])
+
+    def test_sliced_array(self, bf_serializable):
+        """Array offsets are honored."""
+        arr = pa.array(STRINGS)[100:200]
+        bf = bf_serializable(CAPACITY_LARGE)
+        expected = bf_serializable(CAPACITY_LARGE)
+
+        bf.update(arr)
+        expected.update(STRINGS[100:200])
+
+        assert_filters_equal(bf, expected)
+        assert len(bf.contains_many(arr)) == 100
+
+    def test_sliced_array_with_nulls(self, bf_factory):
+        """Validity bitmaps are read at the array offset."""
+        values = [i if i % 3 else None for i in range(100)]
+        arr = pa.array(values, type=pa.int64())[5:50]
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update([v for v in values[5:50] if v is not None])
+
+        assert list(bf.contains_many(arr)) == [int(v is not None) for v in values[5:50]]
+
+    def test_chunked_array(self, bf_serializable):
+        """Chunked arrays are consumed as a stream."""
+        chunks = [STRINGS[:300], STRINGS[300:301], [], STRINGS[301:]]
+        arr = pa.chunked_array([pa.array(c, type=pa.string()) for c in chunks])
+        bf = bf_serializable(CAPACITY_LARGE)
+        expected = bf_serializable(CAPACITY_LARGE)
+
+        bf.update(arr)
+        expected.update(STRINGS)
+
+        assert_filters_equal(bf, expected)
+        assert bf.contains_many(arr) == bytearray([1]) * len(STRINGS)
+        assert bf.count_present(arr) == len(STRINGS)
+
+    def test_update_new_integers(self, bf_factory):
+        """update_new() counts new integers and skips nulls."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update([1])
+
+        arr = pa.array([1, None, 2, 2, 3], type=pa.int32())
+
+        assert bf.update_new(arr, mask=True) == bytearray([0, 0, 1, 0, 1])
+        assert bf.update_new(arr) == 0
+
+    def test_empty_array(self, bf_factory):
+        """Empty columns insert nothing and return an empty mask."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update(pa.array([], type=pa.int64()))
+        assert not bf
+        assert bf.contains_many(pa.array([], type=pa.int64())) == bytearray()
+
+    @pytest.mark.parametrize("buffer_index,offset,length", [
+        (1, 0, 20),
+        (-1, 0, 20),
+        (0, -4, 20),
+        (0, 30, 20),
+        (0, 0, -1),
+    ], ids=["index_past_end", "negative_index", "negative_offset", "past_buffer_end", "negative_length"])
+    def test_malformed_views_rejected(self, bf_serializable, buffer_index, offset, length):
+        """Views pointing outside their data buffers raise instead of being read."""
+        view = struct.pack("<i4sii", length, b"abcd", buffer_index, offset)
+        arr = pa.Array.from_buffers(pa.binary_view(), 1, [None, pa.py_buffer(view), pa.py_buffer(b"x" * 40)])
+        bf = bf_serializable(CAPACITY_MEDIUM)
+
+        with pytest.raises(ValueError, match="view"):
+            bf.update(arr)
+        with pytest.raises(ValueError, match="view"):
+            bf.count_present(arr)
+        assert not bf
+
+    def test_dictionary_falls_back_to_iteration(self, bf_serializable):
+        """Dictionary-encoded columns are not hashed by their indices."""
+        arr = pa.array(["x", "y", "x"]).dictionary_encode()
+        bf = bf_serializable(CAPACITY_MEDIUM)
+
+        # Iteration yields pyarrow scalars, which serializable mode rejects
+        with pytest.raises(TypeError):
+            bf.update(arr)
+        assert 0 not in bf and 1 not in bf
+
+    def test_unsupported_type_falls_back_to_iteration(self, bf_standard):
+        """Columns without a native path are iterated as before."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        bf.update(pa.array([1.5, 2.5]))
+        assert len(bf.contains_many(pa.array([1.5, 2.5]))) == 2
@@ -3,7 +3,9 @@ import os
 import random
 from functools import partial
 import uuid as uuid_lib
+from array import array
 from dataclasses import dataclass
+import abloom
 from abloom import BloomFilter as ABloomFilter
 from rbloom import Bloom as RBloomFilter
 from pybloom_live import BloomFilter as PyBloom
@@ -108,7 +110,48 @@ class UpdateWorkload:
         bf.update(data)
         return bf
 
-WORKLOADS = {"add": AddWorkload(), "lookup": LookupWorkload(), "update": UpdateWorkload()}
+class LookupManyWorkload(LookupWorkload):
+    """Batch lookup through count_present() (abloom only)."""
+    name = "lookup_many"
+
+    def run(self, bf_class, capacity, fp_rate, data, bf):
+        return bf.count_present(data)
+
+class UpdateBufferWorkload:
+    """Insert an int64 array through update_buffer() (abloom only)."""
+    name = "update_buffer"
+
+    def setup(self, bf_class, capacity, fp_rate, data, lib_name=None):
+        return array("q", data)
+
+    def run(self, bf_class, capacity, fp_rate, data, buffer):
+        bf = bf_class(capacity, fp_rate)
+        bf.update_buffer(buffer)
+        return bf
+
+class UpdateFixedWorkload:
+    """Insert packed 16-byte UUIDs through update_fixed() (abloom only)."""
+    name = "update_fixed"
+
+    def setup(self, bf_class, capacity, fp_rate, data, lib_name=None):
+        return b"".join(uuid_lib.UUID(item).bytes for item in data)
+
+    def run(self, bf_class, capacity, fp_rate, data, packed):
+        bf = bf_class(capacity, fp_rate)
+        bf.update_fixed(packed, 16)
+        return bf
+
+WORKLOADS = {
+    "add": AddWorkload(),
+    "lookup": LookupWorkload(),
+    "lookup_many": LookupManyWorkload(),
+    "update": UpdateWorkload(),
+    "update_buffer": UpdateBufferWorkload(),
+    "update_fixed": UpdateFixedWorkload(),
+}
+
+# Workloads that use abloom-specific batch APIs
+ABLOOM_ONLY_WORKLOADS = {"lookup_many", "update_buffer", "update_fixed"}
 
 # ============ HELPERS ============
 
@@ -146,6 +189,19 @@ def test_benchmark(benchmark, config, workload_name, lib_name):
     if lib_name in STATIC_FILTERS and workload_name in ("add", "update"):
         pytest.skip(f"{lib_name} doesn't support {workload_name}")
 
+    if workload_name in ABLOOM_ONLY_WORKLOADS and not lib_name.startswith("abloom"):
+        pytest.skip(f"{lib_name} doesn't support {workload_name}")
+
+    # Buffer ingestion only applies to integer keys
+    if workload_name == "update_buffer" and config.data_type != "int":
+        pytest.skip("update_buffer requires integer data")
+
+    # Fixed-width ingestion applies to packed UUIDs in serializable mode
+    if workload_name == "update_fixed" and (
+        config.data_type != "uuid" or "serializable" not in lib_name
+    ):
+        pytest.skip("update_fixed requires uuid data and serializable=True")
+
     # Static filters ignore FP rate - only run for canonical 1% to avoid duplicates
     if lib_name in STATIC_FILTERS and config.fp_rate != 0.01:
         pytest.skip(f"{lib_name} has fixed FP rate, skipping non-canonical config")
@@ -201,3 +257,99 @@ def test_update_batch_scaling(benchmark, batch_size, lib_name):
         return bf
     
     benchmark.pedantic(bench_fn, rounds=5, iterations=1, warmup_rounds=1)
+
+
+# ============ PREFETCH DISTANCE TEST ============
+
+PREFETCH_SIZES = [100_000, 1_000_000, 10_000_000, 50_000_000]
+PREFETCH_DISTANCES = [0, 8, 16, 64]
+
+@pytest.fixture
+def restore_prefetch_distance():
+    distance = abloom.get_prefetch_distance()
+    yield
+    abloom.set_prefetch_distance(distance)
+
+@pytest.mark.parametrize("operation", ["update_buffer", "count_present"])
+@pytest.mark.parametrize("distance", PREFETCH_DISTANCES)
+@pytest.mark.parametrize("size", PREFETCH_SIZES)
+def test_prefetch_distance(benchmark, restore_prefetch_distance, size, distance, operation):
+    """Measure batch throughput against filter size and prefetch distance.
+
+    Distance 0 disables the prefetch pass. Filters that fit in cache should
+    show no difference, while filters far larger than the last-level cache
+    should gain from overlapping the per-item DRAM misses.
+    """
+    abloom.set_prefetch_distance(distance)
+    data = generate_integers(size, seed=42)
+    buffer = array("q", data)
+    bf = ABloomFilter(size, 0.01)
+    bf.update_buffer(buffer)
+
+    if operation == "update_buffer":
+        bench_fn = partial(bf.update_buffer, buffer)
+    else:
+        bench_fn = partial(bf.count_present, data)
+
+    benchmark.pedantic(bench_fn, **get_benchmark_config(size))
+
+
+# ============ THREADED INSERT TEST ============
+
+THREAD_SIZES = [10_000_000, 50_000_000]
+THREAD_COUNTS = [1, 2, 4, 8]
+
+@pytest.mark.parametrize("threads", THREAD_COUNTS)
+@pytest.mark.parametrize("size", THREAD_SIZES)
+def test_update_threads(benchmark, size, threads):
+    """Measure update_buffer() throughput against the number of threads.
+
+    Each thread fills its own range of blocks, so throughput should scale
+    with cores until memory bandwidth becomes the limit.
+    """
+    buffer = array("q", generate_integers(size, seed=42))
+    bf = ABloomFilter(size, 0.01)
+
+    bench_fn = partial(bf.update_buffer, buffer, threads=threads)
+
+    benchmark.pedantic(bench_fn, **get_benchmark_config(size))
+
+
+# ============ STORAGE BACKEND TEST ============
+
+STORAGE_CONFIGS = [c for c in CONFIGS if c.size == 10_000_000]
+STORAGE_BACKENDS = ["aligned", "mmap", "hugetlb"]
+
+@pytest.fixture
+def restore_storage_backend():
+    backend = abloom.get_storage_backend()
+    yield
+    abloom.set_storage_backend(backend)
+
+@pytest.mark.parametrize("operation", ["update_buffer", "count_present"])
+@pytest.mark.parametrize("backend", STORAGE_BACKENDS)
+@pytest.mark.parametrize("config", STORAGE_CONFIGS,
+                         ids=lambda c: f"{c.data_type}_{c.size}_{c.fp_rate}")
+def test_storage_backend(benchmark, restore_storage_backend, config, backend, operation):
+    """Measure batch throughput on 10M-item filters for each storage backend.
+
+    Huge pages should cut the TLB misses of random block probes. "hugetlb"
+    falls back to "mmap" without reserved huge pages; the filter's storage
+    is recorded in extra_info.
+    """
+    try:
+        abloom.set_storage_backend(backend)
+    except ValueError:
+        pytest.skip(f"{backend} storage is not available on this platform")
+    data = GENERATORS[config.data_type](config.size, seed=42)
+    buffer = array("q", data)
+    bf = ABloomFilter(config.size, config.fp_rate)
+    bf.update_buffer(buffer)
+    benchmark.extra_info["storage"] = bf.storage
+
+    if operation == "update_buffer":
+        bench_fn = partial(bf.update_buffer, buffer)
+    else:
+        bench_fn = partial(bf.count_present, data)
+
+    benchmark.pedantic(bench_fn, **get_benchmark_config(config.size))
@@ -4,16 +4,32 @@ This module tests:
 - add() method
 - __contains__ (membership testing)
 - update() method
+- update_buffer() ingestion of 64-bit integer buffers
+- add_hash() / contains_hash() / update_hashes() / contains_hashes()
+- update_buffer() / update_hashes() with threads=N
+- contains_many() / count_present() batch lookups
+- add_if_absent() / update_new() test-and-set inserts
+- Prefetch distance does not change batch results
+- SIMD block kernels match the scalar implementation
 - copy() method
 - clear() method
 - No false negatives guarantee
 - Data type handling
 """
 
+import ctypes
+import hashlib
+import os
+import subprocess
+import sys
+from array import array
+
 import pytest
+import abloom
 from abloom import BloomFilter
 
 from conftest import (
+    CAPACITY_SMALL,
     CAPACITY_MEDIUM,
     CAPACITY_LARGE,
     FP_RATE_STANDARD,
@@ -250,6 +266,558 @@ class TestUpdate:
         assert_no_false_negatives(bf, items)
 
 
+INT64_EDGE_VALUES = [
+    0, 1, -1, -2, 2**31 - 1, -2**31, 2**61 - 2, 2**61 - 1, 2**61,
+    -(2**61 - 1), -(2**61), 2**63 - 1, -2**63,
+]
+UINT64_EDGE_VALUES = [0, 1, 2**61 - 1, 2**61, 2**63 - 1, 2**63, 2**64 - 2, 2**64 - 1]
+
+
+class TestUpdateBuffer:
+    """Tests for BloomFilter.update_buffer() method."""
+
+    @pytest.mark.parametrize("typecode,values", [
+        ("q", INT64_EDGE_VALUES),
+        ("Q", UINT64_EDGE_VALUES),
+        ("q", list(range(-ITEM_COUNT_LARGE, ITEM_COUNT_LARGE, 7))),
+    ], ids=["int64_edges", "uint64_edges", "int64_range"])
+    def test_matches_update(self, bf_factory, typecode, values):
+        """update_buffer() produces the same filter as update() on ints."""
+        bf_list = bf_factory(CAPACITY_LARGE)
+        bf_buffer = bf_factory(CAPACITY_LARGE)
+
+        bf_list.update(values)
+        bf_buffer.update_buffer(array(typecode, values))
+
+        assert_filters_equal(bf_list, bf_buffer, "Buffer and list ingestion must agree")
+
+    def test_no_false_negatives(self, bf_factory):
+        """All buffered integers are found with ordinary int lookups."""
+        bf = bf_factory(CAPACITY_LARGE)
+        values = list(range(0, ITEM_COUNT_LARGE * 1000, 997))
+
+        bf.update_buffer(array("q", values))
+
+        assert_no_false_negatives(bf, values)
+
+    def test_returns_none(self, bf_factory):
+        """update_buffer() returns None."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.update_buffer(array("q", [1])) is None
+
+    def test_empty_buffer(self, bf_factory):
+        """An empty buffer leaves the filter empty."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update_buffer(array("q"))
+        assert not bf
+
+    def test_memoryview_cast(self, bf_factory):
+        """Raw bytes cast to 64-bit integers are accepted."""
+        values = array("q", [5, -6, 7])
+        bf = bf_factory(CAPACITY_MEDIUM)
+
+        bf.update_buffer(memoryview(values.tobytes()).cast("q"))
+
+        assert_no_false_negatives(bf, list(values))
+
+    @pytest.mark.parametrize("ctype", [
+        ctypes.c_int64.__ctype_be__,
+        ctypes.c_int64.__ctype_le__,
+        ctypes.c_uint64.__ctype_be__,
+    ], ids=["int64_be", "int64_le", "uint64_be"])
+    def test_explicit_byte_order(self, bf_factory, ctype):
+        """Formats with an explicit byte order are decoded correctly."""
+        values = [1, 2, 2**40, 2**62 + 5]
+        data = (ctype * len(values))(*values)
+        bf_list = bf_factory(CAPACITY_MEDIUM)
+        bf_buffer = bf_factory(CAPACITY_MEDIUM)
+
+        bf_list.update(values)
+        bf_buffer.update_buffer(data)
+
+        assert_filters_equal(bf_list, bf_buffer)
+
+    @pytest.mark.parametrize("data", [
+        array("i", [1, 2, 3]),
+        array("d", [1.0, 2.0]),
+        b"12345678",
+        bytearray(16),
+    ], ids=["int32", "float64", "bytes", "bytearray"])
+    def test_rejects_non_int64_formats(self, bf_factory, data):
+        """Buffers that are not 64-bit integers raise TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_buffer(data)
+
+    def test_rejects_non_buffer(self, bf_factory):
+        """Objects without the buffer protocol raise TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_buffer([1, 2, 3])
+
+    def test_rejects_non_contiguous(self, bf_factory):
+        """Strided buffers are rejected."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(BufferError):
+            bf.update_buffer(memoryview(array("q", range(10)))[::2])
+
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(x):
+    """Python port of the MurmurHash3 finalizer used by abloom."""
+    x ^= x >> 33
+    x = (x * 0xff51afd7ed558ccd) & MASK64
+    x ^= x >> 33
+    x = (x * 0xc4ceb9fe1a85ec53) & MASK64
+    x ^= x >> 33
+    return x
+
+
+class TestPrecomputedHashes:
+    """Tests for the raw 64-bit hash entry points."""
+
+    HASHES = [mix64(i) for i in range(ITEM_COUNT_LARGE)]
+
+    def test_add_hash_and_contains_hash(self, bf_factory):
+        """Added hashes are found."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.add_hash(0x9E3779B97F4A7C15)
+
+        assert bf.contains_hash(0x9E3779B97F4A7C15) is True
+
+    def test_add_hash_returns_none(self, bf_factory):
+        """add_hash() returns None."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.add_hash(1) is None
+
+    def test_add_hash_matches_add(self, bf_standard):
+        """add(x) is add_hash(mix64(hash(x))) in standard mode."""
+        items = [0, 1, -1, 42, 2**62, "text", b"bytes", (1, 2)]
+        bf_items = bf_standard(CAPACITY_MEDIUM)
+        bf_hashes = bf_standard(CAPACITY_MEDIUM)
+
+        for item in items:
+            bf_items.add(item)
+            bf_hashes.add_hash(mix64(hash(item) & MASK64))
+
+        assert_filters_equal(bf_items, bf_hashes)
+
+    @pytest.mark.parametrize("value", [0, 2**64 - 1, 2**63])
+    def test_hash_range_boundaries(self, bf_factory, value):
+        """Hashes at the ends of the 64-bit range are accepted."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.add_hash(value)
+        assert bf.contains_hash(value)
+
+    @pytest.mark.parametrize("value", [-1, 2**64])
+    def test_hash_out_of_range_raises(self, bf_factory, value):
+        """Hashes outside [0, 2**64) raise OverflowError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(OverflowError):
+            bf.add_hash(value)
+        with pytest.raises(OverflowError):
+            bf.contains_hash(value)
+
+    @pytest.mark.parametrize("value", ["1", 1.0, None])
+    def test_hash_non_int_raises(self, bf_factory, value):
+        """Non-int hashes raise TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.add_hash(value)
+
+    def test_update_hashes_matches_add_hash(self, bf_factory):
+        """update_hashes() equals add_hash() on each element."""
+        bf_single = bf_factory(CAPACITY_LARGE)
+        bf_buffer = bf_factory(CAPACITY_LARGE)
+
+        for h in self.HASHES:
+            bf_single.add_hash(h)
+        bf_buffer.update_hashes(array("Q", self.HASHES))
+
+        assert_filters_equal(bf_single, bf_buffer)
+
+    def test_signed_buffer_reinterpreted(self, bf_factory):
+        """int64 buffers use the same bits as uint64 buffers."""
+        unsigned = array("Q", self.HASHES)
+        signed = array("q", unsigned.tobytes())
+        bf_unsigned = bf_factory(CAPACITY_LARGE)
+        bf_signed = bf_factory(CAPACITY_LARGE)
+
+        bf_unsigned.update_hashes(unsigned)
+        bf_signed.update_hashes(signed)
+
+        assert_filters_equal(bf_unsigned, bf_signed)
+
+    def test_contains_hashes_matches_contains_hash(self, bf_factory):
+        """contains_hashes() mask matches contains_hash() per element."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update_hashes(array("Q", self.HASHES[::2]))
+
+        mask = bf.contains_hashes(array("Q", self.HASHES))
+
+        assert isinstance(mask, bytearray)
+        assert list(mask) == [int(bf.contains_hash(h)) for h in self.HASHES]
+        assert all(mask[::2])
+
+    def test_contains_hashes_empty(self, bf_factory):
+        """Empty buffer produces an empty mask."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.contains_hashes(array("Q")) == bytearray()
+
+    @pytest.mark.parametrize("method", ["update_hashes", "contains_hashes"])
+    def test_buffer_rejects_wrong_format(self, bf_factory, method):
+        """Buffers that are not 64-bit integers raise TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            getattr(bf, method)(array("I", [1, 2]))
+
+
+# Enough elements for several 64K-element thread shares
+THREADED_COUNT = 400_000
+
+
+class TestThreadedUpdate:
+    """Tests for the threads= option of update_buffer() and update_hashes()."""
+
+    @pytest.mark.parametrize("threads", [2, 3, 8, 1000])
+    def test_update_buffer_matches_single_threaded(self, bf_factory, threads):
+        """Threaded update_buffer() gives a bit-identical filter."""
+        data = array("q", range(-THREADED_COUNT, THREADED_COUNT, 2))
+        expected = bf_factory(THREADED_COUNT)
+        bf = bf_factory(THREADED_COUNT)
+
+        expected.update_buffer(data)
+        bf.update_buffer(data, threads=threads)
+
+        assert_filters_equal(bf, expected, f"threads={threads} must match threads=1")
+
+    @pytest.mark.parametrize("threads", [2, 3, 8, 1000])
+    def test_update_hashes_matches_single_threaded(self, threads):
+        """Threaded update_hashes() gives a bit-identical filter."""
+        hashes = array("Q", ((i * 0x9E3779B97F4A7C15) % 2**64 for i in range(THREADED_COUNT)))
+        expected = BloomFilter(THREADED_COUNT, FP_RATE_STANDARD)
+        bf = BloomFilter(THREADED_COUNT, FP_RATE_STANDARD)
+
+        expected.update_hashes(hashes)
+        bf.update_hashes(hashes, threads=threads)
+
+        assert_filters_equal(bf, expected, f"threads={threads} must match threads=1")
+
+    def test_free_threading_filter(self):
+        """free_threading filters support threaded inserts."""
+        data = array("Q", range(THREADED_COUNT))
+        expected = BloomFilter(THREADED_COUNT, FP_RATE_STANDARD, free_threading=True)
+        bf = BloomFilter(THREADED_COUNT, FP_RATE_STANDARD, free_threading=True)
+
+        expected.update_buffer(data)
+        bf.update_buffer(data, threads=4)
+
+        assert_filters_equal(bf, expected)
+
+    def test_byteswapped_buffer(self, bf_factory):
+        """Non-native byte order is decoded the same way in every thread."""
+        values = list(range(THREADED_COUNT))
+        data = (ctypes.c_int64.__ctype_be__ * len(values))(*values)
+        expected = bf_factory(THREADED_COUNT)
+        bf = bf_factory(THREADED_COUNT)
+
+        expected.update_buffer(array("q", values))
+        bf.update_buffer(data, threads=4)
+
+        assert_filters_equal(bf, expected)
+
+    def test_tiny_filter(self, bf_factory):
+        """More threads than blocks still works."""
+        data = array("q", range(THREADED_COUNT))
+        expected = bf_factory(CAPACITY_SMALL)
+        bf = bf_factory(CAPACITY_SMALL)
+
+        expected.update_buffer(data)
+        bf.update_buffer(data, threads=8)
+
+        assert_filters_equal(bf, expected)
+
+    def test_small_input(self, bf_factory):
+        """Inputs too small to split fall back to a single thread."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update_buffer(array("q", [1, 2, 3]), threads=8)
+        assert_no_false_negatives(bf, [1, 2, 3])
+
+    @pytest.mark.parametrize("threads", [0, -1])
+    def test_invalid_threads(self, bf_standard, threads):
+        """threads must be at least 1."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="threads"):
+            bf.update_buffer(array("q", [1]), threads=threads)
+        with pytest.raises(ValueError, match="threads"):
+            bf.update_hashes(array("Q", [1]), threads=threads)
+
+    def test_threads_is_keyword_only(self, bf_standard):
+        """threads cannot be passed positionally."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_buffer(array("q", [1]), 4)
+
+
+class TestContainsMany:
+    """Tests for BloomFilter.contains_many() and count_present()."""
+
+    def test_contains_many_returns_bytearray(self, bf_factory):
+        """contains_many() returns a bytearray."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert isinstance(bf.contains_many(["a"]), bytearray)
+
+    def test_contains_many_matches_contains(self, bf_factory):
+        """Each mask byte matches `item in bf`."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update(f"item_{i}" for i in range(0, ITEM_COUNT_LARGE, 2))
+        queries = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+        mask = bf.contains_many(queries)
+
+        assert len(mask) == len(queries)
+        assert list(mask) == [int(q in bf) for q in queries]
+
+    def test_contains_many_no_false_negatives(self, bf_factory):
+        """All added items are reported present."""
+        bf = bf_factory(CAPACITY_LARGE)
+        items = list(range(ITEM_COUNT_LARGE))
+        bf.update(items)
+
+        assert bf.contains_many(items) == bytearray([1]) * len(items)
+
+    def test_contains_many_empty_iterable(self, bf_factory):
+        """Empty iterable produces an empty mask."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.contains_many([]) == bytearray()
+
+    @pytest.mark.parametrize("iterable_factory", [
+        lambda: (x for x in ["a", "b", "c"]),
+        lambda: iter(["a", "b", "c"]),
+        lambda: ("a", "b", "c"),
+    ], ids=["generator", "iterator", "tuple"])
+    def test_contains_many_iterable_types(self, bf_factory, iterable_factory):
+        """contains_many() accepts any iterable, with or without a length."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update(["a", "c"])
+
+        assert list(bf.contains_many(iterable_factory())) == [1, 0, 1]
+
+    def test_contains_many_non_iterable_raises(self, bf_factory):
+        """contains_many() with non-iterable raises TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.contains_many(42)
+
+    def test_contains_many_unhashable_raises(self, bf_standard):
+        """Unhashable items raise TypeError."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.contains_many(["ok", ["not", "hashable"]])
+
+    def test_count_present(self, bf_factory):
+        """count_present() matches the number of items found."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update(["a", "b", "c"])
+        queries = ["a", "b", "c", "x", "y"]
+
+        assert bf.count_present(queries) == sum(q in bf for q in queries)
+        assert bf.count_present(["a", "b", "c"]) == 3
+
+    def test_count_present_empty(self, bf_factory):
+        """count_present() of an empty iterable is 0."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.count_present([]) == 0
+
+    def test_count_present_non_iterable_raises(self, bf_factory):
+        """count_present() with non-iterable raises TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.count_present(None)
+
+
+class TestAddIfAbsent:
+    """Tests for BloomFilter.add_if_absent() and update_new()."""
+
+    def test_add_if_absent_reports_presence(self, bf_factory):
+        """First add reports False, later adds report True."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.add_if_absent("a") is False
+        assert bf.add_if_absent("a") is True
+        assert "a" in bf
+
+    def test_add_if_absent_matches_add(self, bf_factory):
+        """add_if_absent() sets the same bits as add()."""
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+        bf = bf_factory(CAPACITY_LARGE)
+        expected = bf_factory(CAPACITY_LARGE)
+
+        for item in items:
+            bf.add_if_absent(item)
+        expected.update(items)
+
+        assert_filters_equal(bf, expected)
+
+    def test_add_if_absent_unhashable_raises(self, bf_standard):
+        """Unhashable items raise TypeError."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.add_if_absent(["not", "hashable"])
+        assert not bf
+
+    def test_update_new_counts_new_items(self, bf_factory):
+        """update_new() returns the number of new items."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert bf.update_new(["a", "b", "c"]) == 3
+        assert bf.update_new(["a", "b", "d"]) == 1
+        assert bf.update_new([]) == 0
+
+    def test_update_new_duplicates_within_batch(self, bf_factory):
+        """A repeated item is new only the first time, even in one window."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        assert list(bf.update_new(["a", "a", "b", "a", "b"], mask=True)) == [1, 0, 1, 0, 0]
+
+    def test_update_new_matches_add_if_absent(self, bf_factory):
+        """The mask matches calling add_if_absent() on each item in order."""
+        items = [i % (ITEM_COUNT_LARGE // 2) for i in range(ITEM_COUNT_LARGE)]
+        bf = bf_factory(CAPACITY_LARGE)
+        expected = bf_factory(CAPACITY_LARGE)
+
+        mask = bf.update_new(items, mask=True)
+
+        assert isinstance(mask, bytearray)
+        assert list(mask) == [int(not expected.add_if_absent(i)) for i in items]
+        assert_filters_equal(bf, expected)
+
+    def test_update_new_inserts_before_error(self, bf_standard):
+        """Items before a failing one are still inserted, as in update()."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_new(["a", "b", ["unhashable"]])
+        assert_no_false_negatives(bf, ["a", "b"])
+
+    def test_update_new_non_iterable_raises(self, bf_factory):
+        """update_new() with non-iterable raises TypeError."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_new(42)
+
+    def test_update_new_mask_is_keyword_only(self, bf_factory):
+        """mask cannot be passed positionally."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_new(["a"], True)
+
+
+class TestPrefetchDistance:
+    """Tests for the batch prefetch pipeline settings."""
+
+    # Large enough (> 256 KiB) for batch operations to use the prefetch pass
+    CAPACITY = 300_000
+
+    @pytest.fixture(autouse=True)
+    def restore_distance(self):
+        distance = abloom.get_prefetch_distance()
+        yield
+        abloom.set_prefetch_distance(distance)
+
+    def test_default_distance(self):
+        """The default distance enables prefetching."""
+        assert abloom.get_prefetch_distance() > 0
+
+    @pytest.mark.parametrize("distance", [0, 1, 256])
+    def test_set_distance(self, distance):
+        """The distance can be set within [0, 256]."""
+        abloom.set_prefetch_distance(distance)
+        assert abloom.get_prefetch_distance() == distance
+
+    @pytest.mark.parametrize("distance", [-1, 257])
+    def test_invalid_distance_raises(self, distance):
+        """Distances outside [0, 256] raise ValueError."""
+        with pytest.raises(ValueError):
+            abloom.set_prefetch_distance(distance)
+
+    @pytest.mark.parametrize("distance", [0, 3, 16, 256])
+    def test_results_independent_of_distance(self, bf_factory, distance):
+        """Every batch API gives the same result at any distance."""
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE * 3)]
+        ints = array("q", range(ITEM_COUNT_LARGE * 3))
+        queries = items + [f"other_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+        abloom.set_prefetch_distance(0)
+        expected = bf_factory(self.CAPACITY)
+        for item in items:
+            expected.add(item)
+        for value in ints:
+            expected.add(value)
+        expected_mask = bytearray(q in expected for q in queries)
+
+        abloom.set_prefetch_distance(distance)
+        bf = bf_factory(self.CAPACITY)
+        bf.update(items)
+        bf.update_buffer(ints)
+
+        assert_filters_equal(expected, bf)
+        assert bf.contains_many(queries) == expected_mask
+        assert bf.count_present(queries) == sum(expected_mask)
+
+    def test_partial_update_inserts_prior_items(self, bf_serializable):
+        """Items before a failing item are inserted, as without batching."""
+        bf = bf_serializable(self.CAPACITY)
+        items = [f"item_{i}" for i in range(ITEM_COUNT_MEDIUM)]
+
+        with pytest.raises(TypeError):
+            bf.update(items + [None])
+
+        assert_no_false_negatives(bf, items)
+
+
+KERNEL_CHECK_SCRIPT = """
+import hashlib
+from array import array
+import abloom
+
+hashes = array("Q", [(i * 0x9E3779B97F4A7C15) % 2**64 for i in range(20_000)])
+bf = abloom.BloomFilter(300_000, 0.01, serializable=True)
+bf.update_hashes(hashes[::2])
+mask = bf.contains_hashes(hashes)
+print(abloom.SIMD_KERNEL)
+print(hashlib.sha256(bf.to_bytes()).hexdigest())
+print(hashlib.sha256(mask).hexdigest())
+"""
+
+
+class TestSimdKernels:
+    """Tests for the runtime-selected block kernels."""
+
+    def test_kernel_name(self):
+        """SIMD_KERNEL names a known kernel."""
+        assert abloom.SIMD_KERNEL in {"avx512", "avx2", "neon", "scalar"}
+
+    @pytest.mark.parametrize("kernel", ["scalar", "avx2", "avx512", "neon"])
+    def test_kernel_matches_single_item_path(self, kernel):
+        """Each supported kernel builds the same filter as add_hash()."""
+        env = dict(os.environ, ABLOOM_SIMD=kernel)
+        result = subprocess.run(
+            [sys.executable, "-c", KERNEL_CHECK_SCRIPT],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        name, filter_digest, mask_digest = result.stdout.split()
+        if name != kernel:
+            pytest.skip(f"{kernel} kernel not supported on this CPU")
+
+        hashes = [(i * 0x9E3779B97F4A7C15) % 2**64 for i in range(20_000)]
+        expected = BloomFilter(300_000, 0.01, serializable=True)
+        for h in hashes[::2]:
+            expected.add_hash(h)
+        expected_mask = bytearray(expected.contains_hash(h) for h in hashes)
+
+        assert filter_digest == hashlib.sha256(expected.to_bytes()).hexdigest()
+        assert mask_digest == hashlib.sha256(expected_mask).hexdigest()
+
+
 class TestCopy:
     """Tests for BloomFilter.copy() method."""
 
@@ -0,0 +1,235 @@
+"""Tests for CountingBloomFilter.
+
+This module tests:
+- Initialization, properties and sizing
+- add() / remove() / __contains__ and their batch variants
+- Counter saturation and repeated adds
+- copy(), clear(), equality and truthiness
+- Concurrent adds and removes with free_threading=True
+"""
+
+import threading
+
+import pytest
+from abloom import BloomFilter, CountingBloomFilter
+
+from conftest import (
+    CAPACITY_MEDIUM,
+    CAPACITY_LARGE,
+    FP_RATE_STANDARD,
+    FP_RATE_VERY_LOW,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+)
+
+
+KEYS = [f"token_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+
+class TestCountingInit:
+    """Construction and properties."""
+
+    def test_properties(self):
+        """Properties reflect the constructor arguments."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, 0.05, serializable=True)
+        assert cbf.capacity == CAPACITY_MEDIUM
+        assert cbf.fp_rate == 0.05
+        assert cbf.k == 8
+        assert cbf.serializable is True
+        assert cbf.free_threading is False
+        assert cbf.byte_count % 128 == 0
+        assert cbf.counter_count == cbf.byte_count * 2
+
+    def test_repr(self):
+        """repr shows capacity, fp_rate and serializable."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM)
+        assert repr(cbf) == "<CountingBloomFilter capacity=1000 fp_rate=0.01 serializable=False>"
+
+    def test_size_relative_to_bloom_filter(self):
+        """4-bit counters on 256-bit blocks take about 4x a BloomFilter."""
+        for fp_rate in (0.1, 0.01, 0.001):
+            cbf = CountingBloomFilter(CAPACITY_LARGE, fp_rate)
+            bf = BloomFilter(CAPACITY_LARGE, fp_rate)
+            assert 4 * bf.byte_count <= cbf.byte_count < 5 * bf.byte_count
+
+    @pytest.mark.parametrize("capacity,fp_rate", [(0, 0.01), (-1, 0.01), (10, 0.0), (10, 1.0)])
+    def test_invalid_arguments(self, capacity, fp_rate):
+        """Invalid capacity and fp_rate raise ValueError."""
+        with pytest.raises(ValueError):
+            CountingBloomFilter(capacity, fp_rate)
+
+    def test_capacity_overflow(self):
+        """Capacities that overflow the counter array are rejected."""
+        with pytest.raises(ValueError, match="overflow"):
+            CountingBloomFilter(2**62, FP_RATE_VERY_LOW)
+
+    def test_properties_read_only(self):
+        """Properties can't be assigned."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM)
+        with pytest.raises(AttributeError):
+            cbf.capacity = 5
+
+
+class TestCountingOperations:
+    """Adding, removing and testing items."""
+
+    def test_add_remove(self, serializable):
+        """A removed item is no longer found."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=serializable)
+        cbf.add("a")
+        assert "a" in cbf
+        cbf.remove("a")
+        assert "a" not in cbf
+        assert not cbf
+
+    def test_remove_absent_raises(self, serializable):
+        """Removing a definitely absent item raises KeyError and changes nothing."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=serializable)
+        cbf.add("a")
+        snapshot = cbf.copy()
+        with pytest.raises(KeyError):
+            cbf.remove("b")
+        assert cbf == snapshot
+
+    def test_repeated_adds_are_counted(self, serializable):
+        """An item added twice survives one removal."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=serializable)
+        cbf.add(42)
+        cbf.add(42)
+        cbf.remove(42)
+        assert 42 in cbf
+        cbf.remove(42)
+        assert 42 not in cbf
+
+    def test_remove_keeps_other_items(self, serializable):
+        """Removing half of the items never loses the other half."""
+        cbf = CountingBloomFilter(CAPACITY_LARGE, serializable=serializable)
+        cbf.update(KEYS)
+
+        assert cbf.remove_many(KEYS[::2]) == len(KEYS[::2])
+
+        assert_no_false_negatives(cbf, KEYS[1::2])
+        assert cbf.count_present(KEYS[::2]) < len(KEYS) // 20
+
+    def test_remove_all_empties_filter(self, serializable):
+        """Removing every added item returns the filter to empty."""
+        cbf = CountingBloomFilter(CAPACITY_LARGE, serializable=serializable)
+        empty = CountingBloomFilter(CAPACITY_LARGE, serializable=serializable)
+        cbf.update(KEYS)
+        cbf.update(KEYS[:100])
+
+        cbf.remove_many(KEYS)
+        cbf.remove_many(KEYS[:100])
+
+        assert cbf == empty
+
+    def test_remove_many_skips_absent(self, serializable):
+        """remove_many() counts only items that were present."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=serializable)
+        cbf.update(["a", "b"])
+        assert cbf.remove_many(["a", "x", "b", "a"]) == 2
+        assert not cbf
+
+    def test_generators(self, serializable):
+        """Batch methods accept any iterable."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=serializable)
+        cbf.update(i for i in range(100))
+        assert cbf.contains_many(i for i in range(100)) == bytearray([1]) * 100
+        assert cbf.remove_many(iter(range(100))) == 100
+
+    def test_saturated_counters_stick(self):
+        """Counters stop at 15 and are not decremented afterwards."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM)
+        for _ in range(20):
+            cbf.add("hot")
+        for _ in range(20):
+            cbf.remove("hot")
+        assert "hot" in cbf
+
+    def test_false_positive_rate(self):
+        """The false positive rate is close to the target at capacity."""
+        cbf = CountingBloomFilter(CAPACITY_LARGE, FP_RATE_STANDARD)
+        cbf.update(range(CAPACITY_LARGE))
+        probes = range(10**9, 10**9 + 100_000)
+        assert cbf.count_present(probes) / 100_000 < FP_RATE_STANDARD * 1.2
+
+    def test_serializable_type_restriction(self):
+        """Serializable mode accepts only bytes, str, int and float."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=True)
+        with pytest.raises(TypeError):
+            cbf.add((1, 2))
+        with pytest.raises(TypeError):
+            cbf.remove((1, 2))
+
+
+class TestCountingCopyClear:
+    """copy(), clear(), equality and truthiness."""
+
+    def test_clear(self, serializable):
+        """clear() removes everything."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, serializable=serializable)
+        cbf.update(KEYS)
+        cbf.clear()
+        assert not cbf
+        assert cbf.count_present(KEYS) == 0
+
+    def test_equality_needs_same_parameters(self):
+        """Filters with different parameters are not equal."""
+        assert CountingBloomFilter(CAPACITY_MEDIUM) == CountingBloomFilter(CAPACITY_MEDIUM)
+        assert CountingBloomFilter(CAPACITY_MEDIUM) != CountingBloomFilter(CAPACITY_MEDIUM, 0.05)
+        assert CountingBloomFilter(CAPACITY_MEDIUM) != BloomFilter(CAPACITY_MEDIUM)
+
+    def test_deterministic_across_instances(self):
+        """Serializable filters with the same items have the same counters."""
+        a = CountingBloomFilter(CAPACITY_MEDIUM, serializable=True)
+        b = CountingBloomFilter(CAPACITY_MEDIUM, serializable=True)
+        a.update(KEYS)
+        for key in reversed(KEYS):
+            b.add(key)
+        assert a == b
+
+
+class TestCountingThreads:
+    """free_threading=True."""
+
+    def test_concurrent_add_remove(self):
+        """Threads adding and removing disjoint items leave the rest intact."""
+        cbf = CountingBloomFilter(CAPACITY_LARGE, free_threading=True)
+        keep = [f"keep_{i}" for i in range(10_000)]
+        cbf.update(keep)
+        chunks = [[f"t{t}_{i}" for i in range(5_000)] for t in range(4)]
+
+        def churn(items):
+            for _ in range(3):
+                cbf.update(items)
+                cbf.remove_many(items)
+
+        threads = [threading.Thread(target=churn, args=(c,)) for c in chunks]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert_no_false_negatives(cbf, keep)
+        expected = CountingBloomFilter(CAPACITY_LARGE, free_threading=True)
+        expected.update(keep)
+        assert cbf == expected
+
+    def test_concurrent_remove_of_same_item(self):
+        """An item added once is removed by exactly one of several threads."""
+        cbf = CountingBloomFilter(CAPACITY_MEDIUM, free_threading=True)
+        items = list(range(2_000))
+        cbf.update(items)
+        removed = []
+
+        def remove_all():
+            removed.append(cbf.remove_many(items))
+
+        threads = [threading.Thread(target=remove_all) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sum(removed) == len(items)
+        assert not cbf
@@ -0,0 +1,269 @@
+"""Tests for CuckooFilter.
+
+This module tests:
+- Initialization, properties and fingerprint sizing
+- add() / remove() / __contains__ and their batch variants
+- Filling the filter, the victim stash and repeated adds
+- copy(), clear(), equality and truthiness
+- Concurrent adds, removes and lookups with free_threading=True
+"""
+
+import threading
+
+import pytest
+from abloom import BloomFilter, CuckooFilter
+
+from conftest import (
+    CAPACITY_MEDIUM,
+    CAPACITY_LARGE,
+    FP_RATE_STANDARD,
+    FP_RATE_LOW,
+    FP_RATE_VERY_LOW,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+)
+
+
+KEYS = [f"token_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+
+def fill(cf):
+    """Adds distinct ints until the filter is full; returns the ones added."""
+    added = []
+    with pytest.raises(OverflowError, match="full"):
+        for i in range(10 * cf.bucket_count * 4):
+            cf.add(i)
+            added.append(i)
+    return added
+
+
+class TestCuckooInit:
+    """Construction, properties and sizing."""
+
+    def test_properties(self):
+        """Properties reflect the constructor arguments."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=True)
+        assert cf.capacity == CAPACITY_MEDIUM
+        assert cf.fp_rate == FP_RATE_LOW
+        assert cf.serializable is True
+        assert cf.free_threading is False
+        assert cf.item_count == 0
+        assert cf.bucket_count * 4 >= CAPACITY_MEDIUM
+        assert cf.byte_count * 8 >= cf.bucket_count * 4 * cf.fingerprint_bits
+
+    def test_repr(self):
+        """repr shows capacity, fp_rate and serializable."""
+        cf = CuckooFilter(CAPACITY_MEDIUM)
+        assert repr(cf) == "<CuckooFilter capacity=1000 fp_rate=0.01 serializable=False>"
+
+    @pytest.mark.parametrize("fp_rate,bits", [(FP_RATE_STANDARD, 12), (FP_RATE_LOW, 13), (0.0003, 15), (FP_RATE_VERY_LOW, 16)])
+    def test_fingerprint_bits(self, fp_rate, bits):
+        """The fingerprint is the narrowest that meets fp_rate."""
+        assert CuckooFilter(CAPACITY_LARGE, fp_rate).fingerprint_bits == bits
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_LOW, 0.0003, FP_RATE_VERY_LOW])
+    def test_smaller_than_bloom_filter(self, fp_rate):
+        """Between 1e-4 and 1e-3 the filter is smaller than a BloomFilter."""
+        cf = CuckooFilter(CAPACITY_LARGE, fp_rate)
+        bf = BloomFilter(CAPACITY_LARGE, fp_rate)
+        assert cf.byte_count < bf.byte_count
+
+    @pytest.mark.parametrize("capacity,fp_rate", [(0, 0.01), (-1, 0.01), (10, 0.0), (10, 1.0), (10, 1e-5)])
+    def test_invalid_arguments(self, capacity, fp_rate):
+        """Invalid capacity and fp_rate raise ValueError."""
+        with pytest.raises(ValueError):
+            CuckooFilter(capacity, fp_rate)
+
+    def test_capacity_overflow(self):
+        """Capacities that overflow the table size are rejected."""
+        with pytest.raises(ValueError, match="overflow"):
+            CuckooFilter(2**62, FP_RATE_LOW)
+
+    def test_properties_read_only(self):
+        """Properties can't be assigned."""
+        cf = CuckooFilter(CAPACITY_MEDIUM)
+        with pytest.raises(AttributeError):
+            cf.capacity = 5
+
+
+class TestCuckooOperations:
+    """Adding, removing and testing items."""
+
+    def test_add_remove(self, serializable):
+        """A removed item is no longer found."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=serializable)
+        cf.add("a")
+        assert "a" in cf
+        assert cf.item_count == 1
+        cf.remove("a")
+        assert "a" not in cf
+        assert not cf
+
+    def test_remove_absent_raises(self, serializable):
+        """Removing a definitely absent item raises KeyError and changes nothing."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=serializable)
+        cf.add("a")
+        snapshot = cf.copy()
+        with pytest.raises(KeyError):
+            cf.remove("b")
+        assert cf == snapshot
+
+    def test_repeated_adds_are_counted(self, serializable):
+        """An item added twice survives one removal."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=serializable)
+        cf.add(42)
+        cf.add(42)
+        cf.remove(42)
+        assert 42 in cf
+        cf.remove(42)
+        assert 42 not in cf
+
+    def test_no_false_negatives_at_capacity(self, serializable):
+        """A filter holds `capacity` items and finds all of them."""
+        cf = CuckooFilter(CAPACITY_LARGE, FP_RATE_LOW, serializable=serializable)
+        cf.update(range(CAPACITY_LARGE))
+        assert cf.item_count == CAPACITY_LARGE
+        assert cf.count_present(range(CAPACITY_LARGE)) == CAPACITY_LARGE
+
+    def test_remove_keeps_other_items(self, serializable):
+        """Removing half of the items never loses the other half."""
+        cf = CuckooFilter(CAPACITY_LARGE, FP_RATE_LOW, serializable=serializable)
+        cf.update(KEYS)
+
+        assert cf.remove_many(KEYS[::2]) == len(KEYS[::2])
+
+        assert_no_false_negatives(cf, KEYS[1::2])
+        assert cf.count_present(KEYS[::2]) < len(KEYS) // 20
+
+    def test_remove_many_skips_absent(self, serializable):
+        """remove_many() counts only items that were present."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=serializable)
+        cf.update(["a", "b"])
+        assert cf.remove_many(["a", "x", "b", "a"]) == 2
+        assert not cf
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW, FP_RATE_VERY_LOW])
+    def test_false_positive_rate(self, fp_rate):
+        """The false positive rate at capacity stays under the target."""
+        cf = CuckooFilter(CAPACITY_LARGE, fp_rate)
+        cf.update(range(CAPACITY_LARGE))
+        probes = range(10**9, 10**9 + 2_000_000)
+        assert cf.count_present(probes) / 2_000_000 < fp_rate * 1.2
+
+    def test_serializable_type_restriction(self):
+        """Serializable mode accepts only bytes, str, int and float."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, serializable=True)
+        with pytest.raises(TypeError):
+            cf.add((1, 2))
+        with pytest.raises(TypeError):
+            cf.remove((1, 2))
+
+
+class TestCuckooFull:
+    """Filling the filter."""
+
+    def test_full_filter_keeps_items(self, serializable):
+        """Items added before the filter filled up are all found."""
+        cf = CuckooFilter(100, FP_RATE_LOW, serializable=serializable)
+        added = fill(cf)
+        assert len(added) >= 100
+        assert cf.item_count == len(added)
+        assert_no_false_negatives(cf, added)
+
+    def test_update_stops_when_full(self, serializable):
+        """update() raises OverflowError and keeps the items that fit."""
+        cf = CuckooFilter(100, FP_RATE_LOW, serializable=serializable)
+        with pytest.raises(OverflowError):
+            cf.update(range(1000))
+        assert cf.item_count >= 100
+        assert cf.count_present(range(cf.item_count)) == cf.item_count
+
+    def test_remove_after_full(self, serializable):
+        """Removing everything from a full filter empties it."""
+        cf = CuckooFilter(100, FP_RATE_LOW, serializable=serializable)
+        added = fill(cf)
+
+        assert cf.remove_many(added[::2]) == len(added[::2])
+        assert_no_false_negatives(cf, added[1::2])
+        fresh = [f"fresh_{i}" for i in range(len(added) // 4)]
+        cf.update(fresh)
+        assert cf.remove_many(fresh) == len(fresh)
+        assert cf.remove_many(added[1::2]) == len(added[1::2])
+
+        assert not cf
+        assert cf == CuckooFilter(100, FP_RATE_LOW, serializable=serializable)
+
+    def test_repeated_adds_fill_buckets(self):
+        """One item fills its two buckets after 8 copies and the stash after 9."""
+        cf = CuckooFilter(CAPACITY_MEDIUM)
+        for _ in range(9):
+            cf.add("hot")
+        with pytest.raises(OverflowError):
+            cf.add("hot")
+        assert cf.remove_many(["hot"] * 10) == 9
+        assert not cf
+
+
+class TestCuckooCopyClear:
+    """copy(), clear(), equality and truthiness."""
+
+    def test_clear(self, serializable):
+        """clear() removes everything."""
+        cf = CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=serializable)
+        cf.update(KEYS[:500])
+        cf.clear()
+        assert not cf
+        assert cf.item_count == 0
+        assert cf.count_present(KEYS) == 0
+        assert cf == CuckooFilter(CAPACITY_MEDIUM, FP_RATE_LOW, serializable=serializable)
+
+    def test_equality_needs_same_parameters(self):
+        """Filters with different parameters are not equal."""
+        assert CuckooFilter(CAPACITY_MEDIUM) == CuckooFilter(CAPACITY_MEDIUM)
+        assert CuckooFilter(CAPACITY_MEDIUM) != CuckooFilter(CAPACITY_MEDIUM, 0.05)
+        assert CuckooFilter(CAPACITY_MEDIUM) != BloomFilter(CAPACITY_MEDIUM)
+
+    def test_deterministic_across_instances(self):
+        """Serializable filters fed the same items in the same order are equal."""
+        a = CuckooFilter(CAPACITY_MEDIUM, serializable=True)
+        b = CuckooFilter(CAPACITY_MEDIUM, serializable=True)
+        a.update(KEYS)
+        for key in KEYS:
+            b.add(key)
+        assert a == b
+
+
+class TestCuckooThreads:
+    """free_threading=True."""
+
+    def test_concurrent_add_remove(self):
+        """Threads churning disjoint items never hide the other items from readers."""
+        cf = CuckooFilter(CAPACITY_LARGE, FP_RATE_LOW, free_threading=True)
+        keep = [f"keep_{i}" for i in range(20_000)]
+        cf.update(keep)
+        chunks = [[f"t{t}_{i}" for i in range(10_000)] for t in range(4)]
+        done = threading.Event()
+        misses = []
+
+        def churn(items):
+            for _ in range(3):
+                cf.update(items)
+                cf.remove_many(items)
+
+        def read():
+            while not done.is_set():
+                misses.append(len(keep) - cf.count_present(keep))
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        threads = [threading.Thread(target=churn, args=(c,)) for c in chunks]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        done.set()
+        reader.join()
+
+        assert not any(misses)
+        assert cf.item_count == len(keep)
+        assert_no_false_negatives(cf, keep)
@@ -0,0 +1,100 @@
+"""Tests shared by the filter types other than BloomFilter's default layout.
+
+This module tests, for every type in both hashing modes:
+- No false negatives
+- contains_many() / count_present() agree with `in`
+- Batch inserts keep the items before an unhashable one
+- copy() returns an equal filter that doesn't share storage
+
+Behavior specific to one type is tested in that type's module.
+"""
+
+import pytest
+from abloom import BloomFilter, CountingBloomFilter, CuckooFilter, FrozenFilter, ScalableBloomFilter
+
+from conftest import (
+    CAPACITY_SMALL,
+    CAPACITY_MEDIUM,
+    CAPACITY_LARGE,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+)
+
+
+KEYS = [f"token_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+# Empty filters that items can be added to; scalable filters start small so
+# the keys span several stages
+MUTABLE_TYPES = {
+    "counting": lambda serializable: CountingBloomFilter(CAPACITY_LARGE, serializable=serializable),
+    "scalable": lambda serializable: ScalableBloomFilter(CAPACITY_SMALL, serializable=serializable),
+    "cuckoo": lambda serializable: CuckooFilter(CAPACITY_LARGE, serializable=serializable),
+    "register": lambda serializable: BloomFilter(CAPACITY_LARGE, serializable=serializable, layout="register"),
+}
+
+
+# Filters built once from their items
+BUILT_TYPES = {
+    "frozen": lambda items, serializable: FrozenFilter.build(items, serializable=serializable),
+}
+
+
+def build(kind, items, serializable):
+    """A filter of type `kind` holding `items`."""
+    if kind in BUILT_TYPES:
+        return BUILT_TYPES[kind](items, serializable)
+    f = MUTABLE_TYPES[kind](serializable)
+    f.update(items)
+    return f
+
+
+@pytest.fixture(params=sorted(MUTABLE_TYPES))
+def mutable_kind(request):
+    """Name of a filter type that supports update() and copy()."""
+    return request.param
+
+
+@pytest.fixture(params=sorted(MUTABLE_TYPES) + sorted(BUILT_TYPES))
+def kind(request):
+    """Name of any filter type."""
+    return request.param
+
+
+class TestLookups:
+    """Membership tests."""
+
+    def test_no_false_negatives(self, kind, serializable):
+        """Every added item is found."""
+        f = build(kind, KEYS, serializable)
+        assert_no_false_negatives(f, KEYS)
+
+    def test_batch_matches_single(self, kind, serializable):
+        """contains_many() and count_present() agree with `in`."""
+        f = build(kind, KEYS[::3], serializable)
+
+        mask = f.contains_many(KEYS)
+
+        assert isinstance(mask, bytearray)
+        assert list(mask) == [int(k in f) for k in KEYS]
+        assert f.count_present(KEYS) == sum(mask)
+
+
+class TestMutation:
+    """update() and copy()."""
+
+    def test_error_keeps_earlier_items(self, mutable_kind, serializable):
+        """Items before an unhashable one are still added."""
+        f = build(mutable_kind, [], serializable)
+        with pytest.raises(TypeError):
+            f.update(["a", "b", [1]])
+        assert_no_false_negatives(f, ["a", "b"])
+
+    def test_copy_is_independent(self, mutable_kind, serializable):
+        """A copy equals the original and doesn't share storage."""
+        f = build(mutable_kind, KEYS, serializable)
+        copy = f.copy()
+        assert copy == f
+
+        copy.update(range(CAPACITY_MEDIUM))
+        assert copy != f
+        assert f.count_present(range(CAPACITY_MEDIUM)) < CAPACITY_MEDIUM // 10
@@ -0,0 +1,287 @@
+"""Tests for FrozenFilter.
+
+This module tests:
+- build(), properties and fingerprint sizing
+- __contains__ and the batch lookups
+- Repeated items, empty and tiny sets
+- Equality and truthiness
+- to_bytes() / from_bytes() round trips and validation
+- open() on saved files
+"""
+
+import struct
+
+import pytest
+from abloom import BloomFilter, FrozenFilter, ScalableBloomFilter
+
+from conftest import (
+    CAPACITY_LARGE,
+    FP_RATE_STANDARD,
+    FP_RATE_LOW,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+)
+
+
+KEYS = [f"token_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+
+class TestFrozenBuild:
+    """build() and properties."""
+
+    def test_properties(self):
+        """Properties reflect the build arguments."""
+        ff = FrozenFilter.build(KEYS, FP_RATE_LOW, serializable=True)
+        assert ff.fp_rate == FP_RATE_LOW
+        assert ff.fingerprint_bits == 16
+        assert ff.item_count == len(KEYS)
+        assert ff.serializable is True
+        assert ff.byte_count >= 2 * len(KEYS)
+
+    def test_repr(self):
+        """repr shows item_count, fp_rate and serializable."""
+        ff = FrozenFilter.build(KEYS)
+        assert repr(ff) == "<FrozenFilter item_count=1000 fp_rate=0.01 serializable=False>"
+
+    @pytest.mark.parametrize("fp_rate,bits", [(0.1, 8), (2**-8, 8), (FP_RATE_LOW, 16), (2**-16, 16)])
+    def test_fingerprint_bits(self, fp_rate, bits):
+        """The fingerprint is the narrowest that meets fp_rate."""
+        assert FrozenFilter.build(KEYS, fp_rate).fingerprint_bits == bits
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW])
+    def test_smaller_than_bloom_filter(self, fp_rate):
+        """Large sets take about 9 or 18 bits per item, less than a BloomFilter."""
+        ff = FrozenFilter.build(range(CAPACITY_LARGE), fp_rate)
+        bf = BloomFilter(CAPACITY_LARGE, 2.0 ** -ff.fingerprint_bits)
+        assert ff.byte_count * 8 / CAPACITY_LARGE < ff.fingerprint_bits * 1.2
+        assert ff.byte_count < bf.byte_count
+
+    @pytest.mark.parametrize("fp_rate", [0.0, 1.0, -0.5, 1e-5])
+    def test_invalid_fp_rate(self, fp_rate):
+        """fp_rate outside [2**-16, 1) raises ValueError."""
+        with pytest.raises(ValueError):
+            FrozenFilter.build(KEYS, fp_rate)
+
+    def test_not_instantiable(self):
+        """Filters only come from build(), from_bytes() and open()."""
+        with pytest.raises(TypeError, match="build"):
+            FrozenFilter()
+
+    def test_properties_read_only(self):
+        """Properties can't be assigned."""
+        ff = FrozenFilter.build(KEYS)
+        with pytest.raises(AttributeError):
+            ff.item_count = 5
+
+    def test_serializable_type_restriction(self):
+        """Serializable mode accepts only bytes, str, int and float."""
+        with pytest.raises(TypeError):
+            FrozenFilter.build([(1, 2)], serializable=True)
+        ff = FrozenFilter.build(KEYS, serializable=True)
+        with pytest.raises(TypeError):
+            (1, 2) in ff
+
+    def test_unhashable_item(self):
+        """An unhashable item fails the whole build."""
+        with pytest.raises(TypeError):
+            FrozenFilter.build(["a", [1]])
+
+
+class TestFrozenLookups:
+    """Membership tests."""
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW])
+    def test_no_false_negatives_each_width(self, serializable, fp_rate):
+        """8- and 16-bit fingerprints find every item the filter was built from."""
+        ff = FrozenFilter.build(KEYS, fp_rate, serializable=serializable)
+        assert_no_false_negatives(ff, KEYS)
+
+    def test_no_false_negatives_large(self, serializable):
+        """Large sets, which use the widest segments, lose nothing."""
+        ff = FrozenFilter.build(range(CAPACITY_LARGE), serializable=serializable)
+        assert ff.count_present(range(CAPACITY_LARGE)) == CAPACITY_LARGE
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW])
+    def test_false_positive_rate(self, fp_rate):
+        """Absent items match with probability 2**-fingerprint_bits."""
+        ff = FrozenFilter.build(range(CAPACITY_LARGE), fp_rate)
+        probes = range(10**9, 10**9 + 2_000_000)
+        assert ff.count_present(probes) / 2_000_000 < 2.0 ** -ff.fingerprint_bits * 1.2
+
+    def test_generators(self, serializable):
+        """build() and the batch lookups accept any iterable."""
+        ff = FrozenFilter.build((i for i in range(100)), serializable=serializable)
+        assert ff.item_count == 100
+        assert ff.contains_many(i for i in range(100)) == bytearray([1]) * 100
+
+    def test_batch_error(self, serializable):
+        """An unhashable item in a batch lookup raises TypeError."""
+        ff = FrozenFilter.build(KEYS, serializable=serializable)
+        with pytest.raises(TypeError):
+            ff.count_present(["a", [1]])
+
+
+class TestFrozenEdgeCases:
+    """Repeated items and small sets."""
+
+    def test_repeated_items_stored_once(self, serializable):
+        """Repeats don't count towards item_count and are all found."""
+        items = ["hot"] * 1000 + KEYS * 3
+        ff = FrozenFilter.build(items, serializable=serializable)
+        assert ff.item_count == len(KEYS) + 1
+        assert_no_false_negatives(ff, KEYS + ["hot"])
+
+    def test_empty(self, serializable):
+        """An empty filter finds nothing and is falsy."""
+        ff = FrozenFilter.build([], serializable=serializable)
+        assert not ff
+        assert ff.item_count == 0
+        assert ff.count_present(KEYS) == 0
+        assert "a" not in ff
+
+    @pytest.mark.parametrize("n", [1, 2, 3, 5, 17, 100])
+    def test_tiny_sets(self, serializable, n):
+        """Sets of a few items are built and found."""
+        ff = FrozenFilter.build(KEYS[:n], serializable=serializable)
+        assert ff
+        assert ff.item_count == n
+        assert_no_false_negatives(ff, KEYS[:n])
+
+    def test_mixed_types(self, serializable):
+        """bytes, str, int and float items can share a filter."""
+        items = [b"raw", "text", 42, 3.5, -7]
+        ff = FrozenFilter.build(items, serializable=serializable)
+        assert_no_false_negatives(ff, items)
+
+
+class TestFrozenEquality:
+    """Equality and determinism."""
+
+    def test_deterministic_builds(self):
+        """Serializable builds from the same items in the same order are equal."""
+        a = FrozenFilter.build(KEYS, serializable=True)
+        b = FrozenFilter.build(list(KEYS), serializable=True)
+        assert a == b
+        assert a.to_bytes() == b.to_bytes()
+
+    def test_different_sets_differ(self):
+        """Filters of different sets or parameters are not equal."""
+        a = FrozenFilter.build(KEYS)
+        assert a != FrozenFilter.build(KEYS[1:])
+        assert a != FrozenFilter.build(KEYS, FP_RATE_LOW)
+        assert a != BloomFilter(len(KEYS))
+
+
+class TestFrozenSerialization:
+    """to_bytes() / from_bytes()."""
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW])
+    def test_roundtrip(self, fp_rate):
+        """A deserialized filter equals the original and finds its items."""
+        ff = FrozenFilter.build(KEYS, fp_rate, serializable=True)
+        data = ff.to_bytes()
+        assert len(data) == 64 + ff.byte_count
+
+        restored = FrozenFilter.from_bytes(data)
+
+        assert restored == ff
+        assert restored.serializable is True
+        assert restored.item_count == ff.item_count
+        assert_no_false_negatives(restored, KEYS)
+
+    def test_header(self):
+        """The header is a v3 header with the fuse layouts 2 and 3."""
+        data8 = FrozenFilter.build(KEYS, serializable=True).to_bytes()
+        data16 = FrozenFilter.build(KEYS, FP_RATE_LOW, serializable=True).to_bytes()
+        assert data8[:8] == b"ABLM\x03\x00\x02\x00"
+        assert data16[:8] == b"ABLM\x03\x00\x03\x00"
+        (item_count,) = struct.unpack_from("<Q", data8, 8)
+        assert item_count == len(KEYS)
+
+    def test_requires_serializable(self):
+        """to_bytes() needs deterministic hashing."""
+        with pytest.raises(ValueError, match="serializable"):
+            FrozenFilter.build(KEYS).to_bytes()
+
+    def test_formats_are_not_interchangeable(self):
+        """Each class rejects the other's data."""
+        data = FrozenFilter.build(KEYS, serializable=True).to_bytes()
+        with pytest.raises(ValueError, match="FrozenFilter"):
+            BloomFilter.from_bytes(data)
+        with pytest.raises(ValueError, match="not a ScalableBloomFilter"):
+            ScalableBloomFilter.from_bytes(data)
+        with pytest.raises(ValueError, match="not a FrozenFilter"):
+            FrozenFilter.from_bytes(BloomFilter(100, serializable=True).to_bytes())
+
+    def test_truncated_and_trailing_data(self):
+        """Data must be consumed exactly."""
+        data = FrozenFilter.build(KEYS, serializable=True).to_bytes()
+        for size in (10, 63, 64, len(data) - 1):
+            with pytest.raises(ValueError):
+                FrozenFilter.from_bytes(data[:size])
+        with pytest.raises(ValueError, match="expected"):
+            FrozenFilter.from_bytes(data + b"\x00")
+
+    @pytest.mark.parametrize("offset,value,match", [
+        (5, 0x01, "flags"),
+        (7, 0x01, "hash"),
+        (16, 0x00, "fp_rate"),
+        (40, 0x03, "geometry"),
+        (48, 0x01, "geometry"),
+    ], ids=["flags", "hash", "fp_rate", "segment_length", "segment_count_length"])
+    def test_invalid_header_fields(self, offset, value, match):
+        """Corrupt header fields are rejected."""
+        data = bytearray(FrozenFilter.build(KEYS, serializable=True).to_bytes())
+        if offset == 16:
+            struct.pack_into("<d", data, 16, 0.001)  # needs 16-bit fingerprints
+        else:
+            data[offset] = value
+        with pytest.raises(ValueError, match=match):
+            FrozenFilter.from_bytes(bytes(data))
+
+    def test_type_check(self):
+        """from_bytes() requires bytes."""
+        with pytest.raises(TypeError):
+            FrozenFilter.from_bytes("not bytes")
+
+
+class TestFrozenOpen:
+    """open() on files written with to_bytes()."""
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW])
+    def test_open_saved_file(self, tmp_path, fp_rate):
+        """A mapped filter equals the one that was saved."""
+        ff = FrozenFilter.build(range(CAPACITY_LARGE), fp_rate, serializable=True)
+        path = tmp_path / "frozen.abf"
+        path.write_bytes(ff.to_bytes())
+
+        mapped = FrozenFilter.open(path)
+
+        assert mapped == ff
+        assert mapped.serializable is True
+        assert mapped.count_present(range(CAPACITY_LARGE)) == CAPACITY_LARGE
+        assert list(mapped.contains_many(KEYS)) == list(ff.contains_many(KEYS))
+
+    def test_open_accepts_str_path(self, tmp_path):
+        """Paths may be str or os.PathLike."""
+        ff = FrozenFilter.build(KEYS, serializable=True)
+        path = tmp_path / "frozen.abf"
+        path.write_bytes(ff.to_bytes())
+        assert FrozenFilter.open(str(path)) == ff
+
+    def test_open_rejects_other_files(self, tmp_path):
+        """Files that aren't FrozenFilters are rejected both ways."""
+        bf_path = tmp_path / "bloom.abf"
+        bf_path.write_bytes(BloomFilter(100, serializable=True).to_bytes())
+        ff_path = tmp_path / "frozen.abf"
+        ff_path.write_bytes(FrozenFilter.build(KEYS, serializable=True).to_bytes())
+
+        with pytest.raises(ValueError, match="not a FrozenFilter"):
+            FrozenFilter.open(bf_path)
+        with pytest.raises(ValueError, match="FrozenFilter"):
+            BloomFilter.open(ff_path)
+
+    def test_open_missing_file(self, tmp_path):
+        """A missing file raises OSError."""
+        with pytest.raises(OSError):
+            FrozenFilter.open(tmp_path / "missing.abf")
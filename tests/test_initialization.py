@@ -5,9 +5,13 @@ This module tests:
 - Property getters (capacity, fp_rate, k, byte_count, bit_count, serializable)
 - __repr__ output format
 - Error handling for invalid parameters
+- Storage backends for large filters
 """
 
+import sys
+
 import pytest
+import abloom
 from abloom import BloomFilter
 
 from conftest import (
@@ -119,6 +123,7 @@ class TestPropertyImmutability:
         ("byte_count", 1024),
         ("bit_count", 8192),
         ("serializable", True),
+        ("storage", "mmap"),
     ])
     def test_properties_are_readonly(self, bf_factory, property_name, value):
         """All properties are read-only and cannot be set."""
@@ -219,6 +224,95 @@ class TestMemoryAllocation:
         assert bf_low_fpr.bit_count > bf_high_fpr.bit_count
 
 
+# Smallest filters are ~1 KiB, this one is above the 2 MiB mapping threshold
+CAPACITY_MAPPED = 2_000_000
+STORAGE_BACKENDS = ["aligned", "mmap", "hugetlb"]
+
+
+@pytest.fixture
+def restore_storage_backend():
+    backend = abloom.get_storage_backend()
+    yield
+    abloom.set_storage_backend(backend)
+
+
+def available_backends():
+    """Backends accepted by set_storage_backend() on this platform."""
+    available = []
+    for name in STORAGE_BACKENDS:
+        try:
+            abloom.set_storage_backend(name)
+        except ValueError:
+            continue
+        available.append(name)
+    return available
+
+
+class TestStorageBackend:
+    """Tests for the block storage backends."""
+
+    def test_default_backend(self):
+        """Large filters are mapped by default where mmap exists."""
+        expected = "aligned" if sys.platform == "win32" else "mmap"
+        assert abloom.get_storage_backend() == expected
+
+    def test_small_filters_use_heap(self, bf_factory, restore_storage_backend):
+        """Filters below the mapping threshold stay on the aligned heap."""
+        for name in available_backends():
+            abloom.set_storage_backend(name)
+            assert bf_factory(CAPACITY_MEDIUM).storage == "aligned"
+
+    def test_large_filter_backend(self, restore_storage_backend):
+        """Large filters report the backend they were allocated from."""
+        for name in available_backends():
+            abloom.set_storage_backend(name)
+            bf = BloomFilter(CAPACITY_MAPPED, FP_RATE_STANDARD)
+            if name == "hugetlb":
+                # Falls back to mmap when no huge pages are reserved
+                assert bf.storage in ("hugetlb", "mmap")
+            else:
+                assert bf.storage == name
+
+    def test_backends_build_identical_filters(self, bf_factory, restore_storage_backend):
+        """Every backend starts zeroed and gives the same filter."""
+        items = range(0, CAPACITY_MAPPED, 7)
+        filters = []
+        for name in available_backends():
+            abloom.set_storage_backend(name)
+            bf = bf_factory(CAPACITY_MAPPED)
+            assert not bf
+            bf.update(items)
+            filters.append(bf)
+
+        for bf in filters[1:]:
+            assert bf == filters[0]
+
+    def test_derived_filters_use_current_backend(self, restore_storage_backend):
+        """copy(), | and from_bytes() allocate from the current backend."""
+        abloom.set_storage_backend("aligned")
+        bf = BloomFilter(CAPACITY_MAPPED, FP_RATE_STANDARD, serializable=True)
+        bf.add("x")
+        data = bf.to_bytes()
+
+        for name in available_backends():
+            abloom.set_storage_backend(name)
+            fresh = BloomFilter(CAPACITY_MAPPED, FP_RATE_STANDARD)
+            for other in [bf.copy(), bf | bf, BloomFilter.from_bytes(data)]:
+                assert other == bf
+                assert other.storage == fresh.storage
+
+    @pytest.mark.parametrize("name", ["", "huge", "MMAP"])
+    def test_unknown_backend_raises(self, name):
+        """Unknown backend names raise ValueError."""
+        with pytest.raises(ValueError, match="storage backend"):
+            abloom.set_storage_backend(name)
+
+    def test_non_string_raises(self):
+        """The backend name must be a str."""
+        with pytest.raises(TypeError):
+            abloom.set_storage_backend(1)
+
+
 class TestOverflowProtection:
     """Tests for overflow protection with extreme capacity values.
 
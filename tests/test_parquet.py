@@ -0,0 +1,376 @@
+"""Tests for layout="parquet" and Parquet Bloom filter interop.
+
+This module tests:
+- Parquet layout properties, sizing and hashing
+- Batch, buffer and Arrow operations with the Parquet layout
+- Serialization, pickling and set operations keep the layout
+- to_parquet() / from_parquet() header handling
+- Byte-for-byte compatibility with Bloom filters written by pyarrow
+"""
+
+import pickle
+import struct
+from array import array
+
+import pytest
+from abloom import BloomFilter
+
+from conftest import (
+    CAPACITY_MEDIUM,
+    CAPACITY_LARGE,
+    FP_RATE_LOW,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+    assert_filters_equal,
+)
+
+
+STRINGS = [f"key_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+# BloomFilterHeader after numBytes: algorithm=BLOCK, hash=XXHASH,
+# compression=UNCOMPRESSED, then the end of the struct
+HEADER_TAIL = b"\x1c\x1c\x00\x00" * 3 + b"\x00"
+
+
+def parquet_header(num_bytes, tail=HEADER_TAIL):
+    """A Thrift compact BloomFilterHeader for a num_bytes bitset."""
+    value = num_bytes << 1
+    varint = bytearray()
+    while value >= 0x80:
+        varint.append(value & 0x7F | 0x80)
+        value >>= 7
+    varint.append(value)
+    return b"\x15" + bytes(varint) + tail
+
+
+class TestParquetLayout:
+    """Properties and operations of layout="parquet" filters."""
+
+    def test_properties(self):
+        """Parquet filters are serializable and report their layout."""
+        bf = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        assert bf.layout == "parquet"
+        assert bf.serializable is True
+        assert bf.k == 8
+        assert bf.bit_count == bf.byte_count * 8
+        assert "layout='parquet'" in repr(bf)
+        assert BloomFilter(CAPACITY_MEDIUM).layout == "sbbf"
+
+    @pytest.mark.parametrize("capacity,fp_rate,expected", [
+        (1, 0.01, 32),
+        (1000, 0.01, 2048),
+        (1000, 0.05, 1024),
+        (1_000_000, 0.01, 2 * 1024 * 1024),
+        (10**10, 0.01, 128 * 1024 * 1024),
+    ])
+    def test_sizing_matches_parquet(self, capacity, fp_rate, expected):
+        """Bitsets are sized like Parquet writers size them."""
+        bf = BloomFilter(capacity, fp_rate, layout="parquet")
+        assert bf.byte_count == expected
+
+    def test_unknown_layout_rejected(self):
+        """Only 'sbbf', 'parquet' and 'register' are accepted."""
+        with pytest.raises(ValueError, match="layout"):
+            BloomFilter(CAPACITY_MEDIUM, layout="xor")
+
+    @pytest.mark.parametrize("items", [
+        STRINGS,
+        [s.encode() for s in STRINGS],
+        list(range(-ITEM_COUNT_LARGE, ITEM_COUNT_LARGE, 7)) + [2**63 - 1, 2**64 - 1],
+        [i / 3 for i in range(ITEM_COUNT_LARGE)],
+    ], ids=["str", "bytes", "int", "float"])
+    def test_no_false_negatives(self, items):
+        """Every supported type is found after insertion."""
+        bf = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        bf.update(items)
+        assert_no_false_negatives(bf, items)
+
+    def test_int_out_of_range(self):
+        """Ints must fit a Parquet INT64 value."""
+        bf = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        with pytest.raises(OverflowError):
+            bf.add(2**64)
+        with pytest.raises(OverflowError):
+            bf.add(-(2**63) - 1)
+
+    def test_unsupported_type(self):
+        """Other types raise TypeError."""
+        bf = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        with pytest.raises(TypeError):
+            bf.add((1, 2))
+
+    def test_hashing_differs_from_serializable(self):
+        """Ints and floats are hashed by their Parquet encoding."""
+        # INT64 and uint64 bit patterns are the same value
+        negative = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        negative.add(-1)
+        assert 2**64 - 1 in negative
+        # -0.0 and 0.0 have different encodings
+        zero = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        zero.add(0.0)
+        assert zero.contains_many([0.0, -0.0]) == bytearray([1, 0])
+
+    def test_batch_operations_match_single(self):
+        """Batch APIs agree with add() and `in`."""
+        single = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        batch = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        for s in STRINGS[::2]:
+            single.add(s)
+        batch.update(STRINGS[::2])
+
+        assert_filters_equal(single, batch)
+        assert list(batch.contains_many(STRINGS)) == [int(s in single) for s in STRINGS]
+        assert batch.count_present(STRINGS[::2]) == len(STRINGS[::2])
+
+    def test_update_new(self):
+        """update_new() and add_if_absent() report new items."""
+        bf = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        assert bf.update_new(["a", "b", "a"], mask=True) == bytearray([1, 1, 0])
+        assert bf.add_if_absent("a") is True
+        assert bf.add_if_absent("c") is False
+
+    @pytest.mark.parametrize("threads", [1, 4])
+    def test_update_buffer_matches_ints(self, threads):
+        """int64 buffers hash like the equivalent ints."""
+        values = list(range(-ITEM_COUNT_LARGE, ITEM_COUNT_LARGE))
+        from_buffer = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        from_ints = BloomFilter(CAPACITY_LARGE, layout="parquet")
+
+        from_buffer.update_buffer(array("q", values), threads=threads)
+        from_ints.update(values)
+
+        assert_filters_equal(from_buffer, from_ints)
+
+    def test_fixed_width_int32(self):
+        """INT32 values can be passed as 4 packed bytes."""
+        values = list(range(ITEM_COUNT_LARGE))
+        packed = struct.pack(f"<{len(values)}i", *values)
+        bf = BloomFilter(CAPACITY_LARGE, layout="parquet")
+
+        bf.update_fixed(packed, 4)
+
+        assert_no_false_negatives(bf, [v.to_bytes(4, "little") for v in values])
+
+    def test_free_threading(self):
+        """The atomic path builds the same filter."""
+        plain = BloomFilter(CAPACITY_LARGE, layout="parquet")
+        atomic = BloomFilter(CAPACITY_LARGE, layout="parquet", free_threading=True)
+        plain.update(STRINGS)
+        atomic.update(STRINGS)
+        assert bytes(memoryview(plain)) == bytes(memoryview(atomic))
+
+    def test_roundtrip_keeps_layout(self, tmp_path):
+        """to_bytes(), write_to() and open() preserve the layout."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, layout="parquet")
+        bf.update(STRINGS)
+
+        data = bf.to_bytes()
+        assert len(data) == 64 + bf.byte_count
+        restored = BloomFilter.from_bytes(data)
+        assert restored.layout == "parquet"
+        assert_filters_equal(restored, bf)
+
+        path = tmp_path / "f"
+        with open(path, "wb") as f:
+            bf.write_to(f)
+        assert_filters_equal(BloomFilter.open(path), bf)
+
+    @pytest.mark.parametrize("protocol", [2, 5])
+    def test_pickle(self, protocol):
+        """Pickling preserves the layout."""
+        bf = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        bf.update(STRINGS)
+        restored = pickle.loads(pickle.dumps(bf, protocol))
+        assert restored.layout == "parquet"
+        assert_filters_equal(restored, bf)
+
+    def test_set_operations(self):
+        """Union works within a layout; layouts don't mix."""
+        a = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        b = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        a.add("a")
+        b.add("b")
+        union = a | b
+        assert union.layout == "parquet"
+        assert_no_false_negatives(union, ["a", "b"])
+
+        sbbf = BloomFilter(CAPACITY_MEDIUM, serializable=True)
+        assert a != sbbf
+        with pytest.raises(ValueError, match="layout"):
+            a | sbbf
+
+    def test_change_tracking_unsupported(self):
+        """Deltas are only available for the SBBF layout."""
+        with pytest.raises(ValueError, match="sbbf"):
+            BloomFilter(CAPACITY_MEDIUM, layout="parquet").checkpoint()
+
+    def test_arrow_int_columns(self):
+        """Arrow integer columns hash like their Parquet physical type."""
+        pa = pytest.importorskip("pyarrow")
+        values = list(range(ITEM_COUNT_LARGE))
+        bf = BloomFilter(CAPACITY_LARGE, layout="parquet")
+
+        bf.update(pa.array(values, type=pa.int32()))
+        bf.update(pa.array(values, type=pa.int64()))
+
+        assert_no_false_negatives(bf, [v.to_bytes(4, "little") for v in values])
+        assert_no_false_negatives(bf, values)
+
+
+class TestParquetFormat:
+    """to_parquet() / from_parquet()."""
+
+    def test_header(self):
+        """to_parquet() writes the Thrift header, then the bitset."""
+        bf = BloomFilter(1000, 0.01, layout="parquet")
+        data = bf.to_parquet()
+        header = parquet_header(2048)
+        assert data[:len(header)] == header
+        assert data[len(header):] == bytes(memoryview(bf))
+
+    def test_roundtrip(self):
+        """from_parquet() restores the bitset and derives the capacity."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, layout="parquet")
+        bf.update(STRINGS)
+
+        restored = BloomFilter.from_parquet(bf.to_parquet(), fp_rate=FP_RATE_LOW)
+
+        assert restored.layout == "parquet"
+        assert restored.fp_rate == FP_RATE_LOW
+        assert restored.capacity >= CAPACITY_LARGE
+        assert restored.byte_count == bf.byte_count
+        assert bytes(memoryview(restored)) == bytes(memoryview(bf))
+        assert_no_false_negatives(restored, STRINGS)
+
+    def test_capacity_is_consistent(self):
+        """The derived capacity rebuilds a bitset of the same size."""
+        for num_bytes in (32, 64, 1 << 20):
+            bf = BloomFilter.from_parquet(parquet_header(num_bytes) + bytes(num_bytes))
+            assert bf.byte_count == num_bytes
+            assert BloomFilter(bf.capacity, bf.fp_rate, layout="parquet").byte_count == num_bytes
+            assert BloomFilter.from_bytes(bf.to_bytes()) == bf
+
+    def test_trailing_data_ignored(self):
+        """Bytes after the bitset are ignored."""
+        bf = BloomFilter(CAPACITY_MEDIUM, layout="parquet")
+        bf.add("a")
+        restored = BloomFilter.from_parquet(memoryview(bf.to_parquet() + b"footer"))
+        assert "a" in restored
+
+    def test_unknown_fields_skipped(self):
+        """Fields the header doesn't define are skipped."""
+        # Field 5 (binary "xy"), field 6 (list of two i32), field 7 (true)
+        tail = HEADER_TAIL[:-1] + b"\x18\x02xy" + b"\x19\x25\x02\x04" + b"\x11" + b"\x00"
+        bf = BloomFilter.from_parquet(parquet_header(32, tail) + bytes(32))
+        assert bf.byte_count == 32
+
+    def test_truncated_rejected(self):
+        """Truncated headers and bitsets are rejected."""
+        data = BloomFilter(CAPACITY_MEDIUM, layout="parquet").to_parquet()
+        with pytest.raises(ValueError, match="expected"):
+            BloomFilter.from_parquet(data[:-1])
+        with pytest.raises(ValueError, match="corrupt"):
+            BloomFilter.from_parquet(data[:5])
+
+    @pytest.mark.parametrize("tail,match", [
+        (b"\x1c\x2c\x00\x00" + HEADER_TAIL[4:], "algorithm"),
+        (HEADER_TAIL[:4] + b"\x1c\x2c\x00\x00" + HEADER_TAIL[8:], "hash"),
+        (HEADER_TAIL[:8] + b"\x1c\x2c\x00\x00\x00", "compression"),
+        (HEADER_TAIL[:8] + b"\x00", "corrupt"),
+    ], ids=["algorithm", "hash", "compression", "missing"])
+    def test_unsupported_header_rejected(self, tail, match):
+        """Unknown algorithms, hashes and compressions are rejected."""
+        with pytest.raises(ValueError, match=match):
+            BloomFilter.from_parquet(parquet_header(32, tail) + bytes(32))
+
+    @pytest.mark.parametrize("num_bytes", [0, 16, 48, 256 << 20])
+    def test_bad_size_rejected(self, num_bytes):
+        """Bitset sizes must be a power of two in Parquet's range."""
+        with pytest.raises(ValueError, match="power of two"):
+            BloomFilter.from_parquet(parquet_header(num_bytes) + bytes(64))
+
+    def test_fp_rate_too_low(self):
+        """A bitset too small for one item at fp_rate is rejected."""
+        with pytest.raises(ValueError, match="fp_rate"):
+            BloomFilter.from_parquet(parquet_header(32) + bytes(32), fp_rate=1e-30)
+
+    def test_to_parquet_requires_layout(self, bf_serializable):
+        """SBBF filters can't be written as Parquet filters."""
+        with pytest.raises(ValueError, match="layout='parquet'"):
+            bf_serializable(CAPACITY_MEDIUM).to_parquet()
+
+
+PYARROW_COLUMNS = {
+    "s": ("string", STRINGS),
+    "b": ("binary", [s.encode() for s in STRINGS]),
+    "i64": ("int64", list(range(-500, ITEM_COUNT_LARGE))),
+    "i32": ("int32", list(range(-500, ITEM_COUNT_LARGE))),
+    "f64": ("float64", [i / 4 for i in range(ITEM_COUNT_LARGE)]),
+}
+
+
+@pytest.fixture(scope="module")
+def parquet_filters(tmp_path_factory):
+    """Bloom filter bytes of each column chunk of a pyarrow-written file."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    n = len(STRINGS)
+    table = pa.table({
+        name: pa.array(values[:n], type=getattr(pa, type_name)())
+        for name, (type_name, values) in PYARROW_COLUMNS.items()
+    })
+    path = tmp_path_factory.mktemp("parquet") / "t.parquet"
+    options = {name: {"ndv": n, "fpp": 0.01} for name in PYARROW_COLUMNS}
+    try:
+        pq.write_table(table, path, bloom_filter_options=options)
+    except TypeError:
+        pytest.skip("pyarrow can't write Bloom filters")
+
+    raw = path.read_bytes()
+    row_group = pq.ParquetFile(path).metadata.row_group(0)
+    filters = {}
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        start = column.bloom_filter_offset
+        filters[column.path_in_schema] = raw[start:start + column.bloom_filter_length]
+    return filters
+
+
+class TestPyarrowInterop:
+    """Bloom filters written by pyarrow's Parquet writer."""
+
+    @pytest.mark.parametrize("name", ["s", "b", "i64", "f64"])
+    def test_values_found(self, parquet_filters, name):
+        """Every value written to the column is found."""
+        bf = BloomFilter.from_parquet(parquet_filters[name])
+        values = PYARROW_COLUMNS[name][1][:len(STRINGS)]
+        assert bf.count_present(values) == len(values)
+
+    def test_int32_values_found(self, parquet_filters):
+        """INT32 columns are probed with 4 packed bytes."""
+        bf = BloomFilter.from_parquet(parquet_filters["i32"])
+        values = PYARROW_COLUMNS["i32"][1][:len(STRINGS)]
+        packed = struct.pack(f"<{len(values)}i", *values)
+        assert bf.contains_fixed(packed, 4) == bytearray([1]) * len(values)
+
+    def test_absent_values_pruned(self, parquet_filters):
+        """Values not in the column are rejected at about fp_rate."""
+        bf = BloomFilter.from_parquet(parquet_filters["s"])
+        absent = [f"absent_{i}" for i in range(10_000)]
+        assert bf.count_present(absent) < 300
+
+    @pytest.mark.parametrize("name", ["s", "b", "i64", "f64"])
+    def test_same_bytes_as_pyarrow(self, parquet_filters, name):
+        """A filter built here for the same ndv/fpp is byte-identical."""
+        values = PYARROW_COLUMNS[name][1][:len(STRINGS)]
+        bf = BloomFilter(len(STRINGS), 0.01, layout="parquet")
+        bf.update(values)
+        assert bf.to_parquet() == parquet_filters[name]
+
+    def test_arrow_int32_column_matches(self, parquet_filters):
+        """An Arrow int32 column builds the same bitset as the writer."""
+        pa = pytest.importorskip("pyarrow")
+        values = PYARROW_COLUMNS["i32"][1][:len(STRINGS)]
+        bf = BloomFilter(len(STRINGS), 0.01, layout="parquet")
+        bf.update(pa.array(values, type=pa.int32()))
+        assert bf.to_parquet() == parquet_filters["i32"]
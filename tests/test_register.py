@@ -0,0 +1,201 @@
+"""Tests for layout="register".
+
+This module tests:
+- Register layout properties, k and sizing
+- False positive rates against the target
+- Batch, buffer and test-and-set operations with the register layout
+- Serialization, pickling and set operations keep the layout and k
+- Concurrent inserts with free_threading=True
+"""
+
+import pickle
+import threading
+from array import array
+
+import pytest
+from abloom import BloomFilter
+
+from conftest import (
+    CAPACITY_MEDIUM,
+    CAPACITY_LARGE,
+    FP_RATE_STANDARD,
+    FP_RATE_LOW,
+    FP_RATE_VERY_LOW,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+    assert_filters_equal,
+)
+
+
+STRINGS = [f"key_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+
+class TestRegisterLayout:
+    """Properties and sizing of layout="register" filters."""
+
+    def test_properties(self):
+        """Register filters report their layout and use one word per item."""
+        bf = BloomFilter(CAPACITY_MEDIUM, layout="register")
+        assert bf.layout == "register"
+        assert bf.serializable is False
+        assert bf.bit_count == bf.byte_count * 8
+        assert bf.byte_count % 8 == 0
+        assert repr(bf) == "<BloomFilter capacity=1000 fp_rate=0.01 serializable=False layout='register'>"
+
+    @pytest.mark.parametrize("fp_rate,k", [(0.2, 2), (0.1, 3), (0.05, 4), (FP_RATE_STANDARD, 5), (FP_RATE_LOW, 7), (FP_RATE_VERY_LOW, 8)])
+    def test_k_grows_as_fp_rate_shrinks(self, fp_rate, k):
+        """k is the number of bits per word that needs the least memory."""
+        assert BloomFilter(CAPACITY_LARGE, fp_rate, layout="register").k == k
+
+    @pytest.mark.parametrize("fp_rate", [0.2, 0.1])
+    def test_smaller_than_sbbf_at_high_rates(self, fp_rate):
+        """Fewer bits per item beat SBBF-512's fixed 8 above a few percent."""
+        register = BloomFilter(CAPACITY_LARGE, fp_rate, layout="register")
+        assert register.byte_count < BloomFilter(CAPACITY_LARGE, fp_rate).byte_count
+
+    @pytest.mark.parametrize("fp_rate", [FP_RATE_STANDARD, FP_RATE_LOW, FP_RATE_VERY_LOW])
+    def test_larger_than_sbbf_at_low_rates(self, fp_rate):
+        """Below a few percent the word fills up and needs more memory."""
+        register = BloomFilter(CAPACITY_LARGE, fp_rate, layout="register")
+        assert register.byte_count > BloomFilter(CAPACITY_LARGE, fp_rate).byte_count
+
+    def test_fp_rate_floor(self):
+        """Rates below 1e-5 are rejected."""
+        BloomFilter(CAPACITY_MEDIUM, 1e-5, layout="register")
+        with pytest.raises(ValueError, match="register"):
+            BloomFilter(CAPACITY_MEDIUM, 9e-6, layout="register")
+
+    def test_capacity_overflow(self):
+        """More than 2**32 words are rejected."""
+        with pytest.raises(ValueError, match="overflow"):
+            BloomFilter(2**40, FP_RATE_STANDARD, layout="register")
+
+    @pytest.mark.parametrize("fp_rate", [0.1, FP_RATE_STANDARD, FP_RATE_LOW])
+    def test_false_positive_rate(self, fp_rate):
+        """The false positive rate at capacity stays under the target."""
+        bf = BloomFilter(CAPACITY_LARGE, fp_rate, layout="register")
+        bf.update(range(CAPACITY_LARGE))
+        probes = range(10**9, 10**9 + 2_000_000)
+        assert bf.count_present(probes) / 2_000_000 < fp_rate * 1.1
+
+
+class TestRegisterOperations:
+    """Adding and testing items."""
+
+    def test_update_matches_add(self, bf_factory):
+        """The register batch loop sets the same bits as add()."""
+        single = bf_factory(CAPACITY_LARGE, layout="register")
+        batch = bf_factory(CAPACITY_LARGE, layout="register")
+        for s in STRINGS[::2]:
+            single.add(s)
+        batch.update(STRINGS[::2])
+
+        assert_filters_equal(single, batch)
+        assert batch.count_present(STRINGS[::2]) == len(STRINGS[::2])
+
+    def test_update_new(self, bf_factory):
+        """update_new() and add_if_absent() report new items."""
+        bf = bf_factory(CAPACITY_LARGE, layout="register")
+        assert bf.update_new(["a", "b", "a"], mask=True) == bytearray([1, 1, 0])
+        assert bf.add_if_absent("a") is True
+        assert bf.add_if_absent("c") is False
+
+    @pytest.mark.parametrize("threads", [1, 4])
+    def test_update_buffer_matches_ints(self, threads):
+        """int64 buffers hash like the equivalent ints."""
+        values = list(range(-ITEM_COUNT_LARGE, ITEM_COUNT_LARGE))
+        from_buffer = BloomFilter(CAPACITY_LARGE, serializable=True, layout="register")
+        from_ints = BloomFilter(CAPACITY_LARGE, serializable=True, layout="register")
+
+        from_buffer.update_buffer(array("q", values), threads=threads)
+        from_ints.update(values)
+
+        assert_filters_equal(from_buffer, from_ints)
+
+    def test_free_threading(self, bf_factory):
+        """The atomic path builds the same filter."""
+        plain = bf_factory(CAPACITY_LARGE, layout="register")
+        atomic = bf_factory(CAPACITY_LARGE, layout="register", free_threading=True)
+        plain.update(STRINGS)
+        atomic.update(STRINGS)
+        assert bytes(memoryview(plain)) == bytes(memoryview(atomic))
+
+    def test_concurrent_add_if_absent(self):
+        """Threads racing to claim the same items claim each exactly once."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, free_threading=True, layout="register")
+        claimed = []
+
+        def claim():
+            claimed.append(sum(bf.add_if_absent(s) is False for s in STRINGS))
+
+        threads = [threading.Thread(target=claim) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sum(claimed) == len(STRINGS)
+        assert_no_false_negatives(bf, STRINGS)
+
+
+class TestRegisterPersistence:
+    """Serialization, pickling and set operations."""
+
+    def test_roundtrip_keeps_layout(self, tmp_path):
+        """to_bytes(), write_to() and open() preserve the layout and k."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, serializable=True, layout="register")
+        bf.update(STRINGS)
+
+        data = bf.to_bytes()
+        assert len(data) == 64 + bf.byte_count
+        assert data[6] == 4
+        assert data[40] == bf.k
+        restored = BloomFilter.from_bytes(data)
+        assert restored.layout == "register"
+        assert restored.k == bf.k
+        assert_filters_equal(restored, bf)
+
+        path = tmp_path / "f"
+        with open(path, "wb") as f:
+            bf.write_to(f)
+        opened = BloomFilter.open(path)
+        assert opened.k == bf.k
+        assert_filters_equal(opened, bf)
+
+    def test_k_must_match_fp_rate(self):
+        """A header whose k doesn't match its fp_rate is rejected."""
+        data = bytearray(BloomFilter(CAPACITY_MEDIUM, serializable=True, layout="register").to_bytes())
+        data[40] = 8
+        with pytest.raises(ValueError, match="k doesn't match"):
+            BloomFilter.from_bytes(bytes(data))
+
+    @pytest.mark.parametrize("protocol", [2, 5])
+    def test_pickle(self, bf_factory, protocol):
+        """Pickling preserves the layout."""
+        bf = bf_factory(CAPACITY_MEDIUM, layout="register")
+        bf.update(STRINGS)
+        restored = pickle.loads(pickle.dumps(bf, protocol))
+        assert restored.layout == "register"
+        assert_filters_equal(restored, bf)
+
+    def test_copy_and_set_operations(self, bf_factory):
+        """copy() and union work within a layout; layouts don't mix."""
+        a = bf_factory(CAPACITY_MEDIUM, layout="register")
+        b = bf_factory(CAPACITY_MEDIUM, layout="register")
+        a.add("a")
+        b.add("b")
+        union = a | b
+        assert union.layout == "register"
+        assert union.k == a.k
+        assert_no_false_negatives(union, ["a", "b"])
+        assert a.copy() == a
+
+        sbbf = BloomFilter(CAPACITY_MEDIUM, serializable=a.serializable)
+        assert a != sbbf
+        with pytest.raises(ValueError, match="layout"):
+            a | sbbf
+
+    def test_change_tracking_unsupported(self):
+        """Deltas are only available for the SBBF layout."""
+        with pytest.raises(ValueError, match="sbbf"):
+            BloomFilter(CAPACITY_MEDIUM, layout="register").checkpoint()
@@ -0,0 +1,267 @@
+"""Tests for ScalableBloomFilter.
+
+This module tests:
+- Initialization, properties and the stage schedule
+- add() / __contains__ and their batch variants across stages
+- The combined false positive rate bound
+- copy(), clear(), equality, truthiness and unions
+- to_bytes() / from_bytes() round trips and validation
+- Concurrent growth with free_threading=True
+"""
+
+import threading
+
+import pytest
+from abloom import BloomFilter, ScalableBloomFilter
+
+from conftest import (
+    CAPACITY_MEDIUM,
+    FP_RATE_STANDARD,
+    ITEM_COUNT_LARGE,
+    assert_no_false_negatives,
+)
+
+
+KEYS = [f"token_{i}" for i in range(20 * ITEM_COUNT_LARGE)]
+INITIAL_CAPACITY = 100
+
+
+class TestScalableInit:
+    """Construction and properties."""
+
+    def test_properties(self):
+        """Properties reflect the constructor arguments."""
+        sbf = ScalableBloomFilter(CAPACITY_MEDIUM, 0.05, growth=4, tightening=0.8, serializable=True)
+        assert sbf.initial_capacity == CAPACITY_MEDIUM
+        assert sbf.capacity == CAPACITY_MEDIUM
+        assert sbf.fp_rate == 0.05
+        assert sbf.growth == 4
+        assert sbf.tightening == 0.8
+        assert sbf.stage_count == 1
+        assert sbf.item_count == 0
+        assert sbf.serializable is True
+        assert sbf.free_threading is False
+
+    def test_first_stage_matches_bloom_filter(self):
+        """The first stage is a BloomFilter at fp_rate * (1 - tightening)."""
+        sbf = ScalableBloomFilter(CAPACITY_MEDIUM, 0.02, tightening=0.5)
+        assert sbf.byte_count == BloomFilter(CAPACITY_MEDIUM, 0.01).byte_count
+
+    def test_repr(self):
+        """repr shows initial_capacity, fp_rate and the stage count."""
+        sbf = ScalableBloomFilter(CAPACITY_MEDIUM)
+        assert repr(sbf) == "<ScalableBloomFilter initial_capacity=1000 fp_rate=0.01 stages=1>"
+
+    @pytest.mark.parametrize("kwargs", [
+        {"initial_capacity": 0},
+        {"initial_capacity": -1},
+        {"fp_rate": 0.0},
+        {"fp_rate": 1.0},
+        {"growth": 1},
+        {"growth": -2},
+        {"tightening": 0.0},
+        {"tightening": 1.0},
+    ])
+    def test_invalid_arguments(self, kwargs):
+        """Out-of-range parameters raise ValueError."""
+        args = {"initial_capacity": 10, **kwargs}
+        with pytest.raises(ValueError):
+            ScalableBloomFilter(**args)
+
+    def test_properties_read_only(self):
+        """Properties can't be assigned."""
+        sbf = ScalableBloomFilter(CAPACITY_MEDIUM)
+        with pytest.raises(AttributeError):
+            sbf.capacity = 5
+
+
+class TestScalableGrowth:
+    """Adding items past the initial capacity."""
+
+    def test_stages_follow_growth(self, serializable):
+        """Each stage holds growth times the items of the one before."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, growth=3, serializable=serializable)
+        # Half way into the third stage, so false positives can't shift it
+        sbf.update(range(INITIAL_CAPACITY * (1 + 3) + INITIAL_CAPACITY * 9 // 2))
+        assert sbf.stage_count == 3
+        assert sbf.capacity == INITIAL_CAPACITY * (1 + 3 + 9)
+
+    def test_no_false_negatives_across_stages(self, serializable):
+        """Every added item is found in whichever stage holds it."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        sbf.update(KEYS)
+        assert sbf.stage_count > 5
+        assert_no_false_negatives(sbf, KEYS)
+
+    def test_add_matches_update(self, serializable):
+        """add() one at a time builds the same filter as update()."""
+        a = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        b = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        a.update(KEYS)
+        for key in KEYS:
+            b.add(key)
+        assert a == b
+        assert a.item_count == b.item_count
+
+    def test_duplicates_not_counted(self, serializable):
+        """Re-adding items doesn't fill stages."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        for _ in range(5):
+            sbf.update(range(INITIAL_CAPACITY - 1))
+        assert sbf.stage_count == 1
+        assert sbf.item_count == INITIAL_CAPACITY - 1
+
+    @pytest.mark.parametrize("tightening", [0.5, 0.8])
+    def test_false_positive_rate_bound(self, tightening):
+        """The combined false positive rate stays under fp_rate."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, FP_RATE_STANDARD, tightening=tightening)
+        sbf.update(range(200_000))
+        probes = range(10**9, 10**9 + 200_000)
+        assert sbf.count_present(probes) / 200_000 < FP_RATE_STANDARD
+
+    def test_serializable_type_restriction(self):
+        """Serializable mode accepts only bytes, str, int and float."""
+        sbf = ScalableBloomFilter(CAPACITY_MEDIUM, serializable=True)
+        with pytest.raises(TypeError):
+            sbf.add((1, 2))
+
+
+class TestScalableCopyClearUnion:
+    """copy(), clear(), equality, truthiness and unions."""
+
+    def test_copy_grows_on_its_own(self, serializable):
+        """A copy adds stages without touching the original's."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        sbf.update(KEYS[:1000])
+        copy = sbf.copy()
+        assert copy == sbf
+
+        copy.update(KEYS[1000:])
+        assert copy != sbf
+        assert copy.stage_count > sbf.stage_count
+
+    def test_clear_reuses_stages(self, serializable):
+        """clear() empties the filter but keeps its stages allocated."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        sbf.update(KEYS)
+        byte_count = sbf.byte_count
+        stage_count = sbf.stage_count
+
+        sbf.clear()
+
+        assert not sbf
+        assert sbf.stage_count == 1
+        assert sbf.item_count == 0
+        assert sbf.byte_count == byte_count
+
+        sbf.update(KEYS)
+        assert sbf.stage_count == stage_count
+        assert sbf.byte_count == byte_count
+        assert_no_false_negatives(sbf, KEYS)
+
+    def test_equality_needs_same_parameters(self):
+        """Filters with different parameters are not equal."""
+        assert ScalableBloomFilter(CAPACITY_MEDIUM) == ScalableBloomFilter(CAPACITY_MEDIUM)
+        assert ScalableBloomFilter(CAPACITY_MEDIUM) != ScalableBloomFilter(CAPACITY_MEDIUM, growth=4)
+        assert ScalableBloomFilter(CAPACITY_MEDIUM) != BloomFilter(CAPACITY_MEDIUM)
+
+    def test_union(self, serializable):
+        """The union finds the items of both filters."""
+        a = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        b = ScalableBloomFilter(INITIAL_CAPACITY, serializable=serializable)
+        a.update(KEYS[:500])
+        b.update(KEYS[500:])
+
+        union = a | b
+
+        assert union.stage_count == b.stage_count
+        assert union.item_count == a.item_count + b.item_count
+        assert_no_false_negatives(union, KEYS)
+        assert a.count_present(KEYS[500:]) < 500
+
+        a |= b
+        assert a == union
+
+    def test_union_requires_same_parameters(self):
+        """Unions of filters with different parameters raise."""
+        with pytest.raises(ValueError):
+            ScalableBloomFilter(CAPACITY_MEDIUM) | ScalableBloomFilter(CAPACITY_MEDIUM, tightening=0.9)
+        with pytest.raises(TypeError):
+            ScalableBloomFilter(CAPACITY_MEDIUM) | BloomFilter(CAPACITY_MEDIUM)
+
+
+class TestScalableSerialization:
+    """to_bytes() / from_bytes()."""
+
+    def test_roundtrip(self):
+        """A deserialized filter equals the original and keeps growing alike."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, growth=3, tightening=0.7, serializable=True)
+        sbf.update(KEYS[:5000])
+
+        restored = ScalableBloomFilter.from_bytes(sbf.to_bytes())
+
+        assert restored == sbf
+        assert restored.item_count == sbf.item_count
+        assert restored.capacity == sbf.capacity
+        sbf.update(KEYS[5000:])
+        restored.update(KEYS[5000:])
+        assert restored == sbf
+
+    def test_requires_serializable(self):
+        """to_bytes() needs deterministic hashing."""
+        with pytest.raises(ValueError, match="serializable"):
+            ScalableBloomFilter(CAPACITY_MEDIUM).to_bytes()
+
+    def test_formats_are_not_interchangeable(self):
+        """Each class rejects the other's data."""
+        sbf = ScalableBloomFilter(CAPACITY_MEDIUM, serializable=True)
+        bf = BloomFilter(CAPACITY_MEDIUM, serializable=True)
+        with pytest.raises(ValueError, match="ScalableBloomFilter"):
+            BloomFilter.from_bytes(sbf.to_bytes())
+        with pytest.raises(ValueError, match="not a ScalableBloomFilter"):
+            ScalableBloomFilter.from_bytes(bf.to_bytes())
+
+    def test_truncated_and_trailing_data(self):
+        """Data must be consumed exactly."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, serializable=True)
+        sbf.update(KEYS[:1000])
+        data = sbf.to_bytes()
+        for size in (10, 64, 100, len(data) - 1):
+            with pytest.raises(ValueError):
+                ScalableBloomFilter.from_bytes(data[:size])
+        with pytest.raises(ValueError, match="expected"):
+            ScalableBloomFilter.from_bytes(data + b"\x00")
+
+    def test_stage_must_match_schedule(self):
+        """A stage with other parameters than the header implies is rejected."""
+        data = bytearray(ScalableBloomFilter(INITIAL_CAPACITY, serializable=True).to_bytes())
+        data[32] = 3  # growth
+        stage_zero = ScalableBloomFilter.from_bytes(bytes(data))
+        assert stage_zero.growth == 3
+
+        data[8] = INITIAL_CAPACITY + 1  # initial_capacity
+        with pytest.raises(ValueError, match="stage 0"):
+            ScalableBloomFilter.from_bytes(bytes(data))
+
+    def test_type_check(self):
+        """from_bytes() requires bytes."""
+        with pytest.raises(TypeError):
+            ScalableBloomFilter.from_bytes("not bytes")
+
+
+class TestScalableThreads:
+    """free_threading=True."""
+
+    def test_concurrent_growth(self):
+        """Threads adding disjoint items while the filter grows lose nothing."""
+        sbf = ScalableBloomFilter(INITIAL_CAPACITY, free_threading=True)
+        chunks = [KEYS[t::4] for t in range(4)]
+
+        threads = [threading.Thread(target=sbf.update, args=(c,)) for c in chunks]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert_no_false_negatives(sbf, KEYS)
+        assert sbf.stage_count > 5
@@ -4,11 +4,30 @@ This module tests:
 - Type restrictions in serializable mode
 - Deterministic hashing behavior
 - to_bytes() / from_bytes() serialization
+- v3 format layout and reading v2 data
+- Compact encoding of sparsely filled filters
 - Float support in serializable mode
 - Round-trip preservation of data and properties
+- update_fixed() / contains_fixed() fixed-width binary keys
+- BloomFilter.open() memory-mapped files
+- create_shared() / attach() shared-memory filters
+- Buffer protocol export of the block array
+- write_to() / read_from() streaming
+- Pickling, including out-of-band buffers and hash seed checks
+- checkpoint() / to_delta() / apply_delta() incremental replication
 """
 
+import copy
+import io
+import os
+import pickle
+import struct
+import subprocess
 import sys
+import uuid
+from array import array
+from multiprocessing import shared_memory
+
 import pytest
 from abloom import BloomFilter
 
@@ -82,6 +101,13 @@ class TestUpdateTypeRestrictions:
         with pytest.raises(TypeError):
             bf.update(["valid", ("invalid", "tuple"), "also_valid"])
 
+    def test_contains_many_rejects_invalid_types(self, bf_serializable):
+        """contains_many() raises TypeError for invalid types in serializable mode."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+
+        with pytest.raises(TypeError):
+            bf.contains_many(["valid", None])
+
 
 class TestDeterministicHashing:
     """Tests for deterministic hashing in serializable mode."""
@@ -208,6 +234,243 @@ class TestFromBytes:
             BloomFilter.from_bytes(truncated)
 
 
+def to_v2_bytes(bf):
+    """Encode a serializable filter in the version 2 format.
+
+    Version 2 has a 30-byte header and stores every field and word
+    big-endian.
+    """
+    data = bf.to_bytes()
+    capacity, fp_rate, block_count = struct.unpack_from("<QdQ", data, 8)
+    words = struct.unpack_from(f"<{block_count * 8}Q", data, 64)
+    header = b"ABLM" + bytes([2]) + struct.pack(">QdQ", capacity, fp_rate, block_count)
+    return header + bytes([data[5] & 1]) + struct.pack(f">{len(words)}Q", *words)
+
+
+class TestFormatVersions:
+    """Tests for the v3 layout and backward compatibility with v2."""
+
+    def test_v3_header(self, bf_serializable):
+        """to_bytes() writes a 64-byte little-endian v3 header."""
+        bf = bf_serializable(CAPACITY_MEDIUM, FP_RATE_LOW)
+        data = bf.to_bytes()
+
+        assert data[:4] == b"ABLM"
+        assert data[4] == 3
+        assert data[6:8] == b"\x00\x00"  # layout SBBF-512, serializable hashing
+        assert struct.unpack_from("<QdQ", data, 8) == (
+            CAPACITY_MEDIUM, FP_RATE_LOW, bf.byte_count // 64,
+        )
+        assert data[32:64] == bytes(32)
+        assert len(data) == 64 + bf.byte_count
+
+    def test_v3_words_little_endian(self, bf_serializable):
+        """Block words follow the header as little-endian uint64."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add_hash(0)  # block 0; bit 0 of every word, since h_low is 0
+
+        data = bf.to_bytes()
+
+        assert struct.unpack_from("<8Q", data, 64) == (1,) * 8
+
+    def test_free_threading_flag(self):
+        """free_threading is bit 0 of the flags byte."""
+        bf = BloomFilter(CAPACITY_MEDIUM, serializable=True, free_threading=True)
+        assert bf.to_bytes()[5] == 1
+
+    @pytest.mark.parametrize("free_threading", [False, True])
+    def test_reads_v2(self, free_threading):
+        """Version 2 data still loads into an identical filter."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_STANDARD, serializable=True,
+                         free_threading=free_threading)
+        bf.update(range(ITEM_COUNT_LARGE))
+
+        restored = BloomFilter.from_bytes(to_v2_bytes(bf))
+
+        assert_filters_equal(restored, bf)
+        assert restored.free_threading is free_threading
+        assert restored.to_bytes() == bf.to_bytes()
+
+    def test_v2_validated(self, bf_serializable):
+        """Version 2 headers are still checked."""
+        data = bytearray(to_v2_bytes(bf_serializable(CAPACITY_MEDIUM)))
+        data[21:29] = (0).to_bytes(8, "big")
+        with pytest.raises(ValueError, match="block_count"):
+            BloomFilter.from_bytes(bytes(data))
+
+    def test_v2_truncated(self, bf_serializable):
+        """Truncated version 2 data is rejected."""
+        data = to_v2_bytes(bf_serializable(CAPACITY_MEDIUM))
+        with pytest.raises(ValueError):
+            BloomFilter.from_bytes(data[:-8])
+        with pytest.raises(ValueError, match="too short"):
+            BloomFilter.from_bytes(data[:20])
+
+    @pytest.mark.parametrize("offset,value,match", [
+        (5, 0x10, "flags"),
+        (6, 0x05, "layout"),
+        (7, 0x01, "hash"),
+    ], ids=["flags", "layout", "hash"])
+    def test_unknown_header_fields(self, bf_serializable, offset, value, match):
+        """Unknown flags, layouts and hash algorithms are rejected."""
+        data = bytearray(bf_serializable(CAPACITY_MEDIUM).to_bytes())
+        data[offset] = value
+        with pytest.raises(ValueError, match=match):
+            BloomFilter.from_bytes(bytes(data))
+
+
+def to_compact_parts(data):
+    """Split compact to_bytes() output into (flags, payload size, payload)."""
+    (size,) = struct.unpack_from("<Q", data, 32)
+    return data[5], size, data[64:]
+
+
+class TestCompactEncoding:
+    """Tests for the compact encoding of sparsely filled filters."""
+
+    def test_plain_by_default(self, bf_serializable, tmp_path):
+        """Compact output is opt-in, so to_bytes() can always be mapped."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        data = bf.to_bytes()
+
+        assert not data[5] & 0x02
+        assert len(data) == 64 + bf.byte_count
+        path = tmp_path / "f"
+        path.write_bytes(data)
+        assert BloomFilter.open(path) == bf
+
+    def test_empty_filter(self, bf_serializable):
+        """An empty filter is stored as its header and block bitmap."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        block_count = bf.byte_count // 64
+
+        flags, size, payload = to_compact_parts(bf.to_bytes(compact=True))
+
+        assert flags & 0x02
+        assert size == len(payload) == (block_count + 7) // 8
+        assert payload == bytes(size)
+
+    def test_record_layout(self, bf_serializable):
+        """Sparse blocks are stored as their set bit positions."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add_hash(0)  # block 0; bit 0 of every word, since h_low is 0
+        bitmap_size = (bf.byte_count // 64 + 7) // 8
+
+        _, _, payload = to_compact_parts(bf.to_bytes(compact=True))
+
+        assert payload[0] == 1
+        assert payload[1:bitmap_size] == bytes(bitmap_size - 1)
+        record = payload[bitmap_size:]
+        assert record[0] == 8
+        assert struct.unpack("<8H", record[1:]) == tuple(range(0, 512, 64))
+
+    def test_sparse_filter_is_smaller(self, bf_serializable):
+        """A filter holding a fraction of its capacity shrinks."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(range(CAPACITY_LARGE // 100))
+
+        data = bf.to_bytes(compact=True)
+
+        assert len(data) < bf.byte_count // 4
+        assert_filters_equal(BloomFilter.from_bytes(data), bf)
+
+    def test_full_filter_is_plain(self, bf_serializable):
+        """Filters the encoding doesn't shrink are written plain."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(range(CAPACITY_MEDIUM))
+
+        assert bf.to_bytes(compact=True) == bf.to_bytes()
+
+    def test_dense_blocks(self, bf_serializable):
+        """Blocks with many set bits are stored whole."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update_hashes(array("Q", [i * 0x9E3779B97F4A7C15 & 0xFFFFFFFF for i in range(50)]))
+        bf.add_hash(0x7FFFFFFF00000001)
+
+        data = bf.to_bytes(compact=True)
+
+        assert data[5] & 0x02
+        assert_filters_equal(BloomFilter.from_bytes(data), bf)
+
+    @pytest.mark.parametrize("free_threading", [False, True])
+    def test_roundtrip(self, free_threading):
+        """from_bytes() and read_from() decode the compact encoding."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, serializable=True,
+                         free_threading=free_threading)
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+        bf.update(items)
+        data = bf.to_bytes(compact=True)
+        assert data[5] & 0x02
+
+        for restored in (BloomFilter.from_bytes(data),
+                         BloomFilter.read_from(io.BytesIO(data))):
+            assert_filters_equal(restored, bf)
+            assert restored.free_threading is free_threading
+            assert_no_false_negatives(restored, items)
+
+    def test_read_from_stops_after_payload(self, bf_serializable):
+        """read_from() reads exactly the compact payload."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.add("a")
+        stream = io.BytesIO(bf.to_bytes(compact=True) + b"trailer")
+
+        assert BloomFilter.read_from(stream) == bf
+        assert stream.read() == b"trailer"
+
+    def test_open_rejected(self, bf_serializable, tmp_path):
+        """Compact data can't be memory-mapped."""
+        path = tmp_path / "f"
+        path.write_bytes(bf_serializable(CAPACITY_MEDIUM).to_bytes(compact=True))
+        with pytest.raises(ValueError, match="compact=False"):
+            BloomFilter.open(path)
+
+    def test_truncated(self, bf_serializable):
+        """Missing payload bytes are rejected."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add("a")
+        data = bf.to_bytes(compact=True)
+        with pytest.raises(ValueError, match="expected"):
+            BloomFilter.from_bytes(data[:-1])
+        with pytest.raises(ValueError, match="expected"):
+            BloomFilter.read_from(io.BytesIO(data[:-1]))
+
+    def test_size_out_of_range(self, bf_serializable):
+        """A compact payload is always smaller than the blocks."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        data = bytearray(bf.to_bytes())
+        data[5] |= 0x02
+        data[32:40] = struct.pack("<Q", bf.byte_count)
+        with pytest.raises(ValueError, match="out of range"):
+            BloomFilter.from_bytes(bytes(data))
+
+    @pytest.mark.parametrize("corrupt", [
+        "bitmap_extra_block",
+        "bitmap_padding",
+        "count_too_large",
+        "position_out_of_range",
+    ])
+    def test_corrupt_payload(self, bf_serializable, corrupt):
+        """Malformed payloads raise instead of building a wrong filter."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add_hash(0)
+        block_count = bf.byte_count // 64
+        assert block_count % 8, "padding case needs a partial bitmap byte"
+        bitmap_size = (block_count + 7) // 8
+        data = bytearray(bf.to_bytes(compact=True))
+
+        if corrupt == "bitmap_extra_block":
+            data[64] |= 0x02
+        elif corrupt == "bitmap_padding":
+            data[64 + bitmap_size - 1] |= 0x80
+        elif corrupt == "count_too_large":
+            data[64 + bitmap_size] = 32
+        else:
+            data[64 + bitmap_size + 1:64 + bitmap_size + 3] = struct.pack("<H", 512)
+
+        with pytest.raises(ValueError, match="corrupt"):
+            BloomFilter.from_bytes(bytes(data))
+
+
 class TestDataIntegrity:
     """Tests for data integrity validation in from_bytes()."""
 
@@ -221,13 +484,12 @@ class TestDataIntegrity:
         bf.add("test")
         data = bytearray(bf.to_bytes())
 
-        # Header layout: 4 magic + 1 version + 8 capacity + 8 fp_rate + 8 block_count
-        # block_count is at bytes 21-28
-        original_block_count = int.from_bytes(data[21:29], 'big')
+        # v3 header: block_count is a little-endian uint64 at bytes 24-31
+        original_block_count = int.from_bytes(data[24:32], 'little')
 
         # Corrupt block_count to a different value
         corrupted_block_count = original_block_count + 1
-        data[21:29] = corrupted_block_count.to_bytes(8, 'big')
+        data[24:32] = corrupted_block_count.to_bytes(8, 'little')
 
         with pytest.raises(ValueError, match=r"block_count|Invalid data"):
             BloomFilter.from_bytes(bytes(data))
@@ -238,7 +500,7 @@ class TestDataIntegrity:
         data = bytearray(bf.to_bytes())
 
         # Set block_count to 0
-        data[21:29] = (0).to_bytes(8, 'big')
+        data[24:32] = (0).to_bytes(8, 'little')
 
         with pytest.raises(ValueError):
             BloomFilter.from_bytes(bytes(data))
@@ -255,13 +517,13 @@ class TestDataIntegrity:
     def test_from_bytes_capacity_zero_raises(self, bf_serializable):
         """from_bytes() rejects data with capacity of 0.
 
-        Header layout: 4 magic + 1 version + 8 capacity (bytes 5-12)
+        v3 header: capacity is a little-endian uint64 at bytes 8-15
         """
         bf = bf_serializable(CAPACITY_MEDIUM)
         data = bytearray(bf.to_bytes())
 
-        # Set capacity to 0 (bytes 5-12, big-endian)
-        data[5:13] = (0).to_bytes(8, 'big')
+        # Set capacity to 0 (bytes 8-15, little-endian)
+        data[8:16] = (0).to_bytes(8, 'little')
 
         with pytest.raises(ValueError, match=r"capacity|Invalid data"):
             BloomFilter.from_bytes(bytes(data))
@@ -269,15 +531,15 @@ class TestDataIntegrity:
     def test_from_bytes_fp_rate_zero_raises(self, bf_serializable):
         """from_bytes() rejects data with fp_rate of 0.0.
 
-        Header layout: 4 magic + 1 version + 8 capacity + 8 fp_rate (bytes 13-20)
+        v3 header: fp_rate is a little-endian double at bytes 16-23
         """
         import struct
 
         bf = bf_serializable(CAPACITY_MEDIUM)
         data = bytearray(bf.to_bytes())
 
-        # Set fp_rate to 0.0 (bytes 13-20, big-endian double)
-        data[13:21] = struct.pack('>d', 0.0)
+        # Set fp_rate to 0.0 (bytes 16-23, little-endian double)
+        data[16:24] = struct.pack('<d', 0.0)
 
         with pytest.raises(ValueError, match=r"fp_rate|Invalid data"):
             BloomFilter.from_bytes(bytes(data))
@@ -292,8 +554,8 @@ class TestDataIntegrity:
         bf = bf_serializable(CAPACITY_MEDIUM)
         data = bytearray(bf.to_bytes())
 
-        # Set fp_rate to 1.0 (bytes 13-20, big-endian double)
-        data[13:21] = struct.pack('>d', 1.0)
+        # Set fp_rate to 1.0 (bytes 16-23, little-endian double)
+        data[16:24] = struct.pack('<d', 1.0)
 
         with pytest.raises(ValueError, match=r"fp_rate|Invalid data"):
             BloomFilter.from_bytes(bytes(data))
@@ -308,8 +570,8 @@ class TestDataIntegrity:
         bf = bf_serializable(CAPACITY_MEDIUM)
         data = bytearray(bf.to_bytes())
 
-        # Set fp_rate to -0.01 (bytes 13-20, big-endian double)
-        data[13:21] = struct.pack('>d', -0.01)
+        # Set fp_rate to -0.01 (bytes 16-23, little-endian double)
+        data[16:24] = struct.pack('<d', -0.01)
 
         with pytest.raises(ValueError, match=r"fp_rate|Invalid data"):
             BloomFilter.from_bytes(bytes(data))
@@ -324,8 +586,8 @@ class TestDataIntegrity:
         bf = bf_serializable(CAPACITY_MEDIUM)
         data = bytearray(bf.to_bytes())
 
-        # Set fp_rate to 1.5 (bytes 13-20, big-endian double)
-        data[13:21] = struct.pack('>d', 1.5)
+        # Set fp_rate to 1.5 (bytes 16-23, little-endian double)
+        data[16:24] = struct.pack('<d', 1.5)
 
         with pytest.raises(ValueError, match=r"fp_rate|Invalid data"):
             BloomFilter.from_bytes(bytes(data))
@@ -477,6 +739,1033 @@ class TestDeserializedOperations:
         assert "new_item" in bf2
 
 
+class TestFixedWidthKeys:
+    """Tests for update_fixed() and contains_fixed()."""
+
+    @pytest.mark.parametrize("itemsize", [1, 16, 20, 33])
+    def test_matches_bytes_keys(self, bf_serializable, itemsize):
+        """Each slice hashes exactly like the equivalent bytes object."""
+        keys = [bytes((i * 7 + j) % 256 for j in range(itemsize))
+                for i in range(ITEM_COUNT_LARGE)]
+        bf_fixed = bf_serializable(CAPACITY_LARGE)
+        bf_bytes = bf_serializable(CAPACITY_LARGE)
+
+        bf_fixed.update_fixed(b"".join(keys), itemsize)
+        bf_bytes.update(keys)
+
+        assert_filters_equal(bf_fixed, bf_bytes, "Fixed-width and bytes keys must agree")
+
+    def test_uuid_keys_queryable_as_bytes(self, bf_serializable):
+        """Packed UUIDs can be queried with ordinary bytes keys."""
+        keys = [uuid.UUID(int=i * 0x9E3779B97F4A7C15).bytes for i in range(ITEM_COUNT_LARGE)]
+        bf = bf_serializable(CAPACITY_LARGE)
+
+        bf.update_fixed(b"".join(keys), 16)
+
+        assert_no_false_negatives(bf, keys)
+
+    def test_contains_fixed_matches_contains(self, bf_serializable):
+        """contains_fixed() agrees with `in` for every key."""
+        keys = [uuid.UUID(int=i).bytes for i in range(ITEM_COUNT_LARGE)]
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(keys[::2])
+
+        mask = bf.contains_fixed(b"".join(keys), itemsize=16)
+
+        assert isinstance(mask, bytearray)
+        assert list(mask) == [int(key in bf) for key in keys]
+
+    def test_accepts_any_contiguous_buffer(self, bf_serializable):
+        """The buffer format is ignored; only the raw bytes matter."""
+        data = array("I", range(100))
+        bf = bf_serializable(CAPACITY_MEDIUM)
+
+        bf.update_fixed(memoryview(data), 8)
+
+        raw = data.tobytes()
+        assert_no_false_negatives(bf, [raw[i:i + 8] for i in range(0, len(raw), 8)])
+
+    def test_empty_buffer(self, bf_serializable):
+        """An empty buffer inserts nothing and returns an empty mask."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update_fixed(b"", 16)
+        assert not bf
+        assert bf.contains_fixed(b"", 16) == bytearray()
+
+    def test_requires_serializable(self, bf_standard):
+        """Standard-mode filters reject fixed-width keys."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="serializable"):
+            bf.update_fixed(b"\0" * 16, 16)
+        with pytest.raises(ValueError, match="serializable"):
+            bf.contains_fixed(b"\0" * 16, 16)
+
+    def test_length_not_multiple_of_itemsize(self, bf_serializable):
+        """A trailing partial key is rejected."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="multiple of itemsize"):
+            bf.update_fixed(b"\0" * 17, 16)
+        assert not bf
+
+    @pytest.mark.parametrize("itemsize", [0, -16])
+    def test_invalid_itemsize(self, bf_serializable, itemsize):
+        """itemsize must be positive."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="itemsize"):
+            bf.contains_fixed(b"", itemsize)
+
+    def test_rejects_non_buffer(self, bf_serializable):
+        """Objects without the buffer protocol raise TypeError."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        with pytest.raises(TypeError):
+            bf.update_fixed([b"a" * 16], 16)
+
+
+# Size of the BloomFilter.open() file header
+FILE_HEADER_SIZE = 64
+
+# Every method that sets bits, with arguments valid for a serializable filter
+WRITERS = [
+    ("add", ("x",)),
+    ("add_if_absent", ("x",)),
+    ("update", (["x"],)),
+    ("update_new", (["x"],)),
+    ("update_buffer", (array("q", [1]),)),
+    ("add_hash", (1,)),
+    ("update_hashes", (array("Q", [1]),)),
+    ("update_fixed", (b"\0" * 16, 16)),
+    ("clear", ()),
+]
+
+
+class TestMappedFile:
+    """Tests for BloomFilter.open() file-backed filters."""
+
+    def test_create_and_reopen(self, tmp_path):
+        """Items added to a new file are found after reopening it."""
+        path = tmp_path / "filter.abloom"
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+        bf = BloomFilter.open(path, "w", capacity=CAPACITY_LARGE, fp_rate=FP_RATE_LOW)
+        bf.update(items)
+        del bf
+
+        reopened = BloomFilter.open(path)
+        assert reopened.capacity == CAPACITY_LARGE
+        assert reopened.fp_rate == FP_RATE_LOW
+        assert reopened.serializable is True
+        assert reopened.storage == "file"
+        assert_no_false_negatives(reopened, items)
+
+    def test_matches_in_memory_filter(self, tmp_path):
+        """A file-backed filter has the same bits as a serializable one."""
+        items = list(range(ITEM_COUNT_LARGE))
+        bf = BloomFilter.open(tmp_path / "f", "w", capacity=CAPACITY_LARGE)
+        expected = BloomFilter(CAPACITY_LARGE, FP_RATE_STANDARD, serializable=True)
+
+        bf.update(items)
+        expected.update(items)
+
+        assert_filters_equal(bf, expected)
+        assert BloomFilter.from_bytes(bf.to_bytes()) == expected
+
+    def test_file_size(self, tmp_path):
+        """The file holds a 64-byte header followed by the blocks."""
+        path = tmp_path / "f"
+        bf = BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        assert path.stat().st_size == FILE_HEADER_SIZE + bf.byte_count
+
+    def test_new_file_is_empty(self, tmp_path):
+        """mode='w' truncates an existing file."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM).add("x")
+        bf = BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        assert not bf
+
+    def test_read_write_persists(self, tmp_path):
+        """Changes through mode='r+' reach the file without to_bytes()."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM).add("a")
+
+        bf = BloomFilter.open(path, "r+")
+        bf.add("b")
+        bf.flush()
+
+        assert_no_false_negatives(BloomFilter.open(path), ["a", "b"])
+
+    def test_visible_to_other_processes(self, tmp_path):
+        """Another process reads the same file."""
+        path = tmp_path / "f"
+        bf = BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        bf.update(["a", "b"])
+        bf.flush()
+
+        script = (
+            "import sys; from abloom import BloomFilter; "
+            "bf = BloomFilter.open(sys.argv[1]); "
+            "print('a' in bf, 'b' in bf)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script, str(path)],
+            capture_output=True, text=True, check=True,
+        )
+        assert result.stdout.split() == ["True", "True"]
+
+    def test_free_threading_preserved(self, tmp_path):
+        """free_threading is stored in the file header."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM, free_threading=True)
+        assert BloomFilter.open(path).free_threading is True
+
+    @pytest.mark.parametrize("method,args", WRITERS, ids=[w[0] for w in WRITERS])
+    def test_read_only_rejects_writes(self, tmp_path, method, args):
+        """Every writer raises on a filter opened with mode='r'."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        bf = BloomFilter.open(path)
+
+        with pytest.raises(TypeError, match="mode='r'"):
+            getattr(bf, method)(*args)
+        assert not bf
+
+    def test_read_only_rejects_inplace_union(self, tmp_path):
+        """|= raises on a filter opened with mode='r'."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        bf = BloomFilter.open(path)
+        other = BloomFilter(CAPACITY_MEDIUM, FP_RATE_STANDARD, serializable=True)
+        other.add("x")
+
+        with pytest.raises(TypeError, match="mode='r'"):
+            bf |= other
+        assert (bf | other) == other
+
+    def test_copy_is_writable(self, tmp_path):
+        """copy() of a read-only filter is an ordinary in-memory filter."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM).add("a")
+
+        copy = BloomFilter.open(path).copy()
+        copy.add("b")
+
+        assert copy.storage != "file"
+        assert copy != BloomFilter.open(path)
+
+    def test_flush_in_memory_filter(self, bf_factory):
+        """flush() does nothing for filters that are not file-backed."""
+        assert bf_factory(CAPACITY_MEDIUM).flush() is None
+
+    @pytest.mark.parametrize("mode", ["a", "rb", "w+", ""])
+    def test_invalid_mode(self, tmp_path, mode):
+        """Only 'r', 'r+' and 'w' are accepted."""
+        with pytest.raises(ValueError, match="mode"):
+            BloomFilter.open(tmp_path / "f", mode, capacity=CAPACITY_MEDIUM)
+
+    def test_write_requires_capacity(self, tmp_path):
+        """mode='w' needs a capacity."""
+        with pytest.raises(ValueError, match="capacity"):
+            BloomFilter.open(tmp_path / "f", "w")
+
+    def test_read_rejects_parameters(self, tmp_path):
+        """Parameters come from the file when reading."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="read from the file"):
+            BloomFilter.open(path, capacity=CAPACITY_MEDIUM)
+
+    def test_missing_file(self, tmp_path):
+        """Opening a missing file raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            BloomFilter.open(tmp_path / "missing")
+
+    @pytest.mark.parametrize("corrupt,match", [
+        (lambda data: b"XXXX" + data[4:], "magic"),
+        (lambda data: data[:4] + b"\x09" + data[5:], "version"),
+        (lambda data: data[:5] + b"\x80" + data[6:], "flags"),
+        (lambda data: data[:-64], "expected"),
+        (lambda data: data[:64], "expected"),
+        (lambda data: data[:10], "too short"),
+    ], ids=["magic", "version", "flags", "truncated", "header_only", "short"])
+    def test_invalid_file(self, tmp_path, corrupt, match):
+        """Corrupt headers and truncated files raise ValueError."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        path.write_bytes(corrupt(path.read_bytes()))
+
+        with pytest.raises(ValueError, match=match):
+            BloomFilter.open(path)
+
+    def test_opens_to_bytes_output(self, tmp_path):
+        """Plain to_bytes() output is the file format, so it can be mapped."""
+        bf = BloomFilter(CAPACITY_MEDIUM, FP_RATE_STANDARD, serializable=True)
+        bf.update(["a", "b"])
+        path = tmp_path / "f"
+        path.write_bytes(bf.to_bytes())
+
+        assert BloomFilter.open(path) == bf
+
+    def test_v2_file_rejected(self, tmp_path):
+        """Version 2 data can only be loaded with from_bytes()."""
+        path = tmp_path / "f"
+        path.write_bytes(to_v2_bytes(BloomFilter(CAPACITY_MEDIUM, serializable=True)))
+        with pytest.raises(ValueError, match="version"):
+            BloomFilter.open(path)
+
+
+@pytest.fixture
+def shm_name():
+    """A unique shared memory segment name, unlinked after the test."""
+    name = f"abloom_test_{uuid.uuid4().hex[:16]}"
+    yield name
+    try:
+        BloomFilter.attach(name).unlink()
+    except (FileNotFoundError, ValueError):
+        pass
+
+
+ATTACH_SCRIPT = (
+    "import sys; from abloom import BloomFilter; "
+    "bf = BloomFilter.attach(sys.argv[1]); "
+    "start = int(sys.argv[2]); "
+    "bf.update(range(start, start + int(sys.argv[3]))); "
+    "print('a' in bf)"
+)
+
+
+class TestSharedMemory:
+    """Tests for create_shared() / attach() shared-memory filters."""
+
+    def test_create_and_attach(self, shm_name):
+        """An attached filter sees the creator's items and vice versa."""
+        bf = BloomFilter.create_shared(shm_name, CAPACITY_LARGE, FP_RATE_LOW)
+        bf.add("a")
+
+        other = BloomFilter.attach(shm_name)
+        other.add("b")
+
+        assert other.capacity == CAPACITY_LARGE
+        assert other.fp_rate == FP_RATE_LOW
+        assert "a" in other
+        assert "b" in bf
+        assert bf == other
+
+    def test_properties(self, shm_name):
+        """Shared filters are serializable and use the atomic path."""
+        bf = BloomFilter.create_shared(shm_name, CAPACITY_MEDIUM)
+        assert not bf
+        assert bf.storage == "shared"
+        assert bf.serializable is True
+        assert bf.free_threading is True
+
+    def test_matches_in_memory_filter(self, shm_name):
+        """Shared filters hash like serializable in-memory filters."""
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+        bf = BloomFilter.create_shared(shm_name, CAPACITY_LARGE)
+        expected = BloomFilter(CAPACITY_LARGE, serializable=True, free_threading=True)
+
+        bf.update(items)
+        expected.update(items)
+
+        assert bf == expected
+        assert bf.to_bytes() == expected.to_bytes()
+
+    def test_attach_does_not_copy(self, shm_name):
+        """Attached filters use the segment's memory in place."""
+        bf = BloomFilter.create_shared(shm_name, CAPACITY_MEDIUM)
+        other = BloomFilter.attach(shm_name)
+
+        memoryview(other)[:8] = b"\xff" * 8
+
+        assert bytes(memoryview(bf)[:8]) == b"\xff" * 8
+
+    def test_concurrent_writer_processes(self, shm_name):
+        """Writers in several processes don't lose each other's bits."""
+        bf = BloomFilter.create_shared(shm_name, 1_000_000)
+        bf.add("a")
+        count = 50_000
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-c", ATTACH_SCRIPT, shm_name, str(i * count), str(count)],
+                stdout=subprocess.PIPE,
+            )
+            for i in range(4)
+        ]
+        outputs = [p.communicate()[0].split() for p in procs]
+
+        assert all(p.returncode == 0 for p in procs)
+        assert outputs == [[b"True"]] * 4
+        assert_no_false_negatives(bf, range(4 * count))
+
+    def test_outlives_creator_process(self, shm_name):
+        """The segment stays until unlink(), not until its creator exits."""
+        script = (
+            "import sys; from abloom import BloomFilter; "
+            "BloomFilter.create_shared(sys.argv[1], 1000).add('a')"
+        )
+        subprocess.run([sys.executable, "-c", script, shm_name], check=True)
+
+        assert "a" in BloomFilter.attach(shm_name)
+
+    def test_unlink(self, shm_name):
+        """unlink() removes the segment; mapped filters keep working."""
+        bf = BloomFilter.create_shared(shm_name, CAPACITY_MEDIUM)
+        bf.unlink()
+
+        bf.add("a")
+        assert "a" in bf
+        with pytest.raises(FileNotFoundError):
+            BloomFilter.attach(shm_name)
+
+    def test_unlink_requires_shared(self, bf_factory):
+        """Only shared filters have a segment to unlink."""
+        with pytest.raises(ValueError, match="create_shared"):
+            bf_factory(CAPACITY_MEDIUM).unlink()
+
+    def test_name_taken(self, shm_name):
+        """Creating a segment that already exists fails."""
+        BloomFilter.create_shared(shm_name, CAPACITY_MEDIUM)
+        with pytest.raises(FileExistsError):
+            BloomFilter.create_shared(shm_name, CAPACITY_MEDIUM)
+
+    def test_attach_foreign_segment(self, shm_name):
+        """Segments that don't hold a filter are rejected."""
+        shm = shared_memory.SharedMemory(shm_name, create=True, size=4096)
+        try:
+            with pytest.raises(ValueError, match="magic"):
+                BloomFilter.attach(shm_name)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    @pytest.mark.parametrize("capacity,fp_rate", [(0, 0.01), (1000, 1.5)])
+    def test_invalid_parameters(self, shm_name, capacity, fp_rate):
+        """Parameters are validated before a segment is created."""
+        with pytest.raises(ValueError):
+            BloomFilter.create_shared(shm_name, capacity, fp_rate)
+        with pytest.raises(FileNotFoundError):
+            BloomFilter.attach(shm_name)
+
+    def test_pickled_by_name(self, shm_name):
+        """Pickling a shared filter attaches to the same segment."""
+        bf = BloomFilter.create_shared(shm_name, CAPACITY_MEDIUM)
+
+        other = pickle.loads(pickle.dumps(bf))
+        other.add("a")
+
+        assert other.storage == "shared"
+        assert "a" in bf
+
+
+class TestBufferProtocol:
+    """Tests for memoryview(bf) and zero-copy I/O."""
+
+    def test_view_matches_blocks(self, bf_factory):
+        """The view holds byte_count bytes of writable blocks."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.update(range(ITEM_COUNT_LARGE))
+
+        view = memoryview(bf)
+
+        assert view.nbytes == bf.byte_count
+        assert view.format == "B"
+        assert not view.readonly
+        assert any(view)
+
+    @pytest.mark.skipif(sys.byteorder != "little", reason="native word order")
+    def test_view_is_to_bytes_payload(self, bf_serializable):
+        """On little-endian hosts the view is to_bytes() minus its header."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(["a", "b"])
+        assert bytes(memoryview(bf)) == bf.to_bytes()[FILE_HEADER_SIZE:]
+
+    def test_write_and_readinto(self, bf_factory):
+        """Blocks round-trip through a file object without to_bytes()."""
+        bf = bf_factory(CAPACITY_LARGE)
+        bf.update(range(ITEM_COUNT_LARGE))
+        restored = bf_factory(CAPACITY_LARGE)
+
+        f = io.BytesIO()
+        f.write(memoryview(bf))
+        f.seek(0)
+        assert f.readinto(restored) == bf.byte_count
+
+        assert_filters_equal(restored, bf)
+
+    def test_view_sees_later_adds(self, bf_factory):
+        """Items added while a view is held show up in the view."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        with memoryview(bf) as view:
+            assert not any(view)
+            bf.add("x")
+            assert any(view)
+            bf.clear()
+            assert not any(view)
+
+    def test_write_through_view(self, bf_factory):
+        """Writes to the view change the filter."""
+        src = bf_factory(CAPACITY_MEDIUM)
+        src.update(["a", "b"])
+        dst = bf_factory(CAPACITY_MEDIUM)
+
+        memoryview(dst)[:] = memoryview(src)
+
+        assert dst == src
+
+    def test_reinit_while_exported(self, bf_factory):
+        """__init__ can't replace the blocks while a view is held."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        view = memoryview(bf)
+        with pytest.raises(BufferError):
+            bf.__init__(CAPACITY_LARGE)
+        assert view.nbytes == bf.byte_count
+
+        view.release()
+        bf.__init__(CAPACITY_LARGE)
+        assert memoryview(bf).nbytes == bf.byte_count
+
+    def test_read_only_file(self, tmp_path):
+        """Filters opened with mode='r' export read-only views."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM).add("a")
+        bf = BloomFilter.open(path)
+
+        view = memoryview(bf)
+
+        assert view.readonly
+        with pytest.raises(TypeError):
+            io.BytesIO(bytes(view)).readinto(bf)
+
+    def test_file_view_writes_file(self, tmp_path):
+        """A writable file-backed filter can be filled through its view."""
+        src = BloomFilter(CAPACITY_MEDIUM, FP_RATE_STANDARD, serializable=True)
+        src.update(["a", "b"])
+        path = tmp_path / "f"
+
+        dst = BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM)
+        memoryview(dst)[:] = memoryview(src)
+        dst.flush()
+
+        assert BloomFilter.open(path) == src
+
+
+class ReadOnly:
+    """A file-like object with read() but no readinto()."""
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, size):
+        return self._stream.read(size)
+
+
+class ShortWriter:
+    """A raw-style writer that accepts at most a few bytes per call."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, buf):
+        chunk = bytes(buf[:7])
+        self.data += chunk
+        return len(chunk)
+
+
+class TestStreaming:
+    """Tests for write_to() / read_from() streamed serialization."""
+
+    def test_matches_to_bytes(self, bf_serializable):
+        """write_to() writes exactly the plain to_bytes() output."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(range(ITEM_COUNT_LARGE))
+        stream = io.BytesIO()
+
+        written = bf.write_to(stream)
+
+        assert stream.getvalue() == bf.to_bytes()
+        assert written == len(stream.getvalue())
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 1000])
+    def test_chunk_sizes(self, bf_serializable, chunk_size):
+        """Any chunk size produces the same stream."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(["a", "b"])
+        stream = io.BytesIO()
+
+        bf.write_to(stream, chunk_size=chunk_size)
+
+        assert stream.getvalue() == bf.to_bytes()
+
+    @pytest.mark.parametrize("chunk_size", [0, -1])
+    def test_invalid_chunk_size(self, bf_serializable, chunk_size):
+        """chunk_size must be positive."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="chunk_size"):
+            bf.write_to(io.BytesIO(), chunk_size=chunk_size)
+
+    def test_requires_serializable(self, bf_standard):
+        """Standard-mode filters can't be streamed."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="serializable"):
+            bf.write_to(io.BytesIO())
+
+    def test_roundtrip(self):
+        """read_from() restores the filter and its properties."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, serializable=True, free_threading=True)
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+        bf.update(items)
+        stream = io.BytesIO()
+        bf.write_to(stream)
+        stream.seek(0)
+
+        restored = BloomFilter.read_from(stream)
+
+        assert_filters_equal(restored, bf)
+        assert restored.free_threading is True
+        assert_no_false_negatives(restored, items)
+
+    def test_consecutive_filters(self, bf_serializable):
+        """read_from() stops right after the filter it reads."""
+        first = bf_serializable(CAPACITY_MEDIUM)
+        second = bf_serializable(CAPACITY_LARGE)
+        first.add("a")
+        second.add("b")
+        stream = io.BytesIO()
+        first.write_to(stream)
+        second.write_to(stream)
+        stream.write(b"trailer")
+        stream.seek(0)
+
+        assert BloomFilter.read_from(stream) == first
+        assert BloomFilter.read_from(stream) == second
+        assert stream.read() == b"trailer"
+
+    def test_file(self, bf_serializable, tmp_path):
+        """Streams to and from a regular file."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(range(ITEM_COUNT_LARGE))
+        path = tmp_path / "f"
+
+        with open(path, "wb") as f:
+            bf.write_to(f, chunk_size=4096)
+        with open(path, "rb", buffering=0) as f:
+            assert BloomFilter.read_from(f) == bf
+
+        assert BloomFilter.open(path) == bf
+
+    def test_pipe(self, bf_serializable):
+        """Streams through a pipe to another process and back."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(range(ITEM_COUNT_LARGE))
+        script = (
+            "import sys; from abloom import BloomFilter; "
+            "bf = BloomFilter.read_from(sys.stdin.buffer); "
+            "bf.add('from child'); "
+            "bf.write_to(sys.stdout.buffer)"
+        )
+        stream = io.BytesIO()
+        bf.write_to(stream)
+
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            input=stream.getvalue(), capture_output=True, check=True,
+        )
+
+        restored = BloomFilter.read_from(io.BytesIO(result.stdout))
+        bf.add("from child")
+        assert restored == bf
+
+    def test_read_without_readinto(self, bf_serializable):
+        """File-likes with only read() are supported."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(["a", "b"])
+        assert BloomFilter.read_from(ReadOnly(bf.to_bytes())) == bf
+
+    def test_partial_writes(self, bf_serializable):
+        """Short writes are retried until the chunk is written."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add("a")
+        writer = ShortWriter()
+
+        bf.write_to(writer)
+
+        assert bytes(writer.data) == bf.to_bytes()
+
+    def test_reads_v2(self, bf_serializable):
+        """Version 2 streams are still readable."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(range(ITEM_COUNT_LARGE))
+        assert BloomFilter.read_from(io.BytesIO(to_v2_bytes(bf))) == bf
+
+    @pytest.mark.parametrize("length,match", [
+        (0, "too short"),
+        (10, "too short"),
+        (FILE_HEADER_SIZE + 100, "expected"),
+    ])
+    def test_truncated(self, bf_serializable, length, match):
+        """A stream ending early is rejected."""
+        data = bf_serializable(CAPACITY_MEDIUM).to_bytes()
+        with pytest.raises(ValueError, match=match):
+            BloomFilter.read_from(io.BytesIO(data[:length]))
+
+    def test_invalid_header(self, bf_serializable):
+        """The header is validated like from_bytes()."""
+        data = bytearray(bf_serializable(CAPACITY_MEDIUM).to_bytes())
+        data[0:4] = b"XXXX"
+        with pytest.raises(ValueError, match="magic"):
+            BloomFilter.read_from(io.BytesIO(bytes(data)))
+
+    def test_reinit_while_writing(self, bf_serializable):
+        """__init__ can't replace the blocks during write_to()."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        errors = []
+
+        class Reinit:
+            def write(self, buf):
+                try:
+                    bf.__init__(CAPACITY_LARGE, serializable=True)
+                except BufferError as e:
+                    errors.append(e)
+                return len(buf)
+
+        bf.write_to(Reinit())
+
+        assert errors
+        assert bf.capacity == CAPACITY_MEDIUM
+
+
+def run_with_hash_seed(seed, script, stdin=b""):
+    """Run a Python snippet with PYTHONHASHSEED set, returning its stdout."""
+    env = dict(os.environ, PYTHONHASHSEED=str(seed))
+    result = subprocess.run(
+        [sys.executable, "-c", script], input=stdin, env=env,
+        capture_output=True, check=True,
+    )
+    return result.stdout
+
+
+DUMP_SCRIPT = (
+    "import pickle, sys; from abloom import BloomFilter; "
+    "bf = BloomFilter(1000, serializable={}); bf.update(['a', b'b', 1]); "
+    "sys.stdout.buffer.write(pickle.dumps(bf))"
+)
+LOAD_SCRIPT = (
+    "import pickle, sys; "
+    "bf = pickle.loads(sys.stdin.buffer.read()); "
+    "print('a' in bf, b'b' in bf, 1 in bf)"
+)
+
+
+class TestPickle:
+    """Tests for pickle support."""
+
+    @pytest.mark.parametrize("protocol", range(pickle.HIGHEST_PROTOCOL + 1))
+    @pytest.mark.parametrize("serializable", [False, True])
+    def test_roundtrip(self, protocol, serializable):
+        """Every protocol restores an identical filter."""
+        bf = BloomFilter(CAPACITY_LARGE, FP_RATE_LOW, serializable=serializable,
+                         free_threading=True)
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+        bf.update(items)
+
+        restored = pickle.loads(pickle.dumps(bf, protocol))
+
+        assert_filters_equal(restored, bf)
+        assert restored.serializable is serializable
+        assert restored.free_threading is True
+        assert_no_false_negatives(restored, items)
+
+    def test_out_of_band_buffer(self, bf_factory):
+        """Protocol 5 hands the block array out of band without a copy."""
+        bf = bf_factory(CAPACITY_LARGE)
+        bf.update(range(ITEM_COUNT_LARGE))
+        buffers = []
+
+        data = pickle.dumps(bf, 5, buffer_callback=buffers.append)
+
+        assert len(buffers) == 1
+        assert len(data) < 256
+        view = buffers[0].raw()
+        assert view.nbytes == bf.byte_count
+        assert view.obj is bf
+        assert pickle.loads(data, buffers=buffers) == bf
+
+    def test_in_band_protocol_5(self, bf_factory):
+        """Without a buffer callback the blocks are stored in the pickle."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.add(1)
+        data = pickle.dumps(bf, 5)
+        assert len(data) > bf.byte_count
+        assert pickle.loads(data) == bf
+
+    def test_copy_module(self, bf_factory):
+        """copy.copy() and copy.deepcopy() go through pickling."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        bf.add(1)
+        for clone in (copy.copy(bf), copy.deepcopy(bf)):
+            assert clone == bf
+            assert clone is not bf
+            clone.add(2)
+            assert clone != bf
+
+    def test_file_backed_filter(self, tmp_path):
+        """Mapped filters unpickle into in-memory filters."""
+        path = tmp_path / "f"
+        BloomFilter.open(path, "w", capacity=CAPACITY_MEDIUM).add("a")
+
+        restored = pickle.loads(pickle.dumps(BloomFilter.open(path), 5))
+
+        assert restored.storage != "file"
+        assert "a" in restored
+        restored.add("b")
+
+    def test_wrong_size_rejected(self, bf_factory):
+        """A block buffer of the wrong size is rejected."""
+        bf = bf_factory(CAPACITY_MEDIUM)
+        func, args = bf.__reduce_ex__(5)
+        with pytest.raises(ValueError, match="expected"):
+            func(*args[:-1], b"\0" * 64)
+
+    @pytest.mark.parametrize("serializable", [False, True])
+    def test_same_hash_seed(self, serializable):
+        """Processes sharing a hash seed exchange any filter."""
+        data = run_with_hash_seed(1, DUMP_SCRIPT.format(serializable))
+        assert run_with_hash_seed(1, LOAD_SCRIPT, data).split() == [b"True"] * 3
+
+    def test_serializable_ignores_hash_seed(self):
+        """Serializable filters don't depend on the hash seed."""
+        data = run_with_hash_seed(1, DUMP_SCRIPT.format(True))
+        assert run_with_hash_seed(2, LOAD_SCRIPT, data).split() == [b"True"] * 3
+
+    def test_different_hash_seed_rejected(self):
+        """Standard-mode filters refuse to load under another hash seed."""
+        data = run_with_hash_seed(1, DUMP_SCRIPT.format(False))
+        with pytest.raises(subprocess.CalledProcessError) as excinfo:
+            run_with_hash_seed(2, LOAD_SCRIPT, data)
+        assert b"PYTHONHASHSEED" in excinfo.value.stderr
+
+
+def delta_block_count(delta):
+    """Number of blocks carried by a to_delta() result."""
+    return struct.unpack_from("<Q", delta, 32)[0]
+
+
+class TestDelta:
+    """Tests for checkpoint() / to_delta() / apply_delta()."""
+
+    def replica(self, bf):
+        """A replica of bf built from a full snapshot."""
+        return BloomFilter.from_bytes(bf.to_bytes())
+
+    def test_requires_checkpoint(self, bf_serializable):
+        """Tracking is opt-in; to_delta() needs a prior checkpoint()."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add("a")
+        with pytest.raises(ValueError, match="checkpoint"):
+            bf.to_delta()
+
+    def test_requires_serializable(self, bf_standard):
+        """to_delta() requires serializable=True."""
+        bf = bf_standard(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        with pytest.raises(ValueError, match="serializable"):
+            bf.to_delta()
+
+    def test_empty_delta(self, bf_serializable):
+        """A delta without changes is just the header."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.update(range(100))
+        bf.checkpoint()
+
+        delta = bf.to_delta()
+
+        assert len(delta) == 64
+        assert delta_block_count(delta) == 0
+        replica = self.replica(bf)
+        replica.apply_delta(delta)
+        assert_filters_equal(replica, bf)
+
+    def test_replica_stays_in_sync(self, bf_serializable):
+        """Applying each delta in order reproduces the source filter."""
+        bf = bf_serializable(CAPACITY_LARGE, FP_RATE_LOW)
+        bf.checkpoint()
+        replica = self.replica(bf)
+        items = [f"item_{i}" for i in range(ITEM_COUNT_LARGE)]
+
+        for start in range(0, ITEM_COUNT_LARGE, 100):
+            bf.update(items[start:start + 100])
+            replica.apply_delta(bf.to_delta(checkpoint=True))
+            assert_filters_equal(replica, bf)
+
+        assert_no_false_negatives(replica, items)
+
+    def test_delta_is_small(self, bf_serializable):
+        """Deltas carry only the changed blocks."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.checkpoint()
+        bf.update(range(10))
+
+        delta = bf.to_delta()
+
+        assert 1 <= delta_block_count(delta) <= 10
+        assert len(delta) < 64 + 11 * 64 + 10 * 3
+
+    def test_checkpoint_resets(self, bf_serializable):
+        """checkpoint() and to_delta(checkpoint=True) start a new delta."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.add("a")
+
+        assert delta_block_count(bf.to_delta()) == 1
+        assert delta_block_count(bf.to_delta(checkpoint=True)) == 1
+        assert delta_block_count(bf.to_delta()) == 0
+        bf.add("b")
+        bf.checkpoint()
+        assert delta_block_count(bf.to_delta()) == 0
+
+    def test_add_present_item_not_tracked(self, bf_serializable):
+        """Adds that set no new bits leave blocks unmarked."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.add("a")
+        bf.checkpoint()
+
+        assert bf.add_if_absent("a") is True
+        assert bf.update_new(["a"]) == 0
+        bf |= bf.copy()
+
+        assert delta_block_count(bf.to_delta()) == 0
+
+    @pytest.mark.parametrize("method", [
+        "add", "add_if_absent", "update", "update_new", "update_buffer", "ior",
+    ])
+    def test_write_paths_tracked(self, bf_serializable, method):
+        """Every way of adding items marks the changed blocks."""
+        bf = bf_serializable(CAPACITY_LARGE)
+        bf.add(-1)
+        bf.checkpoint()
+        replica = self.replica(bf)
+        values = list(range(200))
+
+        if method in ("add", "add_if_absent"):
+            for v in values:
+                getattr(bf, method)(v)
+        elif method == "update_buffer":
+            bf.update_buffer(array("q", values))
+        elif method == "ior":
+            other = bf_serializable(CAPACITY_LARGE)
+            other.update(values)
+            bf |= other
+        else:
+            getattr(bf, method)(values)
+
+        replica.apply_delta(bf.to_delta())
+        assert_filters_equal(replica, bf)
+
+    def test_clear_is_replicated(self, bf_serializable):
+        """A delta after clear() empties the replica."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.update(range(100))
+        replica = self.replica(bf)
+        bf.checkpoint()
+
+        bf.clear()
+        bf.add("x")
+        replica.apply_delta(bf.to_delta())
+
+        assert_filters_equal(replica, bf)
+        assert 0 not in replica
+
+    def test_apply_marks_replica(self, bf_serializable):
+        """A tracking replica forwards applied blocks in its own deltas."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        replica = self.replica(bf)
+        replica.checkpoint()
+        downstream = self.replica(replica)
+
+        bf.update(range(50))
+        replica.apply_delta(bf.to_delta())
+        downstream.apply_delta(replica.to_delta())
+
+        assert_filters_equal(downstream, bf)
+
+    def test_accepts_buffers(self, bf_serializable):
+        """apply_delta() accepts any bytes-like object."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.add("a")
+        replica = self.replica(bf.copy())
+        replica.apply_delta(memoryview(bytearray(bf.to_delta())))
+        assert "a" in replica
+
+    def test_mismatched_filter_rejected(self, bf_serializable):
+        """Deltas only apply to filters of the same capacity and fp_rate."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.add("a")
+        with pytest.raises(ValueError, match="capacity"):
+            bf_serializable(CAPACITY_LARGE).apply_delta(bf.to_delta())
+
+    def test_standard_target_rejected(self, bf_serializable, bf_standard):
+        """A standard filter hashes str and bytes differently, so it can't apply a delta."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.add("a")
+        target = bf_standard(CAPACITY_MEDIUM)
+        with pytest.raises(ValueError, match="serializable"):
+            target.apply_delta(bf.to_delta())
+        assert not target
+
+    def test_full_data_rejected(self, bf_serializable):
+        """Deltas and full serializations aren't interchangeable."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.add("a")
+        with pytest.raises(ValueError, match="apply_delta"):
+            BloomFilter.from_bytes(bf.to_delta())
+        with pytest.raises(ValueError, match="to_delta"):
+            bf.apply_delta(bf.to_bytes())
+        with pytest.raises(ValueError, match="magic"):
+            bf.apply_delta(b"junk" * 16)
+
+    @pytest.mark.parametrize("corrupt", ["count", "index", "truncated", "trailing"])
+    def test_corrupt_delta_rejected(self, bf_serializable, corrupt):
+        """Malformed deltas are rejected without touching the filter."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.update(range(20))
+        data = bytearray(bf.to_delta())
+        if corrupt == "count":
+            struct.pack_into("<Q", data, 32, 1 << 60)
+        elif corrupt == "index":
+            data[-1] = 0x7F
+        elif corrupt == "truncated":
+            data = data[:-1]
+        else:
+            data += b"\0"
+        target = bf_serializable(CAPACITY_MEDIUM)
+
+        with pytest.raises(ValueError, match="Invalid data"):
+            target.apply_delta(bytes(data))
+        assert not target
+
+    def test_readonly_target_rejected(self, bf_serializable, tmp_path):
+        """Read-only mapped filters can't take deltas."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        bf.add("a")
+        path = tmp_path / "f"
+        path.write_bytes(bf_serializable(CAPACITY_MEDIUM).to_bytes())
+        with pytest.raises(TypeError, match="mode='r'"):
+            BloomFilter.open(path).apply_delta(bf.to_delta())
+
+    def test_copy_not_tracked(self, bf_serializable):
+        """Copies start without change tracking."""
+        bf = bf_serializable(CAPACITY_MEDIUM)
+        bf.checkpoint()
+        with pytest.raises(ValueError, match="checkpoint"):
+            bf.copy().to_delta()
+
+
 class TestFloatSupport:
     """Tests for float type support in serializable mode."""
 
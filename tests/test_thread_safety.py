@@ -7,9 +7,16 @@ This module tests:
 - Concurrent access patterns (add, lookup, mixed)
 - Property-based concurrent testing with Hypothesis
 - Stress tests under high contention
+- Bulk buffer operations release the GIL
+- __init__ refuses while another thread's call is using the storage
+- Bulk and single-item writers never lose bits
+- Concurrent add_if_absent() / update_new() report each item new once
 """
 
+import sys
 import threading
+import time
+from array import array
 from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import timedelta
 
@@ -17,7 +24,7 @@ import pytest
 from hypothesis import given, settings, Phase
 from hypothesis import strategies as st
 
-from abloom import BloomFilter
+from abloom import BloomFilter, CountingBloomFilter, CuckooFilter, ScalableBloomFilter
 
 from conftest import (
     CAPACITY_MEDIUM,
@@ -26,6 +33,7 @@ from conftest import (
     FP_RATE_LOW,
     ITEM_COUNT_LARGE,
     assert_no_false_negatives,
+    assert_filters_equal,
 )
 
 
@@ -333,6 +341,33 @@ class TestConcurrentAdd:
         assert_no_false_negatives(bf, all_items)
 
 
+class TestConcurrentAddIfAbsent:
+    """Concurrent test-and-set inserts."""
+
+    @pytest.mark.parametrize("method", ["add_if_absent", "update_new"])
+    def test_each_item_new_exactly_once(self, bf_free_threading, method):
+        """When threads race on the same items, exactly one sees each as new."""
+        bf = bf_free_threading(CAPACITY_LARGE, FP_RATE_LOW)
+        items = [f"shared_{i}" for i in range(ITEMS_PER_THREAD)]
+        barrier = threading.Barrier(WORKERS_FEW)
+
+        def add_items(_):
+            barrier.wait()
+            if method == "update_new":
+                return list(bf.update_new(items, mask=True))
+            return [int(not bf.add_if_absent(item)) for item in items]
+
+        with ThreadPoolExecutor(max_workers=WORKERS_FEW) as ex:
+            masks = list(ex.map(add_items, range(WORKERS_FEW)))
+
+        # A false positive can hide a new item from every thread, never
+        # report it to two
+        new_counts = [sum(column) for column in zip(*masks)]
+        assert max(new_counts) == 1
+        assert sum(new_counts) >= len(items) - 5
+        assert_no_false_negatives(bf, items)
+
+
 class TestConcurrentLookup:
     """Multiple threads reading simultaneously."""
 
@@ -838,3 +873,222 @@ class TestConcurrentStress:
             stop_flag.set()
             for f in futures:
                 f.result()
+
+
+# =============================================================================
+# GIL Release Tests
+# =============================================================================
+
+# ~12 MB of blocks: large enough that each bulk call takes milliseconds
+CAPACITY_GIL = 10_000_000
+GIL_HASHES = array("Q", ((i * 0x9E3779B97F4A7C15) % 2**64 for i in range(1_000_000)))
+
+
+def progress_during(fn, repeats=5):
+    """Run fn() `repeats` times in a worker thread while this thread counts.
+
+    Returns how far the count advanced while fn() itself was running. The
+    switch interval is raised so the GIL only changes hands voluntarily: if
+    fn() holds the GIL throughout, the result is exactly 0.
+    """
+    counter = [0]
+    advanced = [0]
+    done = threading.Event()
+
+    def worker():
+        for _ in range(repeats):
+            before = counter[0]
+            fn()
+            advanced[0] += counter[0] - before
+        done.set()
+
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(10)
+    try:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        while not done.is_set():
+            counter[0] += 1
+            if counter[0] % 1000 == 0:
+                time.sleep(0.0001)  # Let the worker take the GIL
+        thread.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+    return advanced[0]
+
+
+def reinit_refusals(fn, reinit, repeats=5):
+    """Call reinit() in a loop while a worker thread runs fn() `repeats` times.
+
+    Returns how many reinit() calls raised BufferError.
+    """
+    refused = 0
+    done = threading.Event()
+
+    def worker():
+        for _ in range(repeats):
+            fn()
+        done.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    while not done.is_set():
+        try:
+            reinit()
+        except BufferError:
+            refused += 1
+    thread.join()
+    return refused
+
+
+@pytest.fixture(scope="module")
+def gil_filters():
+    """Populated serializable filters large enough for bulk operations."""
+    bf = BloomFilter(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+    other = BloomFilter(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+    bf.update_hashes(GIL_HASHES[::2])
+    other.update_hashes(GIL_HASHES[1::2])
+    return {
+        "bf": bf,
+        "other": other,
+        "twin": bf.copy(),
+        "scratch": bf.copy(),
+        "data": bf.to_bytes(),
+    }
+
+
+BULK_OPERATIONS = {
+    "ior": lambda f: f["scratch"].__ior__(f["other"]),
+    "or": lambda f: f["bf"] | f["other"],
+    "eq": lambda f: f["bf"] == f["twin"],
+    "copy": lambda f: f["bf"].copy(),
+    "clear": lambda f: f["scratch"].clear(),
+    "to_bytes": lambda f: f["bf"].to_bytes(),
+    "from_bytes": lambda f: BloomFilter.from_bytes(f["data"]),
+    "update_buffer": lambda f: f["scratch"].update_buffer(GIL_HASHES),
+    "update_hashes": lambda f: f["scratch"].update_hashes(GIL_HASHES),
+    "contains_hashes": lambda f: f["bf"].contains_hashes(GIL_HASHES),
+}
+
+
+class TestGilRelease:
+    """Bulk operations let other threads run while they work."""
+
+    @pytest.mark.parametrize("op", sorted(BULK_OPERATIONS))
+    def test_other_threads_keep_running(self, gil_filters, op):
+        """Another thread makes progress while a bulk call is running."""
+        fn = BULK_OPERATIONS[op]
+        assert progress_during(lambda: fn(gil_filters)) > 0
+
+    @pytest.mark.parametrize("op", ["to_bytes", "copy", "contains_hashes", "update_buffer"])
+    def test_reinit_refused_while_running(self, op):
+        """__init__ can't free the blocks under a call that released the GIL."""
+        bf = BloomFilter(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+        calls = {
+            "to_bytes": bf.to_bytes,
+            "copy": bf.copy,
+            "contains_hashes": lambda: bf.contains_hashes(GIL_HASHES),
+            "update_buffer": lambda: bf.update_buffer(GIL_HASHES, threads=4),
+        }
+        reinit = lambda: bf.__init__(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+
+        assert reinit_refusals(calls[op], reinit) > 0
+        assert bf.byte_count == len(bf.to_bytes()) - 64
+
+    @pytest.mark.parametrize("op", ["copy", "eq"])
+    def test_counting_reinit_refused_while_running(self, op):
+        """CountingBloomFilter.__init__ can't free the counters under copy() or ==."""
+        cbf = CountingBloomFilter(CAPACITY_GIL, FP_RATE_STANDARD)
+        other = CountingBloomFilter(CAPACITY_GIL, FP_RATE_STANDARD)
+        calls = {"copy": cbf.copy, "eq": lambda: other == cbf}
+        reinit = lambda: cbf.__init__(CAPACITY_GIL, FP_RATE_STANDARD)
+
+        assert reinit_refusals(calls[op], reinit) > 0
+        assert cbf.byte_count == other.byte_count
+        assert cbf == other
+
+    def test_cuckoo_reinit_refused_while_running(self):
+        """CuckooFilter.__init__ can't free the table under ==."""
+        cf = CuckooFilter(CAPACITY_GIL, FP_RATE_STANDARD)
+        other = CuckooFilter(CAPACITY_GIL, FP_RATE_STANDARD)
+        reinit = lambda: cf.__init__(CAPACITY_GIL, FP_RATE_STANDARD)
+
+        assert reinit_refusals(lambda: other == cf, reinit) > 0
+        assert cf.byte_count == other.byte_count
+        assert cf == other
+
+    @pytest.mark.parametrize("op", ["copy", "eq", "to_bytes"])
+    def test_scalable_reinit_refused_while_running(self, op):
+        """ScalableBloomFilter.__init__ can't drop stages another call is using."""
+        sf = ScalableBloomFilter(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+        other = ScalableBloomFilter(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+        calls = {"copy": sf.copy, "eq": lambda: other == sf, "to_bytes": sf.to_bytes}
+        reinit = lambda: sf.__init__(CAPACITY_GIL, FP_RATE_STANDARD, serializable=True)
+
+        assert reinit_refusals(calls[op], reinit) > 0
+        assert sf.byte_count == other.byte_count
+        assert sf == other
+
+    def test_small_operations_keep_working(self):
+        """Inputs below the release threshold keep the GIL and still work."""
+        bf = BloomFilter(CAPACITY_MEDIUM, FP_RATE_STANDARD)
+        hashes = GIL_HASHES[:100]
+        bf.update_hashes(hashes)
+        assert bf.contains_hashes(hashes) == bytearray([1]) * len(hashes)
+
+
+class TestBulkWriters:
+    """Bulk writers running without the GIL alongside single-item writers."""
+
+    @pytest.mark.parametrize("free_threading", [False, True])
+    def test_concurrent_writers_lose_no_bits(self, free_threading):
+        """Concurrent bulk and single-item writes equal a sequential build."""
+        def make():
+            return BloomFilter(CAPACITY_GIL // 4, FP_RATE_STANDARD,
+                               free_threading=free_threading)
+
+        chunks = [GIL_HASHES[i::4] for i in range(4)]
+        source = make()
+        source.update_hashes(chunks[3])
+        singles = [f"item_{i}" for i in range(20_000)]
+
+        expected = make()
+        for chunk in chunks[:3]:
+            expected.update_hashes(chunk)
+        expected |= source
+        expected.update(singles)
+        for h in chunks[2][:5_000]:
+            expected.add_hash(h)
+
+        bf = make()
+        tasks = [
+            lambda: bf.update_hashes(chunks[0]),
+            lambda: bf.update_hashes(chunks[1]),
+            lambda: bf.update_hashes(chunks[2]),
+            lambda: bf.__ior__(source),
+            lambda: [bf.add(item) for item in singles],
+            lambda: [bf.add_hash(h) for h in chunks[2][:5_000]],
+        ]
+        with ThreadPoolExecutor(max_workers=len(tasks)) as ex:
+            for f in [ex.submit(task) for task in tasks]:
+                f.result()
+
+        assert_filters_equal(bf, expected)
+
+    def test_lookups_during_bulk_insert(self):
+        """contains_hashes() never misses hashes inserted before it started."""
+        bf = BloomFilter(CAPACITY_GIL // 4, FP_RATE_STANDARD)
+        present = GIL_HASHES[::2]
+        bf.update_hashes(present)
+        stop_flag = threading.Event()
+
+        def writer():
+            while not stop_flag.is_set():
+                bf.update_hashes(GIL_HASHES[1::2])
+
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            future = ex.submit(writer)
+            for _ in range(10):
+                assert all(bf.contains_hashes(present))
+            stop_flag.set()
+            future.result()